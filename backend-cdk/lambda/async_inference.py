@@ -0,0 +1,95 @@
+import json
+from urllib.parse import urlparse
+
+from botocore.exceptions import ClientError
+
+# Requests queued on the async endpoint are written under this prefix
+INPUT_PREFIX = 'async-inference/input/'
+
+# Manifest of every async transcription in flight, in the summaries bucket
+MANIFEST_PREFIX = 'async-inference/jobs/'
+
+
+class AsyncInferenceError(RuntimeError):
+    """The endpoint wrote a failure object for a request, or never answered."""
+
+
+def parse_s3_uri(uri):
+    """(bucket, key) of an s3:// URI."""
+    parsed = urlparse(uri)
+    if parsed.scheme != 's3' or not parsed.netloc:
+        raise ValueError(f"Not an S3 URI: {uri}")
+    return parsed.netloc, parsed.path.lstrip('/')
+
+
+def _missing(e):
+    return e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404', 'NotFound')
+
+
+def object_exists(s3, uri):
+    bucket, key = parse_s3_uri(uri)
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        if _missing(e):
+            return False
+        raise
+
+
+def read_object(s3, uri):
+    """Bytes of an output or failure object, or None while it does not exist."""
+    bucket, key = parse_s3_uri(uri)
+    try:
+        return s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+    except ClientError as e:
+        if _missing(e):
+            return None
+        raise
+
+
+def chunk_state(s3, submission):
+    """
+    'done', 'failed' or 'pending' for a submitted request.
+
+    Only HEAD requests are made, so polling a long recording does not
+    download every finished transcript again.
+    """
+    if object_exists(s3, submission['OutputLocation']):
+        return 'done'
+    if submission.get('FailureLocation') and object_exists(s3, submission['FailureLocation']):
+        return 'failed'
+    return 'pending'
+
+
+def fetch_result(s3, submission):
+    """
+    Decoded response of a submitted request, or None while it is pending.
+
+    Raises:
+        AsyncInferenceError: if the endpoint reported a failure
+    """
+    body = read_object(s3, submission['OutputLocation'])
+    if body is not None:
+        return json.loads(body.decode('utf-8'))
+    failure = read_object(s3, submission['FailureLocation']) if submission.get('FailureLocation') else None
+    if failure is not None:
+        raise AsyncInferenceError(
+            f"Async inference {submission.get('InferenceId')} failed: {failure.decode('utf-8', 'replace')[:500]}")
+    return None
+
+
+def manifest_key(job_id):
+    return f"{MANIFEST_PREFIX}{job_id}.json"
+
+
+def save_manifest(s3, bucket, job_id, manifest):
+    """Store the manifest of an async transcription and return its key."""
+    key = manifest_key(job_id)
+    s3.put_object(Bucket=bucket, Key=key, Body=json.dumps(manifest).encode('utf-8'),
+                  ContentType='application/json')
+    return key
+
+
+def load_manifest(s3, bucket, key):
+    return json.loads(s3.get_object(Bucket=bucket, Key=key)['Body'].read())
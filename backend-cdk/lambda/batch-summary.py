@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import uuid
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import lambda_runtime
+import rate_limiter
+from metrics import StageMetrics, debug
+from summarization import (SUMMARY_MODEL_ID, SPEAKER_TRANSCRIPT_SUFFIX, apply_guardrail, build_request,
+                           summary_key_for, summary_text)
+
+# Set up logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Bedrock batch inference rejects jobs with fewer records than this
+DEFAULT_MIN_RECORDS = 100
+
+# Job states after which get_model_invocation_job no longer changes
+COMPLETED_STATES = {'Completed', 'PartiallyCompleted'}
+FAILED_STATES = {'Failed', 'Stopped', 'Expired'}
+
+
+def list_speaker_transcripts(s3, bucket, prefix):
+    """Keys of all speaker-identification transcripts under prefix."""
+    keys = []
+    params = {'Bucket': bucket, 'Prefix': prefix}
+    while True:
+        response = s3.list_objects_v2(**params)
+        keys.extend(item['Key'] for item in response.get('Contents', [])
+                    if item['Key'].endswith(SPEAKER_TRANSCRIPT_SUFFIX))
+        if not response.get('IsTruncated'):
+            return keys
+        params['ContinuationToken'] = response['NextContinuationToken']
+
+
+def record_id(index):
+    """Batch record IDs are limited to 11 characters."""
+    return f"r{index:010d}"
+
+
+def job_folder(job_name):
+    return f"batch-summaries/{job_name}/"
+
+
+def guardrail_concurrency():
+    return max(int(os.environ.get('BATCH_GUARDRAIL_CONCURRENCY', '8')), 1)
+
+
+def submit(event, metrics):
+    """
+    Build the JSONL input from every transcript under a prefix and start one batch job.
+
+    Each transcript is redacted with the guardrail first, exactly as the
+    on-demand summary does, so the model never sees unredacted text. The
+    record ID to transcript key mapping is stored next to the input as
+    manifest.json for collect().
+    """
+    s3 = lambda_runtime.get_client('s3')
+    bedrock_runtime = lambda_runtime.get_client('bedrock-runtime', region_name="us-east-1")
+    bedrock = lambda_runtime.get_client('bedrock', region_name="us-east-1")
+    bucket = event.get('bucket') or os.environ['SUMMARIES_BUCKET']
+    prefix = event.get('prefix', 'Transcription-Output-for-')
+    guardrail_id = os.environ['GUARDRAIL_ID']
+    model_id = event.get('modelId', SUMMARY_MODEL_ID)
+
+    with metrics.stage('list') as stage:
+        keys = list_speaker_transcripts(s3, bucket, prefix)
+        stage['ObjectCount'] = len(keys)
+    min_records = int(os.environ.get('BATCH_MIN_RECORDS', str(DEFAULT_MIN_RECORDS)))
+    if len(keys) < min_records:
+        raise ValueError(f"Found {len(keys)} transcripts under {prefix}; batch jobs need at least "
+                         f"{min_records}. Use the on-demand summary for small runs.")
+
+    def redacted_record(index_key):
+        index, key = index_key
+        content = s3.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8')
+        redacted = apply_guardrail(bedrock_runtime, content, guardrail_id)
+        return json.dumps({'recordId': record_id(index), 'modelInput': build_request(redacted)}) + '\n'
+
+    job_name = f"summary-backfill-{time.strftime('%Y%m%d%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+    folder = job_folder(job_name)
+    input_key = f"{folder}input/records.jsonl"
+    manifest_key = f"{folder}manifest.json"
+
+    # Records are streamed to /tmp as they are redacted, so the archive size
+    # is not limited by the function's memory
+    with tempfile.TemporaryFile() as records:
+        with metrics.stage('guardrail') as stage:
+            with ThreadPoolExecutor(max_workers=guardrail_concurrency()) as executor:
+                for line in executor.map(redacted_record, enumerate(keys)):
+                    records.write(line.encode('utf-8'))
+            stage['bytes'] = records.tell()
+        records.seek(0)
+        with metrics.stage('upload') as stage:
+            s3.upload_fileobj(records, bucket, input_key)
+            manifest = {
+                'jobName': job_name,
+                'bucket': bucket,
+                'modelId': model_id,
+                'records': {record_id(index): key for index, key in enumerate(keys)}
+            }
+            s3.put_object(Bucket=bucket, Key=manifest_key, Body=json.dumps(manifest).encode('utf-8'))
+            stage['bytes'] = records.tell()
+
+    with metrics.stage('submit'):
+        response = bedrock.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=os.environ['BATCH_ROLE_ARN'],
+            modelId=model_id,
+            inputDataConfig={'s3InputDataConfig': {'s3InputFormat': 'JSONL', 's3Uri': f"s3://{bucket}/{input_key}"}},
+            outputDataConfig={'s3OutputDataConfig': {'s3Uri': f"s3://{bucket}/{folder}output/"}}
+        )
+    metrics.set_property('RecordCount', len(keys))
+    print(f"Submitted batch summary job {job_name} with {len(keys)} transcripts")
+    return {
+        'action': 'collect',
+        'jobArn': response['jobArn'],
+        'jobName': job_name,
+        'bucket': bucket,
+        'manifestKey': manifest_key,
+        'recordCount': len(keys)
+    }
+
+
+def _split_s3_uri(uri):
+    bucket, _, key = uri[len('s3://'):].partition('/')
+    return bucket, key
+
+
+def iter_output_records(s3, output_uri):
+    """Parsed records of every .jsonl.out file the job wrote under output_uri."""
+    bucket, prefix = _split_s3_uri(output_uri)
+    params = {'Bucket': bucket, 'Prefix': prefix}
+    while True:
+        response = s3.list_objects_v2(**params)
+        for item in response.get('Contents', []):
+            if not item['Key'].endswith('.jsonl.out'):
+                continue
+            for line in s3.get_object(Bucket=bucket, Key=item['Key'])['Body'].read().splitlines():
+                if line.strip():
+                    yield json.loads(line)
+        if not response.get('IsTruncated'):
+            return
+        params['ContinuationToken'] = response['NextContinuationToken']
+
+
+def collect(event, metrics):
+    """
+    Write the summaries of a finished batch job back to S3.
+
+    Every summary goes through the guardrail again and is stored under the
+    same Bedrock-Sonnet-GenAI-summary-<id>.txt key the on-demand path uses.
+    While the job is still running, only its status is returned, so callers
+    (or a Step Functions wait loop) can poll.
+    """
+    s3 = lambda_runtime.get_client('s3')
+    bedrock_runtime = lambda_runtime.get_client('bedrock-runtime', region_name="us-east-1")
+    bedrock = lambda_runtime.get_client('bedrock', region_name="us-east-1")
+    guardrail_id = os.environ['GUARDRAIL_ID']
+
+    job = bedrock.get_model_invocation_job(jobIdentifier=event['jobArn'])
+    status = job['status']
+    # The result can be passed straight back in to poll again
+    result = {'action': 'collect', 'jobArn': event['jobArn'], 'bucket': event['bucket'],
+              'manifestKey': event['manifestKey'], 'status': status}
+    if status in FAILED_STATES:
+        raise RuntimeError(f"Batch job {event['jobArn']} ended with status {status}: {job.get('message', '')}")
+    if status not in COMPLETED_STATES:
+        return dict(result, complete=False)
+
+    manifest = json.loads(s3.get_object(Bucket=event['bucket'], Key=event['manifestKey'])['Body'].read())
+    bucket = manifest['bucket']
+
+    def store_summary(record):
+        key = manifest['records'].get(record.get('recordId'))
+        if key is None or 'modelOutput' not in record:
+            logger.warning(f"No summary for record {record.get('recordId')}: {record.get('error')}")
+            return None
+        summary = apply_guardrail(bedrock_runtime, summary_text(record['modelOutput']), guardrail_id)
+        output_key = summary_key_for(key)
+        s3.put_object(Bucket=bucket, Key=output_key, Body=summary.encode('utf-8'))
+        return output_key
+
+    with metrics.stage('store') as stage:
+        records = list(iter_output_records(s3, job['outputDataConfig']['s3OutputDataConfig']['s3Uri']))
+        with ThreadPoolExecutor(max_workers=guardrail_concurrency()) as executor:
+            written = [key for key in executor.map(store_summary, records) if key]
+        stage['ObjectCount'] = len(written)
+
+    failed = len(manifest['records']) - len(written)
+    metrics.set_property('RecordCount', len(manifest['records']))
+    metrics.set_property('FailedRecords', failed)
+    debug(f"Batch job {event['jobArn']} wrote {len(written)} summaries")
+    return dict(result, complete=True, summaries=len(written), failed=failed)
+
+
+def lambda_handler(event, context):
+    """
+    Batch summarization of an archive (e.g. after a prompt change).
+
+    {"action": "submit", "prefix": "..."} starts one Bedrock batch inference
+    job for every speaker-identification transcript under the prefix.
+    {"action": "collect", ...submit output...} writes the results back once
+    the job has finished. Batch inference is billed at half the on-demand
+    price, and the archive needs two invocations instead of one Step
+    Functions execution and three Lambda runs per recording.
+    """
+    metrics = StageMetrics('batch-summary', Action=event.get('action'))
+    try:
+        if event.get('action') == 'submit':
+            return submit(event, metrics)
+        if event.get('action') == 'collect':
+            return collect(event, metrics)
+        raise ValueError(f"Unknown action: {event.get('action')}")
+    finally:
+        metrics.set_property('RateLimiters', rate_limiter.limiter_stats())
+        metrics.flush()
@@ -1,84 +1,41 @@
 import json
-import boto3
 import uuid
 import logging
 import os
 
+import lambda_runtime
+import profiling
+import content_index
+import rate_limiter
+import summary_routing
+import prompt_compaction
+import redaction
+import job_status
+from metrics import StageMetrics
+from summarization import apply_guardrail, build_request, summary_key_for, summary_text
+
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def apply_guardrail(bedrock_runtime, content, guardrail_id, guardrail_version="DRAFT"):
-    """
-    Apply Bedrock Guardrail to content for redaction
-    
-    Args:
-        bedrock_runtime: Boto3 client for Bedrock Runtime
-        content: The text content to apply guardrails to
-        guardrail_id: The ID of the guardrail to apply
-        guardrail_version: Version of the guardrail to use
-        
-    Returns:
-        The redacted/filtered content
-    """
+@profiling.profile_invocation('bedrock-summary')
+def lambda_handler(event, context):
+    metrics = StageMetrics('bedrock-summary')
     try:
-        # Format content according to the API requirements
-        formatted_content = [
-            {
-                "text": {
-                    "text": content
-                }
-            }
-        ]
-        
-        # Call the guardrail API
-        response = bedrock_runtime.apply_guardrail(
-            guardrailIdentifier=guardrail_id,
-            guardrailVersion=guardrail_version,
-            source="OUTPUT",  # Using OUTPUT as the source based on testing
-            content=formatted_content
-        )
-        
-        # Check if guardrail intervened and we got outputs
-        if 'action' in response and response['action'] == 'GUARDRAIL_INTERVENED' and 'outputs' in response and response['outputs']:
-            logger.info(f"Guardrail successfully intervened. Analyzing outputs...")
-            
-            # Try different response formats
-            if len(response['outputs']) > 0:
-                output = response['outputs'][0]
-                
-                # Try standard format
-                if 'text' in output and isinstance(output['text'], dict) and 'text' in output['text']:
-                    return output['text']['text']
-                    
-                # Try alternative format where text might be directly in output
-                elif 'text' in output and isinstance(output['text'], str):
-                    return output['text']
-                    
-                # Try another alternative where content might be at a different path
-                elif 'content' in output:
-                    if isinstance(output['content'], str):
-                        return output['content']
-                    elif isinstance(output['content'], dict) and 'text' in output['content']:
-                        return output['content']['text']
-                
-                # Log the output structure for debugging
-                logger.warning(f"Could not extract text from response output: {json.dumps(output)}")
-        
-        # If no redacted output, log details and return original content
-        logger.warning(f"No redacted output from guardrail. Action: {response.get('action')}")
-        if 'usage' in response:
-            logger.info(f"Guardrail usage stats: {json.dumps(response['usage'])}")
-        return content
+        return summarize(event, metrics)
     except Exception as e:
-        logger.error(f"Error applying guardrail: {str(e)}")
-        # Return original content if guardrail application fails
-        return content
+        # Failed invocations still report the stages they got through
+        metrics.set_property('FailureReason', str(e))
+        raise
+    finally:
+        metrics.set_property('RateLimiters', rate_limiter.limiter_stats())
+        metrics.flush()
 
-def lambda_handler(event, context):
-    # Create Boto3 clients
-    s3 = boto3.client('s3')
-    bedrock = boto3.client(service_name="bedrock-runtime", region_name="us-east-1")
+
+def summarize(event, metrics):
+    # Boto3 clients are created once per container and reused by warm invocations
+    s3 = lambda_runtime.get_client('s3')
+    bedrock = lambda_runtime.get_client('bedrock-runtime', region_name="us-east-1")
     # Use bedrock-runtime for guardrails, not bedrock-agent-runtime
     bedrock_runtime = bedrock  # reuse the same client for both model invocation and guardrails
     
@@ -100,60 +57,123 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': 'Missing bucket_name or object_key in input'})
         }
     
+    metrics.set_property('InputKey', object_key)
+    job_id = job_status.job_id_for_key(object_key)
+    job_status.notify(job_id, 'summarizing', artifacts={'speaker_key': object_key})
+    
     # Download the object from S3
-    file_obj = s3.get_object(Bucket=bucket_name, Key=object_key)
-    content = file_obj['Body'].read().decode('utf-8')
+    with metrics.stage('download') as stage:
+        file_obj = s3.get_object(Bucket=bucket_name, Key=object_key)
+        raw_content = file_obj['Body'].read()
+        stage['bytes'] = len(raw_content)
+    content = raw_content.decode('utf-8')
     
-    # Apply guardrail to redact sensitive content in the transcription
-    logger.info("Applying guardrail to transcription...")
-    redacted_content = apply_guardrail(bedrock_runtime, content, guardrail_id)
+    # Apply guardrail to redact sensitive content in the transcription, unless
+    # the chunks already went through it while they were being transcribed
+    upstream_redaction = file_obj.get('Metadata', {}).get(redaction.METADATA_KEY, 'none')
+    metrics.set_property('UpstreamRedaction', upstream_redaction)
+    if redaction.guardrail_applied(file_obj.get('Metadata')):
+        logger.info(f"Transcription already redacted during transcription ({upstream_redaction}), skipping guardrail")
+        redacted_content = content
+    else:
+        logger.info("Applying guardrail to transcription...")
+        with metrics.stage('guardrail') as stage:
+            redacted_content = apply_guardrail(bedrock_runtime, content, guardrail_id)
+            stage['bytes'] = len(content)
     
     # Log redaction statistics if content was modified
     if content != redacted_content:
         logger.info("Sensitive content was redacted from transcription")
 
-    # Construct the prompt with redacted content
-    prompt = f"{redacted_content}\n\nGive me the summary, speakers, key discussions, and action items with owners"
-
-    # Construct the request payload
-    body = json.dumps({
-        "max_tokens": 4096,
-        "temperature": 0.5,
-        "messages": [{"role": "user", "content": prompt}],
-        "anthropic_version": "bedrock-2023-05-31"
-    })
+    # Merge turns, coarsen timestamps and drop filler words before they are paid for as input tokens
+    with metrics.stage('compaction') as stage:
+        prompt_content, speaker_aliases, compaction = prompt_compaction.compact_transcript(redacted_content)
+        stage['bytes'] = len(redacted_content)
+    metrics.set_property('PromptTokensBefore', compaction['tokens_before'])
+    metrics.set_property('PromptTokensAfter', compaction['tokens_after'])
+    logger.info(f"Prompt compaction: ~{compaction['tokens_before']} -> ~{compaction['tokens_after']} tokens")
     
-    # Invoke the model
-    modelId = "anthropic.claude-3-5-sonnet-20240620-v1:0"
-    response = bedrock.invoke_model(body=body, modelId=modelId)
+    # Short transcripts go to a faster, cheaper model (see summary_routing.json);
+    # SummaryRouting in the event overrides the tier or the model
+    route = summary_routing.choose_model(prompt_content, event.get('SummaryRouting'))
+    logger.info(f"Summary routed to {route['tier']} tier ({route['model_id']}, "
+                f"~{route['estimated_input_tokens']} input tokens)")
     
-    # Parse the response
-    response_body = json.loads(response.get("body").read())
-    content = response_body.get("content")
-    summary = content[0]['text']
+    # Construct the request payload with the redacted content
+    body = json.dumps(build_request(prompt_content, route['max_tokens']))
+    
+    # Invoke the model
+    modelId = route['model_id']
+    with metrics.stage('model_call') as stage:
+        # Bedrock quotas are per model, so each model gets its own limiter
+        response = rate_limiter.limited_call(f'bedrock:InvokeModel:{modelId}',
+                                             lambda: bedrock.invoke_model(body=body, modelId=modelId))
+        
+        # Parse the response
+        response_body = json.loads(response.get("body").read())
+        stage['bytes'] = len(body)
+    usage = response_body.get('usage', {})
+    metrics.set_property('ModelId', modelId)
+    metrics.set_property('ModelTier', route['tier'])
+    metrics.set_property('EstimatedInputTokens', route['estimated_input_tokens'])
+    if 'input_tokens' in usage:
+        metrics.set_property('InputTokens', usage['input_tokens'])
+    if 'output_tokens' in usage:
+        metrics.set_property('OutputTokens', usage['output_tokens'])
+    # The model may refer to speakers by their compacted aliases
+    summary = prompt_compaction.expand_aliases(summary_text(response_body), speaker_aliases)
     
     # Optionally apply guardrail again to the summary to ensure all sensitive content is redacted
     logger.info("Applying guardrail to generated summary...")
-    redacted_summary = apply_guardrail(bedrock_runtime, summary, guardrail_id)
+    with metrics.stage('guardrail') as stage:
+        redacted_summary = apply_guardrail(bedrock_runtime, summary, guardrail_id)
+        stage['bytes'] = len(summary)
     
     # Log if any additional content was redacted from the summary
     if summary != redacted_summary:
         logger.info("Additional sensitive content was redacted from summary")
     
     # Generate output filename
-    # Input: Transcription-Output-for-uploads/sample-team-meeting-recording-XXXX-XXXX-XXXX-XXXX.mp4-speaker-identification.txt
-    # Output: Bedrock-Sonnet-GenAI-summary-sample-team-meeting-recording-XXXX-XXXX-XXXX-XXXX.txt
-    base_name = object_key.split('/')[-1]
-    file_id = base_name.replace('Transcription-Output-for-uploads/', '').replace('-speaker-identification.txt', '')
-    output_key = f"Bedrock-Sonnet-GenAI-summary-{file_id}.txt"
+    output_key = summary_key_for(object_key)
     
     # Use the same bucket for summaries
     summaries_bucket = bucket_name
     
-    s3.put_object(Bucket=summaries_bucket, Key=output_key, Body=redacted_summary.encode('utf-8'))
+    with metrics.stage('upload') as stage:
+        summary_bytes = redacted_summary.encode('utf-8')
+        s3.put_object(Bucket=summaries_bucket, Key=output_key, Body=summary_bytes)
+        stage['bytes'] = len(summary_bytes)
+    # Browsers watching the job fetch the summary right away instead of at their next poll
+    job_record = job_status.notify(job_id, 'done', summaryKey=output_key, artifacts={'summary_key': output_key})
+    # End-to-end latency per intake lane, for tuning the Express threshold
+    if job_record and job_record.get('lane') and 'totalSeconds' in job_record:
+        metrics.set_property('Lane', job_record['lane'])
+        metrics.set_property('PipelineSeconds', job_record['totalSeconds'])
+    
+    # Record the completed run so identical uploads can reuse its artifacts
+    content_fingerprint = speaker_payload.get('content_fingerprint')
+    fingerprint_index = content_index.get_fingerprint_index(summaries_bucket) if content_fingerprint else None
+    if fingerprint_index:
+        fingerprint_index.record(content_fingerprint, {
+            'input_key': content_index.input_key_from_speaker_key(object_key),
+            'bucket': summaries_bucket,
+            'transcription_key': object_key.replace('-speaker-identification.txt', '.txt'),
+            'speaker_key': object_key,
+            'summary_key': output_key
+        })
     
     return {
         'bucket_name': summaries_bucket,
         'object_key': output_key,
+        'content_fingerprint': content_fingerprint,
+        'compaction': compaction,
+        'model': {
+            'tier': route['tier'],
+            'model_id': modelId,
+            'max_tokens': route['max_tokens'],
+            'estimated_input_tokens': route['estimated_input_tokens'],
+            'input_tokens': usage.get('input_tokens'),
+            'output_tokens': usage.get('output_tokens')
+        },
         'message': 'Summary and key discussions generated successfully'
     }
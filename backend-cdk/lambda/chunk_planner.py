@@ -0,0 +1,154 @@
+import os
+import math
+import base64
+import binascii
+
+# Size of the canonical PCM WAV header written for every chunk
+WAV_HEADER_BYTES = 44
+
+# Whisper processes audio in 30 second windows; longer chunks are truncated
+MODEL_WINDOW_SECONDS = 30
+
+# SageMaker real-time endpoints accept request bodies up to 6 MB; the
+# default leaves headroom for proxies and HTTP framing
+DEFAULT_MAX_PAYLOAD_BYTES = 5 * 1024 * 1024
+
+# Asynchronous endpoints read their input from S3, up to 1 GB per request,
+# so only the model window limits the chunk length
+ASYNC_MAX_PAYLOAD_BYTES = 1024 * 1024 * 1024
+
+# JSON envelope around the encoded audio, identical for both text encodings
+_JSON_PREFIX = b'{"audio_input": "'
+_JSON_SUFFIX = b'", "language": "english", "task": "transcribe", "top_p": 0.9}'
+
+# Request formats the planner can size exactly:
+#   hex-json    - JSON body with the WAV as a hex string (2 bytes per byte)
+#   base64-json - JSON body with the WAV as base64 (4 bytes per 3)
+#   raw-wav     - the WAV bytes as the body (Content-Type audio/wav)
+PAYLOAD_FORMATS = ('hex-json', 'base64-json', 'raw-wav')
+
+
+def envelope_bytes(payload_format):
+    """Bytes a payload format adds around the encoded audio."""
+    if payload_format in ('hex-json', 'base64-json'):
+        return len(_JSON_PREFIX) + len(_JSON_SUFFIX)
+    if payload_format == 'raw-wav':
+        return 0
+    raise ValueError(f"Unknown payload format: {payload_format}")
+
+
+def encoded_payload_bytes(wav_bytes, payload_format='hex-json'):
+    """Exact request body size for a WAV chunk of wav_bytes bytes."""
+    envelope = envelope_bytes(payload_format)
+    if payload_format == 'hex-json':
+        return envelope + 2 * wav_bytes
+    if payload_format == 'base64-json':
+        return envelope + 4 * math.ceil(wav_bytes / 3)
+    return wav_bytes
+
+
+def max_wav_bytes(max_payload_bytes, payload_format='hex-json'):
+    """Largest WAV chunk whose encoded request fits in max_payload_bytes."""
+    available = max_payload_bytes - envelope_bytes(payload_format)
+    if payload_format == 'hex-json':
+        return available // 2
+    if payload_format == 'base64-json':
+        return 3 * (available // 4)
+    return available
+
+
+def content_type(payload_format):
+    """Content-Type header for a payload format."""
+    return 'audio/wav' if payload_format == 'raw-wav' else 'application/json'
+
+
+def encode_payload(chunk_data, payload_format='hex-json'):
+    """
+    Build the request body for a WAV chunk.
+
+    The encoded audio is written straight into the body instead of first
+    being built as a str and then copied again by a JSON encoder.
+    """
+    if payload_format == 'hex-json':
+        return b''.join((_JSON_PREFIX, binascii.hexlify(chunk_data), _JSON_SUFFIX))
+    if payload_format == 'base64-json':
+        return b''.join((_JSON_PREFIX, base64.b64encode(chunk_data), _JSON_SUFFIX))
+    if payload_format == 'raw-wav':
+        return bytes(chunk_data)
+    raise ValueError(f"Unknown payload format: {payload_format}")
+
+
+def plan_chunks(n_frames, framerate, n_channels, sampwidth, max_payload_bytes=DEFAULT_MAX_PAYLOAD_BYTES,
+                max_chunk_seconds=MODEL_WINDOW_SECONDS, payload_format='hex-json'):
+    """
+    Choose the largest chunk length that fits both the payload limit and the model window.
+
+    Args:
+        n_frames: Frames in the recording
+        framerate: Frames per second
+        n_channels: Interleaved channels
+        sampwidth: Bytes per sample
+        max_payload_bytes: Largest request body the endpoint accepts
+        max_chunk_seconds: Longest chunk the model handles in one pass
+        payload_format: One of PAYLOAD_FORMATS
+
+    Returns:
+        Dict with frames_per_chunk, chunk_seconds, chunk_count, chunk_wav_bytes
+        and payload_bytes (per chunk, the last one may be shorter),
+        max_payload_bytes, total_payload_bytes and payload_format
+
+    Raises:
+        ValueError: if not even one frame fits in the payload limit
+    """
+    block_align = n_channels * sampwidth
+    frames_by_payload = (max_wav_bytes(max_payload_bytes, payload_format) - WAV_HEADER_BYTES) // block_align
+    frames_by_window = int(max_chunk_seconds * framerate)
+    frames_per_chunk = min(frames_by_payload, frames_by_window)
+    if frames_per_chunk < 1:
+        raise ValueError(
+            f"A {max_payload_bytes} byte payload limit cannot hold one frame of "
+            f"{n_channels} channel(s) x {8 * sampwidth}-bit audio as {payload_format}")
+
+    chunk_count = math.ceil(n_frames / frames_per_chunk) if n_frames else 0
+    chunk_wav_bytes = []
+    for index in range(chunk_count):
+        frames = min(frames_per_chunk, n_frames - index * frames_per_chunk)
+        chunk_wav_bytes.append(WAV_HEADER_BYTES + frames * block_align)
+    payload_bytes = [encoded_payload_bytes(size, payload_format) for size in chunk_wav_bytes]
+
+    return {
+        'frames_per_chunk': frames_per_chunk,
+        'chunk_seconds': frames_per_chunk / float(framerate),
+        'chunk_count': chunk_count,
+        'chunk_wav_bytes': chunk_wav_bytes,
+        'payload_bytes': payload_bytes,
+        'max_payload_bytes': max_payload_bytes,
+        'total_payload_bytes': sum(payload_bytes),
+        'payload_format': payload_format
+    }
+
+
+def plan_from_environment(n_frames, framerate, n_channels, sampwidth, max_payload_bytes=None):
+    """
+    plan_chunks() with WHISPER_MAX_PAYLOAD_BYTES, WHISPER_MAX_CHUNK_SECONDS and WHISPER_PAYLOAD_FORMAT.
+
+    max_payload_bytes overrides WHISPER_MAX_PAYLOAD_BYTES for backends with
+    their own request limit (see ASYNC_MAX_PAYLOAD_BYTES).
+    """
+    return plan_chunks(
+        n_frames, framerate, n_channels, sampwidth,
+        max_payload_bytes=max_payload_bytes or int(os.environ.get('WHISPER_MAX_PAYLOAD_BYTES', str(DEFAULT_MAX_PAYLOAD_BYTES))),
+        max_chunk_seconds=float(os.environ.get('WHISPER_MAX_CHUNK_SECONDS', str(MODEL_WINDOW_SECONDS))),
+        payload_format=os.environ.get('WHISPER_PAYLOAD_FORMAT', 'hex-json')
+    )
+
+
+def plan_summary(plan):
+    """The plan without its per-chunk lists, for metrics."""
+    return {
+        'chunk_count': plan['chunk_count'],
+        'chunk_seconds': round(plan['chunk_seconds'], 3),
+        'max_chunk_payload_bytes': max(plan['payload_bytes']) if plan['payload_bytes'] else 0,
+        'total_payload_bytes': plan['total_payload_bytes'],
+        'payload_format': plan['payload_format']
+    }
@@ -0,0 +1,175 @@
+import os
+import abc
+import json
+import hashlib
+
+from botocore.exceptions import ClientError
+
+import lambda_runtime
+
+INDEX_PREFIX = 'content-index/'
+
+
+def fingerprint_bytes(data):
+    """Content fingerprint of an uploaded object (hex SHA-256)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def fingerprint_fileobj(fileobj, block_size=1024 * 1024):
+    """Same fingerprint as fingerprint_bytes, read from a binary file in blocks."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(block_size), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_keys(input_key):
+    """
+    Keys of every artifact the pipeline writes for an uploaded object.
+
+    Mirrors the naming used by whisper-transcription.py, speaker-identification.py
+    and bedrock-summary.py.
+    """
+    transcription_key = f"Transcription-Output-for-{input_key}.txt"
+    speaker_key = transcription_key.rsplit('.', 1)[0] + '-speaker-identification.txt'
+    file_id = speaker_key.split('/')[-1].replace('-speaker-identification.txt', '')
+    return {
+        'transcription_key': transcription_key,
+        'speaker_key': speaker_key,
+        'summary_key': f"Bedrock-Sonnet-GenAI-summary-{file_id}.txt"
+    }
+
+
+def input_key_from_speaker_key(speaker_key):
+    """Recover the uploaded object's key from its speaker-identification key."""
+    prefix = 'Transcription-Output-for-'
+    suffix = '-speaker-identification.txt'
+    if speaker_key.startswith(prefix) and speaker_key.endswith(suffix):
+        return speaker_key[len(prefix):-len(suffix)]
+    return None
+
+
+class FingerprintIndex(abc.ABC):
+    """Maps content fingerprints to the artifacts of a completed pipeline run."""
+
+    @abc.abstractmethod
+    def lookup(self, fingerprint):
+        """Return the recorded entry for the fingerprint, or None."""
+
+    @abc.abstractmethod
+    def record(self, fingerprint, entry):
+        """Store the entry for the fingerprint."""
+
+    @abc.abstractmethod
+    def forget(self, fingerprint):
+        """Remove the entry for the fingerprint, if there is one."""
+
+
+class S3FingerprintIndex(FingerprintIndex):
+    """Index stored as one small JSON object per fingerprint in S3."""
+
+    def __init__(self, s3_client, bucket, prefix=INDEX_PREFIX):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, fingerprint):
+        return f"{self.prefix}{fingerprint}.json"
+
+    def lookup(self, fingerprint):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self._key(fingerprint))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(response['Body'].read().decode('utf-8'))
+
+    def record(self, fingerprint, entry):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self._key(fingerprint),
+            Body=json.dumps(entry).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+    def forget(self, fingerprint):
+        self.s3.delete_object(Bucket=self.bucket, Key=self._key(fingerprint))
+
+
+class LocalFingerprintIndex(FingerprintIndex):
+    """Index stored as JSON files in a local directory, for tests and offline runs."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, fingerprint):
+        return os.path.join(self.directory, f"{fingerprint}.json")
+
+    def lookup(self, fingerprint):
+        try:
+            with open(self._path(fingerprint), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def record(self, fingerprint, entry):
+        with open(self._path(fingerprint), 'w') as f:
+            json.dump(entry, f)
+
+    def forget(self, fingerprint):
+        try:
+            os.remove(self._path(fingerprint))
+        except FileNotFoundError:
+            pass
+
+
+def get_fingerprint_index(default_bucket=None):
+    """
+    Build the index selected by CONTENT_INDEX_BACKEND ('s3', 'local' or 'none').
+
+    The S3 backend uses CONTENT_INDEX_BUCKET (default: the summaries bucket);
+    the local backend uses CONTENT_INDEX_DIR.
+    """
+    backend = os.environ.get('CONTENT_INDEX_BACKEND', 's3').lower()
+    if backend == 'none':
+        return None
+    if backend == 'local':
+        return LocalFingerprintIndex(os.environ.get('CONTENT_INDEX_DIR', '/tmp/content-index'))
+    if backend == 's3':
+        bucket = os.environ.get('CONTENT_INDEX_BUCKET') or os.environ.get('SUMMARIES_BUCKET') or default_bucket
+        return S3FingerprintIndex(lambda_runtime.get_client('s3'), bucket)
+    raise ValueError(f"Unknown CONTENT_INDEX_BACKEND: {backend}")
+
+
+def reuse_artifacts(s3_client, entry, input_key, bucket):
+    """
+    Copy the artifacts of an earlier run to the keys expected for input_key.
+
+    Copies are server-side, so no audio or transcript bytes pass through the
+    Lambda. Nothing is copied when the entry already belongs to input_key
+    (a duplicate event delivery for the same object).
+
+    Returns:
+        Dict with the new artifact keys, or None when an artifact of the
+        earlier run no longer exists (deleted or expired) and the upload has
+        to be processed again
+    """
+    new_keys = artifact_keys(input_key)
+    if entry.get('input_key') == input_key:
+        return new_keys
+
+    source_bucket = entry.get('bucket', bucket)
+    for name, new_key in new_keys.items():
+        try:
+            s3_client.copy_object(
+                Bucket=bucket,
+                Key=new_key,
+                CopySource={'Bucket': source_bucket, 'Key': entry[name]}
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return None
+            raise
+    return new_keys
@@ -0,0 +1,208 @@
+import os
+import time
+import threading
+
+from botocore.exceptions import ClientError, BotoCoreError
+
+# Error codes that mean "this endpoint is overloaded or unhealthy right now";
+# the request itself may succeed on another endpoint
+RETRYABLE_ERROR_CODES = {
+    'ThrottlingException',
+    'Throttling',
+    'TooManyRequestsException',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'InternalFailure',
+    'InternalServerError',
+    'ModelNotReadyException'
+}
+
+# Routers live for the lifetime of the execution environment, so endpoint
+# health and latency carry over between warm invocations
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def is_retryable_error(error):
+    """True for throttles, 5xx responses and connection errors."""
+    if isinstance(error, ClientError):
+        code = error.response.get('Error', {}).get('Code', '')
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        return code in RETRYABLE_ERROR_CODES or status == 429 or status >= 500
+    return isinstance(error, BotoCoreError)
+
+
+def parse_targets(spec):
+    """
+    Parse a comma-separated list of endpoints.
+
+    Each entry is an endpoint name, optionally followed by '/' and a
+    production variant name, e.g. 'whisper-a,whisper-b/variant-2'.
+
+    Returns:
+        List of (endpoint name, variant name or None)
+    """
+    targets = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        endpoint_name, _, variant = entry.partition('/')
+        targets.append((endpoint_name, variant or None))
+    return targets
+
+
+class EndpointTarget:
+    """Routing state of one endpoint (or endpoint variant)."""
+
+    def __init__(self, endpoint_name, variant=None):
+        self.endpoint_name = endpoint_name
+        self.variant = variant
+        self.outstanding = 0
+        self.ewma_ms = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    @property
+    def name(self):
+        return f"{self.endpoint_name}/{self.variant}" if self.variant else self.endpoint_name
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'ejections': self.ejections,
+            'outstanding': self.outstanding,
+            'ewma_ms': round(self.ewma_ms, 3) if self.ewma_ms is not None else None
+        }
+
+
+class EndpointRouter:
+    """
+    Client-side load balancer for SageMaker endpoints.
+
+    Requests go to the healthy endpoint with the fewest outstanding requests,
+    with ties broken by the lower latency EWMA. An endpoint that throttles or
+    fails is ejected for `ejection_seconds`, doubling with every consecutive
+    failure up to `max_ejection_seconds`, and the request is retried on
+    another endpoint. If every endpoint is ejected, the one whose ejection
+    ends first is used rather than failing outright.
+
+    Args:
+        targets: List of (endpoint name, variant name or None)
+        ewma_alpha: Weight of the newest latency sample
+        ejection_seconds: Ejection time after the first failure
+        max_ejection_seconds: Upper bound for repeated ejections
+        clock: Monotonic time source (replaceable in tests)
+    """
+
+    def __init__(self, targets, ewma_alpha=0.3, ejection_seconds=10.0, max_ejection_seconds=120.0,
+                 clock=time.monotonic):
+        if not targets:
+            raise ValueError("EndpointRouter needs at least one endpoint")
+        self.targets = [EndpointTarget(endpoint_name, variant) for endpoint_name, variant in targets]
+        self.ewma_alpha = ewma_alpha
+        self.ejection_seconds = ejection_seconds
+        self.max_ejection_seconds = max_ejection_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude=()):
+        """Pick a target for one request and count it as outstanding."""
+        with self._lock:
+            now = self.clock()
+            candidates = [target for target in self.targets if target not in exclude] or self.targets
+            healthy = [target for target in candidates if target.ejected_until <= now]
+            if healthy:
+                # Endpoints without a latency sample yet are tried first
+                target = min(healthy, key=lambda t: (t.outstanding, t.ewma_ms if t.ewma_ms is not None else -1))
+            else:
+                target = min(candidates, key=lambda t: t.ejected_until)
+            target.outstanding += 1
+            target.requests += 1
+            return target
+
+    def release(self, target, latency_ms=None, error=None):
+        """Record the outcome of a request started with acquire()."""
+        with self._lock:
+            target.outstanding -= 1
+            if error is None:
+                target.consecutive_failures = 0
+                if latency_ms is not None:
+                    if target.ewma_ms is None:
+                        target.ewma_ms = latency_ms
+                    else:
+                        target.ewma_ms += self.ewma_alpha * (latency_ms - target.ewma_ms)
+                return
+            target.failures += 1
+            if is_retryable_error(error):
+                target.consecutive_failures += 1
+                ejection = min(self.ejection_seconds * 2 ** (target.consecutive_failures - 1),
+                               self.max_ejection_seconds)
+                target.ejected_until = self.clock() + ejection
+                target.ejections += 1
+
+    def invoke_endpoint(self, sagemaker_client, **kwargs):
+        """
+        Call invoke_endpoint on the selected endpoint.
+
+        Retryable errors eject the endpoint and the request moves on to the
+        next one, trying every endpoint at most once. Other errors (e.g. a
+        rejected payload) are raised immediately.
+        """
+        tried = []
+        while True:
+            target = self.acquire(exclude=tried)
+            params = dict(kwargs, EndpointName=target.endpoint_name)
+            if target.variant:
+                params['TargetVariant'] = target.variant
+            start = time.perf_counter()
+            try:
+                response = sagemaker_client.invoke_endpoint(**params)
+            except Exception as e:
+                self.release(target, error=e)
+                tried.append(target)
+                if not is_retryable_error(e) or len(tried) >= len(self.targets):
+                    raise
+                print(f"Endpoint {target.name} failed ({str(e)}); retrying on another endpoint")
+                continue
+            self.release(target, (time.perf_counter() - start) * 1000)
+            return response
+
+    def stats(self):
+        """Per-endpoint request, failure and latency statistics."""
+        with self._lock:
+            return {target.name: target.stats() for target in self.targets}
+
+
+def router_from_environment():
+    """
+    Router for the endpoints in WHISPER_ENDPOINTS (falling back to
+    WHISPER_ENDPOINT), cached per container.
+
+    ROUTER_EJECTION_SECONDS and ROUTER_EWMA_ALPHA tune the router.
+    """
+    spec = os.environ.get('WHISPER_ENDPOINTS') or os.environ.get('WHISPER_ENDPOINT', '')
+    targets = parse_targets(spec)
+    if not targets:
+        raise ValueError("WHISPER_ENDPOINT or WHISPER_ENDPOINTS environment variable must be set")
+    key = (spec, os.environ.get('ROUTER_EJECTION_SECONDS'), os.environ.get('ROUTER_EWMA_ALPHA'))
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            router = EndpointRouter(
+                targets,
+                ewma_alpha=float(os.environ.get('ROUTER_EWMA_ALPHA', '0.3')),
+                ejection_seconds=float(os.environ.get('ROUTER_EJECTION_SECONDS', '10'))
+            )
+            _routers[key] = router
+        return router
+
+
+def reset_routers():
+    """Forget cached routers and their endpoint state (used by tests)."""
+    with _routers_lock:
+        _routers.clear()
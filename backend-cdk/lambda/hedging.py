@@ -0,0 +1,220 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Latency trackers live for the lifetime of the execution environment, so
+# warm invocations start with a known latency distribution
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(math.ceil(p / 100.0 * len(ordered))), 1)
+    return ordered[rank - 1]
+
+
+class LatencyTracker:
+    """Sliding window of recent request latencies in milliseconds."""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms):
+        with self._lock:
+            self._samples.append(latency_ms)
+
+    def count(self):
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, p):
+        with self._lock:
+            return percentile(list(self._samples), p)
+
+
+def shared_tracker(name):
+    """LatencyTracker for name, cached per container."""
+    with _trackers_lock:
+        tracker = _trackers.get(name)
+        if tracker is None:
+            tracker = LatencyTracker()
+            _trackers[name] = tracker
+        return tracker
+
+
+def reset_trackers():
+    """Forget cached latency history (used by tests)."""
+    with _trackers_lock:
+        _trackers.clear()
+
+
+class Hedger:
+    """
+    Hedged requests for tail latency.
+
+    Each call starts the request once. If it has not completed after the
+    `hedge_percentile` latency of recent requests, a duplicate is started.
+    Behind an EndpointRouter the duplicate usually goes to another
+    endpoint, because the original is still outstanding on the first one.
+    The first successful result wins. The other request is cancelled if it
+    has not started yet and otherwise ignored (an in-flight HTTP call cannot
+    be recalled).
+
+    Hedging is capped at `max_hedge_ratio` of calls, and it only starts once
+    `min_samples` latencies have been observed. Create one Hedger per
+    invocation so stats() describes that invocation; the latency history is
+    kept in the shared tracker.
+
+    Args:
+        tracker: LatencyTracker with the un-hedged latency of recent requests
+        hedge_percentile: Latency percentile after which a request is hedged
+        max_hedge_ratio: Maximum share of calls that may be hedged
+        min_samples: Latencies required before hedging starts
+        max_workers: Threads for original and hedge requests
+    """
+
+    def __init__(self, tracker, hedge_percentile=95, max_hedge_ratio=0.1, min_samples=5, max_workers=4):
+        self.tracker = tracker
+        self.hedge_percentile = hedge_percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies_ms = []
+        self._unhedged_latencies_ms = []
+        # Originals that lost to a hedge while still running, and the index
+        # of their elapsed time in _unhedged_latencies_ms
+        self._outstanding = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def hedge_delay_seconds(self):
+        """Time to wait before hedging, or None while there is too little history."""
+        if self.tracker.count() < self.min_samples:
+            return None
+        return self.tracker.percentile(self.hedge_percentile) / 1000.0
+
+    def _take_hedge_budget(self):
+        with self._lock:
+            if self.hedges < self.max_hedge_ratio * self.requests:
+                self.hedges += 1
+                return True
+            return False
+
+    def _original_done(self, future, start):
+        # The original request's own latency is what the caller would have
+        # seen without hedging; it feeds the delay and the savings estimate
+        latency_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            outstanding = self._outstanding.pop(future, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            if outstanding is not None:
+                # Replace the lower bound; the tracker already has it
+                self._unhedged_latencies_ms[outstanding] = latency_ms
+                return
+            self._unhedged_latencies_ms.append(latency_ms)
+        self.tracker.record(latency_ms)
+
+    def _original_lost(self, future, latency_ms):
+        # A hedge won while the original was still running. Those originals
+        # are the slow tail, so their elapsed time is kept as a lower bound
+        # of their latency until (unless) they finish
+        with self._lock:
+            if future.done():
+                return
+            self._outstanding[future] = len(self._unhedged_latencies_ms)
+            self._unhedged_latencies_ms.append(latency_ms)
+        self.tracker.record(latency_ms)
+
+    def _finish(self, start, result, original=None):
+        latency_ms = (time.perf_counter() - start) * 1000
+        if original is not None:
+            self._original_lost(original, latency_ms)
+        with self._lock:
+            self._latencies_ms.append(latency_ms)
+        return result
+
+    def call(self, attempt):
+        """Run attempt() (a callable without arguments), hedging it if it is slow."""
+        start = time.perf_counter()
+        with self._lock:
+            self.requests += 1
+        original = self._executor.submit(attempt)
+        original.add_done_callback(lambda future: self._original_done(future, start))
+
+        delay = self.hedge_delay_seconds()
+        if delay is None:
+            return self._finish(start, original.result())
+        done, _ = wait([original], timeout=delay)
+        if done or not self._take_hedge_budget():
+            return self._finish(start, original.result())
+
+        hedge = self._executor.submit(attempt)
+        pending = {original, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    result = self._finish(start, future.result(), original if future is hedge else None)
+                    for loser in pending:
+                        loser.cancel()
+                    return result
+                error = error or future.exception()
+        raise error
+
+    def stats(self):
+        """
+        Hedge rate and the p99 latency saved.
+
+        The saving compares the p99 of the latency callers saw with the p99
+        of the original requests alone, i.e. what they would have seen
+        without hedging. An original that lost to a hedge and is still
+        running counts with its latency so far, so the saving is a lower
+        bound rather than missing the slowest requests.
+        """
+        with self._lock:
+            p99 = percentile(self._latencies_ms, 99)
+            p99_unhedged = percentile(self._unhedged_latencies_ms, 99)
+            return {
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'hedge_rate': round(self.hedges / self.requests, 4) if self.requests else 0.0,
+                'p99_ms': round(p99, 3) if p99 is not None else None,
+                'p99_unhedged_ms': round(p99_unhedged, 3) if p99_unhedged is not None else None,
+                'p99_saved_ms': round(max(p99_unhedged - p99, 0.0), 3) if p99 is not None and p99_unhedged is not None else None
+            }
+
+    def close(self):
+        """Release the worker threads without waiting for ignored hedge losers."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def hedger_from_environment(name, max_in_flight=1):
+    """
+    Hedger configured by HEDGE_ENABLED, HEDGE_PERCENTILE, HEDGE_MAX_RATIO and
+    HEDGE_MIN_SAMPLES, or None when hedging is disabled (the default).
+    """
+    if os.environ.get('HEDGE_ENABLED', 'false').lower() != 'true':
+        return None
+    return Hedger(
+        shared_tracker(name),
+        hedge_percentile=float(os.environ.get('HEDGE_PERCENTILE', '95')),
+        max_hedge_ratio=float(os.environ.get('HEDGE_MAX_RATIO', '0.1')),
+        min_samples=int(os.environ.get('HEDGE_MIN_SAMPLES', '5')),
+        max_workers=2 * max(max_in_flight, 1)
+    )
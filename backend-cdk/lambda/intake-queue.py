@@ -0,0 +1,310 @@
+import json
+import os
+import re
+import hashlib
+import logging
+from urllib.parse import unquote_plus
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+import lambda_runtime
+import job_index
+import job_status
+import wav_format
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+STANDARD_LANE = 'standard'
+EXPRESS_LANE = 'express'
+
+# Bytes read from the start of an upload to find its WAV layout
+HEADER_BYTES = 64 * 1024
+
+# Requeued copies of deferred messages carry how often they waited for a slot
+DEFERRALS_ATTRIBUTE = 'IntakeDeferrals'
+
+# Longest DelaySeconds SQS accepts
+MAX_DELAY_SECONDS = 900
+
+
+def execution_name(key, etag):
+    """
+    Deterministic execution name for an uploaded object version.
+
+    Step Functions rejects a second execution with the same name, so duplicate
+    S3 event deliveries for the same key and ETag can never start the pipeline
+    twice.
+    """
+    digest = hashlib.sha256(f"{key}:{etag}".encode('utf-8')).hexdigest()[:32]
+    base_name = re.sub(r'[^A-Za-z0-9_-]', '_', key.split('/')[-1])[:40]
+    return f"{base_name}-{digest}"
+
+
+def parse_s3_records(message_body):
+    """Extract (bucket, key, etag, size) tuples from an S3 notification message."""
+    notification = json.loads(message_body)
+    records = []
+    for record in notification.get('Records', []):
+        s3_info = record.get('s3', {})
+        bucket = s3_info.get('bucket', {}).get('name')
+        obj = s3_info.get('object', {})
+        if not bucket or 'key' not in obj:
+            continue
+        records.append({
+            'bucket': bucket,
+            'key': unquote_plus(obj['key']),
+            'etag': obj.get('eTag', ''),
+            'size': obj.get('size', 0)
+        })
+    # s3:TestEvent messages have no Records and are simply acknowledged
+    return records
+
+
+def count_running_executions(sfn, state_machine_arn, limit):
+    """Count running executions, stopping as soon as the limit is reached."""
+    running = 0
+    params = {'stateMachineArn': state_machine_arn, 'statusFilter': 'RUNNING', 'maxResults': min(limit, 1000)}
+    while True:
+        response = sfn.list_executions(**params)
+        running += len(response.get('executions', []))
+        if running >= limit or not response.get('nextToken'):
+            return running
+        params['nextToken'] = response['nextToken']
+
+
+def wav_duration(s3, record):
+    """
+    Duration of a WAV upload from its header and object size, without
+    downloading the audio.
+
+    Returns:
+        Seconds, or None when the object is not a WAV file or its data chunk
+        starts beyond the first HEADER_BYTES
+    """
+    try:
+        response = s3.get_object(Bucket=record['bucket'], Key=record['key'], Range=f"bytes=0-{HEADER_BYTES - 1}")
+        info = wav_format.parse_header(response['Body'].read())
+    except (ClientError, wav_format.WavFormatError) as e:
+        logger.info(f"No WAV duration for {record['key']}: {e}")
+        return None
+    # The header was cut at HEADER_BYTES, so size the data chunk from the object
+    return max(record['size'] - info.data_offset, 0) / float(info.sample_rate * info.block_align)
+
+
+def choose_lane(s3, record, max_seconds, max_bytes):
+    """
+    Express lane for short recordings, Standard lane for everything else.
+
+    WAV uploads are judged by their duration, other files (and WAV files
+    with an unreadable header) by size.
+
+    Returns:
+        (lane, duration in seconds or None)
+    """
+    duration = wav_duration(s3, record)
+    if duration is not None:
+        short = duration <= max_seconds
+    else:
+        short = record['size'] <= max_bytes
+    return (EXPRESS_LANE if short else STANDARD_LANE), duration
+
+
+def express_duplicate(index, record):
+    """
+    Whether an Express execution was already started for this object version.
+
+    Express workflows do not reject a second execution with the same name,
+    so the name of the started execution is kept in the job index instead.
+    """
+    if index is None:
+        return False
+    job = index.get(job_status.job_id_for_key(record['key']))
+    return bool(job) and job.get('executionName') == execution_name(record['key'], record['etag'])
+
+
+def track_express_execution(index, job_id, timeout_seconds):
+    """
+    Hold an in-flight slot for an Express execution in the job index.
+
+    Express executions cannot be listed, so this count is what keeps them
+    within MAX_IN_FLIGHT_EXECUTIONS across batches; the slot is released
+    when the job reaches done or failed, or lapses after the Express
+    timeout. The execution has already started, so errors are only logged.
+    """
+    if index is None:
+        return
+    try:
+        index.start_in_flight(EXPRESS_LANE, job_id, timeout_seconds)
+    except (BotoCoreError, ClientError, job_index.ConcurrentUpdateError) as e:
+        logger.warning(f"Could not count Express execution for job {job_id} as in flight: {e}")
+
+
+def express_in_flight(index):
+    """
+    Express executions holding an in-flight slot, or 0 if the index cannot be read.
+
+    A failed read only lets this batch start more executions than the
+    limit allows; failing the batch would redeliver every message in it.
+    """
+    if index is None:
+        return 0
+    try:
+        return index.in_flight(EXPRESS_LANE)
+    except (BotoCoreError, ClientError) as e:
+        logger.warning(f"Could not read Express executions in flight, not counting them: {e}")
+        return 0
+
+
+def start_pipeline(sfn, state_machine_arn, record, use_whisper, lane=STANDARD_LANE):
+    """
+    Start one execution for an S3 record.
+
+    Returns:
+        'started' or 'duplicate'
+    """
+    try:
+        sfn.start_execution(
+            stateMachineArn=state_machine_arn,
+            name=execution_name(record['key'], record['etag']),
+            input=json.dumps({
+                'detail': {
+                    'bucket': {'name': record['bucket']},
+                    'object': {'key': record['key'], 'size': record['size'], 'etag': record['etag']}
+                },
+                'useWhisper': use_whisper,
+                'lane': lane
+            })
+        )
+        return 'started'
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ExecutionAlreadyExists':
+            return 'duplicate'
+        raise
+
+
+def deferral_count(message):
+    """How many times a message has already been requeued for lack of an execution slot."""
+    attribute = message.get('messageAttributes', {}).get(DEFERRALS_ATTRIBUTE, {})
+    try:
+        return int(attribute.get('stringValue', '0'))
+    except ValueError:
+        return 0
+
+
+def defer_message(sqs, queue_url, message, delay_seconds):
+    """
+    Requeue a message that found no execution slot.
+
+    A copy is sent back with DelaySeconds and the original is acknowledged,
+    so waiting for a slot never counts towards the queue's maxReceiveCount;
+    only real failures move messages to the dead-letter queue.
+
+    Returns:
+        True if the copy was sent, False if the message has to be retried
+        as a batch item failure instead
+    """
+    if not queue_url:
+        return False
+    try:
+        sqs.send_message(
+            QueueUrl=queue_url,
+            MessageBody=message['body'],
+            DelaySeconds=min(delay_seconds, MAX_DELAY_SECONDS),
+            MessageAttributes={DEFERRALS_ATTRIBUTE: {
+                'DataType': 'Number',
+                'StringValue': str(deferral_count(message) + 1)
+            }}
+        )
+        return True
+    except ClientError as e:
+        logger.warning(f"Could not requeue message {message.get('messageId')}: {e}")
+        return False
+
+
+def lambda_handler(event, context):
+    """
+    Drain a batch of S3 upload notifications from the intake queue.
+
+    Executions are only started while fewer than MAX_IN_FLIGHT_EXECUTIONS are
+    running, so bulk uploads are fed to the Whisper endpoint at a sustainable
+    rate. Messages that do not fit are sent back to the queue with a delay
+    of INTAKE_DEFER_SECONDS, which does not use up receive attempts; only
+    messages that keep failing end up in the dead-letter queue.
+
+    With EXPRESS_STATE_MACHINE_ARN set, recordings of at most
+    EXPRESS_MAX_DURATION_SECONDS (WAV files) or EXPRESS_MAX_MB (others) go
+    to the Express workflow, which skips the Standard workflow's
+    per-transition overhead. Express executions cannot be listed, so they
+    are counted in the job index (see track_express_execution) and share
+    the same in-flight limit.
+    """
+    sfn = lambda_runtime.get_client('stepfunctions')
+    sqs = lambda_runtime.get_client('sqs')
+    state_machine_arn = os.environ['STATE_MACHINE_ARN']
+    express_arn = os.environ.get('EXPRESS_STATE_MACHINE_ARN')
+    express_max_seconds = float(os.environ.get('EXPRESS_MAX_DURATION_SECONDS', '300'))
+    express_max_bytes = int(float(os.environ.get('EXPRESS_MAX_MB', '10')) * 1024 * 1024)
+    express_timeout = int(os.environ.get('EXPRESS_TIMEOUT_SECONDS', '300'))
+    queue_url = os.environ.get('INTAKE_QUEUE_URL')
+    max_in_flight = int(os.environ.get('MAX_IN_FLIGHT_EXECUTIONS', '10'))
+    defer_seconds = int(os.environ.get('INTAKE_DEFER_SECONDS', '60'))
+    use_whisper = os.environ.get('USE_WHISPER', 'true') == 'true'
+
+    messages = event.get('Records', [])
+    s3 = lambda_runtime.get_client('s3') if express_arn else None
+    index = job_index.get_job_index() if express_arn else None
+
+    running = count_running_executions(sfn, state_machine_arn, max_in_flight) + express_in_flight(index)
+    available = max(max_in_flight - running, 0)
+    logger.info(f"Received {len(messages)} messages, {available} execution slots available")
+
+    failures = []
+    stats = {'started': 0, 'duplicate': 0, 'deferred': 0, 'failed': 0,
+             STANDARD_LANE: 0, EXPRESS_LANE: 0}
+
+    for message in messages:
+        try:
+            records = parse_s3_records(message['body'])
+        except (ValueError, KeyError) as e:
+            # Malformed messages can never succeed; let them go to the DLQ
+            logger.error(f"Unparseable message {message.get('messageId')}: {e}")
+            failures.append({'itemIdentifier': message['messageId']})
+            stats['failed'] += 1
+            continue
+
+        if len(records) > available:
+            if not defer_message(sqs, queue_url, message, defer_seconds):
+                failures.append({'itemIdentifier': message['messageId']})
+            stats['deferred'] += 1
+            continue
+
+        try:
+            for record in records:
+                lane, duration = STANDARD_LANE, None
+                # The Transcribe path waits for a task token, which Express workflows do not support
+                if express_arn and use_whisper:
+                    lane, duration = choose_lane(s3, record, express_max_seconds, express_max_bytes)
+                if lane == EXPRESS_LANE and express_duplicate(index, record):
+                    outcome = 'duplicate'
+                else:
+                    outcome = start_pipeline(sfn, express_arn if lane == EXPRESS_LANE else state_machine_arn,
+                                             record, use_whisper, lane)
+                stats[outcome] += 1
+                if outcome == 'started':
+                    available -= 1
+                    stats[lane] += 1
+                    # The lane and start time let the summary stage report latency per lane
+                    job_id = job_status.job_id_for_key(record['key'])
+                    job_status.notify(job_id, 'queued', inputKey=record['key'],
+                                      lane=lane, executionName=execution_name(record['key'], record['etag']),
+                                      durationSeconds=round(duration, 1) if duration is not None else None)
+                    if lane == EXPRESS_LANE:
+                        track_express_execution(index, job_id, express_timeout)
+        except ClientError as e:
+            logger.error(f"Failed to start execution for message {message['messageId']}: {e}")
+            failures.append({'itemIdentifier': message['messageId']})
+            stats['failed'] += 1
+
+    logger.info(f"Intake batch result: {json.dumps(stats)}")
+    return {'batchItemFailures': failures}
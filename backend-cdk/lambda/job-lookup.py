@@ -0,0 +1,101 @@
+import json
+import os
+import logging
+
+from botocore.exceptions import ClientError
+
+import lambda_runtime
+import job_index
+import job_status
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+SUMMARY_PREFIX = 'Bedrock-Sonnet-GenAI-summary-'
+
+
+def response(status_code, body):
+    """API Gateway proxy response with the CORS headers the frontend needs."""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': '*',
+            'Access-Control-Allow-Methods': 'OPTIONS,GET'
+        },
+        'body': json.dumps(body)
+    }
+
+
+def check_summary(index, job_id):
+    """
+    Whether a job's summary exists, from the job's index record.
+
+    Returns:
+        {'exists', 'key', 'status'}; status is the whole record (stage,
+        stage timings, artifact keys, failure), or None for unknown jobs
+    """
+    record = index.get(job_id)
+    summary_key = record and record.get('artifacts', {}).get('summary_key')
+    return {
+        'exists': bool(record) and record.get('stage') == 'done' and bool(summary_key),
+        'key': summary_key,
+        'status': record
+    }
+
+
+def summary_key_for(index, name):
+    """
+    Summary key for a fetch-summary path parameter: either the summary's own
+    file name, as returned by check-summary and pushed with the done status,
+    or a job id looked up in the index.
+    """
+    if name.startswith(SUMMARY_PREFIX):
+        return name
+    record = index.get(job_status.job_id_for_key(name))
+    return record and record.get('artifacts', {}).get('summary_key')
+
+
+def fetch_summary(s3, bucket, key):
+    summary = s3.get_object(Bucket=bucket, Key=key)
+    return {'content': summary['Body'].read().decode('utf-8'), 'key': key}
+
+
+def lambda_handler(event, context):
+    """
+    Summary status and content for the frontend.
+
+    GET /check-summary/{uuid}       -> {exists, key, status}
+    GET /fetch-summary/{filename}   -> {content, key}
+
+    Both answer from a single job index lookup (JOB_INDEX_BACKEND) and at
+    most one object read, instead of listing the summaries bucket.
+    """
+    parameters = event.get('pathParameters') or {}
+    s3 = lambda_runtime.get_client('s3')
+    bucket = os.environ['SUMMARIES_BUCKET']
+    index = job_index.get_job_index(bucket)
+    if index is None:
+        return response(500, {'error': 'Job index is not configured'})
+
+    try:
+        if 'uuid' in parameters:
+            job_id = job_status.job_id_for_key(parameters['uuid'] or '')
+            if not job_id or job_id.startswith(job_index.IN_FLIGHT_PREFIX):
+                return response(400, {'error': 'uuid is required'})
+            return response(200, check_summary(index, job_id))
+        if 'filename' in parameters:
+            name = os.path.basename(parameters['filename'] or '')
+            if not name:
+                return response(400, {'error': 'filename is required'})
+            key = summary_key_for(index, name)
+            if not key:
+                return response(404, {'error': 'Summary not found'})
+            return response(200, fetch_summary(s3, bucket, key))
+        return response(400, {'error': 'uuid or filename is required'})
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return response(404, {'error': 'Summary not found'})
+        logger.error(f"Summary lookup failed: {e}")
+        return response(500, {'error': 'Summary lookup failed'})
@@ -0,0 +1,91 @@
+import json
+import logging
+
+import content_index
+import job_index
+import job_status
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Event the Express workflow sends when a step fails; Express executions
+# emit no Step Functions Execution Status Change events
+PIPELINE_FAILURE_EVENT = 'Pipeline Execution Failed'
+
+# Step Functions execution states and the job stage each one means
+EXECUTION_STAGES = {
+    'RUNNING': 'queued',
+    'SUCCEEDED': 'done',
+    'FAILED': 'failed',
+    'TIMED_OUT': 'failed',
+    'ABORTED': 'failed'
+}
+
+
+def handle_execution_event(channel, detail):
+    """
+    Publish the job status for a Step Functions execution status change.
+
+    The Lambdas publish their own stages while the execution runs; this
+    covers the start, failures, and completions that skip the summary
+    function (deduplicated uploads). The execution input is a JSON string
+    in EventBridge events and an object in the Express failure event.
+    """
+    stage = EXECUTION_STAGES.get(detail.get('status'))
+    try:
+        execution_input = detail.get('input') or '{}'
+        if isinstance(execution_input, str):
+            execution_input = json.loads(execution_input)
+        input_key = execution_input['detail']['object']['key']
+    except (ValueError, KeyError, TypeError):
+        logger.warning(f"No upload key in the input of execution {detail.get('executionArn')}")
+        return None
+    if not stage:
+        return None
+    job_id = job_status.job_id_for_key(input_key)
+    if stage == 'queued':
+        # The event can arrive after transcription has already reported progress
+        if channel.current(job_id):
+            return None
+        return channel.publish(job_id, stage, inputKey=input_key)
+    if stage == 'done':
+        artifacts = content_index.artifact_keys(input_key)
+        return channel.publish(job_id, stage, summaryKey=artifacts['summary_key'], artifacts=artifacts)
+    return channel.publish(job_id, stage, failure={
+        'status': detail.get('status'),
+        'error': detail.get('error'),
+        'cause': detail.get('cause')
+    })
+
+
+def lambda_handler(event, context):
+    """
+    Push job status to browsers over a WebSocket API.
+
+    WebSocket routes: clients send {"action": "subscribe", "jobId": ...} and
+    get the current status back at once, then every update as it happens;
+    $disconnect drops the subscription. EventBridge "Step Functions
+    Execution Status Change" events publish the start and the end of each
+    Standard execution; the Express workflow invokes this function with a
+    "Pipeline Execution Failed" event of the same shape when a step fails.
+    """
+    channel = job_status.channel_from_environment(job_index.get_job_index())
+    if channel is None:
+        raise ValueError("STATUS_WEBSOCKET_ENDPOINT and SUMMARIES_BUCKET must be set")
+
+    if event.get('detail-type') in ('Step Functions Execution Status Change', PIPELINE_FAILURE_EVENT):
+        status = handle_execution_event(channel, event.get('detail', {}))
+        return {'published': status}
+
+    request = event.get('requestContext', {})
+    route, connection_id = request.get('routeKey'), request.get('connectionId')
+    if route == 'subscribe':
+        try:
+            job_id = json.loads(event.get('body') or '{}')['jobId']
+        except (ValueError, KeyError, TypeError):
+            return {'statusCode': 400, 'body': 'jobId is required'}
+        channel.subscribe(job_status.job_id_for_key(job_id), connection_id)
+    elif route == '$disconnect':
+        channel.unsubscribe(connection_id)
+    # $connect and $default (keep-alive pings) need nothing
+    return {'statusCode': 200, 'body': 'OK'}
@@ -0,0 +1,322 @@
+import os
+import abc
+import json
+import time
+import fcntl
+import random
+import hashlib
+
+import botocore
+from botocore.exceptions import ClientError
+
+import lambda_runtime
+
+INDEX_PREFIX = 'job-index/'
+
+# Stages that end a job; they get a start time but are never finished
+FINAL_STAGES = ('done', 'failed')
+
+# Conditional writes that lose to another writer are retried this often
+MAX_UPDATE_ATTEMPTS = 8
+
+# Reserved records listing the executions in flight per intake lane
+IN_FLIGHT_PREFIX = '_in-flight-'
+
+# First botocore release whose PutObject accepts IfMatch and IfNoneMatch
+MIN_BOTOCORE_VERSION = (1, 36, 0)
+
+# Express jobs are reported as failed this long after their timeout, so a
+# final status that is still being written is not overtaken
+STALL_GRACE_SECONDS = 60
+
+
+class ConcurrentUpdateError(RuntimeError):
+    """A record kept changing under every update attempt."""
+
+
+class JobIndex(abc.ABC):
+    """
+    One record per upload, keyed by job id (the upload UUID).
+
+    A record holds the current stage, when each stage started and finished,
+    the artifact keys written so far and, for failed jobs, the failure
+    reason, so status lookups never have to list the summaries bucket.
+
+    Several writers update the same record (the intake, the execution
+    status events and every pipeline stage), so records are only replaced
+    if they have not changed since they were read: update() rereads and
+    reapplies itself when it loses a race instead of dropping the other
+    writer's changes.
+    """
+
+    @abc.abstractmethod
+    def read(self, job_id):
+        """
+        Return (record, version) of a job; (None, None) for unknown jobs.
+
+        The version is opaque and only passed back to write().
+        """
+
+    @abc.abstractmethod
+    def write(self, job_id, record, version):
+        """
+        Store a record if it is still at `version` (None: if it does not exist).
+
+        Returns:
+            False if another writer changed the record first
+        """
+
+    def get(self, job_id):
+        """Return the record of a job, or None."""
+        return expire_stalled(self.read(job_id)[0])
+
+    def update(self, job_id, stage, artifacts=None, failure=None, **fields):
+        """
+        Move a job to a stage and merge in what the stage learned.
+
+        Entering a new stage finishes the timing of the previous one; the
+        same stage can be updated repeatedly (e.g. with progress). A late
+        queued update (the intake or the execution start event arriving
+        after the job has started) only merges its fields. Final stages
+        also record totalSeconds since the first stage started.
+
+        Args:
+            artifacts: Artifact keys to add, e.g. {'summary_key': ...}
+            failure: Failure reason for the failed stage
+            fields: Other top-level fields, e.g. progress or summaryKey
+
+        Returns:
+            The updated record
+
+        Raises:
+            ConcurrentUpdateError: if every attempt lost to another writer
+        """
+        record = self._modify(job_id, lambda current: apply_update(
+            current or {'jobId': job_id, 'stages': {}, 'artifacts': {}}, stage, artifacts, failure, fields))
+        if stage in FINAL_STAGES and record.get('lane'):
+            self.finish_in_flight(record['lane'], job_id)
+        return record
+
+    def _modify(self, job_id, change):
+        """
+        Conditional read-modify-write of one record.
+
+        Args:
+            change: Function of the current record (or None) returning the
+                new record, or None to leave the record as it is
+
+        Returns:
+            The stored record
+        """
+        for attempt in range(MAX_UPDATE_ATTEMPTS):
+            current, version = self.read(job_id)
+            record = change(current)
+            if record is None:
+                return current
+            if self.write(job_id, record, version):
+                return record
+            time.sleep(random.uniform(0, 0.02 * 2 ** attempt))
+        raise ConcurrentUpdateError(f"Job index record {job_id} changed under {MAX_UPDATE_ATTEMPTS} updates")
+
+    def start_in_flight(self, lane, job_id, max_seconds):
+        """
+        Count a job as running in a lane until it reaches a final stage.
+
+        Entries also lapse after max_seconds, the lane's execution time
+        limit, so an execution that ended without a final status cannot
+        hold its slot forever.
+        """
+        def change(current):
+            running = live_in_flight(current)
+            running[job_id] = round(time.time() + max_seconds, 3)
+            return {'jobs': running}
+        self._modify(IN_FLIGHT_PREFIX + lane, change)
+
+    def finish_in_flight(self, lane, job_id):
+        """Release a job's slot in a lane (no write if it holds none)."""
+        def change(current):
+            if job_id not in (current or {}).get('jobs', {}):
+                return None
+            running = live_in_flight(current)
+            running.pop(job_id, None)
+            return {'jobs': running}
+        self._modify(IN_FLIGHT_PREFIX + lane, change)
+
+    def in_flight(self, lane):
+        """Number of jobs running in a lane."""
+        return len(live_in_flight(self.get(IN_FLIGHT_PREFIX + lane)))
+
+
+def live_in_flight(record):
+    """Job ids and expiry times of an in-flight record, without lapsed entries."""
+    now = time.time()
+    return {job_id: expires for job_id, expires in (record or {}).get('jobs', {}).items() if expires > now}
+
+
+def expire_stalled(record):
+    """
+    Report Express jobs that outlived the Express timeout as failed.
+
+    An Express execution stopped by its timeout runs no further state and
+    emits no event, so nothing ever writes its final stage. The record is
+    left as it is; only what lookups and subscribers see changes.
+    EXPRESS_TIMEOUT_SECONDS is the Express workflow's timeout (default 300).
+    """
+    if not record or record.get('lane') != 'express' or record.get('stage') in FINAL_STAGES \
+            or not record.get('stages'):
+        return record
+    timeout = int(os.environ.get('EXPRESS_TIMEOUT_SECONDS', '300'))
+    started = min(timing['startedAt'] for timing in record['stages'].values())
+    if time.time() - started <= timeout + STALL_GRACE_SECONDS:
+        return record
+    return dict(record, stage='failed', failure={
+        'status': 'TIMED_OUT',
+        'error': 'States.Timeout',
+        'cause': f"Express execution did not finish within {timeout} seconds"
+    })
+
+
+def apply_update(record, stage, artifacts, failure, fields):
+    """Apply one JobIndex.update() to the current record (modified in place)."""
+    now = round(time.time(), 3)
+    previous = record.get('stage')
+    if stage == 'queued' and previous not in (None, 'queued'):
+        stage = previous
+    if stage != previous:
+        timing = record['stages'].get(previous)
+        if timing and previous not in FINAL_STAGES and 'finishedAt' not in timing:
+            timing['finishedAt'] = now
+            timing['seconds'] = round(now - timing['startedAt'], 3)
+        record['stages'].setdefault(stage, {'startedAt': now})
+        # Progress belongs to the stage that reported it
+        record.pop('progress', None)
+    record['stage'] = stage
+    record['updatedAt'] = now
+    if stage in FINAL_STAGES:
+        first_start = min(timing['startedAt'] for timing in record['stages'].values())
+        record['totalSeconds'] = round(now - first_start, 3)
+    record['artifacts'].update(artifacts or {})
+    if failure:
+        record['failure'] = failure
+    record.update(fields)
+    return record
+
+
+class S3JobIndex(JobIndex):
+    """
+    Index stored as one small JSON object per job in S3.
+
+    Writes are conditional on the ETag that was read (IfMatch), or on the
+    object not existing yet (IfNoneMatch) for new jobs.
+    """
+
+    def __init__(self, s3_client, bucket, prefix=INDEX_PREFIX):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, job_id):
+        return f"{self.prefix}{job_id}.json"
+
+    def read(self, job_id):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self._key(job_id))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return None, None
+            raise
+        return json.loads(response['Body'].read().decode('utf-8')), response['ETag']
+
+    def write(self, job_id, record, version):
+        condition = {'IfNoneMatch': '*'} if version is None else {'IfMatch': version}
+        try:
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=self._key(job_id),
+                Body=json.dumps(record).encode('utf-8'),
+                ContentType='application/json',
+                **condition
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('PreconditionFailed', 'ConditionalRequestConflict',
+                                                           '412', '409'):
+                return False
+            raise
+        return True
+
+
+class LocalJobIndex(JobIndex):
+    """
+    Index stored as JSON files in a local directory, for tests and offline
+    runs. A lock file per job makes the compare-and-write atomic between
+    threads and processes.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _read_bytes(self, job_id):
+        try:
+            with open(self._path(job_id), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def read(self, job_id):
+        data = self._read_bytes(job_id)
+        if data is None:
+            return None, None
+        return json.loads(data), hashlib.md5(data).hexdigest()
+
+    def write(self, job_id, record, version):
+        path = self._path(job_id)
+        with open(path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            data = self._read_bytes(job_id)
+            if (None if data is None else hashlib.md5(data).hexdigest()) != version:
+                return False
+            with open(path + '.tmp', 'w') as f:
+                json.dump(record, f)
+            os.replace(path + '.tmp', path)
+        return True
+
+
+def require_conditional_writes(version=None):
+    """
+    Raise RuntimeError unless botocore supports conditional PutObject.
+
+    Older releases reject IfMatch with a ParamValidationError on every
+    write. The Lambda runtime's bundled SDK can be older, so the stack
+    ships a newer one as a layer (boto3-layer/requirements.txt).
+    """
+    version = version or botocore.__version__
+    parts = tuple(int(part) if part.isdigit() else 0 for part in version.split('.')[:3])
+    if parts < MIN_BOTOCORE_VERSION:
+        required = '.'.join(str(part) for part in MIN_BOTOCORE_VERSION)
+        raise RuntimeError(f"The S3 job index needs botocore>={required} for conditional writes "
+                           f"(IfMatch); found {version}")
+
+
+def get_job_index(default_bucket=None):
+    """
+    Build the index selected by JOB_INDEX_BACKEND ('s3', 'local' or 'none',
+    the default).
+
+    The S3 backend uses JOB_INDEX_BUCKET (default: the summaries bucket)
+    and fails fast on a botocore without conditional writes; the local
+    backend uses JOB_INDEX_DIR.
+    """
+    backend = os.environ.get('JOB_INDEX_BACKEND', 'none').lower()
+    if backend == 'none':
+        return None
+    if backend == 'local':
+        return LocalJobIndex(os.environ.get('JOB_INDEX_DIR', '/tmp/job-index'))
+    if backend == 's3':
+        require_conditional_writes()
+        bucket = os.environ.get('JOB_INDEX_BUCKET') or os.environ.get('SUMMARIES_BUCKET') or default_bucket
+        return S3JobIndex(lambda_runtime.get_client('s3'), bucket)
+    raise ValueError(f"Unknown JOB_INDEX_BACKEND: {backend}")
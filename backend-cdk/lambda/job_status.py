@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import time
+import logging
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+import lambda_runtime
+import job_index
+
+logger = logging.getLogger()
+
+# One marker per WebSocket connection watching a job, plus a reverse entry
+# per connection so $disconnect can find the job
+BY_JOB_PREFIX = 'status-connections/by-job/'
+BY_CONNECTION_PREFIX = 'status-connections/by-connection/'
+
+# Stages in pipeline order; done and failed are final
+STAGES = ('queued', 'transcribing', 'speaker_identification', 'summarizing', 'done', 'failed')
+
+# The upload API names objects uploads/<uuid>-<file name>
+_UUID_PREFIX = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+_ARTIFACT_PREFIX = 'Transcription-Output-for-'
+_ARTIFACT_SUFFIXES = ('-speaker-identification.txt', '.txt')
+
+
+def job_id_for_key(key):
+    """
+    Job id of an upload or of its transcript artifacts.
+
+    The UUID the upload API put in front of the file name, which is also what
+    the frontend extracts from the upload key; other keys fall back to the
+    file name.
+    """
+    if key.startswith(_ARTIFACT_PREFIX):
+        key = key[len(_ARTIFACT_PREFIX):]
+        for suffix in _ARTIFACT_SUFFIXES:
+            if key.endswith(suffix):
+                key = key[:-len(suffix)]
+                break
+    name = key.rsplit('/', 1)[-1]
+    match = _UUID_PREFIX.match(name)
+    if match:
+        return match.group(0).lower()
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', name)[:128]
+
+
+class StatusChannel:
+    """
+    Job status pushed to WebSocket subscribers.
+
+    publish() records the status in the job index and posts the job's
+    record to every connection that subscribed to the job. Connections that
+    have gone away are dropped on the way.
+    """
+
+    def __init__(self, s3_client, bucket, connections_client, index=None):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.connections_client = connections_client
+        self.index = index
+
+    def _put_json(self, key, document):
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=json.dumps(document).encode('utf-8'),
+                           ContentType='application/json')
+
+    def _get_json(self, key):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(response['Body'].read().decode('utf-8'))
+
+    def current(self, job_id):
+        """Latest published status of a job, or None without a job index."""
+        return self.index.get(job_id) if self.index else None
+
+    def connections(self, job_id):
+        prefix = f"{BY_JOB_PREFIX}{job_id}/"
+        params = {'Bucket': self.bucket, 'Prefix': prefix}
+        connection_ids = []
+        while True:
+            response = self.s3.list_objects_v2(**params)
+            connection_ids.extend(entry['Key'][len(prefix):] for entry in response.get('Contents', []))
+            if not response.get('IsTruncated'):
+                return connection_ids
+            params['ContinuationToken'] = response['NextContinuationToken']
+
+    def send(self, connection_id, status):
+        """
+        Post a status to one connection.
+
+        Returns:
+            False if the connection is gone, True otherwise
+        """
+        try:
+            self.connections_client.post_to_connection(ConnectionId=connection_id,
+                                                       Data=json.dumps(status).encode('utf-8'))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('GoneException', '410'):
+                return False
+            raise
+
+    def publish(self, job_id, stage, **fields):
+        """
+        Store and push a status update.
+
+        Args:
+            stage: One of STAGES
+            fields: Extra status fields (see JobIndex.update), e.g.
+                progress={'completed': 3, 'total': 12}, or summaryKey once
+                the summary has been written
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown job stage: {stage}")
+        if self.index:
+            status = self.index.update(job_id, stage, **fields)
+        else:
+            status = dict(fields, jobId=job_id, stage=stage, updatedAt=round(time.time(), 3))
+        for connection_id in self.connections(job_id):
+            if not self.send(connection_id, status):
+                self.unsubscribe(connection_id, job_id)
+        return status
+
+    def subscribe(self, job_id, connection_id):
+        """Watch a job from a connection and send it the current status right away."""
+        self._put_json(f"{BY_JOB_PREFIX}{job_id}/{connection_id}", {'connectedAt': round(time.time(), 3)})
+        self._put_json(f"{BY_CONNECTION_PREFIX}{connection_id}", {'jobId': job_id})
+        status = self.current(job_id) or {'jobId': job_id, 'stage': 'queued'}
+        self.send(connection_id, status)
+        return status
+
+    def unsubscribe(self, connection_id, job_id=None):
+        if job_id is None:
+            entry = self._get_json(f"{BY_CONNECTION_PREFIX}{connection_id}")
+            job_id = entry and entry['jobId']
+        if job_id:
+            self.s3.delete_object(Bucket=self.bucket, Key=f"{BY_JOB_PREFIX}{job_id}/{connection_id}")
+        self.s3.delete_object(Bucket=self.bucket, Key=f"{BY_CONNECTION_PREFIX}{connection_id}")
+
+
+class ProgressReporter:
+    """
+    Publishes "completed N of M" progress for a stage, at most once every
+    min_interval seconds apart from the first and the last update, so long
+    recordings do not post once per chunk.
+    """
+
+    def __init__(self, job_id, stage, total, min_interval=2.0):
+        self.job_id = job_id
+        self.stage = stage
+        self.total = total
+        self.min_interval = min_interval
+        self._last = None
+
+    def __call__(self, completed):
+        now = time.monotonic()
+        if self._last is not None and completed < self.total and now - self._last < self.min_interval:
+            return
+        self._last = now
+        notify(self.job_id, self.stage, progress={'completed': completed, 'total': self.total})
+
+
+def channel_from_environment(index=None):
+    """
+    StatusChannel for STATUS_WEBSOCKET_ENDPOINT (the WebSocket API callback
+    URL), or None when push status is not deployed. Subscriptions are stored
+    in STATUS_BUCKET, by default the summaries bucket; the latest status of
+    each job comes from the job index.
+    """
+    endpoint = os.environ.get('STATUS_WEBSOCKET_ENDPOINT')
+    bucket = os.environ.get('STATUS_BUCKET') or os.environ.get('SUMMARIES_BUCKET')
+    if not endpoint or not bucket:
+        return None
+    return StatusChannel(lambda_runtime.get_client('s3'), bucket,
+                         lambda_runtime.get_client('apigatewaymanagementapi', endpoint_url=endpoint), index)
+
+
+def notify(job_id, stage, **fields):
+    """
+    Record a status update in the job index and push it to subscribers,
+    whichever of the two is configured.
+
+    Status is a side channel: failures are logged and never fail the job.
+
+    Returns:
+        The job's index record (the plain status without an index), or None
+        when nothing is configured or publishing failed
+    """
+    try:
+        index = job_index.get_job_index()
+        channel = channel_from_environment(index)
+        if channel:
+            return channel.publish(job_id, stage, **fields)
+        if index:
+            return index.update(job_id, stage, **fields)
+    except (BotoCoreError, ClientError, job_index.ConcurrentUpdateError) as e:
+        logger.warning(f"Could not publish {stage} status for job {job_id}: {e}")
+    return None
+
+
+def progress_reporter(job_id, stage, total):
+    """ProgressReporter for a stage, or None when neither the job index nor push status is configured."""
+    if not os.environ.get('STATUS_WEBSOCKET_ENDPOINT') and os.environ.get('JOB_INDEX_BACKEND', 'none') == 'none':
+        return None
+    return ProgressReporter(job_id, stage, total, float(os.environ.get('STATUS_MIN_INTERVAL_SECONDS', '2')))
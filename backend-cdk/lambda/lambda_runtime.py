@@ -0,0 +1,146 @@
+import os
+import shutil
+import importlib
+import threading
+
+import boto3
+from botocore.config import Config
+
+# Locations where an FFmpeg binary may be provided (Lambda layers, deployment
+# package, or downloaded at runtime)
+FFMPEG_SEARCH_PATHS = [
+    '/opt/bin',            # Common Lambda layer path
+    '/opt/ffmpeg/bin',     # Another possible location
+    '/var/task/bin',       # If you added ffmpeg in the deployment package
+    '/tmp/bin',            # If you downloaded ffmpeg at runtime
+    '/opt/ffmpeg',         # FFmpeg directory itself
+    '/opt'                 # Root opt directory
+]
+
+# Services whose calls go through rate_limiter, which retries throttles
+# itself; their clients make a single attempt so every throttle reaches the
+# limiter instead of being retried blindly by botocore first
+RATE_LIMITED_SERVICES = {'sagemaker-runtime', 'bedrock-runtime'}
+
+# Module level state lives for the lifetime of the execution environment, so
+# everything cached here is only built on the first (cold) invocation
+_clients = {}
+_clients_lock = threading.Lock()
+_ffmpeg_path = None
+_ffmpeg_checked = False
+
+
+def client_config(max_pool_connections=None, max_attempts=3):
+    """
+    Build the botocore config shared by all clients.
+
+    Connection pools are sized for concurrent chunk uploads and TCP keep-alive
+    is enabled so warm containers reuse their connections between invocations.
+    """
+    if max_pool_connections is None:
+        max_pool_connections = int(os.environ.get('MAX_POOL_CONNECTIONS', '50'))
+    return Config(
+        max_pool_connections=max_pool_connections,
+        tcp_keepalive=True,
+        connect_timeout=int(os.environ.get('CONNECT_TIMEOUT_SECONDS', '10')),
+        read_timeout=int(os.environ.get('READ_TIMEOUT_SECONDS', '120')),
+        retries={'mode': 'standard', 'max_attempts': max_attempts}
+    )
+
+
+def get_client(service_name, region_name=None, endpoint_url=None):
+    """
+    Return a boto3 client for the service, creating it once per container.
+
+    Args:
+        service_name: Name of the AWS service, e.g. 's3' or 'sagemaker-runtime'
+        region_name: Optional region; clients are cached per (service, region)
+        endpoint_url: Optional endpoint, e.g. the callback URL of a WebSocket
+            API for apigatewaymanagementapi; cached separately as well
+
+    Returns:
+        A cached boto3 client
+    """
+    cache_key = (service_name, region_name) if endpoint_url is None else (service_name, region_name, endpoint_url)
+    client = _clients.get(cache_key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(cache_key)
+        if client is None:
+            max_attempts = 1 if service_name in RATE_LIMITED_SERVICES else 3
+            client = boto3.client(service_name, region_name=region_name, endpoint_url=endpoint_url,
+                                  config=client_config(max_attempts=max_attempts))
+            _clients[cache_key] = client
+    return client
+
+
+def register_client(service_name, client, region_name=None, endpoint_url=None):
+    """Install a client (or a local stand-in) to be returned by get_client."""
+    with _clients_lock:
+        _clients[(service_name, region_name) if endpoint_url is None else (service_name, region_name, endpoint_url)] = client
+
+
+def reset_clients():
+    """Drop all cached clients so the next get_client call builds new ones."""
+    with _clients_lock:
+        _clients.clear()
+
+
+def find_ffmpeg():
+    """
+    Locate the FFmpeg binary once per container.
+
+    The search paths are added to PATH on the first call only and the result
+    is cached, so warm invocations do not spawn a subprocess or list directories.
+
+    Returns:
+        Absolute path to ffmpeg, or None if it is not available
+    """
+    global _ffmpeg_path, _ffmpeg_checked
+    if _ffmpeg_checked:
+        return _ffmpeg_path
+
+    current_path = os.environ.get('PATH', '')
+    missing = [path for path in FFMPEG_SEARCH_PATHS if path not in current_path.split(':')]
+    if missing:
+        os.environ['PATH'] = ':'.join(missing + ([current_path] if current_path else []))
+
+    _ffmpeg_path = shutil.which('ffmpeg')
+    _ffmpeg_checked = True
+    print(f"FFmpeg lookup: {_ffmpeg_path if _ffmpeg_path else 'not found'}")
+    return _ffmpeg_path
+
+
+def reset_ffmpeg_cache():
+    """Forget the cached FFmpeg lookup."""
+    global _ffmpeg_path, _ffmpeg_checked
+    _ffmpeg_path = None
+    _ffmpeg_checked = False
+
+
+class LazyModule:
+    """Module proxy that performs the import on first attribute access."""
+
+    def __init__(self, module_name):
+        self._module_name = module_name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+        return self._module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+
+def lazy_import(module_name):
+    """
+    Defer importing a heavy dependency until it is first used.
+
+    Handlers that never touch the dependency (for example WAV input that needs
+    no conversion) then do not pay its import time during a cold start.
+    """
+    return LazyModule(module_name)
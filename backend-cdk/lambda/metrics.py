@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'AudioSummarizer')
+
+# CloudWatch accepts at most 100 values per metric in one EMF record
+MAX_VALUES_PER_RECORD = 100
+
+# Invocation properties that are also published as metrics
+PROPERTY_METRICS = {
+    'AudioDurationSeconds': 'Seconds',
+    'AudioBytes': 'Bytes',
+    'InputTokens': 'Count',
+    'OutputTokens': 'Count',
+    'EstimatedInputTokens': 'Count',
+    'PromptTokensBefore': 'Count',
+    'PromptTokensAfter': 'Count',
+    'HedgeRate': 'None',
+    'HedgeP99SavedMs': 'Milliseconds',
+    'PipelineSeconds': 'Seconds'
+}
+
+# Invocation properties that, when set, also split the invocation metrics
+# by their value (e.g. PipelineSeconds per intake lane)
+DIMENSION_PROPERTIES = ('Lane',)
+
+# Most recently created recorder, i.e. the current invocation's
+_latest = None
+
+
+def latest_properties():
+    """Properties of the current invocation's StageMetrics (empty if none)."""
+    return dict(_latest.properties) if _latest is not None else {}
+
+
+def verbose_logging_enabled():
+    """Debug output is off unless VERBOSE_LOGGING=true."""
+    return os.environ.get('VERBOSE_LOGGING', 'false').lower() == 'true'
+
+
+def debug(*args, **kwargs):
+    """print() that only writes when verbose logging is enabled."""
+    if verbose_logging_enabled():
+        print(*args, **kwargs)
+
+
+class StageMetrics:
+    """
+    Collects named stage timings for one invocation and emits them as
+    CloudWatch embedded metric format (EMF) records.
+
+    Every stage becomes one record with the dimensions Function and Stage.
+    Stages that run more than once per invocation (e.g. per-chunk inference)
+    are emitted as a list of values so CloudWatch keeps the full distribution.
+
+    Example:
+        metrics = StageMetrics('whisper-transcription')
+        with metrics.stage('download') as stage:
+            data = s3.get_object(...)['Body'].read()
+            stage['bytes'] = len(data)
+        metrics.flush()
+    """
+
+    def __init__(self, function_name, **properties):
+        global _latest
+        _latest = self
+        self.function_name = function_name
+        self.properties = dict(properties)
+        self.stages = {}
+        self._order = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def set_property(self, name, value):
+        """
+        Attach a value (e.g. audio duration or input key) to the invocation.
+
+        Scalar values go on every record; structured values (dicts and lists
+        such as the chunk plan or endpoint statistics) only on the invocation
+        total, so they are not repeated in each stage record.
+        """
+        self.properties[name] = value
+
+    def _stage_properties(self):
+        return {name: value for name, value in self.properties.items() if not isinstance(value, (dict, list, tuple))}
+
+    def record(self, stage_name, duration_ms, nbytes=None, **values):
+        """Record one occurrence of a stage (safe to call from worker threads)."""
+        with self._lock:
+            stage = self.stages.get(stage_name)
+            if stage is None:
+                stage = {'duration_ms': [], 'bytes': [], 'values': {}}
+                self.stages[stage_name] = stage
+                self._order.append(stage_name)
+            stage['duration_ms'].append(round(duration_ms, 3))
+            if nbytes is not None:
+                stage['bytes'].append(nbytes)
+            for name, value in values.items():
+                stage['values'].setdefault(name, []).append(value)
+
+    @contextmanager
+    def stage(self, stage_name):
+        """
+        Time the enclosed block as one occurrence of stage_name.
+
+        The yielded dict can be given a 'bytes' entry and any other numeric
+        values to record alongside the duration.
+        """
+        extra = {}
+        start = time.perf_counter()
+        try:
+            yield extra
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            nbytes = extra.pop('bytes', None)
+            self.record(stage_name, duration_ms, nbytes, **extra)
+
+    def summary(self):
+        """Per-stage totals, suitable for including in a handler response."""
+        return {
+            name: {
+                'count': len(self.stages[name]['duration_ms']),
+                'total_ms': round(sum(self.stages[name]['duration_ms']), 3),
+                'max_ms': max(self.stages[name]['duration_ms'])
+            }
+            for name in self._order
+        }
+
+    def _emf_records(self, stage_name):
+        stage = self.stages[stage_name]
+        series = {'StageDuration': ('Milliseconds', stage['duration_ms'])}
+        if stage['bytes']:
+            series['StageBytes'] = ('Bytes', stage['bytes'])
+        for name, values in stage['values'].items():
+            series[name] = ('None', values)
+
+        longest = max(len(values) for _, values in series.values())
+        for offset in range(0, longest, MAX_VALUES_PER_RECORD):
+            record = {
+                '_aws': {
+                    'Timestamp': int(time.time() * 1000),
+                    'CloudWatchMetrics': [{
+                        'Namespace': NAMESPACE,
+                        'Dimensions': [['Function', 'Stage']],
+                        'Metrics': [{'Name': name, 'Unit': unit} for name, (unit, values) in series.items()
+                                    if values[offset:offset + MAX_VALUES_PER_RECORD]]
+                    }]
+                },
+                'Function': self.function_name,
+                'Stage': stage_name
+            }
+            record.update(self._stage_properties())
+            for name, (unit, values) in series.items():
+                window = values[offset:offset + MAX_VALUES_PER_RECORD]
+                if window:
+                    record[name] = window if len(window) > 1 else window[0]
+            yield record
+
+    def flush(self):
+        """Write one EMF record per stage plus an invocation total to stdout."""
+        for stage_name in self._order:
+            for record in self._emf_records(stage_name):
+                print(json.dumps(record, default=str))
+
+        invocation_metrics = [{'Name': 'InvocationDuration', 'Unit': 'Milliseconds'}]
+        invocation_metrics.extend({'Name': name, 'Unit': unit} for name, unit in PROPERTY_METRICS.items()
+                                  if isinstance(self.properties.get(name), (int, float)))
+        total = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': NAMESPACE,
+                    'Dimensions': [['Function']] + [['Function', name] for name in DIMENSION_PROPERTIES
+                                                    if name in self.properties],
+                    'Metrics': invocation_metrics
+                }]
+            },
+            'Function': self.function_name,
+            'InvocationDuration': round((time.perf_counter() - self._start) * 1000, 3)
+        }
+        total.update(self.properties)
+        print(json.dumps(total, default=str))
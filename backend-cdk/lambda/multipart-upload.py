@@ -0,0 +1,197 @@
+import json
+import math
+import os
+import re
+import uuid
+import logging
+
+from botocore.exceptions import ClientError
+
+import lambda_runtime
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# S3 limits for multipart uploads
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+# Part URLs handed out per request; the browser asks for more as it goes
+MAX_URLS_PER_REQUEST = 100
+
+# Only recordings under uploads/ are processed, and only those may be written
+UPLOAD_PREFIX = 'uploads/'
+
+
+def response(status_code, body):
+    """API Gateway proxy response with the CORS headers the frontend needs."""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': '*',
+            'Access-Control-Allow-Methods': 'OPTIONS,POST'
+        },
+        'body': json.dumps(body)
+    }
+
+
+def part_size_for(file_size, preferred_size):
+    """
+    Part size for a file: the preferred size, raised in whole MiB when the
+    file would otherwise need more than MAX_PARTS parts.
+    """
+    size = max(preferred_size, MIN_PART_SIZE)
+    if file_size > size * MAX_PARTS:
+        size = math.ceil(file_size / MAX_PARTS / (1024 * 1024)) * 1024 * 1024
+    return size
+
+
+def upload_key(filename):
+    """uploads/<uuid>-<filename>, the key format the summary lookup expects."""
+    name = re.sub(r'[^A-Za-z0-9._-]', '_', os.path.basename(filename or ''))[:200]
+    if not name.strip('._'):
+        raise ValueError("filename is required")
+    return f"{UPLOAD_PREFIX}{uuid.uuid4()}-{name}"
+
+
+def part_urls(s3, bucket, key, upload_id, part_numbers, expires_in):
+    """Presigned UploadPart URLs as {part number: url}."""
+    return {
+        part_number: s3.generate_presigned_url('upload_part', Params={
+            'Bucket': bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number
+        }, ExpiresIn=expires_in)
+        for part_number in part_numbers
+    }
+
+
+def uploaded_parts(s3, bucket, key, upload_id):
+    """Parts S3 already holds for an upload, as {part number: {'ETag', 'Size'}}."""
+    parts = {}
+    params = {'Bucket': bucket, 'Key': key, 'UploadId': upload_id}
+    while True:
+        page = s3.list_parts(**params)
+        for part in page.get('Parts', []):
+            parts[part['PartNumber']] = {'ETag': part['ETag'], 'Size': part['Size']}
+        if not page.get('IsTruncated'):
+            return parts
+        params['PartNumberMarker'] = page['NextPartNumberMarker']
+
+
+def start_upload(s3, bucket, body, preferred_part_size):
+    """Create a multipart upload and return its key, upload id and part layout."""
+    file_size = int(body.get('size') or 0)
+    if file_size <= 0:
+        raise ValueError("size must be a positive number of bytes")
+    key = upload_key(body.get('filename'))
+    params = {'Bucket': bucket, 'Key': key}
+    if body.get('contentType'):
+        params['ContentType'] = body['contentType']
+    upload_id = s3.create_multipart_upload(**params)['UploadId']
+    part_size = part_size_for(file_size, preferred_part_size)
+    logger.info(f"Started multipart upload of {key} ({file_size} bytes, {part_size} byte parts)")
+    return {'key': key, 'uploadId': upload_id, 'partSize': part_size,
+            'partCount': math.ceil(file_size / part_size)}
+
+
+def list_upload(s3, bucket, body, expires_in):
+    """
+    Parts already uploaded, plus fresh URLs for the requested part numbers.
+
+    A browser resuming an interrupted upload calls this with no part numbers
+    first to learn which parts S3 already has, then asks for URLs of the
+    missing ones in batches.
+    """
+    key, upload_id = upload_reference(body)
+    uploaded = uploaded_parts(s3, bucket, key, upload_id)
+    requested = [int(number) for number in body.get('partNumbers', [])]
+    if len(requested) > MAX_URLS_PER_REQUEST:
+        raise ValueError(f"At most {MAX_URLS_PER_REQUEST} part URLs can be requested at once")
+    if any(number < 1 or number > MAX_PARTS for number in requested):
+        raise ValueError(f"Part numbers must be between 1 and {MAX_PARTS}")
+    urls = part_urls(s3, bucket, key, upload_id, requested, expires_in)
+    return {
+        'key': key,
+        'uploadId': upload_id,
+        'uploaded': [{'partNumber': number, 'size': part['Size']} for number, part in sorted(uploaded.items())],
+        'urls': [{'partNumber': number, 'url': url} for number, url in urls.items()]
+    }
+
+
+def complete_upload(s3, bucket, body):
+    """
+    Complete an upload from the parts S3 has, so the browser never has to
+    read ETag headers.
+
+    Raises:
+        ValueError: if any of parts 1..partCount has not been uploaded
+    """
+    key, upload_id = upload_reference(body)
+    part_count = int(body.get('partCount') or 0)
+    uploaded = uploaded_parts(s3, bucket, key, upload_id)
+    missing = [number for number in range(1, part_count + 1) if number not in uploaded]
+    if missing or not uploaded:
+        raise ValueError(f"Upload is missing parts {missing[:20]}")
+    s3.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={
+        'Parts': [{'PartNumber': number, 'ETag': part['ETag']} for number, part in sorted(uploaded.items())]
+    })
+    logger.info(f"Completed multipart upload of {key} from {len(uploaded)} parts")
+    return {'key': key, 'parts': len(uploaded)}
+
+
+def abort_upload(s3, bucket, body):
+    key, upload_id = upload_reference(body)
+    s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+    return {'key': key, 'aborted': True}
+
+
+def upload_reference(body):
+    key, upload_id = body.get('key'), body.get('uploadId')
+    if not key or not upload_id:
+        raise ValueError("key and uploadId are required")
+    if not key.startswith(UPLOAD_PREFIX) or '..' in key:
+        raise ValueError(f"key must be under {UPLOAD_PREFIX}")
+    return key, upload_id
+
+
+def lambda_handler(event, context):
+    """
+    Multipart upload API for large recordings.
+
+    POST /multipart-upload            {filename, size, contentType} -> key, uploadId, partSize, partCount
+    POST /multipart-upload/parts      {key, uploadId, partNumbers}  -> uploaded parts and part URLs
+    POST /multipart-upload/complete   {key, uploadId, partCount}
+    POST /multipart-upload/abort      {key, uploadId}
+
+    The browser uploads parts in parallel straight to S3 and retries or
+    resumes single parts; completion happens here, from the parts S3 holds.
+    Part size comes from UPLOAD_PART_SIZE_MB (default 16) and URLs expire
+    after UPLOAD_URL_EXPIRY_SECONDS (default 3600).
+    """
+    s3 = lambda_runtime.get_client('s3')
+    bucket = os.environ['UPLOADS_BUCKET']
+    preferred_part_size = int(os.environ.get('UPLOAD_PART_SIZE_MB', '16')) * 1024 * 1024
+    expires_in = int(os.environ.get('UPLOAD_URL_EXPIRY_SECONDS', '3600'))
+
+    action = (event.get('path') or '').rstrip('/').rsplit('/', 1)[-1]
+    try:
+        body = json.loads(event.get('body') or '{}')
+        if action == 'multipart-upload':
+            return response(200, start_upload(s3, bucket, body, preferred_part_size))
+        if action == 'parts':
+            return response(200, list_upload(s3, bucket, body, expires_in))
+        if action == 'complete':
+            return response(200, complete_upload(s3, bucket, body))
+        if action == 'abort':
+            return response(200, abort_upload(s3, bucket, body))
+        return response(404, {'error': f"Unknown multipart upload action: {action}"})
+    except ValueError as e:
+        return response(400, {'error': str(e)})
+    except ClientError as e:
+        code = e.response.get('Error', {}).get('Code')
+        if code == 'NoSuchUpload':
+            # Expired or aborted; the browser starts a new upload
+            return response(404, {'error': 'Upload no longer exists', 'code': code})
+        logger.error(f"Multipart upload {action} failed: {e}")
+        return response(500, {'error': 'Multipart upload request failed'})
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import uuid
+import cProfile
+import tempfile
+import functools
+import tracemalloc
+from urllib.parse import quote
+
+import lambda_runtime
+import metrics
+
+DEFAULT_PROFILE_DIR = '/tmp/profiles'
+DEFAULT_TOP_ALLOCATIONS = 25
+
+# Invocations seen by this execution environment, for PROFILE_SAMPLE_EVERY
+_invocation_count = 0
+
+
+def profiling_enabled():
+    """Profiling is off unless PROFILING_ENABLED=true."""
+    return os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+
+
+def should_profile():
+    """
+    Decide whether to profile the current invocation.
+
+    With PROFILE_SAMPLE_EVERY=N only every Nth invocation of a warm
+    execution environment is profiled (the first one always is).
+    """
+    global _invocation_count
+    if not profiling_enabled():
+        return False
+    _invocation_count += 1
+    every = max(int(os.environ.get('PROFILE_SAMPLE_EVERY', '1')), 1)
+    return (_invocation_count - 1) % every == 0
+
+
+def reset_sampling():
+    """Start sampling from the first invocation again (used by tests)."""
+    global _invocation_count
+    _invocation_count = 0
+
+
+def _split_s3_uri(uri):
+    bucket, _, prefix = uri[len('s3://'):].partition('/')
+    if prefix and not prefix.endswith('/'):
+        prefix += '/'
+    return bucket, prefix
+
+
+def write_profile(function_name, profile_id, files, tags):
+    """
+    Store the profile artifacts.
+
+    Artifacts go to PROFILE_S3_URI (s3://bucket/prefix/) when it is set,
+    otherwise to PROFILE_DIR (default /tmp/profiles). Each invocation gets
+    its own <function>/<profile id>/ folder.
+
+    Args:
+        files: Dict of artifact name -> local file path
+        tags: Dict of values identifying the invocation (input key, audio duration)
+
+    Returns:
+        Location of the artifact folder
+    """
+    s3_uri = os.environ.get('PROFILE_S3_URI')
+    if s3_uri:
+        bucket, prefix = _split_s3_uri(s3_uri)
+        folder = f"{prefix}{function_name}/{profile_id}/"
+        s3 = lambda_runtime.get_client('s3')
+        # S3 user metadata must be ASCII
+        object_metadata = {name.lower(): quote(str(value), safe='') for name, value in tags.items()
+                           if value is not None}
+        for name, path in files.items():
+            with open(path, 'rb') as f:
+                s3.put_object(Bucket=bucket, Key=folder + name, Body=f.read(), Metadata=object_metadata)
+        return f"s3://{bucket}/{folder}"
+
+    folder = os.path.join(os.environ.get('PROFILE_DIR', DEFAULT_PROFILE_DIR), function_name, profile_id)
+    os.makedirs(folder, exist_ok=True)
+    for name, path in files.items():
+        os.replace(path, os.path.join(folder, name))
+    return folder
+
+
+def top_allocations(snapshot, limit):
+    """Human-readable list of the biggest allocation sites in a snapshot."""
+    lines = [f"Top {limit} allocation sites by size"]
+    for index, stat in enumerate(snapshot.statistics('lineno')[:limit], 1):
+        frame = stat.traceback[0]
+        lines.append(f"#{index}: {frame.filename}:{frame.lineno}: {stat.size / 1024:.1f} KiB in {stat.count} blocks")
+    return '\n'.join(lines) + '\n'
+
+
+def profile_invocation(function_name):
+    """
+    Decorator that profiles a Lambda handler when PROFILING_ENABLED=true.
+
+    For every sampled invocation it writes:
+      - cprofile.prof: cProfile stats, loadable with pstats or snakeviz
+      - tracemalloc.snapshot: loadable with tracemalloc.Snapshot.load
+      - tracemalloc.txt: the PROFILE_TOP_ALLOCATIONS biggest allocation sites
+      - metadata.json: input key, audio duration, wall time and peak traced memory
+
+    The input key and audio duration are taken from the invocation's
+    StageMetrics properties. cProfile only sees the handler's own thread, so
+    time spent in worker threads shows up as waiting on futures. Profiling
+    failures are logged and never fail the invocation.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            if not should_profile():
+                return handler(event, context)
+
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start(int(os.environ.get('PROFILE_TRACEMALLOC_FRAMES', '1')))
+            tracemalloc.reset_peak()
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                return handler(event, context)
+            finally:
+                profiler.disable()
+                duration_ms = (time.perf_counter() - start) * 1000
+                snapshot = tracemalloc.take_snapshot()
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+                try:
+                    _save(function_name, context, profiler, snapshot, duration_ms, peak_bytes)
+                except Exception as e:
+                    print(f"Error writing profile for {function_name}: {str(e)}")
+        return wrapper
+    return decorator
+
+
+def _save(function_name, context, profiler, snapshot, duration_ms, peak_bytes):
+    properties = metrics.latest_properties()
+    request_id = getattr(context, 'aws_request_id', None) or uuid.uuid4().hex
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{request_id}"
+    tags = {
+        'InputKey': properties.get('InputKey'),
+        'AudioDurationSeconds': properties.get('AudioDurationSeconds')
+    }
+    limit = int(os.environ.get('PROFILE_TOP_ALLOCATIONS', str(DEFAULT_TOP_ALLOCATIONS)))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        files = {
+            'cprofile.prof': os.path.join(work_dir, 'cprofile.prof'),
+            'tracemalloc.snapshot': os.path.join(work_dir, 'tracemalloc.snapshot'),
+            'tracemalloc.txt': os.path.join(work_dir, 'tracemalloc.txt'),
+            'metadata.json': os.path.join(work_dir, 'metadata.json')
+        }
+        profiler.dump_stats(files['cprofile.prof'])
+        snapshot.dump(files['tracemalloc.snapshot'])
+        with open(files['tracemalloc.txt'], 'w') as f:
+            f.write(top_allocations(snapshot, limit))
+        with open(files['metadata.json'], 'w') as f:
+            json.dump(dict(tags, Function=function_name, RequestId=request_id,
+                           DurationMs=round(duration_ms, 3), PeakTracedBytes=peak_bytes), f, default=str)
+        location = write_profile(function_name, profile_id, files, tags)
+
+    print(f"Profile for {tags['InputKey']} written to {location}")
@@ -0,0 +1,177 @@
+import os
+import re
+import itertools
+
+from summary_routing import estimate_tokens
+
+# Steps applied when PROMPT_COMPACTION_STEPS is not set
+DEFAULT_STEPS = ('merge_turns', 'coarsen_timestamps', 'collapse_disfluencies', 'alias_speakers')
+ALL_STEPS = DEFAULT_STEPS + ('drop_timestamps',)
+
+# One speaker-identification line: "[0:01:23] spk_0: text"
+_TURN = re.compile(r'^\[(\d+):(\d{2}):(\d{2})\]\s+([^:\s]+):\s?(.*)$')
+
+# Filler words that carry no meaning, with the commas around them
+_FILLERS = re.compile(r'(?:,\s*)?\b(?:u+m+|u+h+|e+r+m*|a+h+|h+m+|m+h*m+)\b[,.]?\s*', re.IGNORECASE)
+
+# A word or phrase of up to four words repeated straight after itself
+_REPEATS = re.compile(r"\b([\w']+(?:\s+[\w']+){0,3})(?:[\s,]+\1\b)+", re.IGNORECASE)
+
+_ALIAS = re.compile(r'\bS\d+\b')
+
+_SPACES = re.compile(r'\s+')
+_SPACE_BEFORE_PUNCTUATION = re.compile(r'\s+([,.?!])')
+
+
+class Turn:
+    """One speaker turn of a speaker-identification transcript."""
+
+    def __init__(self, seconds, speaker, text):
+        self.seconds = seconds
+        self.speaker = speaker
+        self.text = text
+
+
+def steps_from_environment():
+    """Steps listed in PROMPT_COMPACTION_STEPS (comma separated, 'none' disables compaction)."""
+    value = os.environ.get('PROMPT_COMPACTION_STEPS')
+    if value is None:
+        return DEFAULT_STEPS
+    steps = tuple(step.strip() for step in value.split(',') if step.strip() and step.strip() != 'none')
+    unknown = [step for step in steps if step not in ALL_STEPS]
+    if unknown:
+        raise ValueError(f"Unknown prompt compaction steps: {', '.join(unknown)}")
+    return steps
+
+
+def parse_turns(text):
+    """
+    Split a speaker-identification transcript into turns.
+
+    Lines without the "[H:MM:SS] speaker:" prefix are appended to the
+    previous turn, so unexpected input is passed through rather than lost.
+    """
+    turns = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        match = _TURN.match(line.strip())
+        if match:
+            hours, minutes, seconds, speaker, words = match.groups()
+            turns.append(Turn(int(hours) * 3600 + int(minutes) * 60 + int(seconds), speaker, words))
+        elif turns:
+            turns[-1].text = f"{turns[-1].text} {line.strip()}"
+        else:
+            turns.append(Turn(None, None, line.strip()))
+    return turns
+
+
+def merge_turns(turns):
+    """Join consecutive turns of the same speaker, keeping the first timestamp."""
+    merged = []
+    for turn in turns:
+        if merged and turn.speaker is not None and merged[-1].speaker == turn.speaker:
+            merged[-1].text = f"{merged[-1].text} {turn.text}"
+        else:
+            merged.append(Turn(turn.seconds, turn.speaker, turn.text))
+    return merged
+
+
+def collapse_disfluencies(text):
+    """Drop filler words and collapse immediately repeated words and short phrases."""
+    text = _FILLERS.sub(' ', text)
+    text = _REPEATS.sub(r'\1', text)
+    text = _SPACE_BEFORE_PUNCTUATION.sub(r'\1', _SPACES.sub(' ', text))
+    return text.strip(' ,')
+
+
+def speaker_aliases(turns):
+    """
+    Short aliases (S0, S1, ...) for speakers in order of appearance.
+
+    Aliases that already occur in the transcript (e.g. "Amazon S3") are
+    skipped, so expand_aliases() never rewrites real content. No aliases
+    are used when the legend would cost more characters than the aliases
+    save, e.g. for a short voicemail.
+    """
+    taken = set(_ALIAS.findall(' '.join(turn.text for turn in turns)))
+    candidates = (f"S{index}" for index in itertools.count())
+    aliases = {}
+    for turn in turns:
+        if turn.speaker is not None and turn.speaker not in aliases:
+            aliases[turn.speaker] = next(alias for alias in candidates if alias not in taken)
+    saved = sum(len(turn.speaker) - len(aliases[turn.speaker]) for turn in turns if turn.speaker is not None)
+    if saved <= len(_legend(aliases)):
+        return {}
+    return aliases
+
+
+def _legend(aliases):
+    return 'Speakers: ' + ', '.join(f"{alias}={speaker}" for speaker, alias in aliases.items())
+
+
+def expand_aliases(text, aliases):
+    """Replace speaker aliases in model output with the original labels."""
+    if not aliases:
+        return text
+    labels = {alias: speaker for speaker, alias in aliases.items()}
+    return _ALIAS.sub(lambda match: labels.get(match.group(0), match.group(0)), text)
+
+
+def compact_transcript(text, steps=None):
+    """
+    Shrink a speaker-identification transcript before it goes into the prompt.
+
+    Steps (see DEFAULT_STEPS):
+      merge_turns: one line per run of the same speaker
+      coarsen_timestamps: [H:MM] instead of [H:MM:SS], only when the minute changes
+      drop_timestamps: no timestamps at all
+      collapse_disfluencies: drop "um"/"uh" and repeated words or phrases
+      alias_speakers: S0, S1, ... instead of the speaker labels, with a legend
+
+    Args:
+        text: Speaker-identification transcript
+        steps: Steps to apply (default: steps_from_environment())
+
+    Returns:
+        (compacted text, aliases used as {speaker label: alias}, report) where
+        the report has the estimated tokens and turns before and after
+    """
+    steps = steps_from_environment() if steps is None else tuple(steps)
+    report = {'tokens_before': estimate_tokens(text), 'steps': list(steps)}
+    if not steps:
+        report['tokens_after'] = report['tokens_before']
+        return text, {}, report
+
+    turns = parse_turns(text)
+    report['turns_before'] = len(turns)
+    if 'merge_turns' in steps:
+        turns = merge_turns(turns)
+    if 'collapse_disfluencies' in steps:
+        for turn in turns:
+            turn.text = collapse_disfluencies(turn.text)
+        turns = [turn for turn in turns if turn.text]
+    aliases = speaker_aliases(turns) if 'alias_speakers' in steps else {}
+
+    lines = []
+    if aliases:
+        lines.append(_legend(aliases))
+    last_minute = None
+    for turn in turns:
+        prefix = ''
+        if turn.seconds is not None and 'drop_timestamps' not in steps:
+            if 'coarsen_timestamps' in steps:
+                minute = turn.seconds // 60
+                if minute != last_minute:
+                    prefix = f"[{minute // 60}:{minute % 60:02d}] "
+                    last_minute = minute
+            else:
+                hours, rest = divmod(turn.seconds, 3600)
+                prefix = f"[{hours}:{rest // 60:02d}:{rest % 60:02d}] "
+        speaker = aliases.get(turn.speaker, turn.speaker)
+        lines.append(f"{prefix}{speaker}: {turn.text}" if speaker else f"{prefix}{turn.text}")
+
+    compacted = '\n'.join(lines)
+    report['turns_after'] = len(turns)
+    report['tokens_after'] = estimate_tokens(compacted)
+    return compacted, aliases, report
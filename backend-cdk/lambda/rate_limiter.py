@@ -0,0 +1,201 @@
+import os
+import time
+import random
+import threading
+
+from botocore.exceptions import ClientError, BotoCoreError
+
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'Throttling',
+    'TooManyRequestsException',
+    'ServiceQuotaExceededException',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded'
+}
+
+# Errors worth retrying that are not throttles
+TRANSIENT_ERROR_CODES = {
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'InternalFailure',
+    'InternalServerError',
+    'InternalServerException',
+    'ModelNotReadyException'
+}
+
+# Limiters live for the lifetime of the execution environment, so a warm
+# container keeps the rate it has learned
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _error_details(error):
+    return (error.response.get('Error', {}).get('Code', ''),
+            error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0))
+
+
+def is_throttling_error(error):
+    """True if the service rejected the request because of its rate limit."""
+    if not isinstance(error, ClientError):
+        return False
+    code, status = _error_details(error)
+    return code in THROTTLING_ERROR_CODES or status == 429
+
+
+def is_transient_error(error):
+    """True for throttles, 5xx responses and connection errors."""
+    if isinstance(error, ClientError):
+        code, status = _error_details(error)
+        return is_throttling_error(error) or code in TRANSIENT_ERROR_CODES or status >= 500
+    return isinstance(error, BotoCoreError)
+
+
+class AIMDRateLimiter:
+    """
+    Token bucket whose rate adapts with additive increase, multiplicative decrease.
+
+    Every successful call raises the rate by `additive_increase` requests per
+    second, up to `max_rate`. A throttle multiplies it by `decrease_factor`,
+    down to `min_rate`. Throttles that arrive within `decrease_cooldown`
+    seconds of the last decrease are counted once, so a burst of concurrent
+    rejections does not collapse the rate. The limit is per container; all
+    containers converge on their share of the service limit independently.
+
+    Args:
+        initial_rate: Starting requests per second
+        min_rate: Lowest rate after repeated throttles
+        max_rate: Highest rate reached by additive increase
+        additive_increase: Requests per second added per success
+        decrease_factor: Multiplier applied to the rate on a throttle
+        burst: Bucket capacity in requests
+        decrease_cooldown: Seconds during which further throttles are ignored
+        clock / sleep: Time source and sleep function (replaceable in tests)
+    """
+
+    def __init__(self, initial_rate=10.0, min_rate=0.2, max_rate=100.0, additive_increase=0.5,
+                 decrease_factor=0.5, burst=None, decrease_cooldown=1.0, clock=time.monotonic, sleep=None):
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.additive_increase = additive_increase
+        self.decrease_factor = decrease_factor
+        self.burst = burst if burst is not None else max(initial_rate, 1.0)
+        self.decrease_cooldown = decrease_cooldown
+        self.clock = clock
+        self.sleep = sleep or time.sleep
+        self.tokens = self.burst
+        self.throttles = 0
+        self.decreases = 0
+        self._updated = clock()
+        self._last_decrease = None
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            self.sleep(wait_seconds)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.additive_increase)
+            self.burst = max(self.burst, min(self.rate, self.max_rate))
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttles += 1
+            now = self.clock()
+            if self._last_decrease is not None and now - self._last_decrease < self.decrease_cooldown:
+                return
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self.burst = max(1.0, min(self.burst, self.rate))
+            self.tokens = min(self.tokens, self.burst)
+            self._last_decrease = now
+            self.decreases += 1
+
+    def stats(self):
+        with self._lock:
+            return {'rate': round(self.rate, 3), 'throttles': self.throttles, 'decreases': self.decreases}
+
+
+def call_with_retries(limiter, call, max_attempts=None, base_delay=0.2, max_delay=10.0,
+                      sleep=None, jitter=random.uniform):
+    """
+    Run call() through the limiter, retrying transient errors.
+
+    Retries wait a random time between 0 and base_delay * 2**attempt seconds
+    (full jitter, capped at max_delay), so clients that were throttled
+    together do not retry together. Throttles also lower the limiter's rate.
+
+    Args:
+        limiter: AIMDRateLimiter for the API being called
+        call: Callable without arguments making one request
+        max_attempts: Attempts before the last error is raised (default RATE_LIMITER_MAX_ATTEMPTS or 6)
+    """
+    if max_attempts is None:
+        max_attempts = int(os.environ.get('RATE_LIMITER_MAX_ATTEMPTS', '6'))
+    sleep = sleep or time.sleep
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            result = call()
+        except Exception as e:
+            if is_throttling_error(e):
+                limiter.on_throttle()
+            attempt += 1
+            if not is_transient_error(e) or attempt >= max_attempts:
+                raise
+            sleep(jitter(0, min(max_delay, base_delay * 2 ** attempt)))
+            continue
+        limiter.on_success()
+        return result
+
+
+def get_limiter(api_name):
+    """
+    AIMD limiter for one downstream API (e.g. 'sagemaker:InvokeEndpoint'), cached per container.
+
+    RATE_LIMITER_INITIAL_RPS, RATE_LIMITER_MIN_RPS and RATE_LIMITER_MAX_RPS
+    set the starting rate and its bounds.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(api_name)
+        if limiter is None:
+            limiter = AIMDRateLimiter(
+                initial_rate=float(os.environ.get('RATE_LIMITER_INITIAL_RPS', '10')),
+                min_rate=float(os.environ.get('RATE_LIMITER_MIN_RPS', '0.2')),
+                max_rate=float(os.environ.get('RATE_LIMITER_MAX_RPS', '100'))
+            )
+            _limiters[api_name] = limiter
+        return limiter
+
+
+def limited_call(api_name, call):
+    """call_with_retries() with the container's limiter for api_name."""
+    return call_with_retries(get_limiter(api_name), call)
+
+
+def limiter_stats():
+    """Rate and throttle counts of every limiter in this container."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+def reset_limiters():
+    """Forget learned rates (used by tests)."""
+    with _limiters_lock:
+        _limiters.clear()
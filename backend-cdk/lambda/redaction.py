@@ -0,0 +1,200 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from summarization import guardrail_result
+
+# Formatted identifiers the regex pass replaces, with the placeholders the
+# Bedrock guardrail uses when it anonymizes the same entity types. Card
+# numbers go first so their digit groups are not taken for phone numbers.
+PATTERNS = (
+    ('{CREDIT_DEBIT_CARD_NUMBER}', re.compile(r'\b(?:\d{4}[-\s]?){3}\d{4}\b')),
+    ('{EMAIL}', re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')),
+    ('{US_SOCIAL_SECURITY_NUMBER}', re.compile(r'\b\d{3}-\d{2}-\d{4}\b')),
+    ('{PHONE}', re.compile(r'(?:\+?1[-.\s]?)?\(?\b\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b')),
+)
+
+# Characters on each side of a chunk boundary checked for identifiers that
+# were split between two chunks
+SEAM_WINDOW = 48
+
+# S3 object metadata recording how a transcript was redacted
+METADATA_KEY = 'pii-redaction'
+
+
+def steps_from_environment():
+    """
+    Redaction steps from CHUNK_REDACTION: "regex" (default), "regex,guardrail",
+    "guardrail" or "none".
+    """
+    value = os.environ.get('CHUNK_REDACTION', 'regex')
+    steps = tuple(step.strip() for step in value.split(',') if step.strip() and step.strip() != 'none')
+    unknown = [step for step in steps if step not in ('regex', 'guardrail')]
+    if unknown:
+        raise ValueError(f"Unknown chunk redaction steps: {', '.join(unknown)}")
+    return steps
+
+
+def regex_redact(text):
+    """Replace phone numbers, e-mail addresses, SSNs and card numbers."""
+    for placeholder, pattern in PATTERNS:
+        text = pattern.sub(placeholder, text)
+    return text
+
+
+def redact_seams(texts):
+    """
+    Redact identifiers split across the boundary of two consecutive chunks.
+
+    Each chunk was redacted on its own, so a phone number whose first digits
+    end one chunk and whose last digits start the next is still in the
+    text. The end of one chunk and the start of the next are joined with the
+    same space the transcript uses; a match crossing the join is replaced by
+    the placeholder in the earlier chunk and removed from the later one.
+    """
+    texts = list(texts)
+    for i in range(1, len(texts)):
+        left, right = texts[i - 1], texts[i]
+        tail, head = left[-SEAM_WINDOW:], right[:SEAM_WINDOW]
+        seam = len(tail)
+        window = f"{tail} {head}"
+        for placeholder, pattern in PATTERNS:
+            match = next((m for m in pattern.finditer(window) if m.start() < seam < m.end()), None)
+            if match:
+                texts[i - 1] = left[:len(left) - seam + match.start()] + placeholder
+                texts[i] = right[match.end() - seam - 1:].lstrip()
+                break
+    return texts
+
+
+def seam_window(left, right):
+    """
+    Whole words on each side of the boundary between two chunks.
+
+    Returns (tail, head): the end of `left` and the start of `right`, at
+    most SEAM_WINDOW characters each, without a word cut off at the edge.
+    """
+    tail, head = left[-SEAM_WINDOW:], right[:SEAM_WINDOW]
+    if len(tail) < len(left) and ' ' in tail:
+        tail = tail[tail.index(' ') + 1:]
+    if len(head) < len(right) and ' ' in head:
+        head = head[:head.rindex(' ')]
+    return tail, head
+
+
+class ChunkRedactor:
+    """
+    Redacts chunk transcripts on a small thread pool while the remaining
+    chunks are still being transcribed.
+
+    submit() returns a future for each chunk; results() waits for all of
+    them and then redacts identifiers split across chunk boundaries. The
+    guardrail is only reported in describe() when it processed every chunk
+    and every seam; otherwise the summary function runs its own pass.
+    """
+
+    def __init__(self, steps, bedrock_runtime=None, guardrail_id=None, max_workers=2):
+        if 'guardrail' in steps and not (bedrock_runtime and guardrail_id):
+            raise ValueError("Guardrail chunk redaction needs a Bedrock runtime client and GUARDRAIL_ID")
+        self.steps = tuple(steps)
+        self.bedrock_runtime = bedrock_runtime
+        self.guardrail_id = guardrail_id
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._guardrail_calls = 0
+        self._guardrail_failures = 0
+
+    def guardrail(self, text):
+        """Guardrail pass over text, counting calls whose text it did not process."""
+        text, processed = guardrail_result(self.bedrock_runtime, text, self.guardrail_id)
+        with self._lock:
+            self._guardrail_calls += 1
+            if not processed:
+                self._guardrail_failures += 1
+        return text
+
+    def redact(self, text):
+        if 'regex' in self.steps:
+            text = regex_redact(text)
+        if 'guardrail' in self.steps and text.strip():
+            text = self.guardrail(text)
+        return text
+
+    def submit(self, text):
+        return self._executor.submit(self.redact, text)
+
+    def results(self, futures):
+        """Redacted texts in order, with chunk boundaries checked as well."""
+        texts = [future.result() for future in futures]
+        if 'regex' in self.steps:
+            texts = redact_seams(texts)
+        if 'guardrail' in self.steps:
+            texts = self.redact_guardrail_seams(texts)
+        return texts
+
+    def redact_guardrail_seams(self, texts):
+        """
+        Guardrail pass over each chunk boundary, for names and other entities
+        the regex pass cannot see that were split between two chunks.
+
+        When the guardrail changes the joined window, the redacted window
+        replaces the end of the earlier chunk and the start of the later one
+        is removed, as redact_seams() does.
+        """
+        texts = list(texts)
+        for i in range(1, len(texts)):
+            left, right = texts[i - 1], texts[i]
+            tail, head = seam_window(left, right)
+            if not (tail.strip() and head.strip()):
+                continue
+            window = f"{tail} {head}"
+            redacted = self.guardrail(window)
+            if redacted != window:
+                texts[i - 1] = left[:len(left) - len(tail)] + redacted
+                texts[i] = right[len(head):].lstrip()
+        return texts
+
+    def describe(self):
+        """
+        Value of the pii-redaction metadata, e.g. "regex+guardrail".
+
+        The guardrail step is left out when any guardrail call returned its
+        text unprocessed.
+        """
+        with self._lock:
+            failed = self._guardrail_failures > 0
+        return '+'.join(step for step in self.steps if not (step == 'guardrail' and failed))
+
+    def stats(self):
+        with self._lock:
+            calls, failures = self._guardrail_calls, self._guardrail_failures
+        return {'steps': self.describe(), 'guardrail_calls': calls, 'guardrail_failures': failures}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def redactor_from_environment(bedrock_runtime_factory):
+    """
+    ChunkRedactor for CHUNK_REDACTION, or None when redaction is off.
+
+    Args:
+        bedrock_runtime_factory: Called for the Bedrock runtime client only
+            when the guardrail step is enabled
+    """
+    steps = steps_from_environment()
+    if not steps:
+        return None
+    guardrail = 'guardrail' in steps
+    return ChunkRedactor(
+        steps,
+        bedrock_runtime=bedrock_runtime_factory() if guardrail else None,
+        guardrail_id=os.environ.get('GUARDRAIL_ID') if guardrail else None,
+        max_workers=int(os.environ.get('CHUNK_REDACTION_CONCURRENCY', '2'))
+    )
+
+
+def guardrail_applied(metadata):
+    """True if S3 object metadata says the guardrail already redacted the text."""
+    return 'guardrail' in (metadata or {}).get(METADATA_KEY, '').split('+')
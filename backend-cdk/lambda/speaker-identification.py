@@ -1,16 +1,35 @@
 import json
-import boto3
 import datetime
+from time import perf_counter
 import codecs
 import logging
 from botocore.exceptions import ClientError
 
+import lambda_runtime
+import profiling
+import redaction
+import job_status
+from metrics import StageMetrics, debug
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+@profiling.profile_invocation('speaker-identification')
 def lambda_handler(event, context):
+    metrics = StageMetrics('speaker-identification')
+    try:
+        return identify_speakers(event, metrics)
+    except Exception as e:
+        # Failed invocations still report the stages they got through
+        metrics.set_property('FailureReason', str(e))
+        raise
+    finally:
+        metrics.flush()
+
+
+def identify_speakers(event, metrics):
         # Log the incoming event structure for debugging
-        logger.info(f"Event received: {json.dumps(event)}")
+        debug(f"Event received: {json.dumps(event)}")
         
         # Lambda Invoke tasks in Step Functions wrap outputs in a 'Payload' field
         # Access TranscriptFileUri from the correct path in the event structure
@@ -18,6 +37,7 @@ def lambda_handler(event, context):
         transcription_job_details = transcription_job.get('TranscriptionJob', {})
         transcript = transcription_job_details.get('Transcript', {})
         transcript_file_uri = transcript.get('TranscriptFileUri', None)
+        content_fingerprint = transcription_job_details.get('ContentFingerprint')
         
         # If TranscriptFileUri is still not found, try direct path as fallback
         if not transcript_file_uri and 'TranscriptionJob' in event:
@@ -25,10 +45,8 @@ def lambda_handler(event, context):
             if 'TranscriptionJob' in direct_job:
                 direct_transcript = direct_job['TranscriptionJob'].get('Transcript', {})
                 transcript_file_uri = direct_transcript.get('TranscriptFileUri', None)
+                content_fingerprint = direct_job['TranscriptionJob'].get('ContentFingerprint')
         
-        session = boto3.Session()
-        region = session.region_name
-         
         if not transcript_file_uri:
             logger.error(f"TranscriptFileUri not found in event structure: {json.dumps(event)}")
             raise ValueError("TranscriptFileUri is missing from the event")
@@ -39,18 +57,30 @@ def lambda_handler(event, context):
         bucket_name = parts[3]
         object_key = '/'.join(parts[4:])
         
-        # Set up S3 client
-        s3_client = boto3.client('s3')
+        # S3 client is created once per container and reused by warm invocations
+        s3_client = lambda_runtime.get_client('s3')
 
-        # Retrieve the object
-        response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
+        metrics.set_property('InputKey', object_key)
+        job_status.notify(job_status.job_id_for_key(object_key), 'speaker_identification',
+                          artifacts={'transcription_key': object_key})
         
-        # Get the object content
-        object_content = response['Body'].read().decode('utf-8')
+        # Retrieve the object
+        with metrics.stage('download') as stage:
+            response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
+            
+            # Get the object content
+            raw_content = response['Body'].read()
+            stage['bytes'] = len(raw_content)
+        # Redaction done during transcription carries over to the speaker transcript
+        redaction_metadata = {key: value for key, value in response.get('Metadata', {}).items()
+                              if key == redaction.METADATA_KEY}
+        object_content = raw_content.decode('utf-8')
         
-        logger.info(f'Object content: {object_content}')
+        debug(f'Object content: {object_content}')
 
-        data =  json.loads(object_content)  
+        with metrics.stage('parse'):
+            data =  json.loads(object_content)  
+        merge_start = perf_counter()
         
         # Extract the necessary data
         labels = data['results']['speaker_labels']['segments']
@@ -88,16 +118,22 @@ def lambda_handler(event, context):
             line = '[' + str(datetime.timedelta(seconds=int(round(float(line_data['time']))))) + '] ' + line_data.get('speaker') + ': ' + line_data.get('line')
             output.append(line)
     
+        metrics.record('merge', (perf_counter() - merge_start) * 1000)
+    
         # Save the output to S3
-        s3 = boto3.client('s3')
+        s3 = s3_client
         output_key = object_key.rsplit('.', 1)[0]
         
         object_key = output_key +'-speaker-identification.txt'
         output_text = '\n\n'.join(output)
-        s3.put_object(Bucket=bucket_name, Key=object_key, Body=output_text.encode('utf-8'))
+        with metrics.stage('upload') as stage:
+            output_bytes = output_text.encode('utf-8')
+            s3.put_object(Bucket=bucket_name, Key=object_key, Body=output_bytes, Metadata=redaction_metadata)
+            stage['bytes'] = len(output_bytes)
     
         return {
             'bucket_name': bucket_name,
             'object_key': object_key,
+            'content_fingerprint': content_fingerprint,
             'message': 'Speaker identification completed successfully'
         }
@@ -0,0 +1,128 @@
+import json
+import logging
+
+import rate_limiter
+
+logger = logging.getLogger()
+
+# Large summary model; batch jobs use it, on-demand calls pick a model with summary_routing
+SUMMARY_MODEL_ID = "anthropic.claude-3-5-sonnet-20240620-v1:0"
+
+SUMMARY_INSTRUCTION = "Give me the summary, speakers, key discussions, and action items with owners"
+
+SPEAKER_TRANSCRIPT_SUFFIX = '-speaker-identification.txt'
+
+
+def build_request(redacted_content, max_tokens=4096):
+    """Anthropic messages request body asking for the meeting summary."""
+    prompt = f"{redacted_content}\n\n{SUMMARY_INSTRUCTION}"
+    return {
+        "max_tokens": max_tokens,
+        "temperature": 0.5,
+        "messages": [{"role": "user", "content": prompt}],
+        "anthropic_version": "bedrock-2023-05-31"
+    }
+
+
+def summary_text(response_body):
+    """Summary text from a parsed Anthropic messages response."""
+    return response_body.get("content")[0]['text']
+
+
+def summary_key_for(object_key):
+    """
+    Summary key for a speaker-identification transcript key.
+
+    Input: Transcription-Output-for-uploads/sample-team-meeting-recording-XXXX-XXXX-XXXX-XXXX.mp4-speaker-identification.txt
+    Output: Bedrock-Sonnet-GenAI-summary-sample-team-meeting-recording-XXXX-XXXX-XXXX-XXXX.txt
+    """
+    base_name = object_key.split('/')[-1]
+    file_id = base_name.replace('Transcription-Output-for-uploads/', '').replace(SPEAKER_TRANSCRIPT_SUFFIX, '')
+    return f"Bedrock-Sonnet-GenAI-summary-{file_id}.txt"
+
+
+def apply_guardrail(bedrock_runtime, content, guardrail_id, guardrail_version="DRAFT"):
+    """
+    Apply Bedrock Guardrail to content for redaction
+
+    Args:
+        bedrock_runtime: Boto3 client for Bedrock Runtime
+        content: The text content to apply guardrails to
+        guardrail_id: The ID of the guardrail to apply
+        guardrail_version: Version of the guardrail to use
+
+    Returns:
+        The redacted/filtered content
+
+    Throttles and other transient errors are retried through the shared
+    rate limiter and raised if they persist, so unredacted text is never
+    passed on just because the guardrail was busy.
+    """
+    return guardrail_result(bedrock_runtime, content, guardrail_id, guardrail_version)[0]
+
+
+def guardrail_result(bedrock_runtime, content, guardrail_id, guardrail_version="DRAFT"):
+    """
+    Like apply_guardrail, but also reports whether the guardrail processed the text.
+
+    Returns:
+        (text, processed): processed is False when the original content is
+        returned because the call failed with a non-transient error or the
+        guardrail intervened but no output text could be read
+    """
+    try:
+        # Format content according to the API requirements
+        formatted_content = [
+            {
+                "text": {
+                    "text": content
+                }
+            }
+        ]
+
+        # Call the guardrail API
+        response = rate_limiter.limited_call('bedrock:ApplyGuardrail', lambda: bedrock_runtime.apply_guardrail(
+            guardrailIdentifier=guardrail_id,
+            guardrailVersion=guardrail_version,
+            source="OUTPUT",  # Using OUTPUT as the source based on testing
+            content=formatted_content
+        ))
+
+        # Check if guardrail intervened and we got outputs
+        if 'action' in response and response['action'] == 'GUARDRAIL_INTERVENED' and 'outputs' in response and response['outputs']:
+            logger.info(f"Guardrail successfully intervened. Analyzing outputs...")
+
+            # Try different response formats
+            if len(response['outputs']) > 0:
+                output = response['outputs'][0]
+
+                # Try standard format
+                if 'text' in output and isinstance(output['text'], dict) and 'text' in output['text']:
+                    return output['text']['text'], True
+
+                # Try alternative format where text might be directly in output
+                elif 'text' in output and isinstance(output['text'], str):
+                    return output['text'], True
+
+                # Try another alternative where content might be at a different path
+                elif 'content' in output:
+                    if isinstance(output['content'], str):
+                        return output['content'], True
+                    elif isinstance(output['content'], dict) and 'text' in output['content']:
+                        return output['content']['text'], True
+
+                # Log the output structure for debugging
+                logger.warning(f"Could not extract text from response output: {json.dumps(output)}")
+
+        # If no redacted output, log details and return original content
+        logger.warning(f"No redacted output from guardrail. Action: {response.get('action')}")
+        if 'usage' in response:
+            logger.info(f"Guardrail usage stats: {json.dumps(response['usage'])}")
+        # Nothing to redact unless the guardrail intervened
+        return content, response.get('action') != 'GUARDRAIL_INTERVENED'
+    except Exception as e:
+        logger.error(f"Error applying guardrail: {str(e)}")
+        if rate_limiter.is_transient_error(e):
+            raise
+        # Return original content if guardrail application fails
+        return content, False
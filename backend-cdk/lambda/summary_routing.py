@@ -0,0 +1,107 @@
+import os
+import json
+import math
+
+# Policy shipped with the function; SUMMARY_ROUTING_POLICY replaces it
+DEFAULT_POLICY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'summary_routing.json')
+
+# Parsed policies by source, so warm invocations do not re-read the file
+_policies = {}
+
+
+def validate_policy(policy):
+    """
+    Check a routing policy and return its tiers ordered by size.
+
+    Every tier needs a name, model_id and max_tokens. Exactly one tier has
+    "max_input_tokens": null; it takes every transcript longer than the
+    other tiers' limits.
+
+    Raises:
+        ValueError: if the policy is malformed
+    """
+    tiers = policy.get('tiers') or []
+    if not tiers:
+        raise ValueError("Summary routing policy has no tiers")
+    for tier in tiers:
+        missing = [field for field in ('name', 'model_id', 'max_tokens') if not tier.get(field)]
+        if missing:
+            raise ValueError(f"Summary routing tier {tier.get('name', '?')} is missing {', '.join(missing)}")
+    unbounded = [tier for tier in tiers if tier.get('max_input_tokens') is None]
+    if len(unbounded) != 1:
+        raise ValueError("Exactly one summary routing tier must have max_input_tokens null")
+    return sorted(tiers, key=lambda tier: (tier.get('max_input_tokens') is None, tier.get('max_input_tokens') or 0))
+
+
+def load_policy():
+    """
+    Routing policy from SUMMARY_ROUTING_POLICY (a JSON document or a file
+    path), falling back to summary_routing.json; cached per container.
+    """
+    source = os.environ.get('SUMMARY_ROUTING_POLICY') or DEFAULT_POLICY_PATH
+    policy = _policies.get(source)
+    if policy is None:
+        if source.lstrip().startswith('{'):
+            policy = json.loads(source)
+        else:
+            with open(source) as f:
+                policy = json.load(f)
+        policy = dict(policy, tiers=validate_policy(policy))
+        _policies[source] = policy
+    return policy
+
+
+def reset_policies():
+    """Forget cached policies (used by tests)."""
+    _policies.clear()
+
+
+def estimate_tokens(text, chars_per_token=4):
+    """
+    Rough input token count of a transcript.
+
+    Claude models average about four characters of English per token; the
+    estimate only has to place a transcript in the right tier.
+    """
+    return int(math.ceil(len(text) / float(chars_per_token)))
+
+
+def choose_model(text, override=None, policy=None):
+    """
+    Pick the summary model for a transcript.
+
+    Args:
+        text: Redacted transcript that goes into the prompt
+        override: Optional per-request choice, either {"tier": name} or
+            {"model_id": ..., "max_tokens": ...}
+        policy: Routing policy (default: load_policy())
+
+    Returns:
+        Dict with tier, model_id, max_tokens and estimated_input_tokens
+    """
+    policy = policy or load_policy()
+    estimated = estimate_tokens(text, policy.get('chars_per_token', 4))
+    tiers = policy['tiers']
+    override = override or {}
+
+    if override.get('tier'):
+        matches = [tier for tier in tiers if tier['name'] == override['tier']]
+        if not matches:
+            raise ValueError(f"Unknown summary routing tier: {override['tier']}")
+        tier = matches[0]
+    else:
+        tier = next(tier for tier in tiers
+                    if tier.get('max_input_tokens') is None or estimated <= tier['max_input_tokens'])
+
+    route = {
+        'tier': tier['name'],
+        'model_id': tier['model_id'],
+        'max_tokens': int(tier['max_tokens']),
+        'estimated_input_tokens': estimated
+    }
+    if override.get('model_id'):
+        route.update(tier='override', model_id=override['model_id'],
+                     max_tokens=int(override.get('max_tokens', tiers[-1]['max_tokens'])))
+    elif override.get('max_tokens'):
+        route['max_tokens'] = int(override['max_tokens'])
+    return route
@@ -0,0 +1,109 @@
+import json
+import os
+import logging
+
+from botocore.exceptions import ClientError
+
+import lambda_runtime
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Task tokens are parked in the summaries bucket until the job finishes
+CALLBACK_PREFIX = 'transcribe-callbacks/'
+
+
+def callback_key(job_name):
+    """S3 key holding the Step Functions task token for a transcription job."""
+    return f"{CALLBACK_PREFIX}{job_name}.json"
+
+
+def start_handler(event, context):
+    """
+    Register the task token and start the Amazon Transcribe job.
+
+    Invoked by the state machine with `.waitForTaskToken`. The token is stored
+    before the job is started so a fast job can never finish before its
+    completion event has a token to resume.
+
+    Args:
+        event: {"TaskToken": ..., "TranscriptionJob": <StartTranscriptionJob parameters>}
+        context: Lambda context
+
+    Returns:
+        The transcription job name
+    """
+    s3 = lambda_runtime.get_client('s3')
+    transcribe = lambda_runtime.get_client('transcribe')
+    bucket = os.environ['SUMMARIES_BUCKET']
+
+    job_parameters = event['TranscriptionJob']
+    job_name = job_parameters['TranscriptionJobName']
+
+    s3.put_object(
+        Bucket=bucket,
+        Key=callback_key(job_name),
+        Body=json.dumps({'TaskToken': event['TaskToken']}).encode('utf-8'),
+        ContentType='application/json'
+    )
+    logger.info(f"Registered callback for {job_name}")
+
+    try:
+        transcribe.start_transcription_job(**job_parameters)
+    except Exception:
+        # No completion event will ever use the token
+        s3.delete_object(Bucket=bucket, Key=callback_key(job_name))
+        raise
+    logger.info(f"Started transcription job {job_name}")
+    return {'TranscriptionJobName': job_name}
+
+
+def lambda_handler(event, context):
+    """
+    Resume the waiting execution when Transcribe reports a job state change.
+
+    Triggered by the EventBridge "Transcribe Job State Change" rule. The task
+    output has the same shape as GetTranscriptionJob so the existing
+    TranscriptionJobStatus choice and speaker identification work unchanged.
+    If no token is registered (e.g. the execution already fell back to polling)
+    the event is ignored.
+    """
+    s3 = lambda_runtime.get_client('s3')
+    transcribe = lambda_runtime.get_client('transcribe')
+    sfn = lambda_runtime.get_client('stepfunctions')
+    bucket = os.environ['SUMMARIES_BUCKET']
+
+    detail = event.get('detail', {})
+    job_name = detail.get('TranscriptionJobName')
+    status = detail.get('TranscriptionJobStatus')
+    if not job_name or status not in ('COMPLETED', 'FAILED'):
+        logger.info(f"Ignoring event for job {job_name} with status {status}")
+        return {'resumed': False}
+
+    key = callback_key(job_name)
+    try:
+        token_obj = s3.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            logger.info(f"No callback registered for {job_name}; polling fallback will pick it up")
+            return {'resumed': False}
+        raise
+    task_token = json.loads(token_obj['Body'].read().decode('utf-8'))['TaskToken']
+
+    job = transcribe.get_transcription_job(TranscriptionJobName=job_name)
+    job.pop('ResponseMetadata', None)
+
+    try:
+        sfn.send_task_success(taskToken=task_token, output=json.dumps(job, default=str))
+    except ClientError as e:
+        # The execution timed out into the polling fallback or was stopped
+        if e.response.get('Error', {}).get('Code') not in ('TaskTimedOut', 'TaskDoesNotExist', 'InvalidToken'):
+            raise
+        logger.warning(f"Task token for {job_name} is no longer valid: {e}")
+
+    # Only drop the token once it has been used, so an async retry of this
+    # event can still resume the execution after a transient failure
+    s3.delete_object(Bucket=bucket, Key=key)
+
+    logger.info(f"Resumed execution for {job_name} with status {status}")
+    return {'resumed': True, 'TranscriptionJobName': job_name, 'TranscriptionJobStatus': status}
@@ -0,0 +1,98 @@
+import re
+import json
+import hashlib
+
+# A recorder writes each segment as a standalone WAV under sessions/<id>/,
+# then sessions/<id>/complete.json once the recording has ended
+SEGMENT_KEY = re.compile(r'^sessions/([A-Za-z0-9_.-]+)/segment-(\d+)\.wav$')
+COMPLETE_KEY = re.compile(r'^sessions/([A-Za-z0-9_.-]+)/complete\.json$')
+
+# Transcribed segments are stored under this prefix in the summaries bucket
+STATE_PREFIX = 'session-state/'
+
+
+def parse_session_key(key):
+    """
+    Classify an uploads-bucket key.
+
+    Returns:
+        ('segment', session id, sequence number), ('complete', session id,
+        None), or None for keys outside sessions/
+    """
+    match = SEGMENT_KEY.match(key)
+    if match:
+        return 'segment', match.group(1), int(match.group(2))
+    match = COMPLETE_KEY.match(key)
+    if match:
+        return 'complete', match.group(1), None
+    return None
+
+
+def segment_key(session_id, sequence):
+    return f"sessions/{session_id}/segment-{sequence:06d}.wav"
+
+
+def state_key(session_id, sequence):
+    return f"{STATE_PREFIX}{session_id}/segment-{sequence:06d}.json"
+
+
+def save_segment(s3, bucket, session_id, sequence, texts, durations, redaction=''):
+    """
+    Store the transcript of one segment.
+
+    Each segment has its own object, so duplicate or concurrent deliveries of
+    segment events only ever rewrite the same state.
+
+    Args:
+        texts: Chunk transcripts in order
+        durations: Chunk lengths in seconds, relative to the segment
+        redaction: How the texts were redacted (redaction.ChunkRedactor.describe())
+    """
+    state = {'sequence': sequence, 'texts': texts, 'durations': durations, 'redaction': redaction}
+    s3.put_object(Bucket=bucket, Key=state_key(session_id, sequence),
+                  Body=json.dumps(state).encode('utf-8'), ContentType='application/json')
+    return state
+
+
+def load_segments(s3, bucket, session_id):
+    """Stored segment transcripts of a session as {sequence: state}."""
+    prefix = f"{STATE_PREFIX}{session_id}/"
+    segments = {}
+    params = {'Bucket': bucket, 'Prefix': prefix}
+    while True:
+        response = s3.list_objects_v2(**params)
+        for entry in response.get('Contents', []):
+            body = s3.get_object(Bucket=bucket, Key=entry['Key'])['Body'].read()
+            state = json.loads(body)
+            segments[state['sequence']] = state
+        if not response.get('IsTruncated'):
+            return segments
+        params['ContinuationToken'] = response['NextContinuationToken']
+
+
+def merge_segments(segments, segment_count):
+    """
+    Chunk texts and absolute (start, end) timings of a whole session.
+
+    Segments are laid end to end in sequence order, so each one starts where
+    the previous one's audio ended.
+
+    Raises:
+        ValueError: if any of segments 1..segment_count is missing
+    """
+    missing = [sequence for sequence in range(1, segment_count + 1) if sequence not in segments]
+    if missing:
+        raise ValueError(f"Session is missing segments {missing}")
+    texts, durations = [], []
+    for sequence in range(1, segment_count + 1):
+        texts.extend(segments[sequence]['texts'])
+        durations.extend(segments[sequence]['durations'])
+    # Summed like the whole-recording path, so both give the same timestamps
+    starts = [sum(durations[:i]) for i in range(len(durations))]
+    return texts, [(start, start + duration) for start, duration in zip(starts, durations)]
+
+
+def execution_name(session_id):
+    """Deterministic execution name, so a repeated completion event starts nothing new."""
+    digest = hashlib.sha256(session_id.encode('utf-8')).hexdigest()[:16]
+    return f"session-{re.sub(r'[^A-Za-z0-9_-]', '_', session_id)[:40]}-{digest}"
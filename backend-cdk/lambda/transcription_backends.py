@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import uuid
+import threading
+import importlib
+import importlib.util
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+import lambda_runtime
+import endpoint_router
+import rate_limiter
+import chunk_planner
+import wav_format
+import async_inference
+
+# Backend used when neither the event nor TRANSCRIPTION_BACKEND names one
+DEFAULT_BACKEND = 'sagemaker'
+
+# Loader of the in-process CPU engine, as "module:function"
+DEFAULT_CPU_LOADER = 'transcription_backends:load_faster_whisper'
+
+# CPU worker pools hold a loaded model in every worker process, so they live
+# for the lifetime of the execution environment like routers and clients
+_cpu_pools = {}
+_cpu_pools_lock = threading.Lock()
+
+# The engine loaded in this worker process (set by _init_cpu_worker)
+_worker_engine = None
+
+
+def as_result(response_body):
+    """
+    Result dict ({"text": str}) of any Whisper response.
+
+    Whisper endpoints answer with {"text": str}, {"text": [str, ...]} or a
+    bare string; every backend returns the same shape.
+    """
+    if isinstance(response_body, dict) and 'text' in response_body:
+        text = response_body['text']
+        return {'text': text if isinstance(text, str) else ' '.join(text)}
+    if isinstance(response_body, str):
+        return {'text': response_body}
+    return {'text': str(response_body)}
+
+
+class SageMakerBackend:
+    """Whisper on SageMaker real-time endpoints, spread by an EndpointRouter."""
+
+    name = 'sagemaker'
+
+    def __init__(self, sagemaker_client, router, payload_format='hex-json'):
+        self.sagemaker_client = sagemaker_client
+        self.router = router
+        self.payload_format = payload_format
+
+    def transcribe(self, chunk_data, hedger=None):
+        """
+        Transcribe one WAV chunk.
+
+        Throttles slow the shared rate limiter down and are retried with
+        jitter. With a Hedger, a slow request is duplicated and the first
+        response is used.
+        """
+        body = chunk_planner.encode_payload(chunk_data, self.payload_format)
+
+        def invoke():
+            response = rate_limiter.limited_call('sagemaker:InvokeEndpoint', lambda: self.router.invoke_endpoint(
+                self.sagemaker_client,
+                ContentType=chunk_planner.content_type(self.payload_format),
+                Body=body
+            ))
+            return json.loads(response['Body'].read().decode('utf-8'))
+
+        return as_result(hedger.call(invoke) if hedger else invoke())
+
+    def stats(self):
+        return self.router.stats()
+
+
+class SageMakerAsyncBackend:
+    """
+    Whisper on a SageMaker asynchronous inference endpoint.
+
+    Each request body is written to S3 and queued with InvokeEndpointAsync,
+    so requests are not bound by the real-time payload limit and nobody has
+    to hold a connection open while the endpoint works. submit() and
+    fetch() let the caller collect results later (the state machine polls
+    between Lambda invocations); transcribe() waits for one request by
+    polling its output location, for callers that need the text right away.
+    """
+
+    name = 'sagemaker-async'
+    max_payload_bytes = chunk_planner.ASYNC_MAX_PAYLOAD_BYTES
+
+    def __init__(self, sagemaker_client, s3_client, endpoint_name, bucket, prefix=async_inference.INPUT_PREFIX,
+                 payload_format='hex-json', poll_seconds=2.0, timeout_seconds=900):
+        self.sagemaker_client = sagemaker_client
+        self.s3 = s3_client
+        self.endpoint_name = endpoint_name
+        self.bucket = bucket
+        self.prefix = prefix
+        self.payload_format = payload_format
+        self.poll_seconds = poll_seconds
+        self.timeout_seconds = timeout_seconds
+        self._lock = threading.Lock()
+        self._submitted = 0
+
+    def submit(self, chunk_data, inference_id):
+        """
+        Upload one WAV chunk and queue it on the endpoint.
+
+        Returns:
+            Dict with InferenceId, InputLocation, OutputLocation and
+            FailureLocation, everything fetch() needs
+        """
+        key = f"{self.prefix}{inference_id}"
+        self.s3.put_object(Bucket=self.bucket, Key=key,
+                           Body=chunk_planner.encode_payload(chunk_data, self.payload_format),
+                           ContentType=chunk_planner.content_type(self.payload_format))
+        input_location = f"s3://{self.bucket}/{key}"
+        response = rate_limiter.limited_call('sagemaker:InvokeEndpointAsync', lambda: self.sagemaker_client.invoke_endpoint_async(
+            EndpointName=self.endpoint_name,
+            InputLocation=input_location,
+            ContentType=chunk_planner.content_type(self.payload_format),
+            InferenceId=inference_id,
+            InvocationTimeoutSeconds=self.timeout_seconds
+        ))
+        with self._lock:
+            self._submitted += 1
+        return {
+            'InferenceId': inference_id,
+            'InputLocation': input_location,
+            'OutputLocation': response['OutputLocation'],
+            'FailureLocation': response.get('FailureLocation')
+        }
+
+    def fetch(self, submission):
+        """Result of a submitted request, or None while it is queued or running."""
+        response_body = async_inference.fetch_result(self.s3, submission)
+        return None if response_body is None else as_result(response_body)
+
+    def transcribe(self, chunk_data, hedger=None):
+        """Transcribe one WAV chunk and wait for it (hedging does not apply)."""
+        submission = self.submit(chunk_data, uuid.uuid4().hex)
+        deadline = time.monotonic() + self.timeout_seconds
+        while True:
+            result = self.fetch(submission)
+            if result is not None:
+                return result
+            if time.monotonic() >= deadline:
+                raise async_inference.AsyncInferenceError(
+                    f"Async inference {submission['InferenceId']} did not finish in {self.timeout_seconds} s")
+            time.sleep(self.poll_seconds)
+
+    def stats(self):
+        with self._lock:
+            return {'endpoint': self.endpoint_name, 'submitted': self._submitted}
+
+
+class HttpBackend:
+    """
+    Whisper behind a plain HTTP endpoint, e.g. a local inference server or
+    the LocalWhisperServer stand-in, taking the same request bodies as the
+    SageMaker endpoint.
+    """
+
+    name = 'http'
+
+    def __init__(self, url, payload_format='hex-json', timeout=120):
+        self.url = url
+        self.payload_format = payload_format
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._requests = 0
+
+    def transcribe(self, chunk_data, hedger=None):
+        body = chunk_planner.encode_payload(chunk_data, self.payload_format)
+
+        def post():
+            request = urllib.request.Request(
+                self.url, data=body, method='POST',
+                headers={'Content-Type': chunk_planner.content_type(self.payload_format)}
+            )
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+
+        with self._lock:
+            self._requests += 1
+        return as_result(hedger.call(post) if hedger else post())
+
+    def stats(self):
+        with self._lock:
+            return {'url': self.url, 'requests': self._requests}
+
+
+def load_loader(spec):
+    """Function named by a "module:function" loader spec."""
+    module_name, _, function_name = spec.partition(':')
+    if not module_name or not function_name:
+        raise ValueError(f"CPU engine loader must look like module:function, got {spec!r}")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def require_faster_whisper():
+    """
+    Fail with an install hint when faster-whisper is missing.
+
+    The engine is loaded in the worker processes, where a failed import
+    would only surface as a broken pool, so the CPU backend checks first.
+    """
+    if importlib.util.find_spec('faster_whisper') is None:
+        raise ImportError("The cpu transcription backend needs faster-whisper: "
+                          "pip install -r requirements-cpu.txt")
+
+
+def load_faster_whisper(model, compute_type):
+    """
+    Engine transcribing WAV chunks with faster-whisper (CTranslate2).
+
+    compute_type "int8" runs the quantized model, which is several times
+    faster on CPU than float32 with near-identical transcripts. Each worker
+    process uses one thread, so the pool size is the number of cores used.
+    """
+    # Imported here so only the worker processes of the cpu backend load it
+    from faster_whisper import WhisperModel
+    whisper_model = WhisperModel(model, device='cpu', compute_type=compute_type,
+                                                cpu_threads=1, num_workers=1)
+
+    def transcribe(chunk_data):
+        info = wav_format.parse_header(chunk_data)
+        if not info.is_target_format:
+            raise wav_format.WavFormatError(f"CPU engine expects 16 kHz mono PCM, got {info.describe()}")
+        samples = wav_format.pcm_view(chunk_data, info)[:, 0]
+        segments, _ = whisper_model.transcribe(wav_format.to_float(samples, info), beam_size=1)
+        return ' '.join(segment.text.strip() for segment in segments)
+
+    return transcribe
+
+
+def _init_cpu_worker(loader, model, compute_type):
+    global _worker_engine
+    _worker_engine = load_loader(loader)(model, compute_type)
+
+
+def _transcribe_in_worker(chunk_data):
+    return _worker_engine(chunk_data)
+
+
+class CpuBackend:
+    """
+    In-process Whisper on CPU, one model per worker process.
+
+    Meant for backfills and offline runs where keeping an endpoint warm is
+    not worth it. Worker processes need /dev/shm, which Lambda does not
+    provide, so this backend runs on EC2, containers or a laptop.
+    """
+
+    name = 'cpu'
+
+    def __init__(self, model='base', compute_type='int8', workers=None, loader=DEFAULT_CPU_LOADER):
+        if loader == DEFAULT_CPU_LOADER:
+            require_faster_whisper()
+        self.model = model
+        self.compute_type = compute_type
+        self.workers = workers or os.cpu_count() or 1
+        self.loader = loader
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_cpu_worker,
+                                         initargs=(loader, model, compute_type))
+
+    def transcribe(self, chunk_data, hedger=None):
+        """Transcribe one WAV chunk in a worker process (hedging does not apply)."""
+        return as_result(self._pool.submit(_transcribe_in_worker, bytes(chunk_data)).result())
+
+    def stats(self):
+        return {'model': self.model, 'compute_type': self.compute_type, 'workers': self.workers}
+
+    def close(self):
+        self._pool.shutdown()
+
+
+def backend_name(event=None):
+    """Backend for a job: event "TranscriptionBackend", then TRANSCRIPTION_BACKEND."""
+    name = (event or {}).get('TranscriptionBackend') or os.environ.get('TRANSCRIPTION_BACKEND') or DEFAULT_BACKEND
+    if name not in ('sagemaker', 'sagemaker-async', 'http', 'cpu'):
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return name
+
+
+def backend_from_environment(name):
+    """
+    Backend configured from the environment.
+
+    sagemaker: WHISPER_ENDPOINTS / WHISPER_ENDPOINT (see endpoint_router)
+    sagemaker-async: WHISPER_ASYNC_ENDPOINT; requests are written under
+        ASYNC_INFERENCE_PREFIX in ASYNC_INFERENCE_BUCKET (default: the
+        summaries bucket), and transcribe() polls every ASYNC_POLL_SECONDS
+    http: TRANSCRIPTION_HTTP_URL
+    cpu: CPU_WHISPER_MODEL (default base), CPU_COMPUTE_TYPE (default int8),
+        CPU_WORKERS (default: all cores), CPU_ENGINE_LOADER; the worker pool
+        is cached per container
+
+    WHISPER_PAYLOAD_FORMAT selects the request body of the remote backends.
+    """
+    payload_format = os.environ.get('WHISPER_PAYLOAD_FORMAT', 'hex-json')
+    if name == 'sagemaker':
+        return SageMakerBackend(lambda_runtime.get_client('sagemaker-runtime', region_name='us-east-1'),
+                                endpoint_router.router_from_environment(), payload_format)
+    if name == 'sagemaker-async':
+        endpoint_name = os.environ.get('WHISPER_ASYNC_ENDPOINT')
+        bucket = os.environ.get('ASYNC_INFERENCE_BUCKET') or os.environ.get('SUMMARIES_BUCKET')
+        if not endpoint_name or not bucket:
+            raise ValueError("WHISPER_ASYNC_ENDPOINT and ASYNC_INFERENCE_BUCKET (or SUMMARIES_BUCKET) "
+                             "must be set for the sagemaker-async backend")
+        return SageMakerAsyncBackend(lambda_runtime.get_client('sagemaker-runtime', region_name='us-east-1'),
+                                     lambda_runtime.get_client('s3'), endpoint_name, bucket,
+                                     os.environ.get('ASYNC_INFERENCE_PREFIX', async_inference.INPUT_PREFIX),
+                                     payload_format, float(os.environ.get('ASYNC_POLL_SECONDS', '2')))
+    if name == 'http':
+        url = os.environ.get('TRANSCRIPTION_HTTP_URL')
+        if not url:
+            raise ValueError("TRANSCRIPTION_HTTP_URL environment variable must be set for the http backend")
+        return HttpBackend(url, payload_format)
+    if name == 'cpu':
+        key = (os.environ.get('CPU_WHISPER_MODEL', 'base'), os.environ.get('CPU_COMPUTE_TYPE', 'int8'),
+               int(os.environ.get('CPU_WORKERS', '0')) or None, os.environ.get('CPU_ENGINE_LOADER', DEFAULT_CPU_LOADER))
+        with _cpu_pools_lock:
+            backend = _cpu_pools.get(key)
+            if backend is None:
+                backend = CpuBackend(*key)
+                _cpu_pools[key] = backend
+            return backend
+    raise ValueError(f"Unknown transcription backend: {name}")
+
+
+def reset_backends():
+    """Shut down cached CPU worker pools (used by tests)."""
+    with _cpu_pools_lock:
+        for backend in _cpu_pools.values():
+            backend.close()
+        _cpu_pools.clear()
@@ -0,0 +1,323 @@
+import io
+import os
+import mmap
+import wave
+import struct
+import importlib.util
+
+import lambda_runtime
+
+# NumPy is only needed when a recording has to be converted
+np = lambda_runtime.lazy_import('numpy')
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# WAVE_FORMAT_EXTENSIBLE stores the real format in the first two bytes of a
+# SubFormat GUID; the remaining 14 bytes are the same for every KSDATAFORMAT
+_SUBFORMAT_GUID_TAIL = b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+
+# What Whisper consumes: everything else is resampled to this by the model anyway
+TARGET_SAMPLE_RATE = 16000
+TARGET_CHANNELS = 1
+TARGET_SAMPWIDTH = 2
+
+# Seconds of source audio converted at a time
+DEFAULT_BLOCK_SECONDS = 10
+
+# data chunk size written by streaming recorders that never patch the header
+_UNKNOWN_SIZE = 0xFFFFFFFF
+
+
+class WavFormatError(ValueError):
+    """The file is not a WAV file this module can read."""
+
+
+class WavInfo:
+    """Layout of a RIFF/WAVE file, as found by parse_header()."""
+
+    def __init__(self, format_tag, channels, sample_rate, bits_per_sample, block_align,
+                 data_offset, data_size, extensible=False, valid_bits=None, chunks=()):
+        self.format_tag = format_tag
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.bits_per_sample = bits_per_sample
+        self.block_align = block_align
+        self.data_offset = data_offset
+        self.data_size = data_size
+        self.extensible = extensible
+        self.valid_bits = valid_bits or bits_per_sample
+        self.chunks = list(chunks)
+
+    @property
+    def sampwidth(self):
+        return self.block_align // self.channels
+
+    @property
+    def n_frames(self):
+        return self.data_size // self.block_align
+
+    @property
+    def duration_seconds(self):
+        return self.n_frames / float(self.sample_rate)
+
+    @property
+    def is_float(self):
+        return self.format_tag == WAVE_FORMAT_IEEE_FLOAT
+
+    @property
+    def stdlib_readable(self):
+        """True if the wave module can read the file as it is."""
+        return self.format_tag == WAVE_FORMAT_PCM and not self.extensible and self.sampwidth in (1, 2, 3, 4)
+
+    @property
+    def is_target_format(self):
+        """True for plain 16-bit 16 kHz mono PCM, which needs no conversion."""
+        return (self.stdlib_readable and self.sample_rate == TARGET_SAMPLE_RATE
+                and self.channels == TARGET_CHANNELS and self.sampwidth == TARGET_SAMPWIDTH)
+
+    def describe(self):
+        kind = 'float' if self.is_float else 'pcm'
+        layout = 'extensible ' if self.extensible else ''
+        return f"{layout}{kind} {self.valid_bits}-bit {self.sample_rate} Hz x{self.channels}"
+
+
+def numpy_available():
+    """True if NumPy can be imported (conversion needs it)."""
+    return importlib.util.find_spec('numpy') is not None
+
+
+def _parse_fmt(body):
+    if len(body) < 16:
+        raise WavFormatError("fmt chunk is too short")
+    format_tag, channels, sample_rate, _, block_align, bits_per_sample = struct.unpack_from('<HHIIHH', body)
+    extensible = False
+    valid_bits = None
+    if format_tag == WAVE_FORMAT_EXTENSIBLE:
+        if len(body) < 40:
+            raise WavFormatError("WAVE_FORMAT_EXTENSIBLE fmt chunk is too short")
+        valid_bits, _channel_mask = struct.unpack_from('<HI', body, 18)
+        subformat = body[24:40]
+        if subformat[2:] != _SUBFORMAT_GUID_TAIL:
+            raise WavFormatError("Unsupported WAVE_FORMAT_EXTENSIBLE sub-format")
+        format_tag = struct.unpack_from('<H', subformat)[0]
+        extensible = True
+    if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+        raise WavFormatError(f"Unsupported WAV format tag 0x{format_tag:04x}")
+    if not channels or not sample_rate or not block_align:
+        raise WavFormatError("fmt chunk has zero channels, sample rate or block size")
+    if block_align % channels or (block_align // channels) * 8 < bits_per_sample:
+        raise WavFormatError(f"Inconsistent fmt chunk: {bits_per_sample}-bit samples in {block_align}-byte frames")
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT and block_align // channels not in (4, 8):
+        raise WavFormatError(f"Unsupported float sample size: {bits_per_sample} bits")
+    return format_tag, channels, sample_rate, bits_per_sample, block_align, extensible, valid_bits
+
+
+def parse_header(source):
+    """
+    Walk the RIFF chunk list of a WAV file.
+
+    Unknown chunks (LIST, JUNK, bext, cue, ...) are skipped, including
+    chunks that come before fmt or after data. A data chunk whose size is
+    missing or larger than the file (streaming recorders) is clamped to the
+    bytes actually present.
+
+    Args:
+        source: WAV bytes or a seekable binary file object (its position is restored)
+
+    Returns:
+        WavInfo
+
+    Raises:
+        WavFormatError: if the file is not a WAV file or uses an unsupported format
+    """
+    fileobj = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+    start = fileobj.tell()
+    try:
+        fileobj.seek(0, os.SEEK_END)
+        file_size = fileobj.tell()
+        fileobj.seek(0)
+        riff = fileobj.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            raise WavFormatError("Not a RIFF/WAVE file")
+
+        fmt = None
+        data = None
+        chunks = []
+        position = 12
+        while position + 8 <= file_size:
+            fileobj.seek(position)
+            chunk_id, size = struct.unpack('<4sI', fileobj.read(8))
+            body_offset = position + 8
+            chunks.append((chunk_id.decode('latin-1'), body_offset, size))
+            if chunk_id == b'fmt ':
+                fmt = _parse_fmt(fileobj.read(size))
+            elif chunk_id == b'data':
+                if size == _UNKNOWN_SIZE or body_offset + size > file_size:
+                    size = file_size - body_offset
+                data = (body_offset, size)
+            if fmt and data:
+                break
+            # Chunks are padded to an even length
+            position = body_offset + size + (size & 1)
+    finally:
+        fileobj.seek(start)
+
+    if fmt is None:
+        raise WavFormatError("WAV file has no fmt chunk")
+    if data is None:
+        raise WavFormatError("WAV file has no data chunk")
+    format_tag, channels, sample_rate, bits_per_sample, block_align, extensible, valid_bits = fmt
+    data_offset, data_size = data
+    return WavInfo(format_tag, channels, sample_rate, bits_per_sample, block_align,
+                   data_offset, data_size - data_size % block_align,
+                   extensible=extensible, valid_bits=valid_bits, chunks=chunks)
+
+
+def _dtype(info):
+    if info.is_float:
+        return np.dtype('<f4') if info.sampwidth == 4 else np.dtype('<f8')
+    return {1: np.dtype('u1'), 2: np.dtype('<i2'), 4: np.dtype('<i4')}.get(info.sampwidth)
+
+
+def pcm_view(buffer, info, start_frame=0, n_frames=None):
+    """
+    Samples of a WAV file as a (frames, channels) NumPy array.
+
+    For 8, 16 and 32-bit integer and for float samples this is a view of
+    `buffer` (no copy). 24-bit samples have no NumPy dtype, so they are
+    unpacked into an int32 array with the sample in the top three bytes,
+    i.e. at the same scale as 32-bit PCM.
+
+    Args:
+        buffer: Object supporting the buffer protocol holding the whole file (bytes, mmap, ...)
+        info: WavInfo from parse_header()
+        start_frame / n_frames: Frame range to return (default: all frames)
+    """
+    if n_frames is None:
+        n_frames = info.n_frames - start_frame
+    n_frames = max(min(n_frames, info.n_frames - start_frame), 0)
+    offset = info.data_offset + start_frame * info.block_align
+    dtype = _dtype(info)
+    if dtype is not None and info.block_align == dtype.itemsize * info.channels:
+        return np.frombuffer(buffer, dtype=dtype, count=n_frames * info.channels, offset=offset) \
+            .reshape(n_frames, info.channels)
+    if info.sampwidth == 3 and info.block_align == 3 * info.channels:
+        raw = np.frombuffer(buffer, dtype=np.uint8, count=n_frames * info.block_align, offset=offset)
+        samples = np.zeros((n_frames * info.channels, 4), dtype=np.uint8)
+        samples[:, 1:] = raw.reshape(-1, 3)
+        return samples.view('<i4').reshape(n_frames, info.channels)
+    raise WavFormatError(f"Unsupported sample layout: {info.describe()} in {info.block_align}-byte frames")
+
+
+def to_float(samples, info):
+    """Scale samples from pcm_view() to float32 in [-1, 1]."""
+    if info.is_float:
+        return samples.astype(np.float32, copy=False)
+    if info.sampwidth == 1:
+        return (samples.astype(np.float32) - 128.0) / 128.0
+    # 24-bit samples were widened to 32-bit scale by pcm_view()
+    full_scale = float(1 << (8 * (4 if info.sampwidth == 3 else info.sampwidth) - 1))
+    return samples.astype(np.float32) / full_scale
+
+
+def converted_frames(info, target_rate=TARGET_SAMPLE_RATE):
+    """Frames in the converted recording."""
+    return info.n_frames * target_rate // info.sample_rate
+
+
+def _resample_block(mono, first_position, step, n_out):
+    """Linear interpolation of n_out samples starting at a fractional source position."""
+    positions = first_position + step * np.arange(n_out, dtype=np.float64)
+    return np.interp(positions, np.arange(len(mono), dtype=np.float64), mono).astype(np.float32)
+
+
+def iter_int16_mono(buffer, info, target_rate=TARGET_SAMPLE_RATE, block_seconds=DEFAULT_BLOCK_SECONDS):
+    """
+    Convert a WAV file to int16 mono at target_rate, one block at a time.
+
+    Channels are averaged, then the signal is resampled: by averaging groups
+    of frames when the source rate is an integer multiple of the target rate
+    (48, 32 kHz), otherwise by linear interpolation (44.1, 22.05 kHz).
+    Whisper only looks at frequencies below 8 kHz, so this is enough to keep
+    transcripts identical. Only one block of source audio is converted at a
+    time, so memory stays bounded for long recordings.
+
+    Yields:
+        int16 NumPy arrays of consecutive output samples
+    """
+    total_out = converted_frames(info, target_rate)
+    ratio = info.sample_rate / float(target_rate)
+    integer_ratio = info.sample_rate % target_rate == 0
+    block_out = max(int(block_seconds * target_rate), 1)
+
+    for first_out in range(0, total_out, block_out):
+        n_out = min(block_out, total_out - first_out)
+        if integer_ratio:
+            factor = info.sample_rate // target_rate
+            source = pcm_view(buffer, info, first_out * factor, n_out * factor)
+            mono = to_float(source, info).mean(axis=1)
+            block = mono.reshape(n_out, factor).mean(axis=1) if factor > 1 else mono
+        else:
+            first_position = first_out * ratio
+            first_frame = int(first_position)
+            last_frame = min(int((first_out + n_out - 1) * ratio) + 2, info.n_frames)
+            source = pcm_view(buffer, info, first_frame, last_frame - first_frame)
+            mono = to_float(source, info).mean(axis=1)
+            block = _resample_block(mono, first_position - first_frame, ratio, n_out)
+        yield np.clip(np.rint(block * 32767.0), -32768, 32767).astype('<i2')
+
+
+def to_int16_mono(buffer, info, target_rate=TARGET_SAMPLE_RATE):
+    """The whole recording converted by iter_int16_mono(), as one array."""
+    blocks = list(iter_int16_mono(buffer, info, target_rate))
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype='<i2')
+
+
+def _buffer_of(source):
+    """(buffer, closer) over WAV bytes, a BytesIO or a real file, without copying."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source, None
+    if hasattr(source, 'getbuffer'):
+        view = source.getbuffer()
+        return view, view.release
+    mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    return mapped, mapped.close
+
+
+def normalize_wav(source, dest, info=None, target_rate=TARGET_SAMPLE_RATE, block_seconds=DEFAULT_BLOCK_SECONDS):
+    """
+    Write any supported WAV as plain 16-bit mono PCM at target_rate.
+
+    Handles files the wave module rejects (WAVE_FORMAT_EXTENSIBLE, float,
+    24-bit, odd chunk layouts) without FFmpeg. Files on disk are memory
+    mapped, so only one block of audio is in memory at a time.
+
+    Args:
+        source: WAV bytes, BytesIO or a binary file object with a file descriptor
+        dest: Writable binary file object that receives the converted WAV
+        info: WavInfo of source, if already parsed
+
+    Returns:
+        Number of frames written
+    """
+    if info is None:
+        info = parse_header(source)
+    buffer, close = _buffer_of(source)
+    blocks = iter_int16_mono(buffer, info, target_rate, block_seconds)
+    frames = 0
+    try:
+        with wave.open(dest, 'wb') as out:
+            out.setnchannels(TARGET_CHANNELS)
+            out.setsampwidth(TARGET_SAMPWIDTH)
+            out.setframerate(target_rate)
+            for block in blocks:
+                out.writeframes(block.tobytes())
+                frames += len(block)
+    finally:
+        # The generator holds views of the buffer, which must be gone before it is released
+        blocks.close()
+        if close:
+            close()
+    return frames
@@ -1,7 +1,5 @@
-import boto3
 import json
 import wave
-import math
 from io import BytesIO
 import time
 import os
@@ -10,25 +8,33 @@ import subprocess
 import tempfile
 import shutil
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_plus
+
+from botocore.exceptions import ClientError
+
+import lambda_runtime
+import profiling
+import content_index
+import transcription_backends
+import transcript_sessions
+import async_inference
+import redaction
+import job_status
+import hedging
+import rate_limiter
+import chunk_planner
+import wav_format
+from metrics import StageMetrics, debug
 
 def check_ffmpeg():
-    """Check if FFmpeg is available in the environment."""
-    try:
-        # Try to run ffmpeg -version to check if it's installed
-        result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True, check=False)
-        if result.returncode == 0:
-            print(f"FFmpeg found: {result.stdout.splitlines()[0] if result.stdout else 'No version info'}")
-            return True
-        print(f"FFmpeg command failed with return code {result.returncode}")
-        print(f"Error: {result.stderr if result.stderr else 'No error output'}")
-        return False
-    except Exception as e:
-        print(f"Exception checking for FFmpeg: {str(e)}")
-        return False
+    """Check if FFmpeg is available in the environment (cached per container)."""
+    return lambda_runtime.find_ffmpeg() is not None
 
 def convert_mp4_to_wav(mp4_data):
     """Convert MP4 audio data to WAV format using FFmpeg."""
-    print(f"Converting MP4 to WAV. Input data size: {len(mp4_data)} bytes")
+    debug(f"Converting MP4 to WAV. Input data size: {len(mp4_data)} bytes")
     
     # Ensure /tmp directory exists and is writable
     tmp_dir = '/tmp'
@@ -39,7 +45,7 @@ def convert_mp4_to_wav(mp4_data):
             print(f"Error creating /tmp directory: {e}")
             tmp_dir = tempfile.gettempdir()
     
-    print(f"Using temporary directory: {tmp_dir}")
+    debug(f"Using temporary directory: {tmp_dir}")
     
     # Create unique filenames in the tmp directory
     timestamp = int(time.time())
@@ -51,23 +57,23 @@ def convert_mp4_to_wav(mp4_data):
         with open(mp4_path, 'wb') as mp4_file:
             mp4_file.write(mp4_data)
         
-        print(f"MP4 file written to {mp4_path}, file exists: {os.path.exists(mp4_path)}, size: {os.path.getsize(mp4_path)} bytes")
+        debug(f"MP4 file written to {mp4_path}, file exists: {os.path.exists(mp4_path)}, size: {os.path.getsize(mp4_path)} bytes")
         
         # Check FFmpeg is available
         ffmpeg_available = check_ffmpeg()
-        print(f"FFmpeg available: {ffmpeg_available}")
+        debug(f"FFmpeg available: {ffmpeg_available}")
         
         # Try several methods for conversion, from best to most basic
         for method in ['ffmpeg', 'ffmpeg_direct', 'custom_header']:
             try:
                 if method == 'ffmpeg' and ffmpeg_available:
                     # Show all environment variables to help debug PATH issues
-                    print(f"PATH: {os.environ.get('PATH', 'Not set')}")
-                    print(f"LD_LIBRARY_PATH: {os.environ.get('LD_LIBRARY_PATH', 'Not set')}")
+                    debug(f"PATH: {os.environ.get('PATH', 'Not set')}")
+                    debug(f"LD_LIBRARY_PATH: {os.environ.get('LD_LIBRARY_PATH', 'Not set')}")
                     
                     # Method 1: Standard FFmpeg conversion
                     cmd = ['ffmpeg', '-i', mp4_path, '-vn', '-acodec', 'pcm_s16le', '-ar', '44100', '-ac', '2', wav_path]
-                    print(f"Running command: {' '.join(cmd)}")
+                    debug(f"Running command: {' '.join(cmd)}")
                     
                     result = subprocess.run(
                         cmd,
@@ -77,11 +83,11 @@ def convert_mp4_to_wav(mp4_data):
                     )
                     
                     if result.returncode == 0:
-                        print("FFmpeg conversion successful")
+                        debug("FFmpeg conversion successful")
                         # Read the converted WAV file
                         with open(wav_path, 'rb') as wav_file:
                             wav_data = wav_file.read()
-                            print(f"WAV data size: {len(wav_data)} bytes")
+                            debug(f"WAV data size: {len(wav_data)} bytes")
                         return wav_data
                     else:
                         print(f"FFmpeg error: {result.stderr}")
@@ -89,18 +95,12 @@ def convert_mp4_to_wav(mp4_data):
                 
                 elif method == 'ffmpeg_direct' and ffmpeg_available:
                     # Method 2: Try direct FFmpeg with explicit path
-                    # Find ffmpeg binary in PATH
-                    ffmpeg_paths = os.environ.get('PATH', '').split(':') 
-                    ffmpeg_path = None
-                    for path in ffmpeg_paths:
-                        if os.path.exists(os.path.join(path, 'ffmpeg')):
-                            ffmpeg_path = os.path.join(path, 'ffmpeg')
-                            break
+                    ffmpeg_path = lambda_runtime.find_ffmpeg()
                             
                     if ffmpeg_path:
                         # Direct command with full path to ffmpeg
                         cmd = [ffmpeg_path, '-i', mp4_path, '-vn', '-acodec', 'pcm_s16le', '-ar', '44100', '-ac', '2', wav_path]
-                        print(f"Running direct command: {' '.join(cmd)}")
+                        debug(f"Running direct command: {' '.join(cmd)}")
                         
                         result = subprocess.run(
                             cmd,
@@ -110,21 +110,21 @@ def convert_mp4_to_wav(mp4_data):
                         )
                         
                         if result.returncode == 0:
-                            print("Direct FFmpeg conversion successful")
+                            debug("Direct FFmpeg conversion successful")
                             # Read the converted WAV file
                             with open(wav_path, 'rb') as wav_file:
                                 wav_data = wav_file.read()
-                                print(f"WAV data size: {len(wav_data)} bytes")
+                                debug(f"WAV data size: {len(wav_data)} bytes")
                             return wav_data
                         else:
                             print(f"Direct FFmpeg error: {result.stderr}")
                             # Continue to next method
                     else:
-                        print("Could not find ffmpeg executable in PATH")
+                        debug("Could not find ffmpeg executable in PATH")
                 
                 elif method == 'custom_header':
                     # Method 3: Fallback - create a minimal WAV header
-                    print("Using fallback WAV header creation")
+                    debug("Using fallback WAV header creation")
                     
                     # Try to determine audio properties with ffprobe if available
                     sample_rate = 44100  # Default sample rate
@@ -147,7 +147,7 @@ def convert_mp4_to_wav(mp4_data):
                                             sample_rate = int(value)
                                         elif key == 'channels' and value.isdigit():
                                             channels = int(value)
-                                print(f"Detected audio properties: sample_rate={sample_rate}, channels={channels}")
+                                debug(f"Detected audio properties: sample_rate={sample_rate}, channels={channels}")
                         except Exception as e:
                             print(f"Error getting audio properties: {str(e)}")
                     
@@ -176,7 +176,7 @@ def convert_mp4_to_wav(mp4_data):
                     for i in range(len(mp4_data) - 4):
                         if mp4_data[i:i+4] == b'mdat':
                             data_start = i + 8  # Skip 'mdat' and size fields
-                            print(f"Found mdat box at position {i}, using data from position {data_start}")
+                            debug(f"Found mdat box at position {i}, using data from position {data_start}")
                             break
                     
                     # Use either extracted audio data or limit to 30 seconds to avoid excessive memory usage
@@ -185,7 +185,7 @@ def convert_mp4_to_wav(mp4_data):
                     audio_data = audio_data[:max_size] if len(audio_data) > max_size else audio_data
                     
                     wav_data = header.getvalue() + audio_data
-                    print(f"Created WAV with manual header. Size: {len(wav_data)} bytes")
+                    debug(f"Created WAV with manual header. Size: {len(wav_data)} bytes")
                     return wav_data
             
             except Exception as method_error:
@@ -205,16 +205,16 @@ def convert_mp4_to_wav(mp4_data):
         try:
             if os.path.exists(mp4_path):
                 os.remove(mp4_path)
-                print(f"Removed temporary MP4 file: {mp4_path}")
+                debug(f"Removed temporary MP4 file: {mp4_path}")
             if os.path.exists(wav_path):
                 os.remove(wav_path)
-                print(f"Removed temporary WAV file: {wav_path}")
+                debug(f"Removed temporary WAV file: {wav_path}")
         except Exception as cleanup_error:
             print(f"Error during cleanup: {cleanup_error}")
 
 def is_wav_format(audio_data):
-    """Check if the audio data is in WAV format (starts with RIFF header)."""
-    return audio_data.startswith(b'RIFF')
+    """Check if the audio data is in WAV format (RIFF header with WAVE form type)."""
+    return audio_data[:4] == b'RIFF' and audio_data[8:12] == b'WAVE'
 
 
 def detect_audio_format(audio_data):
@@ -229,6 +229,10 @@ def detect_audio_format(audio_data):
         b'OggS': 'ogg'   # OGG files
     }
     
+    # RIFF is also used by AVI and WebP; only the WAVE form type is audio
+    if audio_data.startswith(b'RIFF'):
+        return 'wav' if is_wav_format(audio_data) else 'unknown'
+    
     # Check for each signature
     for sig, fmt in signatures.items():
         # Check at the beginning of the file
@@ -240,28 +244,33 @@ def detect_audio_format(audio_data):
     
     return 'unknown'
 
-def chunk_audio(audio_data, chunk_duration_seconds=30):
-    """Split wave audio from BytesIO into chunks."""
+def chunk_audio(audio_data, plan=None):
+    """
+    Split wave audio from BytesIO into chunks.
+    
+    Chunk lengths come from the chunk planner (see chunk_planner.plan_chunks);
+    a plan computed by the caller can be passed in.
+    """
     try:
-        print(f"Starting audio chunking. Input data size: {len(audio_data)} bytes")
+        debug(f"Starting audio chunking. Input data size: {len(audio_data)} bytes")
         
         # Check audio format
         audio_format = detect_audio_format(audio_data)
-        print(f"Detected audio format: {audio_format}")
+        debug(f"Detected audio format: {audio_format}")
         
         # Check if it's a WAV file (starts with RIFF header)
         if not is_wav_format(audio_data):
-            print(f"Input is not WAV format (detected as {audio_format}), attempting conversion...")
+            debug(f"Input is not WAV format (detected as {audio_format}), attempting conversion...")
             try:
                 audio_data = convert_mp4_to_wav(audio_data)
-                print(f"Conversion completed. WAV data size: {len(audio_data)} bytes")
+                debug(f"Conversion completed. WAV data size: {len(audio_data)} bytes")
                 
                 # Verify the converted data is valid WAV
                 if not is_wav_format(audio_data):
                     print("Warning: Converted data does not have RIFF header")
                     # Try to add RIFF header if missing
                     if not audio_data.startswith(b'RIFF'):
-                        print("Adding RIFF header to converted data")
+                        debug("Adding RIFF header to converted data")
                         sample_rate = 44100
                         channels = 2
                         bits_per_sample = 16
@@ -282,7 +291,7 @@ def chunk_audio(audio_data, chunk_duration_seconds=30):
                         header.write((len(audio_data)).to_bytes(4, 'little'))
                         
                         audio_data = header.getvalue() + audio_data
-                        print(f"Added RIFF header. New size: {len(audio_data)} bytes")
+                        debug(f"Added RIFF header. New size: {len(audio_data)} bytes")
             except Exception as e:
                 print(f"Error converting audio: {str(e)}")
                 # This is a critical error - we can't proceed without conversion
@@ -290,7 +299,7 @@ def chunk_audio(audio_data, chunk_duration_seconds=30):
         
         # Create a BytesIO object from the audio data
         wav_buffer = BytesIO(audio_data)
-        print("WAV buffer created successfully")
+        debug("WAV buffer created successfully")
         
         try:
             with wave.open(wav_buffer, 'rb') as wav_file:
@@ -301,27 +310,16 @@ def chunk_audio(audio_data, chunk_duration_seconds=30):
                 n_frames = wav_file.getnframes()
                 
                 # Log wav file properties for debugging
-                print(f"WAV properties: channels={n_channels}, sampwidth={sampwidth}, ")
-                print(f"framerate={framerate}, frames={n_frames}")
-                
-                # Calculate frames per chunk
-                frames_per_chunk = chunk_duration_seconds * framerate
-                
-                # For large audio files (especially MP4 conversions), create smaller chunks
-                # to avoid SageMaker payload limits (typically around 5-6MB)
-                max_payload_size = 2 * 1024 * 1024  # 2MB as a safe limit
-                bytes_per_frame = n_channels * sampwidth
-                estimated_chunk_size = frames_per_chunk * bytes_per_frame + 44  # WAV header size
+                debug(f"WAV properties: channels={n_channels}, sampwidth={sampwidth}, ")
+                debug(f"framerate={framerate}, frames={n_frames}")
                 
-                if estimated_chunk_size > max_payload_size:
-                    size_ratio = max_payload_size / estimated_chunk_size
-                    # Use 80% of the size limit as a safety margin
-                    adjusted_chunk_duration = int(chunk_duration_seconds * size_ratio * 0.8)
-                    frames_per_chunk = adjusted_chunk_duration * framerate
-                    print(f"Adjusted chunk duration to {adjusted_chunk_duration} seconds to keep chunks under {max_payload_size/1024/1024:.1f}MB")
+                # Largest chunks that fit the endpoint's payload limit and the model window
+                if plan is None:
+                    plan = chunk_planner.plan_from_environment(n_frames, framerate, n_channels, sampwidth)
+                frames_per_chunk = plan['frames_per_chunk']
                 
-                n_chunks = math.ceil(n_frames / frames_per_chunk)
-                print(f"Audio will be split into {n_chunks} chunks")
+                n_chunks = plan['chunk_count']
+                debug(f"Audio will be split into {n_chunks} chunks")
                 
                 chunks = []
                 for i in range(n_chunks):
@@ -340,7 +338,7 @@ def chunk_audio(audio_data, chunk_duration_seconds=30):
                             chunk_wav.writeframes(chunk_frames)
                         
                         chunk_data = chunk_buffer.getvalue()
-                        print(f"Chunk {i+1}/{n_chunks} created, size: {len(chunk_data)} bytes")
+                        debug(f"Chunk {i+1}/{n_chunks} created, size: {len(chunk_data)} bytes")
                         chunks.append(chunk_data)
                     except Exception as chunk_error:
                         print(f"Error processing chunk {i+1}: {chunk_error}")
@@ -352,11 +350,11 @@ def chunk_audio(audio_data, chunk_duration_seconds=30):
                     # WAV headers are typically around 44 bytes
                     # If a chunk is only a header with no audio data, skip it
                     if len(chunk) <= 44:
-                        print(f"Skipping chunk {i+1} as it contains only header (size: {len(chunk)} bytes)")
+                        debug(f"Skipping chunk {i+1} as it contains only header (size: {len(chunk)} bytes)")
                     else:
                         valid_chunks.append(chunk)
                 
-                print(f"Successfully created {len(valid_chunks)} valid chunks out of {len(chunks)} total chunks")
+                debug(f"Successfully created {len(valid_chunks)} valid chunks out of {len(chunks)} total chunks")
                 return valid_chunks
         except Exception as wave_error:
             print(f"Error opening WAV file: {wave_error}")
@@ -368,49 +366,228 @@ def chunk_audio(audio_data, chunk_duration_seconds=30):
         # Return empty list as fallback
         return []
 
-def transcribe_chunk(sagemaker_client, chunk_data, endpoint_name):
-    """Transcribe a single audio chunk using SageMaker runtime with Whisper endpoint."""
+def memory_budget_mode_enabled():
+    """
+    Memory budget mode is on when MEMORY_BUDGET_MODE=true.
+    
+    The upload is streamed to a temporary file and read back one chunk at a
+    time, so peak memory depends on the chunk size and CHUNK_CONCURRENCY
+    rather than on the length of the recording.
+    """
+    return os.environ.get('MEMORY_BUDGET_MODE', 'false').lower() == 'true'
+
+def download_to_spool(s3_client, bucket, key, block_size=1024 * 1024):
+    """
+    Stream an S3 object into an anonymous temporary file.
+    
+    Returns:
+        (file object positioned at the start, size in bytes)
+    """
+    spool = tempfile.TemporaryFile()
     try:
-        import io
-        import base64
-        import wave
-
-        print(f"Using SageMaker endpoint: {endpoint_name}")
-        print(f"Sending request to SageMaker runtime with audio size: {len(chunk_data)} bytes")
-        
-        # Convert audio to hex string (not base64)
-        hex_audio = chunk_data.hex()
-        
-        # Create payload in the format expected by Whisper endpoints
-        payload = {
-            "audio_input": hex_audio,
-            "language": "english",
-            "task": "transcribe",
-            "top_p": 0.9
-        }
+        response = s3_client.get_object(Bucket=bucket, Key=key)
+        size = 0
+        for block in response['Body'].iter_chunks(block_size):
+            spool.write(block)
+            size += len(block)
+        spool.seek(0)
+        return spool, size
+    except Exception:
+        spool.close()
+        raise
+
+def plan_wav_chunks(wav_source, max_payload_bytes=None):
+    """Chunk plan for a WAV file (path or seekable binary file object)."""
+    with wave.open(wav_source, 'rb') as wav_file:
+        return chunk_planner.plan_from_environment(
+            wav_file.getnframes(), wav_file.getframerate(), wav_file.getnchannels(), wav_file.getsampwidth(),
+            max_payload_bytes)
+
+def audio_normalization_enabled():
+    """WAVs are converted to 16 kHz mono 16-bit PCM unless WHISPER_NORMALIZE_AUDIO=false."""
+    return os.environ.get('WHISPER_NORMALIZE_AUDIO', 'true').lower() == 'true'
+
+def normalize_audio(source, info):
+    """
+    Convert a WAV to what Whisper consumes (16-bit 16 kHz mono PCM) if needed.
+    
+    Files the wave module cannot read (WAVE_FORMAT_EXTENSIBLE, float) are
+    always converted. Other files are converted only when normalization is
+    enabled, which also shrinks the payload sent for every chunk (44.1 kHz
+    stereo is 5.5 times the size). Conversion uses NumPy and no FFmpeg.
+    
+    Args:
+        source: WAV bytes or a spooled temporary file
+        info: wav_format.WavInfo of source
+    
+    Returns:
+        Converted WAV (bytes, or a temporary file for file sources), or None if
+        the source can be used as it is
+    """
+    if info.is_target_format:
+        return None
+    if info.stdlib_readable and not (audio_normalization_enabled() and wav_format.numpy_available()):
+        return None
+    if not wav_format.numpy_available():
+        raise ValueError(f"Converting {info.describe()} WAV files requires NumPy")
+    
+    if isinstance(source, (bytes, bytearray)):
+        converted = BytesIO()
+        wav_format.normalize_wav(source, converted, info)
+        return converted.getvalue()
+    converted = tempfile.TemporaryFile()
+    try:
+        wav_format.normalize_wav(source, converted, info)
+        converted.seek(0)
+        return converted
+    except Exception:
+        converted.close()
+        raise
+
+def iter_wav_chunks(wav_source, plan=None):
+    """
+    Lazily split a WAV file into chunks.
+    
+    Unlike chunk_audio, only the chunk currently being yielded is held in
+    memory.
+    
+    Args:
+        wav_source: Path or seekable binary file object containing a WAV file
+        plan: Chunk plan from chunk_planner (computed from the header if omitted)
+    
+    Yields:
+        (chunk WAV bytes, start time in seconds, end time in seconds)
+    """
+    with wave.open(wav_source, 'rb') as wav_file:
+        n_channels = wav_file.getnchannels()
+        sampwidth = wav_file.getsampwidth()
+        framerate = wav_file.getframerate()
+        n_frames = wav_file.getnframes()
+        if plan is None:
+            plan = chunk_planner.plan_from_environment(n_frames, framerate, n_channels, sampwidth)
+        frames_per_chunk = plan['frames_per_chunk']
         
-        # Invoke the SageMaker endpoint with JSON payload
-        response = sagemaker_client.invoke_endpoint(
-            EndpointName=endpoint_name,
-            ContentType='application/json',
-            Body=json.dumps(payload)
-        )
-        
-        # Parse the response
-        print("Response received from SageMaker endpoint")
-        response_body = json.loads(response['Body'].read().decode('utf-8'))
-        print(f"Response type: {type(response_body)}")
-        
-        # For debugging - print the response structure
-        if isinstance(response_body, dict):
-            print(f"Response keys: {list(response_body.keys())}")
-            if 'text' in response_body:
-                print(f"First part of text: {response_body['text'][:100]}...")
-        
-        # Return the response object - we'll handle formatting in the calling function
-        return response_body
+        start_frame = 0
+        while start_frame < n_frames:
+            chunk_frames = wav_file.readframes(frames_per_chunk)
+            frame_count = len(chunk_frames) // (n_channels * sampwidth)
+            if not frame_count:
+                break
+            
+            chunk_buffer = BytesIO()
+            with wave.open(chunk_buffer, 'wb') as chunk_wav:
+                chunk_wav.setnchannels(n_channels)
+                chunk_wav.setsampwidth(sampwidth)
+                chunk_wav.setframerate(framerate)
+                chunk_wav.writeframes(chunk_frames)
+            del chunk_frames
+            
+            yield (chunk_buffer.getvalue(),
+                   start_frame / framerate,
+                   (start_frame + frame_count) / framerate)
+            start_frame += frame_count
+
+def whisper_payload_format():
+    """Request format sent to the endpoint (WHISPER_PAYLOAD_FORMAT, default hex-json)."""
+    return os.environ.get('WHISPER_PAYLOAD_FORMAT', 'hex-json')
+
+def encode_whisper_payload(chunk_data, payload_format='hex-json'):
+    """
+    Build the request body for the Whisper endpoint as bytes.
+    
+    For hex-json this is equivalent to json.dumps() of the payload dict.
+    The chunk planner sizes chunks against exactly this encoding.
+    """
+    return chunk_planner.encode_payload(chunk_data, payload_format)
+
+def transcribe_chunks(backend, chunk_source, metrics, max_in_flight=1, hedger=None, redactor=None, on_progress=None):
+    """
+    Transcribe chunks with at most max_in_flight requests outstanding.
+    
+    The next chunk is only pulled from chunk_source once a slot is free, so
+    a generator source never has more than max_in_flight chunks in memory.
+    With a redaction.ChunkRedactor, each chunk's text is redacted on the
+    redactor's threads as soon as it returns, while later chunks are still
+    being transcribed.
+    
+    Args:
+        chunk_source: Iterable of (chunk WAV bytes, start time, end time)
+        on_progress: Called with the number of chunks transcribed so far
+    
+    Returns:
+        List of (result, (start time, end time)) in chunk order
+    """
+    def transcribe(index, chunk_data):
+        debug(f"Processing chunk {index}")
+        start = time.perf_counter()
+        try:
+            result = transcribe_chunk(backend, chunk_data, hedger)
+        except Exception as e:
+            print(f"Error processing chunk {index}: {str(e)}")
+            raise
+        metrics.record('inference', (time.perf_counter() - start) * 1000, len(chunk_data))
+        return result
+    
+    results = []
+    redacted = []
+    
+    def collect(result, timing):
+        results.append((result, timing))
+        if redactor:
+            redacted.append(redactor.submit(result_text(result, len(results) - 1)))
+        if on_progress:
+            on_progress(len(results))
+    
+    if max_in_flight <= 1:
+        for index, (chunk_data, start_time, end_time) in enumerate(chunk_source, 1):
+            collect(transcribe(index, chunk_data), (start_time, end_time))
+    else:
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            for index, (chunk_data, start_time, end_time) in enumerate(chunk_source, 1):
+                if len(pending) >= max_in_flight:
+                    future, timing = pending.popleft()
+                    collect(future.result(), timing)
+                pending.append((executor.submit(transcribe, index, chunk_data), (start_time, end_time)))
+                del chunk_data
+            while pending:
+                future, timing = pending.popleft()
+                collect(future.result(), timing)
+    
+    if redactor:
+        redact_start = time.perf_counter()
+        texts = redactor.results(redacted)
+        # Only the wait after the last chunk adds to the transcription time
+        metrics.record('redaction_tail', (time.perf_counter() - redact_start) * 1000)
+        results = [(dict(result, text=text), timing) for (result, timing), text in zip(results, texts)]
+    return results
+
+def wav_duration_seconds(wav_bytes):
+    """Duration in seconds of an in-memory WAV chunk (0 if it cannot be parsed)."""
+    try:
+        with wave.open(BytesIO(wav_bytes), 'rb') as wav_file:
+            return wav_file.getnframes() / float(wav_file.getframerate())
+    except (wave.Error, EOFError):
+        return 0.0
+
+def transcribe_chunk(backend, chunk_data, hedger=None):
+    """
+    Transcribe a single audio chunk with the job's transcription backend.
+    
+    The SageMaker backend sends the request to the endpoint picked by its
+    EndpointRouter. With a Hedger, a slow request to a remote backend is
+    duplicated and the first response is used.
+    
+    Returns:
+        {"text": str}, the same shape for every backend
+    """
+    try:
+        debug(f"Sending chunk of {len(chunk_data)} bytes to the {backend.name} backend")
+        result = backend.transcribe(chunk_data, hedger)
+        debug(f"First part of text: {result['text'][:100]}...")
+        return result
     except Exception as e:
-        print(f"Error invoking SageMaker endpoint: {str(e)}")
+        print(f"Error transcribing chunk with the {backend.name} backend: {str(e)}")
         # Print detailed exception for debugging
         import traceback
         print(traceback.format_exc())
@@ -450,9 +627,76 @@ def create_speaker_timestamps(text, start_time, end_time):
     
     return items
 
+def result_text(result, i):
+    """Text of one chunk's transcription result."""
+    # Handle different response formats from the Whisper model
+    if isinstance(result, dict) and 'text' in result:
+        # Standard format with text field
+        text = result['text'] if isinstance(result['text'], str) else ' '.join(result['text'])
+    elif isinstance(result, str):
+        # Directly returned text string
+        text = result
+    else:
+        # Fallback for unexpected formats
+        debug(f"Unexpected result format for chunk {i}: {type(result)}")
+        try:
+            # Try to convert to string representation
+            text = str(result)
+        except:
+            text = f"[Unable to transcribe chunk {i}]"
+    
+    debug(f"Processed text for chunk {i}: {text[:50]}...")
+    return text
+
+def write_transcribe_output(fileobj, job_name, texts, chunk_timings):
+    """
+    Write the AWS Transcribe-like output document to a binary file.
+    
+    Produces the same document as the in-memory merge in lambda_handler, but
+    word items are generated and written one chunk at a time, so only the
+    chunk texts are held in memory.
+    """
+    def write(fragment):
+        fileobj.write(fragment.encode('utf-8'))
+    
+    def write_list(name, make_entries):
+        write(f', {json.dumps(name)}: [')
+        first = True
+        for (start_time, end_time), text in zip(chunk_timings, texts):
+            for entry in make_entries(text, start_time, end_time):
+                write(('\n' if first else ',\n') + json.dumps(entry))
+                first = False
+        write(']')
+    
+    def speaker_segments(text, start_time, end_time):
+        yield {
+            "start_time": str(start_time),
+            "end_time": str(end_time),
+            "speaker_label": "spk_0",  # Default speaker label
+            "items": [
+                {
+                    "start_time": item.get("start_time", "0"),
+                    "end_time": item.get("end_time", "0"),
+                    "speaker_label": "spk_0"
+                }
+                for item in create_speaker_timestamps(text, start_time, end_time)
+                if item.get("type") == "pronunciation"
+            ]
+        }
+    
+    write(f'{{"jobName": {json.dumps(job_name)}, "accountId": "123456789012", "results": {{')
+    write(f'"transcripts": [{{"transcript": {json.dumps(" ".join(texts))}}}]')
+    write_list("items", create_speaker_timestamps)
+    write(', "speaker_labels": {"speakers": 1')
+    write_list("segments", speaker_segments)
+    write('}}, "status": "COMPLETED"}')
+
+@profiling.profile_invocation('whisper-transcription')
 def lambda_handler(event, context):
+    metrics = StageMetrics('whisper-transcription')
+    audio_file = None
     try:
-        print("Event received:", json.dumps(event))
+        debug("Event received:", json.dumps(event))
         
         # Extract bucket and key from the event
         bucket = event['detail']['bucket']['name']
@@ -465,63 +709,46 @@ def lambda_handler(event, context):
         # Generate output key for full transcription
         output_key = f"Transcription-Output-for-{input_key}.txt"
         
-        print(f"Processing s3://{bucket}/{input_key}")
-        
-        # Initialize clients
-        s3 = boto3.client('s3')
-        
-        # Initialize clients
-        s3 = boto3.client('s3')
-        # Use SageMaker runtime for SageMaker endpoints
-        sagemaker_runtime = boto3.client('sagemaker-runtime', region_name='us-east-1')
-        # Use SageMaker Whisper endpoint name from environment variable (required)
-        endpoint_name = os.environ['WHISPER_ENDPOINT']
-        if not endpoint_name:
-            raise ValueError("WHISPER_ENDPOINT environment variable must be set")
-        
-        print(f"Using SageMaker endpoint: {endpoint_name}")
-        
-        # Set up ffmpeg path (if using Lambda layers)
-        ffmpeg_paths = [
-            '/opt/bin',            # Common Lambda layer path
-            '/opt/ffmpeg/bin',     # Another possible location
-            '/var/task/bin',       # If you added ffmpeg in the deployment package
-            '/tmp/bin',            # If you downloaded ffmpeg at runtime
-            '/opt/ffmpeg',         # FFmpeg directory itself
-            '/opt'                 # Root opt directory
-        ]
+        debug(f"Processing s3://{bucket}/{input_key}")
+        metrics.set_property('InputKey', input_key)
         
-        # Add all possible FFmpeg paths to PATH
-        for path in ffmpeg_paths:
-            if path not in os.environ.get('PATH', ''):
-                os.environ['PATH'] = f"{path}:{os.environ.get('PATH', '')}"
+        # Clients are created once per container and reused by warm invocations
+        s3 = lambda_runtime.get_client('s3')
+        # SageMaker endpoints by default; "TranscriptionBackend" in the event or
+        # TRANSCRIPTION_BACKEND picks the http or cpu backend for this job.
+        # The SageMaker router keeps endpoint health across warm invocations
+        backend = transcription_backends.backend_from_environment(transcription_backends.backend_name(event))
+        metrics.set_property('TranscriptionBackend', backend.name)
         
-        print(f"Updated PATH: {os.environ.get('PATH', 'Not set')}")
+        debug(f"Using the {backend.name} transcription backend")
         
-        # Check if FFmpeg is available after PATH updates
-        ffmpeg_available = check_ffmpeg()
-        print(f"FFmpeg available after PATH setup: {ffmpeg_available}")
-        
-        # List files in potential FFmpeg directories for debugging
-        for path in ffmpeg_paths:
-            if os.path.exists(path):
-                try:
-                    files = os.listdir(path)
-                    print(f"Files in {path}: {files if files else 'Empty directory'}")
-                except Exception as e:
-                    print(f"Error listing files in {path}: {str(e)}")
+        memory_budget = memory_budget_mode_enabled()
+        max_in_flight = max(int(os.environ.get('CHUNK_CONCURRENCY', '1')), 1)
         
         # Download audio file from S3
-        response = s3.get_object(Bucket=bucket, Key=input_key)
-        audio_data = response['Body'].read()
+        with metrics.stage('download') as stage:
+            if memory_budget:
+                # Spool to /tmp so the recording is never held in memory
+                audio_file, audio_size = download_to_spool(s3, bucket, input_key)
+                audio_data = None
+                audio_header = audio_file.read(64)
+                audio_file.seek(0)
+            else:
+                response = s3.get_object(Bucket=bucket, Key=input_key)
+                audio_data = response['Body'].read()
+                audio_size = len(audio_data)
+                audio_header = audio_data[:64]
+            stage['bytes'] = audio_size
+        metrics.set_property('AudioBytes', audio_size)
         
         # Check audio format and reject non-WAV files
-        print("Splitting audio into chunks...")
-        print(f"Starting audio chunking. Input data size: {len(audio_data)} bytes")
+        debug("Splitting audio into chunks...")
+        debug(f"Starting audio chunking. Input data size: {audio_size} bytes")
         
         # Detect the file format
-        audio_format = detect_audio_format(audio_data)
-        print(f"Detected audio format: {audio_format}")
+        with metrics.stage('detect_format'):
+            audio_format = detect_audio_format(audio_header)
+        debug(f"Detected audio format: {audio_format}")
         
         # Only accept WAV files
         if audio_format != 'wav':
@@ -529,61 +756,166 @@ def lambda_handler(event, context):
             print(error_message)
             raise ValueError(error_message)
         
-        # Split audio into chunks
-        chunks = chunk_audio(audio_data)
+        # Skip the whole pipeline for content that has already been processed
+        summaries_bucket = os.environ.get('SUMMARIES_BUCKET', bucket)
+        with metrics.stage('dedup_lookup'):
+            if memory_budget:
+                fingerprint = content_index.fingerprint_fileobj(audio_file)
+                audio_file.seek(0)
+            else:
+                fingerprint = content_index.fingerprint_bytes(audio_data)
+            fingerprint_index = content_index.get_fingerprint_index(summaries_bucket)
+            previous_run = fingerprint_index.lookup(fingerprint) if fingerprint_index else None
+        reused_keys = None
+        if previous_run:
+            with metrics.stage('dedup_copy'):
+                reused_keys = content_index.reuse_artifacts(s3, previous_run, input_key, summaries_bucket)
+            if reused_keys is None:
+                # The artifacts are gone; this run records the fingerprint again once it is summarized
+                print(f"Artifacts of {previous_run.get('input_key')} for content fingerprint {fingerprint} "
+                      f"no longer exist; transcribing again")
+                fingerprint_index.forget(fingerprint)
+                metrics.set_property('StaleIndexEntry', True)
+        if reused_keys:
+            print(f"Content fingerprint {fingerprint} already processed for {previous_run.get('input_key')}; reusing results")
+            # Express executions emit no status change events, so report completion here
+            job_status.notify(job_status.job_id_for_key(input_key), 'done', inputKey=input_key,
+                              summaryKey=reused_keys['summary_key'], artifacts=reused_keys)
+            return {
+                "TranscriptionJob": {
+                    "TranscriptionJobStatus": "DEDUPLICATED",
+                    "TranscriptionJobName": job_name,
+                    "ContentFingerprint": fingerprint,
+                    "Transcript": {
+                        "TranscriptFileUri": f"https://s3.amazonaws.com/{summaries_bucket}/{reused_keys['transcription_key']}"
+                    }
+                },
+                "Deduplication": {
+                    "Hit": True,
+                    "ContentFingerprint": fingerprint,
+                    "SourceKey": previous_run.get('input_key'),
+                    "Bucket": summaries_bucket,
+                    "Artifacts": reused_keys
+                }
+            }
+        
+        # Parse the RIFF chunk list and convert to 16 kHz mono PCM if needed
+        with metrics.stage('normalize') as stage:
+            wav_info = wav_format.parse_header(audio_file if memory_budget else audio_data)
+            metrics.set_property('SourceFormat', wav_info.describe())
+            converted = normalize_audio(audio_file if memory_budget else audio_data, wav_info)
+            if converted is not None:
+                if memory_budget:
+                    audio_file.close()
+                    audio_file = converted
+                    stage['bytes'] = os.fstat(audio_file.fileno()).st_size
+                else:
+                    audio_data = converted
+                    stage['bytes'] = len(audio_data)
+                debug(f"Converted {wav_info.describe()} audio to 16 kHz mono PCM")
+        
+        # Plan the largest chunks that fit the endpoint's payload limit
+        with metrics.stage('chunk') as stage:
+            plan = plan_wav_chunks(audio_file if memory_budget else BytesIO(audio_data),
+                                   getattr(backend, 'max_payload_bytes', None))
+            stage['ChunkCount'] = plan['chunk_count']
+            stage['PlannedPayloadBytes'] = plan['total_payload_bytes']
+        metrics.set_property('ChunkPlan', chunk_planner.plan_summary(plan))
+        debug(f"Chunk plan: {chunk_planner.plan_summary(plan)}")
+        
+        if memory_budget:
+            # Chunks are produced one at a time while they are transcribed
+            audio_file.seek(0)
+            with wave.open(audio_file, 'rb') as wav_file:
+                metrics.set_property('AudioDurationSeconds', round(wav_file.getnframes() / float(wav_file.getframerate()), 3))
+            audio_file.seek(0)
+            chunk_source = iter_wav_chunks(audio_file, plan)
+        else:
+            # Split audio into chunks
+            chunks = chunk_audio(audio_data, plan)
+            chunk_durations = [wav_duration_seconds(chunk) for chunk in chunks]
+            metrics.set_property('AudioDurationSeconds', round(sum(chunk_durations), 3))
+            chunk_starts = [sum(chunk_durations[:i]) for i in range(len(chunk_durations))]
+            chunk_source = ((chunk_data, start, start + duration)
+                            for chunk_data, start, duration in zip(chunks, chunk_starts, chunk_durations))
+        
+        # "Transcribing chunk N of M" for the job index and browsers watching the job
+        job_id = job_status.job_id_for_key(input_key)
+        job_status.notify(job_id, 'transcribing', inputKey=input_key,
+                          progress={'completed': 0, 'total': plan['chunk_count']})
+        
+        if backend.name == 'sagemaker-async':
+            # Chunks queue on the async endpoint; the state machine waits
+            # between collect_handler polls instead of this Lambda
+            return submit_async_transcription(backend, chunk_source, metrics, {
+                'job_id': job_id,
+                'job_name': job_name,
+                'input_key': input_key,
+                'output_key': output_key,
+                'summaries_bucket': summaries_bucket,
+                'fingerprint': fingerprint
+            })
         
         # Process each chunk
-        all_transcriptions = []
-        chunk_timings = []
-        cumulative_duration = 0
+        # Duplicate requests that run past the usual latency (HEDGE_ENABLED=true)
+        hedger = hedging.hedger_from_environment('whisper-inference', max_in_flight)
+        # PII is redacted chunk by chunk while later chunks are transcribed,
+        # so the transcript is never written to S3 unredacted (CHUNK_REDACTION)
+        redactor = chunk_redactor()
+        progress = job_status.progress_reporter(job_id, 'transcribing', plan['chunk_count'])
+        try:
+            transcribed = transcribe_chunks(backend, chunk_source, metrics, max_in_flight, hedger, redactor, progress)
+        finally:
+            if redactor:
+                redactor.close()
+                metrics.set_property('Redaction', redactor.stats())
+            if hedger:
+                hedge_stats = hedger.stats()
+                hedger.close()
+                metrics.set_property('HedgeRate', hedge_stats['hedge_rate'])
+                metrics.set_property('HedgeP99SavedMs', hedge_stats['p99_saved_ms'])
+                metrics.set_property('HedgeStats', hedge_stats)
+        metrics.set_property('EndpointStats' if backend.name == 'sagemaker' else 'BackendStats', backend.stats())
+        metrics.set_property('RateLimiters', rate_limiter.limiter_stats())
+        all_transcriptions = [result for result, _ in transcribed]
+        chunk_timings = [timing for _, timing in transcribed]
         
-        for i, chunk_data in enumerate(chunks, 1):
-            print(f"Processing chunk {i}/{len(chunks)}")
-            try:
-                # Get duration of this chunk (30 seconds per chunk, or less for the last chunk)
-                chunk_start = cumulative_duration
-                chunk_duration = 30  # Default chunk duration in seconds
-                chunk_end = chunk_start + chunk_duration
-                cumulative_duration = chunk_end
-                
-                # Use SageMaker runtime client with the endpoint name
-                # SageMaker endpoints use a different API than Bedrock
-                result = transcribe_chunk(sagemaker_runtime, chunk_data, endpoint_name)
-                
-                # For debugging
-                print(f"Transcription result type: {type(result)}")
-                if isinstance(result, dict):
-                    print(f"Result keys: {result.keys()}")
+        if memory_budget:
+            # Stream the transcript to /tmp instead of building the whole
+            # document (one dict per word) in memory
+            with metrics.stage('merge'), tempfile.TemporaryFile() as output_file:
+                texts = [result_text(result, i) for i, result in enumerate(all_transcriptions)]
+                del all_transcriptions, transcribed
+                write_transcribe_output(output_file, job_name, texts, chunk_timings)
+                output_size = output_file.tell()
+                output_file.seek(0)
                 
-                all_transcriptions.append(result)
-                chunk_timings.append((chunk_start, chunk_end))
-            except Exception as e:
-                print(f"Error processing chunk {i}: {str(e)}")
-                raise
+                with metrics.stage('upload') as stage:
+                    s3.upload_fileobj(output_file, summaries_bucket, output_key,
+                                      ExtraArgs={'ContentType': 'application/json',
+                                                 'Metadata': redaction_metadata(redactor)})
+                    stage['bytes'] = output_size
+            
+            print(f"Transcription saved to s3://{summaries_bucket}/{output_key}")
+            return {
+                "TranscriptionJob": {
+                    "TranscriptionJobStatus": "COMPLETED",
+                    "TranscriptionJobName": job_name,
+                    "ContentFingerprint": fingerprint,
+                    "Transcript": {
+                        "TranscriptFileUri": f"https://s3.amazonaws.com/{summaries_bucket}/{output_key}"
+                    }
+                }
+            }
         
         # Combine transcriptions into a format similar to AWS Transcribe output
+        merge_start = time.perf_counter()
         full_transcription = []
         all_items = []
         speaker_segments = []
         
         for i, (result, (start_time, end_time)) in enumerate(zip(all_transcriptions, chunk_timings)):
-            # Handle different response formats from the Whisper model
-            if isinstance(result, dict) and 'text' in result:
-                # Standard format with text field
-                text = result['text'] if isinstance(result['text'], str) else ' '.join(result['text'])
-            elif isinstance(result, str):
-                # Directly returned text string
-                text = result
-            else:
-                # Fallback for unexpected formats
-                print(f"Unexpected result format for chunk {i}: {type(result)}")
-                try:
-                    # Try to convert to string representation
-                    text = str(result)
-                except:
-                    text = f"[Unable to transcribe chunk {i}]"
-            
-            print(f"Processed text for chunk {i}: {text[:50]}...")
+            text = result_text(result, i)
             full_transcription.append(text)
             
             # Create simulated timestamps for words
@@ -626,16 +958,19 @@ def lambda_handler(event, context):
             "status": "COMPLETED"
         }
         
-        # Get the summaries bucket name from environment variables
-        summaries_bucket = os.environ.get('SUMMARIES_BUCKET', bucket)
+        metrics.record('merge', (time.perf_counter() - merge_start) * 1000)
         
         # Upload result to S3
-        s3.put_object(
-            Bucket=summaries_bucket,
-            Key=output_key,
-            Body=json.dumps(transcribe_output, indent=2),
-            ContentType='application/json'
-        )
+        with metrics.stage('upload') as stage:
+            transcription_body = json.dumps(transcribe_output, indent=2).encode('utf-8')
+            s3.put_object(
+                Bucket=summaries_bucket,
+                Key=output_key,
+                Body=transcription_body,
+                ContentType='application/json',
+                Metadata=redaction_metadata(redactor)
+            )
+            stage['bytes'] = len(transcription_body)
         
         print(f"Transcription saved to s3://{summaries_bucket}/{output_key}")
         
@@ -645,6 +980,7 @@ def lambda_handler(event, context):
             "TranscriptionJob": {
                 "TranscriptionJobStatus": "COMPLETED",
                 "TranscriptionJobName": job_name,
+                "ContentFingerprint": fingerprint,
                 "Transcript": {
                     "TranscriptFileUri": f"https://s3.amazonaws.com/{summaries_bucket}/{output_key}"
                 }
@@ -653,6 +989,7 @@ def lambda_handler(event, context):
         
     except Exception as e:
         print(f"Error: {str(e)}")
+        metrics.set_property('FailureReason', str(e))
         return {
             "TranscriptionJob": {
                 "TranscriptionJobStatus": "FAILED",
@@ -660,3 +997,293 @@ def lambda_handler(event, context):
                 "FailureReason": str(e)
             }
         }
+    finally:
+        if audio_file is not None:
+            audio_file.close()
+        metrics.flush()
+
+def chunk_redactor():
+    """redaction.ChunkRedactor for CHUNK_REDACTION, or None when it is off."""
+    return redaction.redactor_from_environment(
+        lambda: lambda_runtime.get_client('bedrock-runtime', region_name='us-east-1'))
+
+def redaction_metadata(redactor):
+    """S3 metadata telling later stages how the transcript was redacted."""
+    return {redaction.METADATA_KEY: redactor.describe()} if redactor else {}
+
+def transcribe_segment(s3, bucket, key, backend, metrics, max_in_flight=1, redactor=None):
+    """
+    Transcribe one standalone WAV segment of an incremental session.
+    
+    Segments are a few minutes long, so they are processed in memory.
+    
+    Returns:
+        (chunk texts, chunk durations in seconds)
+    """
+    with metrics.stage('download') as stage:
+        audio_data = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+        stage['bytes'] = len(audio_data)
+    if detect_audio_format(audio_data[:64]) != 'wav':
+        raise ValueError(f"Session segment {key} is not a WAV file")
+    with metrics.stage('normalize'):
+        converted = normalize_audio(audio_data, wav_format.parse_header(audio_data))
+        if converted is not None:
+            audio_data = converted
+    with metrics.stage('chunk'):
+        chunks = chunk_audio(audio_data, plan_wav_chunks(BytesIO(audio_data)))
+    durations = [wav_duration_seconds(chunk) for chunk in chunks]
+    starts = [sum(durations[:i]) for i in range(len(durations))]
+    transcribed = transcribe_chunks(backend, ((chunk, start, start + duration)
+                                              for chunk, start, duration in zip(chunks, starts, durations)),
+                                    metrics, max_in_flight, redactor=redactor)
+    return [result_text(result, i) for i, (result, _) in enumerate(transcribed)], durations
+
+def complete_session(s3, uploads_bucket, session_id, backend, metrics, max_in_flight=1, redactor=None):
+    """
+    Finish an incremental session: transcribe the segments that have no
+    stored transcript yet (normally only the tail), merge all of them into
+    the usual transcript document and hand it to the state machine.
+    
+    Returns:
+        The same result as lambda_handler for a whole recording
+    """
+    summaries_bucket = os.environ.get('SUMMARIES_BUCKET', uploads_bucket)
+    marker = json.loads(s3.get_object(Bucket=uploads_bucket, Key=f"sessions/{session_id}/complete.json")['Body'].read())
+    segment_count = int(marker['segments'])
+    name = marker.get('name') or f"{session_id}.wav"
+    input_key = f"uploads/{name}"
+    job_name = f"Transcription-Job-{name}"
+    output_key = f"Transcription-Output-for-{input_key}.txt"
+    metrics.set_property('InputKey', input_key)
+    
+    with metrics.stage('session_load'):
+        segments = transcript_sessions.load_segments(s3, summaries_bucket, session_id)
+    tail = [sequence for sequence in range(1, segment_count + 1) if sequence not in segments]
+    metrics.set_property('SessionSegments', segment_count)
+    metrics.set_property('TailSegments', len(tail))
+    for sequence in tail:
+        texts, durations = transcribe_segment(s3, uploads_bucket, transcript_sessions.segment_key(session_id, sequence),
+                                              backend, metrics, max_in_flight, redactor)
+        segments[sequence] = transcript_sessions.save_segment(s3, summaries_bucket, session_id, sequence, texts, durations,
+                                                              redactor.describe() if redactor else '')
+    
+    texts, chunk_timings = transcript_sessions.merge_segments(segments, segment_count)
+    # The merged transcript only counts as redacted if every segment was redacted the same way
+    redactions = {segment.get('redaction', '') for segment in segments.values()}
+    metadata = {redaction.METADATA_KEY: redactions.pop()} if len(redactions) == 1 and '' not in redactions else {}
+    metrics.set_property('AudioDurationSeconds', chunk_timings[-1][1] if chunk_timings else 0)
+    with metrics.stage('merge'), tempfile.TemporaryFile() as output_file:
+        write_transcribe_output(output_file, job_name, texts, chunk_timings)
+        output_size = output_file.tell()
+        output_file.seek(0)
+        with metrics.stage('upload') as stage:
+            s3.upload_fileobj(output_file, summaries_bucket, output_key,
+                              ExtraArgs={'ContentType': 'application/json', 'Metadata': metadata})
+            stage['bytes'] = output_size
+    print(f"Session {session_id} transcription saved to s3://{summaries_bucket}/{output_key}")
+    
+    result = {
+        "TranscriptionJob": {
+            "TranscriptionJobStatus": "COMPLETED",
+            "TranscriptionJobName": job_name,
+            "Transcript": {
+                "TranscriptFileUri": f"https://s3.amazonaws.com/{summaries_bucket}/{output_key}"
+            }
+        }
+    }
+    state_machine_arn = os.environ.get('STATE_MACHINE_ARN')
+    if state_machine_arn:
+        # Speaker identification and the summary run as for a whole upload;
+        # IncrementalSession makes the state machine skip transcription
+        try:
+            lambda_runtime.get_client('stepfunctions').start_execution(
+                stateMachineArn=state_machine_arn,
+                name=transcript_sessions.execution_name(session_id),
+                input=json.dumps({
+                    'IncrementalSession': {'SessionId': session_id, 'Segments': segment_count},
+                    'detail': {'bucket': {'name': uploads_bucket}, 'object': {'key': input_key}},
+                    'TranscriptionJob': {'Payload': result}
+                })
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ExecutionAlreadyExists':
+                raise
+    return result
+
+def segment_handler(event, context):
+    """
+    Incremental transcription of recordings uploaded as segments.
+    
+    Subscribed to S3 notifications for sessions/ in the uploads bucket. Each
+    segment-NNNNNN.wav is transcribed as soon as it lands and its transcript
+    is stored per session; complete.json ({"segments": N, "name": ...})
+    finishes the session with complete_session(), so after the upload ends
+    only the last segment and the merge are left to do.
+    """
+    s3 = lambda_runtime.get_client('s3')
+    max_in_flight = max(int(os.environ.get('CHUNK_CONCURRENCY', '1')), 1)
+    summaries_bucket = os.environ.get('SUMMARIES_BUCKET')
+    results = []
+    for record in event.get('Records', []):
+        bucket = record['s3']['bucket']['name']
+        key = unquote_plus(record['s3']['object']['key'])
+        parsed = transcript_sessions.parse_session_key(key)
+        if parsed is None:
+            print(f"Ignoring s3://{bucket}/{key}: not a session segment or completion marker")
+            continue
+        kind, session_id, sequence = parsed
+        metrics = StageMetrics('whisper-transcription')
+        metrics.set_property('SessionId', session_id)
+        backend = transcription_backends.backend_from_environment(transcription_backends.backend_name(event))
+        redactor = chunk_redactor()
+        try:
+            if kind == 'segment':
+                texts, durations = transcribe_segment(s3, bucket, key, backend, metrics, max_in_flight, redactor)
+                transcript_sessions.save_segment(s3, summaries_bucket or bucket, session_id, sequence, texts, durations,
+                                                 redactor.describe() if redactor else '')
+                results.append({'session_id': session_id, 'segment': sequence, 'chunks': len(texts)})
+            else:
+                result = complete_session(s3, bucket, session_id, backend, metrics, max_in_flight, redactor)
+                results.append({'session_id': session_id, 'completed': True,
+                                'transcript_uri': result['TranscriptionJob']['Transcript']['TranscriptFileUri']})
+        finally:
+            if redactor:
+                redactor.close()
+            metrics.flush()
+    return {'processed': results}
+
+def async_result(manifest, manifest_key, completed):
+    """State machine result of an async transcription that is still running."""
+    return {
+        "TranscriptionJob": {
+            "TranscriptionJobStatus": "IN_PROGRESS",
+            "TranscriptionJobName": manifest['job_name'],
+            "ContentFingerprint": manifest.get('fingerprint')
+        },
+        "AsyncInference": {
+            "Bucket": manifest['summaries_bucket'],
+            "ManifestKey": manifest_key,
+            "Completed": completed,
+            "Total": len(manifest['chunks'])
+        }
+    }
+
+def submit_async_transcription(backend, chunk_source, metrics, job):
+    """
+    Queue every chunk on the async endpoint and store the job's manifest.
+    
+    Chunks are uploaded one at a time, so memory budget mode still holds at
+    most one chunk in memory.
+    
+    Returns:
+        The IN_PROGRESS result the state machine polls collect_handler with
+    """
+    chunks = []
+    with metrics.stage('async_submit') as stage:
+        for index, (chunk_data, start_time, end_time) in enumerate(chunk_source):
+            submission = backend.submit(chunk_data, f"{job['job_id']}-{index:05d}")
+            chunks.append(dict(submission, start=start_time, end=end_time))
+            del chunk_data
+        stage['ChunkCount'] = len(chunks)
+    metrics.set_property('BackendStats', backend.stats())
+    manifest = dict(job, chunks=chunks, submittedAt=round(time.time(), 3))
+    s3 = lambda_runtime.get_client('s3')
+    key = async_inference.save_manifest(s3, job['summaries_bucket'], job['job_id'], manifest)
+    print(f"Queued {len(chunks)} chunks of {job['input_key']} on the async endpoint")
+    return async_result(manifest, key, 0)
+
+def async_deadline_seconds():
+    """
+    How long collect_handler waits for the async endpoint, from submission.
+    
+    ASYNC_INFERENCE_DEADLINE_SECONDS (default 1500) should stay below the
+    state machine timeout, so a chunk that never answers fails the job with
+    a reason instead of running into the execution timeout.
+    """
+    return int(os.environ.get('ASYNC_INFERENCE_DEADLINE_SECONDS', '1500'))
+
+def collect_handler(event, context):
+    """
+    Poll an async transcription started by lambda_handler.
+    
+    Invoked by the state machine after each wait with the previous result.
+    Chunks are checked in order from the first unfinished one, with HEAD
+    requests only. While any chunk is pending the IN_PROGRESS result is
+    returned again, until async_deadline_seconds() have passed since
+    submission; the job then fails. Once all are done the texts are redacted
+    (CHUNK_REDACTION), merged and written like a synchronous transcription,
+    and the same COMPLETED result is returned.
+    """
+    metrics = StageMetrics('whisper-transcription')
+    s3 = lambda_runtime.get_client('s3')
+    reference = event['AsyncInference']
+    manifest = async_inference.load_manifest(s3, reference['Bucket'], reference['ManifestKey'])
+    chunks = manifest['chunks']
+    metrics.set_property('InputKey', manifest['input_key'])
+    redactor = None
+    try:
+        with metrics.stage('async_poll'):
+            completed = reference.get('Completed', 0)
+            while completed < len(chunks):
+                state = async_inference.chunk_state(s3, chunks[completed])
+                if state == 'failed':
+                    async_inference.fetch_result(s3, chunks[completed])
+                if state != 'done':
+                    break
+                completed += 1
+        job_status.notify(manifest['job_id'], 'transcribing', progress={'completed': completed, 'total': len(chunks)})
+        if completed < len(chunks):
+            deadline = async_deadline_seconds()
+            if time.time() - manifest['submittedAt'] > deadline:
+                raise async_inference.AsyncInferenceError(
+                    f"Async inference {chunks[completed].get('InferenceId')} (chunk {completed + 1} of "
+                    f"{len(chunks)}) has no output or failure after {deadline} seconds")
+            return async_result(manifest, reference['ManifestKey'], completed)
+        
+        with metrics.stage('async_fetch'):
+            texts = [result_text(transcription_backends.as_result(async_inference.fetch_result(s3, chunk)), i)
+                     for i, chunk in enumerate(chunks)]
+        redactor = chunk_redactor()
+        if redactor:
+            with metrics.stage('redaction'):
+                texts = redactor.results([redactor.submit(text) for text in texts])
+            metrics.set_property('Redaction', redactor.stats())
+        chunk_timings = [(chunk['start'], chunk['end']) for chunk in chunks]
+        metrics.set_property('AudioDurationSeconds', round(chunk_timings[-1][1], 3) if chunk_timings else 0)
+        metrics.set_property('AsyncWaitSeconds', round(time.time() - manifest['submittedAt'], 3))
+        
+        summaries_bucket, output_key = manifest['summaries_bucket'], manifest['output_key']
+        with metrics.stage('merge'), tempfile.TemporaryFile() as output_file:
+            write_transcribe_output(output_file, manifest['job_name'], texts, chunk_timings)
+            output_size = output_file.tell()
+            output_file.seek(0)
+            with metrics.stage('upload') as stage:
+                s3.upload_fileobj(output_file, summaries_bucket, output_key,
+                                  ExtraArgs={'ContentType': 'application/json',
+                                             'Metadata': redaction_metadata(redactor)})
+                stage['bytes'] = output_size
+        print(f"Transcription saved to s3://{summaries_bucket}/{output_key}")
+        return {
+            "TranscriptionJob": {
+                "TranscriptionJobStatus": "COMPLETED",
+                "TranscriptionJobName": manifest['job_name'],
+                "ContentFingerprint": manifest.get('fingerprint'),
+                "Transcript": {
+                    "TranscriptFileUri": f"https://s3.amazonaws.com/{summaries_bucket}/{output_key}"
+                }
+            }
+        }
+    except async_inference.AsyncInferenceError as e:
+        print(f"Error: {str(e)}")
+        metrics.set_property('FailureReason', str(e))
+        return {
+            "TranscriptionJob": {
+                "TranscriptionJobStatus": "FAILED",
+                "TranscriptionJobName": manifest['job_name'],
+                "FailureReason": str(e)
+            }
+        }
+    finally:
+        if redactor:
+            redactor.close()
+        metrics.flush()
@@ -1,3 +1,5 @@
+import * as path from 'path';
+import { execSync } from 'child_process';
 import * as cdk from 'aws-cdk-lib';
 import { Construct } from 'constructs';
 import * as s3 from 'aws-cdk-lib/aws-s3';
@@ -5,12 +7,18 @@ import * as s3deploy from 'aws-cdk-lib/aws-s3-deployment';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import * as iam from 'aws-cdk-lib/aws-iam';
 import * as apigateway from 'aws-cdk-lib/aws-apigateway';
+import * as apigatewayv2 from 'aws-cdk-lib/aws-apigatewayv2';
+import * as apigatewayv2Integrations from 'aws-cdk-lib/aws-apigatewayv2-integrations';
 import * as cloudfront from 'aws-cdk-lib/aws-cloudfront';
 import * as origins from 'aws-cdk-lib/aws-cloudfront-origins';
 import * as s3n from 'aws-cdk-lib/aws-s3-notifications';
 import * as logs from 'aws-cdk-lib/aws-logs';
 import * as sfn from 'aws-cdk-lib/aws-stepfunctions';
 import * as tasks from 'aws-cdk-lib/aws-stepfunctions-tasks';
+import * as events from 'aws-cdk-lib/aws-events';
+import * as targets from 'aws-cdk-lib/aws-events-targets';
+import * as sqs from 'aws-cdk-lib/aws-sqs';
+import * as lambdaEventSources from 'aws-cdk-lib/aws-lambda-event-sources';
 
 export class AudioSummarizerStack extends cdk.Stack {
   constructor(scope: Construct, id: string, props?: cdk.StackProps) {
@@ -67,15 +75,46 @@ export class AudioSummarizerStack extends cdk.Stack {
       code: lambda.Code.fromAsset('lambda'),
       memorySize: 2048,
       timeout: cdk.Duration.seconds(600),  // 10-minute timeout for larger files
+      // Memory budget mode spools the recording to /tmp instead of holding it in memory
+      ephemeralStorageSize: cdk.Size.gibibytes(2),
       environment: {
         UPLOADS_BUCKET: uploadsBucket.bucketName,
         SUMMARIES_BUCKET: summariesBucket.bucketName,
         REGION: cdk.Stack.of(this).region,
-        WHISPER_ENDPOINT: 'endpoint-quick-start-irrc7' // Must be configured before deployment
+        WHISPER_ENDPOINT: 'endpoint-quick-start-irrc7', // Must be configured before deployment
+        // Optional comma-separated endpoints (or endpoint/variant) to load balance across,
+        // e.g. `cdk deploy -c whisperEndpoints=whisper-a,whisper-b/variant-2`
+        WHISPER_ENDPOINTS: String(this.node.tryGetContext('whisperEndpoints') ?? ''),
+        // sagemaker, sagemaker-async (WHISPER_ASYNC_ENDPOINT) or http (TRANSCRIPTION_HTTP_URL);
+        // events can pick a backend per job
+        TRANSCRIPTION_BACKEND: String(this.node.tryGetContext('transcriptionBackend') ?? 'sagemaker'),
+        // Asynchronous inference endpoint; its S3OutputPath should be
+        // s3://<summaries bucket>/async-inference/output/
+        WHISPER_ASYNC_ENDPOINT: String(this.node.tryGetContext('whisperAsyncEndpoint') ?? ''),
+        TRANSCRIPTION_HTTP_URL: String(this.node.tryGetContext('transcriptionHttpUrl') ?? ''),
+        // Hedged requests for slow chunks: at most 10% of requests are duplicated
+        HEDGE_ENABLED: String(this.node.tryGetContext('hedgeEnabled') ?? 'false'),
+        HEDGE_PERCENTILE: '95',
+        HEDGE_MAX_RATIO: '0.1',
+        MEMORY_BUDGET_MODE: 'true',
+        CHUNK_CONCURRENCY: '2',
+        // PII redaction of each chunk while the rest is still transcribing: regex, guardrail,
+        // regex,guardrail or none. With the guardrail step the summary skips its first pass
+        CHUNK_REDACTION: String(this.node.tryGetContext('chunkRedaction') ?? 'regex,guardrail'),
+        GUARDRAIL_ID: 'arn:aws:bedrock:us-east-1:064080936720:guardrail-profile/us.guardrail.v1:0' // Must be configured before deployment
       },
       logRetention: logs.RetentionDays.ONE_WEEK
     });
 
+    // NumPy converts float, 24-bit and WAVE_FORMAT_EXTENSIBLE recordings to 16 kHz mono PCM.
+    // Provide it as a layer (e.g. built from layer/requirements.txt) with
+    // `cdk deploy -c numpyLayerArn=arn:aws:lambda:...`; without it only plain PCM WAVs are accepted
+    const numpyLayerArn = this.node.tryGetContext('numpyLayerArn');
+    if (numpyLayerArn) {
+      whisperTranscriptionFunction.addLayers(
+        lambda.LayerVersion.fromLayerVersionArn(this, 'NumpyLayer', String(numpyLayerArn)));
+    }
+
     // Add Bedrock permissions to the Whisper transcription Lambda with specific model ARNs
     whisperTranscriptionFunction.addToRolePolicy(new iam.PolicyStatement({
       effect: iam.Effect.ALLOW, 
@@ -90,6 +129,46 @@ export class AudioSummarizerStack extends cdk.Stack {
       ] // Restricted to specific models
     }));
 
+    // Guardrail step of the per-chunk redaction
+    whisperTranscriptionFunction.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['bedrock:ApplyGuardrail'],
+      resources: ['*']
+    }));
+
+    // Asynchronous inference (TRANSCRIPTION_BACKEND=sagemaker-async): the
+    // Whisper function queues every chunk from async-inference/input/ and
+    // returns; the state machine waits asyncPollSeconds between polls of
+    // this function, which merges the outputs once all chunks are done
+    whisperTranscriptionFunction.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['sagemaker:InvokeEndpointAsync'],
+      resources: [`arn:aws:sagemaker:${cdk.Stack.of(this).region}:${cdk.Stack.of(this).account}:endpoint/*`]
+    }));
+    const asyncCollectFunction = new lambda.Function(this, 'AsyncTranscriptionCollectFunction', {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      handler: 'whisper-transcription.collect_handler',
+      code: lambda.Code.fromAsset('lambda'),
+      memorySize: 1024,
+      timeout: cdk.Duration.seconds(120),
+      environment: {
+        SUMMARIES_BUCKET: summariesBucket.bucketName,
+        CHUNK_REDACTION: String(this.node.tryGetContext('chunkRedaction') ?? 'regex,guardrail'),
+        GUARDRAIL_ID: 'arn:aws:bedrock:us-east-1:064080936720:guardrail-profile/us.guardrail.v1:0' // Must be configured before deployment
+      },
+      logRetention: logs.RetentionDays.ONE_WEEK
+    });
+    asyncCollectFunction.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['bedrock:ApplyGuardrail'],
+      resources: ['*']
+    }));
+    const asyncPollSeconds = Number(this.node.tryGetContext('asyncPollSeconds') ?? 15);
+    // Fail the job when a chunk has neither an output nor a failure object
+    // this long after submission, ahead of the 30 minute execution timeout
+    asyncCollectFunction.addEnvironment('ASYNC_INFERENCE_DEADLINE_SECONDS',
+      String(this.node.tryGetContext('asyncDeadlineSeconds') ?? 1500));
+
     // Create Speaker Identification Lambda
     const speakerIdentificationFunction = new lambda.Function(this, 'SpeakerIdentificationFunction', {
       runtime: lambda.Runtime.PYTHON_3_12, // Updated to latest Python runtime
@@ -142,7 +221,12 @@ export class AudioSummarizerStack extends cdk.Stack {
       environment: {
         SUMMARIES_BUCKET: summariesBucket.bucketName,
         REGION: cdk.Stack.of(this).region,
-        GUARDRAIL_ID: 'arn:aws:bedrock:us-east-1:064080936720:guardrail-profile/us.guardrail.v1:0' // Must be configured before deployment
+        GUARDRAIL_ID: 'arn:aws:bedrock:us-east-1:064080936720:guardrail-profile/us.guardrail.v1:0', // Must be configured before deployment
+        // Model tiers by transcript length; empty uses lambda/summary_routing.json.
+        // Override with `cdk deploy -c summaryRoutingPolicy='{"tiers": [...]}'`
+        SUMMARY_ROUTING_POLICY: String(this.node.tryGetContext('summaryRoutingPolicy') ?? ''),
+        // Comma separated lambda/prompt_compaction.py steps; 'none' sends the transcript as is
+        PROMPT_COMPACTION_STEPS: String(this.node.tryGetContext('promptCompactionSteps') ?? 'merge_turns,coarsen_timestamps,collapse_disfluencies,alias_speakers')
       },
       logRetention: logs.RetentionDays.ONE_WEEK
     });
@@ -157,7 +241,10 @@ export class AudioSummarizerStack extends cdk.Stack {
       resources: [
         // Specify the exact model ARNs that will be used
         `arn:aws:bedrock:${cdk.Stack.of(this).region}:${cdk.Stack.of(this).account}:model/anthropic.claude-3-sonnet-20240229-v1:0`,
-        `arn:aws:bedrock:${cdk.Stack.of(this).region}:${cdk.Stack.of(this).account}:model/anthropic.claude-3-haiku-20240307-v1:0`
+        `arn:aws:bedrock:${cdk.Stack.of(this).region}:${cdk.Stack.of(this).account}:model/anthropic.claude-3-haiku-20240307-v1:0`,
+        // Models chosen by summary_routing.json
+        `arn:aws:bedrock:${cdk.Stack.of(this).region}::foundation-model/anthropic.claude-3-haiku-20240307-v1:0`,
+        `arn:aws:bedrock:${cdk.Stack.of(this).region}::foundation-model/anthropic.claude-3-5-sonnet-20240620-v1:0`
       ] // Restricted to specific models
     }));
     
@@ -179,38 +266,221 @@ export class AudioSummarizerStack extends cdk.Stack {
     summariesBucket.grantReadWrite(speakerIdentificationFunction);
     summariesBucket.grantReadWrite(piiRedactionFunction);
     summariesBucket.grantReadWrite(bedrockSummaryFunction);
+    summariesBucket.grantReadWrite(asyncCollectFunction);
+    // Async inference requests and outputs are only needed until the transcript is merged
+    summariesBucket.addLifecycleRule({
+      prefix: 'async-inference/',
+      expiration: cdk.Duration.days(7)
+    });
 
-    // Create Step Function for orchestration
-    // Define the state machine
-    const transcribeTask = new tasks.LambdaInvoke(this, 'TranscribeAudio', {
-      lambdaFunction: whisperTranscriptionFunction,
-      outputPath: '$.Payload',
+    // Batch summarization for archive backfills (see lambda/batch-summary.py).
+    // Bedrock batch inference reads the JSONL input from and writes results to
+    // the summaries bucket with its own service role
+    const batchInferenceRole = new iam.Role(this, 'BatchInferenceRole', {
+      assumedBy: new iam.ServicePrincipal('bedrock.amazonaws.com'),
     });
+    summariesBucket.grantReadWrite(batchInferenceRole, 'batch-summaries/*');
+    batchInferenceRole.addToPolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['bedrock:InvokeModel'],
+      resources: [`arn:aws:bedrock:${cdk.Stack.of(this).region}::foundation-model/*`]
+    }));
 
-    const identifySpeakersTask = new tasks.LambdaInvoke(this, 'IdentifySpeakers', {
-      lambdaFunction: speakerIdentificationFunction,
-      outputPath: '$.Payload',
+    const batchSummaryFunction = new lambda.Function(this, 'BatchSummaryFunction', {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      handler: 'batch-summary.lambda_handler',
+      code: lambda.Code.fromAsset('lambda'),
+      memorySize: 1024,
+      timeout: cdk.Duration.minutes(15),
+      // The JSONL batch input is spooled to /tmp
+      ephemeralStorageSize: cdk.Size.gibibytes(4),
+      environment: {
+        SUMMARIES_BUCKET: summariesBucket.bucketName,
+        GUARDRAIL_ID: 'arn:aws:bedrock:us-east-1:064080936720:guardrail-profile/us.guardrail.v1:0', // Must be configured before deployment
+        BATCH_ROLE_ARN: batchInferenceRole.roleArn,
+        BATCH_GUARDRAIL_CONCURRENCY: '8'
+      },
+      logRetention: logs.RetentionDays.ONE_WEEK
     });
+    summariesBucket.grantReadWrite(batchSummaryFunction);
+    batchSummaryFunction.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: [
+        'bedrock:CreateModelInvocationJob',
+        'bedrock:GetModelInvocationJob',
+        'bedrock:ApplyGuardrail'
+      ],
+      resources: ['*']
+    }));
+    batchInferenceRole.grantPassRole(batchSummaryFunction.role!);
 
-    const redactPIITask = new tasks.LambdaInvoke(this, 'RedactPII', {
-      lambdaFunction: piiRedactionFunction,
-      outputPath: '$.Payload',
+    // Opt-in profiling of the Python pipeline Lambdas (see lambda/profiling.py).
+    // Enable with `cdk deploy -c profilingEnabled=true`; snapshots are written
+    // under profiles/ in the summaries bucket
+    const profilingEnabled = String(this.node.tryGetContext('profilingEnabled') ?? 'false');
+    for (const fn of [whisperTranscriptionFunction, speakerIdentificationFunction, bedrockSummaryFunction]) {
+      fn.addEnvironment('PROFILING_ENABLED', profilingEnabled);
+      fn.addEnvironment('PROFILE_SAMPLE_EVERY', String(this.node.tryGetContext('profileSampleEvery') ?? 1));
+      fn.addEnvironment('PROFILE_S3_URI', `s3://${summariesBucket.bucketName}/profiles/`);
+    }
+
+    // Callback-based completion for the Amazon Transcribe path (executions
+    // started with useWhisper false). The start function parks the task
+    // token and starts the job; the completion function resumes the
+    // execution as soon as Transcribe emits its job-state-change event.
+    const transcribeCallbackStartFunction = new lambda.Function(this, 'TranscribeCallbackStartFunction', {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      handler: 'transcribe-callback.start_handler',
+      code: lambda.Code.fromAsset('lambda'),
+      memorySize: 256,
+      timeout: cdk.Duration.seconds(30),
+      environment: {
+        SUMMARIES_BUCKET: summariesBucket.bucketName
+      },
+      logRetention: logs.RetentionDays.ONE_WEEK
     });
 
-    const generateSummaryTask = new tasks.LambdaInvoke(this, 'GenerateSummary', {
-      lambdaFunction: bedrockSummaryFunction,
-      outputPath: '$.Payload',
+    const transcribeCallbackFunction = new lambda.Function(this, 'TranscribeCallbackFunction', {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      handler: 'transcribe-callback.lambda_handler',
+      code: lambda.Code.fromAsset('lambda'),
+      memorySize: 256,
+      timeout: cdk.Duration.seconds(30),
+      environment: {
+        SUMMARIES_BUCKET: summariesBucket.bucketName
+      },
+      logRetention: logs.RetentionDays.ONE_WEEK
     });
 
-    // Define a workflow that combines all these steps
-    const definition = transcribeTask
-      .next(identifySpeakersTask)
-      .next(redactPIITask)
-      .next(generateSummaryTask);
+    transcribeCallbackStartFunction.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['transcribe:StartTranscriptionJob'],
+      resources: ['*'] // Transcribe does not support resource-level permissions for this action
+    }));
+    transcribeCallbackFunction.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['transcribe:GetTranscriptionJob'],
+      resources: ['*']
+    }));
+
+    // Create Step Function for orchestration
+    // Amazon Transcribe instead of Whisper. The execution waits for the task
+    // token the completion function returns; polling GetTranscriptionJob is
+    // only the fallback when the event does not arrive within 15 minutes.
+    // Both leave the job in $.TranscriptionJob.TranscriptionJob, which
+    // speaker identification reads directly
+    const buildTranscribeBranch = (prefix: string, speakersAndSummary: sfn.IChainable) => {
+      const jobName = sfn.JsonPath.format('Transcription-Job-{}', sfn.JsonPath.arrayGetItem(
+        sfn.JsonPath.stringSplit(sfn.JsonPath.stringAt('$.detail.object.key'), '/'), 1));
+      const startTranscriptionTask = new tasks.LambdaInvoke(this, `${prefix}StartTranscriptionJob`, {
+        lambdaFunction: transcribeCallbackStartFunction,
+        integrationPattern: sfn.IntegrationPattern.WAIT_FOR_TASK_TOKEN,
+        payload: sfn.TaskInput.fromObject({
+          TaskToken: sfn.JsonPath.taskToken,
+          TranscriptionJob: {
+            Media: {
+              MediaFileUri: sfn.JsonPath.format('s3://{}/{}',
+                sfn.JsonPath.stringAt('$.detail.bucket.name'), sfn.JsonPath.stringAt('$.detail.object.key'))
+            },
+            LanguageCode: 'en-US',
+            Settings: { ShowSpeakerLabels: true, MaxSpeakerLabels: 30 },
+            TranscriptionJobName: jobName,
+            OutputBucketName: summariesBucket.bucketName,
+            OutputKey: sfn.JsonPath.format('Transcription-Output-for-{}.txt', sfn.JsonPath.stringAt('$.detail.object.key'))
+          }
+        }),
+        taskTimeout: sfn.Timeout.duration(cdk.Duration.minutes(15)),
+        resultPath: '$.TranscriptionJob'
+      });
+      const getTranscriptionJob = new tasks.CallAwsService(this, `${prefix}GetTranscriptionJob`, {
+        service: 'transcribe',
+        action: 'getTranscriptionJob',
+        parameters: { TranscriptionJobName: jobName },
+        iamResources: ['*'],
+        resultPath: '$.TranscriptionJob'
+      });
+      const waitForTranscription = new sfn.Wait(this, `${prefix}WaitForTranscription`, {
+        time: sfn.WaitTime.duration(cdk.Duration.seconds(30))
+      });
+      const transcribeJobStatus = new sfn.Choice(this, `${prefix}TranscribeJobStatus`)
+        .when(sfn.Condition.stringEquals('$.TranscriptionJob.TranscriptionJob.TranscriptionJobStatus', 'COMPLETED'),
+          speakersAndSummary)
+        .when(sfn.Condition.stringEquals('$.TranscriptionJob.TranscriptionJob.TranscriptionJobStatus', 'FAILED'),
+          new sfn.Fail(this, `${prefix}TranscribeJobFailed`, { error: 'FAILED', cause: 'transcription job failed' }))
+        .otherwise(waitForTranscription);
+      waitForTranscription.next(getTranscriptionJob);
+      getTranscriptionJob.next(transcribeJobStatus);
+      startTranscriptionTask.addCatch(getTranscriptionJob, { errors: ['States.Timeout'], resultPath: sfn.JsonPath.DISCARD });
+      return startTranscriptionTask.next(transcribeJobStatus);
+    };
+
+    // Define the state machine. The same Whisper -> speakers -> PII ->
+    // summary steps back the Standard workflow and the Express fast lane,
+    // so the states are built once per workflow (prefix '' for Standard).
+    // Express workflows cannot wait for task tokens, so only the Standard
+    // workflow gets the Transcribe branch
+    const buildPipeline = (prefix: string, withTranscribe: boolean) => {
+      const transcribeTask = new tasks.LambdaInvoke(this, `${prefix}TranscribeAudio`, {
+        lambdaFunction: whisperTranscriptionFunction,
+        outputPath: '$.Payload',
+      });
+
+      const identifySpeakersTask = new tasks.LambdaInvoke(this, `${prefix}IdentifySpeakers`, {
+        lambdaFunction: speakerIdentificationFunction,
+        outputPath: '$.Payload',
+      });
+
+      const redactPIITask = new tasks.LambdaInvoke(this, `${prefix}RedactPII`, {
+        lambdaFunction: piiRedactionFunction,
+        outputPath: '$.Payload',
+      });
+
+      const generateSummaryTask = new tasks.LambdaInvoke(this, `${prefix}GenerateSummary`, {
+        lambdaFunction: bedrockSummaryFunction,
+        outputPath: '$.Payload',
+      });
+
+      // Async inference: wait on the Step Functions side, then poll
+      const waitForAsyncInference = new sfn.Wait(this, `${prefix}WaitForAsyncInference`, {
+        time: sfn.WaitTime.duration(cdk.Duration.seconds(asyncPollSeconds))
+      });
+      const collectAsyncTask = new tasks.LambdaInvoke(this, `${prefix}CollectAsyncTranscription`, {
+        lambdaFunction: asyncCollectFunction,
+        outputPath: '$.Payload',
+      });
+
+      // Uploads whose content was already processed stop after transcription;
+      // the Whisper function has copied the earlier artifacts to the new keys
+      const reuseExistingResults = new sfn.Succeed(this, `${prefix}ReuseExistingResults`, {
+        comment: 'Identical content already processed - artifacts reused'
+      });
+
+      // Define a workflow that combines all these steps
+      const speakersAndSummary = identifySpeakersTask
+        .next(redactPIITask)
+        .next(generateSummaryTask);
+      const transcriptionStatus = new sfn.Choice(this, `${prefix}ContentAlreadyProcessed`)
+        .when(sfn.Condition.stringEquals('$.TranscriptionJob.TranscriptionJobStatus', 'DEDUPLICATED'), reuseExistingResults)
+        .when(sfn.Condition.stringEquals('$.TranscriptionJob.TranscriptionJobStatus', 'IN_PROGRESS'), waitForAsyncInference)
+        .otherwise(speakersAndSummary);
+      waitForAsyncInference.next(collectAsyncTask).next(transcriptionStatus);
+
+      // Incremental sessions arrive with their transcript already merged
+      // (whisper-transcription.segment_handler) and skip transcription
+      const entry = new sfn.Choice(this, `${prefix}TranscriptAlreadyMerged`)
+        .when(sfn.Condition.isPresent('$.IncrementalSession'), speakersAndSummary);
+      if (withTranscribe) {
+        entry.when(sfn.Condition.and(
+          sfn.Condition.isPresent('$.useWhisper'),
+          sfn.Condition.booleanEquals('$.useWhisper', false)
+        ), buildTranscribeBranch(prefix, speakersAndSummary));
+      }
+      return entry.otherwise(transcribeTask.next(transcriptionStatus));
+    };
 
     // Create the state machine with the defined workflow
     const stateMachine = new sfn.StateMachine(this, 'AudioSummarizerWorkflow', {
-      definition,
+      definition: buildPipeline('', true),
       timeout: cdk.Duration.minutes(30),
       tracingEnabled: true, // Enable X-Ray tracing
       logs: {
@@ -221,8 +491,67 @@ export class AudioSummarizerStack extends cdk.Stack {
       }
     });
 
+    // Publishes job status (lambda/job-status.py): WebSocket subscriptions,
+    // execution status change events and Express pipeline failures
+    const jobStatusFunction = new lambda.Function(this, 'JobStatusFunction', {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      handler: 'job-status.lambda_handler',
+      code: lambda.Code.fromAsset('lambda'),
+      memorySize: 256,
+      timeout: cdk.Duration.seconds(30),
+      environment: {
+        SUMMARIES_BUCKET: summariesBucket.bucketName
+      },
+      logRetention: logs.RetentionDays.ONE_WEEK
+    });
+
+    // Express fast lane for short recordings: no per-transition charge or
+    // latency, but executions are capped at 5 minutes, so the intake only
+    // routes recordings below expressMaxDurationSeconds (WAV) or
+    // expressMaxMb (other files) here. Set expressMaxDurationSeconds to 0
+    // to send everything to the Standard workflow
+    const expressMaxDurationSeconds = Number(this.node.tryGetContext('expressMaxDurationSeconds') ?? 300);
+    const expressMaxMb = Number(this.node.tryGetContext('expressMaxMb') ?? 10);
+    // Express executions emit no status change events, so a failed step is
+    // caught around the whole pipeline and published from the workflow.
+    // Executions stopped by the timeout run no further state; the job index
+    // reports those as failed once the timeout has passed
+    const publishExpressFailure = new tasks.LambdaInvoke(this, 'ExpressPublishFailure', {
+      lambdaFunction: jobStatusFunction,
+      payload: sfn.TaskInput.fromObject({
+        'detail-type': 'Pipeline Execution Failed',
+        detail: {
+          status: 'FAILED',
+          error: sfn.JsonPath.stringAt('$.Failure.Error'),
+          cause: sfn.JsonPath.stringAt('$.Failure.Cause'),
+          input: { detail: sfn.JsonPath.objectAt('$.detail') }
+        }
+      }),
+      resultPath: sfn.JsonPath.DISCARD
+    });
+    const expressPipeline = new sfn.Parallel(this, 'ExpressPipeline')
+      .branch(buildPipeline('Express', false))
+      .addCatch(publishExpressFailure.next(new sfn.Fail(this, 'ExpressPipelineFailed', {
+        errorPath: '$.Failure.Error',
+        causePath: '$.Failure.Cause'
+      })), { errors: [sfn.Errors.ALL], resultPath: '$.Failure' });
+
+    const expressTimeout = cdk.Duration.minutes(5);
+    const expressStateMachine = new sfn.StateMachine(this, 'AudioSummarizerExpressWorkflow', {
+      definition: expressPipeline,
+      stateMachineType: sfn.StateMachineType.EXPRESS,
+      timeout: expressTimeout,
+      tracingEnabled: true,
+      logs: {
+        destination: new logs.LogGroup(this, 'ExpressStateMachineLogs', {
+          retention: logs.RetentionDays.ONE_WEEK
+        }),
+        level: sfn.LogLevel.ERROR
+      }
+    });
+
     // Grant Step Function permissions to invoke Lambda functions and access S3
-    // No transcribe permissions needed as we're using Whisper directly
+    // (the GetTranscriptionJob fallback task grants its own Transcribe permission)
 
     // Grant more specific S3 permissions to the state machine
     // For bucket level operations (ListBucket)
@@ -252,6 +581,27 @@ export class AudioSummarizerStack extends cdk.Stack {
     speakerIdentificationFunction.grantInvoke(stateMachine);
     bedrockSummaryFunction.grantInvoke(stateMachine);
 
+    // Transcribe reads the media and writes the transcript with the start
+    // function's credentials
+    uploadsBucket.grantRead(transcribeCallbackStartFunction);
+    summariesBucket.grantReadWrite(transcribeCallbackStartFunction);
+    summariesBucket.grantReadWrite(transcribeCallbackFunction);
+    stateMachine.grantTaskResponse(transcribeCallbackFunction);
+    transcribeCallbackStartFunction.grantInvoke(stateMachine);
+
+    new events.Rule(this, 'TranscribeJobStateChangeRule', {
+      description: 'Resumes the state machine when a Transcribe job finishes',
+      eventPattern: {
+        source: ['aws.transcribe'],
+        detailType: ['Transcribe Job State Change'],
+        detail: {
+          TranscriptionJobStatus: ['COMPLETED', 'FAILED'],
+          TranscriptionJobName: [{ prefix: 'Transcription-Job-' }]
+        }
+      },
+      targets: [new targets.LambdaFunction(transcribeCallbackFunction)]
+    });
+
     // Create API access logs group with appropriate retention
     const apiAccessLogs = new logs.LogGroup(this, 'ApiAccessLogs', {
       retention: logs.RetentionDays.ONE_WEEK,
@@ -353,64 +703,248 @@ export class AudioSummarizerStack extends cdk.Stack {
       resources: [`${summariesBucket.bucketArn}/*`]
     }));
 
-    // Create S3 event processor to trigger Step Function
-    const s3EventProcessor = new lambda.Function(this, 'S3EventProcessor', {
-      runtime: lambda.Runtime.NODEJS_20_X, // Updated to latest Node.js runtime
-      handler: 'index.handler',
+    // Multipart uploads for large recordings: the browser uploads parts in
+    // parallel to presigned URLs and resumes interrupted uploads, and this
+    // function completes them (lambda/multipart-upload.py)
+    const multipartUploadFunction = new lambda.Function(this, 'MultipartUploadFunction', {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      handler: 'multipart-upload.lambda_handler',
+      code: lambda.Code.fromAsset('lambda'),
+      memorySize: 256,
+      timeout: cdk.Duration.seconds(25),
       environment: {
-        USE_WHISPER: 'true',  // Set to true to use Whisper by default
+        UPLOADS_BUCKET: uploadsBucket.bucketName,
+        UPLOAD_PART_SIZE_MB: String(this.node.tryGetContext('uploadPartSizeMb') ?? 16),
+        UPLOAD_URL_EXPIRY_SECONDS: '3600'
       },
-      code: lambda.Code.fromInline(`
-        const { SFNClient, StartExecutionCommand } = require('@aws-sdk/client-sfn');
-        const sfnClient = new SFNClient();
-        
-        exports.handler = async (event) => {
-          console.log('Received S3 event:', JSON.stringify(event, null, 2));
-          
-          try {
-            for (const record of event.Records) {
-              console.log('Processing record:', JSON.stringify(record, null, 2));
-              
-              // Default to using Whisper instead of AWS Transcribe
-              const useWhisper = process.env.USE_WHISPER === 'true';
-              console.log('Using Whisper for transcription:', useWhisper);
-              
-              const params = {
-                stateMachineArn: '${stateMachine.stateMachineArn}',
-                input: JSON.stringify({
-                  detail: {
-                    bucket: { name: record.s3.bucket.name },
-                    object: { key: record.s3.object.key }
-                  },
-                  useWhisper: useWhisper
-                })
-              };
-              
-              console.log('Starting Step Function execution with params:', JSON.stringify(params, null, 2));
-              
-              const command = new StartExecutionCommand(params);
-              const result = await sfnClient.send(command);
-              console.log('Step Function execution started:', result);
+      logRetention: logs.RetentionDays.ONE_WEEK
+    });
+    multipartUploadFunction.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: [
+        's3:PutObject', // CreateMultipartUpload, UploadPart (presigned) and CompleteMultipartUpload
+        's3:ListMultipartUploadParts',
+        's3:AbortMultipartUpload'
+      ],
+      resources: [`${uploadsBucket.bucketArn}/uploads/*`]
+    }));
+
+    // Push job status to the browser over a WebSocket API instead of polling
+    // check-summary. The pipeline functions publish each stage (with chunk
+    // progress while transcribing) and the summary key as soon as it is
+    // written; execution status changes cover the start and failures
+    const jobStatusIntegration = new apigatewayv2Integrations.WebSocketLambdaIntegration('JobStatusIntegration', jobStatusFunction);
+    const jobStatusApi = new apigatewayv2.WebSocketApi(this, 'JobStatusApi', {
+      apiName: 'Audio Summarizer Job Status',
+      connectRouteOptions: { integration: jobStatusIntegration },
+      disconnectRouteOptions: { integration: jobStatusIntegration },
+      defaultRouteOptions: { integration: jobStatusIntegration }
+    });
+    jobStatusApi.addRoute('subscribe', { integration: jobStatusIntegration });
+    const jobStatusStage = new apigatewayv2.WebSocketStage(this, 'JobStatusStage', {
+      webSocketApi: jobStatusApi,
+      stageName: 'prod',
+      autoDeploy: true
+    });
+    const statusPublishers = [whisperTranscriptionFunction, asyncCollectFunction, speakerIdentificationFunction,
+      bedrockSummaryFunction, jobStatusFunction];
+    for (const publisher of statusPublishers) {
+      publisher.addEnvironment('STATUS_WEBSOCKET_ENDPOINT', jobStatusStage.callbackUrl);
+      jobStatusStage.grantManagementApiAccess(publisher);
+    }
+    whisperTranscriptionFunction.addEnvironment('STATUS_MIN_INTERVAL_SECONDS', '2');
+    jobStatusFunction.addEnvironment('EXPRESS_TIMEOUT_SECONDS', String(expressTimeout.toSeconds()));
+    summariesBucket.grantReadWrite(jobStatusFunction);
+
+    // Job index: one record per upload (stage, stage timings, artifact keys,
+    // failure reason) written by every stage, so check-summary and
+    // fetch-summary answer with a single key lookup (lambda/job_index.py)
+    for (const writer of statusPublishers) {
+      writer.addEnvironment('JOB_INDEX_BACKEND', 's3');
+    }
+    // Its conditional writes (IfMatch) need botocore>=1.36, which the Python
+    // runtime does not guarantee, so the index users get a pinned SDK layer
+    // (boto3-layer/requirements.txt). Bundled with a local pip when there is
+    // one, in the runtime's build image otherwise
+    const boto3Layer = new lambda.LayerVersion(this, 'Boto3Layer', {
+      code: lambda.Code.fromAsset('boto3-layer', {
+        bundling: {
+          image: lambda.Runtime.PYTHON_3_12.bundlingImage,
+          command: ['bash', '-c', 'pip install -r requirements.txt -t /asset-output/python'],
+          local: {
+            tryBundle(outputDir: string) {
+              try {
+                execSync(`pip3 install -r ${path.join('boto3-layer', 'requirements.txt')} -t ${path.join(outputDir, 'python')}`,
+                  { stdio: 'inherit' });
+                return true;
+              } catch {
+                return false;
+              }
             }
-          } catch (error) {
-            console.error('Error processing S3 event:', error);
-            throw error;
           }
-        };
-      `)
+        }
+      }),
+      compatibleRuntimes: [lambda.Runtime.PYTHON_3_12],
+      description: 'boto3/botocore with conditional PutObject for the job index'
+    });
+    for (const writer of statusPublishers) {
+      writer.addLayers(boto3Layer);
+    }
+    const jobLookupFunction = new lambda.Function(this, 'JobLookupFunction', {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      handler: 'job-lookup.lambda_handler',
+      code: lambda.Code.fromAsset('lambda'),
+      memorySize: 256,
+      timeout: cdk.Duration.seconds(25),
+      environment: {
+        SUMMARIES_BUCKET: summariesBucket.bucketName,
+        JOB_INDEX_BACKEND: 's3',
+        EXPRESS_TIMEOUT_SECONDS: String(expressTimeout.toSeconds())
+      },
+      layers: [boto3Layer],
+      logRetention: logs.RetentionDays.ONE_WEEK
+    });
+    summariesBucket.grantRead(jobLookupFunction);
+    new events.Rule(this, 'JobStatusExecutionRule', {
+      description: 'Publishes job status when a pipeline execution starts or ends',
+      eventPattern: {
+        source: ['aws.states'],
+        detailType: ['Step Functions Execution Status Change'],
+        detail: {
+          stateMachineArn: [stateMachine.stateMachineArn],
+          status: ['RUNNING', 'SUCCEEDED', 'FAILED', 'TIMED_OUT', 'ABORTED']
+        }
+      },
+      targets: [new targets.LambdaFunction(jobStatusFunction)]
+    });
+    new cdk.CfnOutput(this, 'JobStatusWebSocketUrl', {
+      description: 'WebSocket URL for job status (REACT_APP_STATUS_WEBSOCKET_URL)',
+      value: jobStatusStage.url
     });
 
+    // Buffered intake between S3 events and the state machine. Uploads are
+    // queued and a consumer starts executions only while fewer than
+    // maxInFlightExecutions are running, so bulk uploads do not overrun the
+    // single Whisper endpoint. Limits can be tuned with CDK context values.
+    const maxInFlightExecutions = Number(this.node.tryGetContext('maxInFlightExecutions') ?? 10);
+    const intakeMaxReceiveCount = Number(this.node.tryGetContext('intakeMaxReceiveCount') ?? 50);
+
+    const intakeDeadLetterQueue = new sqs.Queue(this, 'IntakeDeadLetterQueue', {
+      encryption: sqs.QueueEncryption.SQS_MANAGED,
+      enforceSSL: true,
+      retentionPeriod: cdk.Duration.days(14)
+    });
+
+    const intakeQueue = new sqs.Queue(this, 'IntakeQueue', {
+      encryption: sqs.QueueEncryption.SQS_MANAGED,
+      enforceSSL: true,
+      visibilityTimeout: cdk.Duration.seconds(360), // 6x the consumer timeout
+      retentionPeriod: cdk.Duration.days(4),
+      deadLetterQueue: {
+        queue: intakeDeadLetterQueue,
+        maxReceiveCount: intakeMaxReceiveCount
+      }
+    });
+
+    const s3EventProcessor = new lambda.Function(this, 'S3EventProcessor', {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      handler: 'intake-queue.lambda_handler',
+      code: lambda.Code.fromAsset('lambda'),
+      memorySize: 256,
+      timeout: cdk.Duration.seconds(60),
+      environment: {
+        USE_WHISPER: 'true',  // Set to true to use Whisper by default
+        STATE_MACHINE_ARN: stateMachine.stateMachineArn,
+        INTAKE_QUEUE_URL: intakeQueue.queueUrl,
+        MAX_IN_FLIGHT_EXECUTIONS: String(maxInFlightExecutions),
+        INTAKE_DEFER_SECONDS: '60',
+        JOB_INDEX_BACKEND: 's3',
+        SUMMARIES_BUCKET: summariesBucket.bucketName,
+        ...(expressMaxDurationSeconds > 0 ? {
+          EXPRESS_STATE_MACHINE_ARN: expressStateMachine.stateMachineArn,
+          EXPRESS_MAX_DURATION_SECONDS: String(expressMaxDurationSeconds),
+          EXPRESS_MAX_MB: String(expressMaxMb),
+          EXPRESS_TIMEOUT_SECONDS: String(expressTimeout.toSeconds())
+        } : {})
+      },
+      layers: [boto3Layer], // Job index (see Boto3Layer)
+      logRetention: logs.RetentionDays.ONE_WEEK
+    });
+
+    s3EventProcessor.addEventSource(new lambdaEventSources.SqsEventSource(intakeQueue, {
+      batchSize: 10,
+      maxBatchingWindow: cdk.Duration.seconds(5),
+      maxConcurrency: 2, // Serialises the in-flight check between consumers
+      reportBatchItemFailures: true
+    }));
+
     // Grant permissions
     stateMachine.grantStartExecution(s3EventProcessor);
+    stateMachine.grantRead(s3EventProcessor); // ListExecutions for the in-flight limit
+    expressStateMachine.grantStartExecution(s3EventProcessor);
+    uploadsBucket.grantRead(s3EventProcessor, 'uploads/*'); // WAV header for the lane choice
+    summariesBucket.grantReadWrite(s3EventProcessor, 'job-index/*');
+    intakeQueue.grantConsumeMessages(s3EventProcessor);
+    intakeQueue.grantSendMessages(s3EventProcessor); // Deferred messages are requeued with a delay
     uploadsBucket.addEventNotification(
       s3.EventType.OBJECT_CREATED_PUT,
-      new s3n.LambdaDestination(s3EventProcessor)
+      new s3n.SqsDestination(intakeQueue),
+      { prefix: 'uploads/' }
+    );
+    // Large recordings arrive as multipart uploads
+    uploadsBucket.addEventNotification(
+      s3.EventType.OBJECT_CREATED_COMPLETE_MULTIPART_UPLOAD,
+      new s3n.SqsDestination(intakeQueue),
+      { prefix: 'uploads/' }
+    );
+
+    // Incremental transcription of recordings uploaded as segments: each
+    // sessions/<id>/segment-NNNNNN.wav is transcribed as it lands, and
+    // sessions/<id>/complete.json merges the session and starts the state
+    // machine at speaker identification
+    const sessionTranscriptionFunction = new lambda.Function(this, 'SessionTranscriptionFunction', {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      handler: 'whisper-transcription.segment_handler',
+      code: lambda.Code.fromAsset('lambda'),
+      memorySize: 2048,
+      timeout: cdk.Duration.seconds(600),
+      environment: {
+        SUMMARIES_BUCKET: summariesBucket.bucketName,
+        WHISPER_ENDPOINT: 'endpoint-quick-start-irrc7', // Must be configured before deployment
+        WHISPER_ENDPOINTS: String(this.node.tryGetContext('whisperEndpoints') ?? ''),
+        CHUNK_CONCURRENCY: '2',
+        CHUNK_REDACTION: String(this.node.tryGetContext('chunkRedaction') ?? 'regex,guardrail'),
+        GUARDRAIL_ID: 'arn:aws:bedrock:us-east-1:064080936720:guardrail-profile/us.guardrail.v1:0', // Must be configured before deployment
+        STATE_MACHINE_ARN: stateMachine.stateMachineArn
+      },
+      logRetention: logs.RetentionDays.ONE_WEEK
+    });
+    sessionTranscriptionFunction.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['sagemaker:InvokeEndpoint'],
+      resources: [`arn:aws:sagemaker:${cdk.Stack.of(this).region}:${cdk.Stack.of(this).account}:endpoint/*`]
+    }));
+    sessionTranscriptionFunction.addToRolePolicy(new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['bedrock:ApplyGuardrail'],
+      resources: ['*']
+    }));
+    uploadsBucket.grantRead(sessionTranscriptionFunction, 'sessions/*');
+    summariesBucket.grantReadWrite(sessionTranscriptionFunction);
+    stateMachine.grantStartExecution(sessionTranscriptionFunction);
+    uploadsBucket.addEventNotification(
+      s3.EventType.OBJECT_CREATED_PUT,
+      new s3n.LambdaDestination(sessionTranscriptionFunction),
+      { prefix: 'sessions/' }
     );
 
     // Create API endpoints with proxy integration
     const apiIntegration = new apigateway.LambdaIntegration(apiFunction, {
       proxy: true
     });
+    const jobLookupIntegration = new apigateway.LambdaIntegration(jobLookupFunction, {
+      proxy: true
+    });
 
     // Create and configure resources with explicit CORS
     const corsOptions = {
@@ -435,7 +969,7 @@ export class AudioSummarizerStack extends cdk.Stack {
     const checkSummary = checkSummaryRoot.addResource('{uuid}');
 
     // Add GET method with enhanced validation
-    checkSummary.addMethod('GET', apiIntegration, {
+    checkSummary.addMethod('GET', jobLookupIntegration, {
       requestValidator: requestValidator,
       requestParameters: {
         'method.request.path.uuid': true  // Require the uuid parameter
@@ -463,7 +997,7 @@ export class AudioSummarizerStack extends cdk.Stack {
     const fetchSummary = fetchSummaryRoot.addResource('{filename}');
 
     // Add GET method with enhanced validation
-    fetchSummary.addMethod('GET', apiIntegration, {
+    fetchSummary.addMethod('GET', jobLookupIntegration, {
       requestValidator: requestValidator,
       requestParameters: {
         'method.request.path.filename': true  // Require the filename parameter
@@ -494,6 +1028,16 @@ export class AudioSummarizerStack extends cdk.Stack {
       }]
     });
 
+    // Multipart upload endpoints: start, parts (uploaded parts and part URLs), complete and abort
+    const multipartIntegration = new apigateway.LambdaIntegration(multipartUploadFunction, {
+      proxy: true
+    });
+    const multipartUpload = api.root.addResource('multipart-upload');
+    multipartUpload.addMethod('POST', multipartIntegration);
+    for (const action of ['parts', 'complete', 'abort']) {
+      multipartUpload.addResource(action).addMethod('POST', multipartIntegration);
+    }
+
     // Output the API endpoint URL
     new cdk.CfnOutput(this, 'ApiEndpoint', {
       description: 'API Gateway endpoint URL',
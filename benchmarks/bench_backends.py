@@ -0,0 +1,114 @@
+"""
+Compare transcription backends in real-time factor per core.
+
+Sends the same set of WAV chunks through each backend in
+backend-cdk/lambda/transcription_backends.py and reports, per backend:
+
+    rtf           wall seconds per second of audio (lower is faster)
+    rtf_per_core  core seconds per second of audio, i.e. rtf x cores used;
+                  the number to compare when pricing instances
+
+Cores are the worker processes for the cpu backend and --endpoint-cores
+for the remote backends (the vCPUs behind the endpoint). By default the
+SageMaker and HTTP backends are local stand-ins with a fixed latency per
+audio second and the cpu backend burns --cpu-seconds-per-audio-second of
+CPU; pass --cpu-loader transcription_backends:load_faster_whisper (with
+faster-whisper installed) to measure the real int8 model.
+
+Usage:
+    python benchmarks/bench_backends.py --chunks 16 --chunk-seconds 30 --workers 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend-cdk', 'lambda'))
+
+import lambda_runtime  # noqa: E402
+import endpoint_router  # noqa: E402
+import transcription_backends  # noqa: E402
+import local_aws  # noqa: E402
+
+
+def run_backend(backend, chunks, concurrency):
+    """Wall seconds to transcribe every chunk with `concurrency` requests in flight."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(backend.transcribe, chunks))
+    return time.perf_counter() - start
+
+
+def summarize(wall_seconds, audio_seconds, cores):
+    return {
+        'wall_seconds': round(wall_seconds, 3),
+        'audio_seconds': round(audio_seconds, 3),
+        'cores': cores,
+        'rtf': round(wall_seconds / audio_seconds, 4),
+        'rtf_per_core': round(wall_seconds * cores / audio_seconds, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare transcription backends in real-time factor per core')
+    parser.add_argument('--chunks', type=int, default=16, help='Chunks per backend')
+    parser.add_argument('--chunk-seconds', type=float, default=30.0, help='Audio seconds per chunk')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='CPU backend worker processes')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight for the remote backends')
+    parser.add_argument('--endpoint-cores', type=int, default=4, help='vCPUs behind the remote endpoint')
+    parser.add_argument('--endpoint-latency', type=float, default=0.02,
+                        help='Stand-in endpoint seconds per audio second')
+    parser.add_argument('--cpu-loader', default='local_aws:load_placeholder_engine', help='CPU engine loader')
+    parser.add_argument('--cpu-model', default='base', help='Whisper model of the CPU engine')
+    parser.add_argument('--cpu-seconds-per-audio-second', type=float, default=0.05,
+                        help='CPU the placeholder engine burns per audio second')
+    parser.add_argument('--backends', default='sagemaker,http,cpu', help='Backends to compare')
+    args = parser.parse_args()
+
+    chunk = local_aws.generate_wav(args.chunk_seconds)
+    chunks = [chunk] * args.chunks
+    audio_seconds = args.chunk_seconds * args.chunks
+
+    os.environ.setdefault('RATE_LIMITER_INITIAL_RPS', '10000')
+    report = {}
+    for name in args.backends.split(','):
+        if name == 'sagemaker':
+            lambda_runtime.register_client('sagemaker-runtime', local_aws.LocalSageMakerRuntime(
+                latency_per_audio_second=args.endpoint_latency), region_name='us-east-1')
+            backend = transcription_backends.SageMakerBackend(
+                lambda_runtime.get_client('sagemaker-runtime', region_name='us-east-1'),
+                endpoint_router.EndpointRouter([('local-whisper', None)]))
+            report[name] = summarize(run_backend(backend, chunks, args.concurrency), audio_seconds, args.endpoint_cores)
+        elif name == 'http':
+            with local_aws.LocalWhisperServer(latency_per_audio_second=args.endpoint_latency) as server:
+                backend = transcription_backends.HttpBackend(server.url)
+                report[name] = summarize(run_backend(backend, chunks, args.concurrency), audio_seconds,
+                                         args.endpoint_cores)
+        elif name == 'cpu':
+            loader = args.cpu_loader
+            if loader == 'local_aws:load_placeholder_engine':
+                os.environ['PLACEHOLDER_CPU_SECONDS'] = str(args.cpu_seconds_per_audio_second)
+                loader = 'bench_backends:load_placeholder_engine'
+            backend = transcription_backends.CpuBackend(args.cpu_model, 'int8', args.workers, loader)
+            try:
+                # Load the model in every worker before timing
+                run_backend(backend, [local_aws.generate_wav(0.1)] * args.workers, args.workers)
+                report[name] = summarize(run_backend(backend, chunks, args.workers), audio_seconds, args.workers)
+            finally:
+                backend.close()
+        else:
+            raise SystemExit(f"Unknown backend: {name}")
+
+    print(json.dumps(report, indent=2))
+
+
+def load_placeholder_engine(model, compute_type):
+    """Placeholder engine burning PLACEHOLDER_CPU_SECONDS of CPU per audio second."""
+    return local_aws.load_placeholder_engine(model, compute_type,
+                                             float(os.environ.get('PLACEHOLDER_CPU_SECONDS', '0')))
+
+
+if __name__ == '__main__':
+    main()
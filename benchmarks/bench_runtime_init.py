@@ -0,0 +1,124 @@
+"""
+Benchmark per-invocation setup overhead of the Python Lambda functions.
+
+Compares the setup each invocation used to perform (fresh boto3 clients,
+PATH rewrite, `ffmpeg -version` subprocess and directory listings) with the
+shared warm-container runtime in backend-cdk/lambda/lambda_runtime.py.
+No AWS calls are made; only client construction and local setup are timed.
+
+Usage:
+    python benchmarks/bench_runtime_init.py --invocations 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend-cdk', 'lambda'))
+
+import lambda_runtime  # noqa: E402
+
+
+def legacy_whisper_setup():
+    """Setup performed on every invocation before the shared runtime existed."""
+    s3 = boto3.client('s3')
+    s3 = boto3.client('s3')
+    sagemaker_runtime = boto3.client('sagemaker-runtime', region_name='us-east-1')
+
+    for path in lambda_runtime.FFMPEG_SEARCH_PATHS:
+        if path not in os.environ.get('PATH', ''):
+            os.environ['PATH'] = f"{path}:{os.environ.get('PATH', '')}"
+
+    try:
+        subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True, check=False)
+    except Exception:
+        pass
+
+    for path in lambda_runtime.FFMPEG_SEARCH_PATHS:
+        if os.path.exists(path):
+            try:
+                os.listdir(path)
+            except Exception:
+                pass
+    return s3, sagemaker_runtime
+
+
+def legacy_summary_setup():
+    s3 = boto3.client('s3')
+    bedrock = boto3.client(service_name="bedrock-runtime", region_name="us-east-1")
+    return s3, bedrock
+
+
+def legacy_speaker_setup():
+    boto3.Session()
+    s3_client = boto3.client('s3')
+    s3 = boto3.client('s3')
+    return s3_client, s3
+
+
+def runtime_whisper_setup():
+    s3 = lambda_runtime.get_client('s3')
+    sagemaker_runtime = lambda_runtime.get_client('sagemaker-runtime', region_name='us-east-1')
+    lambda_runtime.find_ffmpeg()
+    return s3, sagemaker_runtime
+
+
+def runtime_summary_setup():
+    return lambda_runtime.get_client('s3'), lambda_runtime.get_client('bedrock-runtime', region_name='us-east-1')
+
+
+def runtime_speaker_setup():
+    return lambda_runtime.get_client('s3')
+
+
+def time_invocations(setup, invocations):
+    """Return per-invocation setup times in milliseconds."""
+    timings = []
+    for _ in range(invocations):
+        start = time.perf_counter()
+        setup()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        'cold_ms': round(timings[0], 3),
+        'warm_mean_ms': round(sum(timings[1:]) / max(len(timings) - 1, 1), 3),
+        'warm_p50_ms': round(ordered[len(ordered) // 2], 3),
+        'total_ms': round(sum(timings), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure Lambda per-invocation init overhead')
+    parser.add_argument('--invocations', type=int, default=20, help='Invocations to simulate per handler')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+    handlers = {
+        'whisper-transcription': (legacy_whisper_setup, runtime_whisper_setup),
+        'bedrock-summary': (legacy_summary_setup, runtime_summary_setup),
+        'speaker-identification': (legacy_speaker_setup, runtime_speaker_setup),
+    }
+
+    report = {}
+    for name, (legacy, runtime) in handlers.items():
+        lambda_runtime.reset_clients()
+        lambda_runtime.reset_ffmpeg_cache()
+        report[name] = {
+            'before': summarize(time_invocations(legacy, args.invocations)),
+            'after': summarize(time_invocations(runtime, args.invocations)),
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
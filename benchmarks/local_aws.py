@@ -0,0 +1,583 @@
+"""
+In-process stand-ins for the AWS services used by the Lambda pipeline.
+
+The stand-ins implement only the client methods the handlers call, count
+every API call and the bytes moved, and can add latency or throttle a share
+of requests. Register them with lambda_runtime.register_client so the
+handlers pick them up instead of real boto3 clients.
+"""
+import io
+import base64
+import json
+import math
+import hashlib
+import time
+import wave
+import random
+import struct
+import threading
+import http.server
+from collections import Counter, defaultdict
+
+from botocore.exceptions import ClientError
+
+
+def throttling_error(operation_name):
+    """Build the ClientError botocore raises for a throttled request."""
+    return ClientError(
+        {'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'},
+         'ResponseMetadata': {'HTTPStatusCode': 400}},
+        operation_name
+    )
+
+
+class StreamingBody:
+    """Minimal stand-in for botocore's StreamingBody."""
+
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self, amt=None):
+        return self._stream.read() if amt is None else self._stream.read(amt)
+
+    def iter_chunks(self, chunk_size=1024 * 1024):
+        while True:
+            chunk = self._stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        self._stream.close()
+
+
+class LocalService:
+    """Shared call accounting, latency and throttling for the stand-ins."""
+
+    def __init__(self, latency_seconds=0.0, throttle_rate=0.0, seed=0):
+        self.latency_seconds = latency_seconds
+        self.throttle_rate = throttle_rate
+        self.calls = Counter()
+        self.throttled = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _begin(self, operation_name, bytes_in=0, extra_latency=0.0, throttle_rate=None):
+        if throttle_rate is None:
+            throttle_rate = self.throttle_rate
+        with self._lock:
+            self.calls[operation_name] += 1
+            self.bytes_in += bytes_in
+            throttled = throttle_rate and self._random.random() < throttle_rate
+            if throttled:
+                self.throttled[operation_name] += 1
+        if self.latency_seconds or extra_latency:
+            time.sleep(self.latency_seconds + extra_latency)
+        if throttled:
+            raise throttling_error(operation_name)
+
+    def _sent(self, nbytes):
+        with self._lock:
+            self.bytes_out += nbytes
+
+    def stats(self):
+        return {
+            'calls': dict(self.calls),
+            'throttled': dict(self.throttled),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out
+        }
+
+
+class LocalS3(LocalService):
+    """
+    In-memory S3 bucket store. User metadata is kept next to the objects and
+    multipart uploads in `uploads` until they are completed or aborted.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.objects = {}
+        self.metadata = {}
+        self.uploads = {}
+
+    def _missing(self, operation_name):
+        return ClientError({'Error': {'Code': 'NoSuchKey', 'Message': 'Not found'}}, operation_name)
+
+    def _etag(self, key):
+        return f'"{hashlib.md5(self.objects[key]).hexdigest()}"'
+
+    def put_object(self, Bucket, Key, Body=b'', Metadata=None, IfMatch=None, IfNoneMatch=None, **kwargs):
+        data = Body.encode('utf-8') if isinstance(Body, str) else bytes(Body)
+        self._begin('PutObject', bytes_in=len(data))
+        with self._lock:
+            # Conditional writes compare and replace in one step, like S3
+            exists = (Bucket, Key) in self.objects
+            if (IfNoneMatch == '*' and exists) or (
+                    IfMatch is not None and (not exists or self._etag((Bucket, Key)) != IfMatch)):
+                raise ClientError({'Error': {'Code': 'PreconditionFailed', 'Message': 'At least one of the '
+                                             'pre-conditions you specified did not hold'}}, 'PutObject')
+            self.objects[(Bucket, Key)] = data
+            self.metadata[(Bucket, Key)] = dict(Metadata or {})
+            return {'ETag': self._etag((Bucket, Key))}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._begin('GetObject')
+        if (Bucket, Key) not in self.objects:
+            raise self._missing('GetObject')
+        data = self.objects[(Bucket, Key)]
+        if 'Range' in kwargs:
+            start, end = kwargs['Range'].replace('bytes=', '').split('-')
+            data = data[int(start):int(end) + 1 if end else None]
+        self._sent(len(data))
+        return {'Body': StreamingBody(data), 'ContentLength': len(data), 'ETag': self._etag((Bucket, Key)),
+                'Metadata': dict(self.metadata.get((Bucket, Key), {}))}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._begin('HeadObject')
+        if (Bucket, Key) not in self.objects:
+            raise self._missing('HeadObject')
+        return {'ContentLength': len(self.objects[(Bucket, Key)]), 'ETag': self._etag((Bucket, Key)),
+                'Metadata': dict(self.metadata.get((Bucket, Key), {}))}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self._begin('CopyObject')
+        source = (CopySource['Bucket'], CopySource['Key'])
+        if source not in self.objects:
+            raise self._missing('CopyObject')
+        self.objects[(Bucket, Key)] = self.objects[source]
+        if kwargs.get('MetadataDirective') == 'REPLACE':
+            self.metadata[(Bucket, Key)] = dict(kwargs.get('Metadata', {}))
+        else:
+            self.metadata[(Bucket, Key)] = dict(self.metadata.get(source, {}))
+        return {}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._begin('DeleteObject')
+        self.objects.pop((Bucket, Key), None)
+        self.metadata.pop((Bucket, Key), None)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', **kwargs):
+        self._begin('ListObjectsV2')
+        contents = [{'Key': key, 'Size': len(data)}
+                    for (bucket, key), data in sorted(self.objects.items())
+                    if bucket == Bucket and key.startswith(Prefix)]
+        return {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': False}
+
+    def download_fileobj(self, Bucket, Key, Fileobj, **kwargs):
+        response = self.get_object(Bucket=Bucket, Key=Key)
+        for chunk in response['Body'].iter_chunks():
+            Fileobj.write(chunk)
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, **kwargs):
+        self.put_object(Bucket=Bucket, Key=Key, Body=Fileobj.read(), Metadata=(ExtraArgs or {}).get('Metadata'))
+
+    def create_multipart_upload(self, Bucket, Key, Metadata=None, **kwargs):
+        self._begin('CreateMultipartUpload')
+        upload_id = f"upload-{len(self.uploads) + 1}"
+        self.uploads[upload_id] = {'Bucket': Bucket, 'Key': Key, 'Metadata': dict(Metadata or {}), 'Parts': {}}
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def _upload(self, operation_name, Bucket, Key, UploadId):
+        upload = self.uploads.get(UploadId)
+        if not upload or (upload['Bucket'], upload['Key']) != (Bucket, Key):
+            raise ClientError({'Error': {'Code': 'NoSuchUpload', 'Message': 'Upload not found'}}, operation_name)
+        return upload
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        params = dict(Params or {})
+        bucket, key = params.pop('Bucket'), params.pop('Key')
+        # Query parameter names as S3 uses them, e.g. partNumber=1&uploadId=...
+        query = '&'.join(f"{name[0].lower()}{name[1:]}={value}" for name, value in sorted(params.items()))
+        return f"https://{bucket}.s3.local/{key}?{query}&X-Amz-Expires={ExpiresIn}"
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body=b'', **kwargs):
+        """What a browser PUT to a presigned UploadPart URL does."""
+        data = Body.encode('utf-8') if isinstance(Body, str) else bytes(Body)
+        self._begin('UploadPart', bytes_in=len(data))
+        etag = f'"{PartNumber}-{len(data)}"'
+        self._upload('UploadPart', Bucket, Key, UploadId)['Parts'][PartNumber] = (etag, data)
+        return {'ETag': etag}
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker=0, MaxParts=1000, **kwargs):
+        self._begin('ListParts')
+        parts = sorted(self._upload('ListParts', Bucket, Key, UploadId)['Parts'].items())
+        page = [(number, part) for number, part in parts if number > PartNumberMarker][:MaxParts]
+        truncated = bool(page) and page[-1][0] < parts[-1][0]
+        response = {'Parts': [{'PartNumber': number, 'ETag': etag, 'Size': len(data)} for number, (etag, data) in page],
+                    'IsTruncated': truncated}
+        if truncated:
+            response['NextPartNumberMarker'] = page[-1][0]
+        return response
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self._begin('CompleteMultipartUpload')
+        upload = self._upload('CompleteMultipartUpload', Bucket, Key, UploadId)
+        data = bytearray()
+        for part in MultipartUpload['Parts']:
+            etag, part_data = upload['Parts'].get(part['PartNumber'], (None, b''))
+            if etag != part['ETag']:
+                raise ClientError({'Error': {'Code': 'InvalidPart', 'Message': 'Part not found'}}, 'CompleteMultipartUpload')
+            data.extend(part_data)
+        del self.uploads[UploadId]
+        self.objects[(Bucket, Key)] = bytes(data)
+        self.metadata[(Bucket, Key)] = upload['Metadata']
+        return {'Bucket': Bucket, 'Key': Key, 'ETag': f'"{len(data)}-{len(MultipartUpload["Parts"])}"'}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self._begin('AbortMultipartUpload')
+        self._upload('AbortMultipartUpload', Bucket, Key, UploadId)
+        del self.uploads[UploadId]
+        return {}
+
+
+def wav_duration_seconds(wav_bytes):
+    """Duration of a WAV payload, or 0 if it cannot be parsed."""
+    try:
+        with wave.open(io.BytesIO(wav_bytes), 'rb') as wav_file:
+            return wav_file.getnframes() / float(wav_file.getframerate())
+    except (wave.Error, EOFError):
+        return 0.0
+
+
+def decode_whisper_payload(body, content_type='application/json'):
+    """WAV bytes of a Whisper request body in any chunk_planner format."""
+    if content_type.startswith('audio/'):
+        return body
+    payload = json.loads(body)
+    try:
+        return bytes.fromhex(payload['audio_input'])
+    except ValueError:
+        return base64.b64decode(payload['audio_input'])
+
+
+def placeholder_transcript(duration, words_per_second=2.5):
+    """Transcript of `words_per_second` placeholder words per second of audio."""
+    words = [f"word{i}" for i in range(int(math.ceil(duration * words_per_second)))]
+    return ' '.join(words) + ('.' if words else '')
+
+
+def load_placeholder_engine(model, compute_type, seconds_per_audio_second=0.0):
+    """
+    CPU engine for transcription_backends.CpuBackend that answers like
+    LocalSageMakerRuntime, optionally burning CPU for a share of the audio
+    length (CPU_ENGINE_LOADER=local_aws:load_placeholder_engine).
+    """
+    def transcribe(chunk_data):
+        duration = wav_duration_seconds(chunk_data)
+        deadline = time.process_time() + duration * seconds_per_audio_second
+        while time.process_time() < deadline:
+            pass
+        return placeholder_transcript(duration)
+    return transcribe
+
+
+class LocalWhisperServer:
+    """
+    HTTP stand-in for a Whisper inference server, for the http backend.
+
+    Answers POSTed request bodies like LocalSageMakerRuntime. Use it as a
+    context manager; `url` is set once the server is listening.
+    """
+
+    def __init__(self, latency_per_audio_second=0.0, words_per_second=2.5, port=0):
+        self.latency_per_audio_second = latency_per_audio_second
+        self.words_per_second = words_per_second
+        self.port = port
+        self.requests = 0
+        self.url = None
+        self._server = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                audio = decode_whisper_payload(body, self.headers.get('Content-Type', 'application/json'))
+                duration = wav_duration_seconds(audio)
+                time.sleep(duration * stand_in.latency_per_audio_second)
+                with stand_in._lock:
+                    stand_in.requests += 1
+                response = json.dumps({'text': placeholder_transcript(duration, stand_in.words_per_second)}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/invocations"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class LocalSageMakerRuntime(LocalService):
+    """
+    Whisper endpoint stand-in.
+
+    Latency is `latency_seconds` plus `latency_per_audio_second` for every
+    second of audio in the request, and the transcript contains
+    `words_per_second` placeholder words per second of audio.
+
+    Several endpoints can be simulated at once: `endpoint_latencies` and
+    `endpoint_throttle_rates` map endpoint names to extra latency and to a
+    throttle rate that replaces `throttle_rate`. Calls per endpoint are
+    counted in `endpoint_calls`. A `tail_latency_rate` share of calls takes
+    `tail_latency_seconds` longer, to simulate slow outliers.
+    """
+
+    def __init__(self, latency_per_audio_second=0.0, words_per_second=2.5, endpoint_latencies=None,
+                 endpoint_throttle_rates=None, tail_latency_rate=0.0, tail_latency_seconds=0.0,
+                 async_s3=None, defer_async=False, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_per_audio_second = latency_per_audio_second
+        self.words_per_second = words_per_second
+        self.endpoint_latencies = endpoint_latencies or {}
+        self.endpoint_throttle_rates = endpoint_throttle_rates or {}
+        self.endpoint_calls = Counter()
+        self.tail_latency_rate = tail_latency_rate
+        self.tail_latency_seconds = tail_latency_seconds
+        self.audio_seconds = 0.0
+        # Asynchronous inference reads inputs from and writes outputs to async_s3;
+        # with defer_async, queued requests only run in run_async_requests()
+        self.async_s3 = async_s3
+        self.defer_async = defer_async
+        self.async_queue = []
+
+    def transcribe_payload(self, body, content_type='application/json'):
+        """Decode a Whisper request body (any chunk_planner format) and return (duration, transcript)."""
+        duration = wav_duration_seconds(decode_whisper_payload(body, content_type))
+        return duration, placeholder_transcript(duration, self.words_per_second)
+
+    def invoke_endpoint(self, EndpointName, Body, ContentType='application/json', **kwargs):
+        body = Body.encode('utf-8') if isinstance(Body, str) else bytes(Body)
+        duration, text = self.transcribe_payload(body, ContentType)
+        with self._lock:
+            self.endpoint_calls[EndpointName] += 1
+            slow = self.tail_latency_rate and self._random.random() < self.tail_latency_rate
+        self._begin('InvokeEndpoint', bytes_in=len(body),
+                    extra_latency=(duration * self.latency_per_audio_second
+                                   + self.endpoint_latencies.get(EndpointName, 0.0)
+                                   + (self.tail_latency_seconds if slow else 0.0)),
+                    throttle_rate=self.endpoint_throttle_rates.get(EndpointName))
+        with self._lock:
+            self.audio_seconds += duration
+        response = json.dumps({'text': text}).encode('utf-8')
+        self._sent(len(response))
+        return {'Body': StreamingBody(response), 'ContentType': 'application/json'}
+
+    def invoke_endpoint_async(self, EndpointName, InputLocation, ContentType='application/json', InferenceId=None, **kwargs):
+        self._begin('InvokeEndpointAsync')
+        bucket, key = InputLocation[len('s3://'):].split('/', 1)
+        inference_id = InferenceId or key.rsplit('/', 1)[-1]
+        request = {
+            'EndpointName': EndpointName, 'InputLocation': InputLocation, 'ContentType': ContentType,
+            'OutputLocation': f"s3://{bucket}/async-inference/output/{inference_id}.out",
+            'FailureLocation': f"s3://{bucket}/async-inference/failure/{inference_id}.out"
+        }
+        with self._lock:
+            self.async_queue.append(request)
+        if not self.defer_async:
+            self.run_async_requests()
+        return {'InferenceId': inference_id, 'OutputLocation': request['OutputLocation'],
+                'FailureLocation': request['FailureLocation']}
+
+    def run_async_requests(self, fail=False):
+        """Process the queued async requests like the endpoint would; returns how many ran."""
+        with self._lock:
+            queue, self.async_queue = self.async_queue, []
+        for request in queue:
+            bucket, key = request['InputLocation'][len('s3://'):].split('/', 1)
+            if fail:
+                location, body = request['FailureLocation'], b'ModelError: local failure'
+            else:
+                location = request['OutputLocation']
+                body = self.invoke_endpoint(request['EndpointName'], self.async_s3.objects[(bucket, key)],
+                                            request['ContentType'])['Body'].read()
+            output_bucket, output_key = location[len('s3://'):].split('/', 1)
+            self.async_s3.put_object(Bucket=output_bucket, Key=output_key, Body=body)
+        return len(queue)
+
+
+class LocalBedrockRuntime(LocalService):
+    """Bedrock runtime stand-in for invoke_model and apply_guardrail."""
+
+    def __init__(self, latency_per_output_token=0.0, summary_text=None, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_per_output_token = latency_per_output_token
+        self.summary_text = summary_text or (
+            "Summary: Placeholder meeting summary.\n\n"
+            "Speakers: spk_0\n\n"
+            "Key Discussions:\n- Placeholder discussion\n\n"
+            "Action Items:\n- Placeholder action (Owner: spk_0)"
+        )
+        self.models = Counter()
+
+    def invoke_model(self, body, modelId, **kwargs):
+        data = body.encode('utf-8') if isinstance(body, str) else bytes(body)
+        request = json.loads(data)
+        prompt = ''.join(
+            part if isinstance(part, str) else part.get('text', '')
+            for message in request.get('messages', [])
+            for part in ([message['content']] if isinstance(message['content'], str) else message['content'])
+        )
+        output_tokens = max(len(self.summary_text) // 4, 1)
+        self._begin('InvokeModel', bytes_in=len(data),
+                    extra_latency=output_tokens * self.latency_per_output_token)
+        with self._lock:
+            self.models[modelId] += 1
+        response = json.dumps({
+            'content': [{'type': 'text', 'text': self.summary_text}],
+            'usage': {'input_tokens': max(len(prompt) // 4, 1), 'output_tokens': output_tokens},
+            'stop_reason': 'end_turn'
+        }).encode('utf-8')
+        self._sent(len(response))
+        return {'body': StreamingBody(response), 'contentType': 'application/json'}
+
+    def apply_guardrail(self, guardrailIdentifier, guardrailVersion, source, content, **kwargs):
+        text = ''.join(item.get('text', {}).get('text', '') for item in content)
+        self._begin('ApplyGuardrail', bytes_in=len(text.encode('utf-8')))
+        return {'action': 'NONE', 'outputs': [], 'usage': {'textUnitsProcessed': len(text) // 1000 + 1}}
+
+
+class LocalBedrock(LocalService):
+    """
+    Bedrock control plane stand-in for batch inference jobs.
+
+    A job runs when it is first queried after `run_after_polls` status
+    checks: every record of its JSONL input is answered through `runtime`
+    (a LocalBedrockRuntime) and the results are written to
+    <output uri><job id>/<input file>.out, as Bedrock does. Records listed
+    in `failing_records` get an error instead of a model output.
+    """
+
+    def __init__(self, s3, runtime=None, run_after_polls=1, failing_records=(), **kwargs):
+        super().__init__(**kwargs)
+        self.s3 = s3
+        self.runtime = runtime or LocalBedrockRuntime()
+        self.run_after_polls = run_after_polls
+        self.failing_records = set(failing_records)
+        self.jobs = {}
+
+    def create_model_invocation_job(self, jobName, roleArn, modelId, inputDataConfig, outputDataConfig, **kwargs):
+        self._begin('CreateModelInvocationJob')
+        job_id = f"{len(self.jobs) + 1:012d}"
+        job_arn = f"arn:aws:bedrock:us-east-1:123456789012:model-invocation-job/{job_id}"
+        self.jobs[job_arn] = {
+            'jobArn': job_arn, 'jobName': jobName, 'modelId': modelId, 'roleArn': roleArn,
+            'status': 'Submitted', 'polls': 0,
+            'inputDataConfig': inputDataConfig, 'outputDataConfig': outputDataConfig
+        }
+        return {'jobArn': job_arn}
+
+    def get_model_invocation_job(self, jobIdentifier, **kwargs):
+        self._begin('GetModelInvocationJob')
+        if jobIdentifier not in self.jobs:
+            raise ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'No such job'}},
+                              'GetModelInvocationJob')
+        job = self.jobs[jobIdentifier]
+        job['polls'] += 1
+        if job['status'] == 'Submitted':
+            job['status'] = 'InProgress'
+        elif job['status'] == 'InProgress' and job['polls'] > self.run_after_polls:
+            self._run(job)
+        return {key: value for key, value in job.items() if key != 'polls'}
+
+    def _run(self, job):
+        input_bucket, _, input_key = job['inputDataConfig']['s3InputDataConfig']['s3Uri'][5:].partition('/')
+        output_bucket, _, output_prefix = job['outputDataConfig']['s3OutputDataConfig']['s3Uri'][5:].partition('/')
+        lines = []
+        for line in self.s3.objects[(input_bucket, input_key)].splitlines():
+            record = json.loads(line)
+            if record['recordId'] in self.failing_records:
+                record['error'] = {'errorCode': 400, 'errorMessage': 'Malformed input request'}
+            else:
+                response = self.runtime.invoke_model(body=json.dumps(record['modelInput']), modelId=job['modelId'])
+                record['modelOutput'] = json.loads(response['body'].read())
+            lines.append(json.dumps(record))
+        job_id = job['jobArn'].rsplit('/', 1)[-1]
+        output_key = f"{output_prefix}{job_id}/{input_key.rsplit('/', 1)[-1]}.out"
+        self.s3.objects[(output_bucket, output_key)] = '\n'.join(lines).encode('utf-8') + b'\n'
+        job['status'] = 'PartiallyCompleted' if self.failing_records else 'Completed'
+
+
+class LocalConnections(LocalService):
+    """
+    API Gateway management API stand-in for WebSocket pushes.
+
+    Messages posted to each connection are collected in `messages`;
+    posting to a connection in `gone` fails like a closed socket.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.messages = defaultdict(list)
+        self.gone = set()
+
+    def post_to_connection(self, ConnectionId, Data, **kwargs):
+        self._begin('PostToConnection', bytes_in=len(Data))
+        if ConnectionId in self.gone:
+            raise ClientError({'Error': {'Code': 'GoneException', 'Message': 'Gone'}}, 'PostToConnection')
+        with self._lock:
+            self.messages[ConnectionId].append(json.loads(Data))
+        return {}
+
+
+def generate_wav(duration_seconds, sample_rate=16000, channels=1, sample_width=2, fileobj=None):
+    """
+    Generate a speech-like test signal as WAV.
+
+    The signal is a 220 Hz tone amplitude-modulated at syllable rate, written
+    one second at a time so long recordings do not need a second copy in
+    memory.
+
+    Args:
+        duration_seconds: Length of the recording
+        sample_rate: Frames per second
+        channels: Number of interleaved channels
+        sample_width: Bytes per sample (2 = 16-bit PCM)
+        fileobj: Optional binary file object to write to
+
+    Returns:
+        The WAV bytes, or None when written to fileobj
+    """
+    target = fileobj if fileobj is not None else io.BytesIO()
+    max_amplitude = (1 << (8 * sample_width - 1)) - 1
+    pack_format = {1: 'B', 2: 'h', 4: 'i'}[sample_width]
+    # One second of signal is reused for every second of the recording
+    second = bytearray()
+    for n in range(sample_rate):
+        t = n / sample_rate
+        value = math.sin(2 * math.pi * 220 * t) * (0.5 + 0.5 * math.sin(2 * math.pi * 4 * t))
+        sample = int(value * max_amplitude * 0.3)
+        if sample_width == 1:
+            sample = sample + 128
+        second += struct.pack('<' + pack_format, sample) * channels
+    second = bytes(second)
+
+    with wave.open(target, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(sample_rate)
+        whole_seconds = int(duration_seconds)
+        for _ in range(whole_seconds):
+            wav_file.writeframes(second)
+        remainder = int(round((duration_seconds - whole_seconds) * sample_rate))
+        if remainder:
+            wav_file.writeframes(second[:remainder * channels * sample_width])
+
+    if fileobj is None:
+        return target.getvalue()
+    return None
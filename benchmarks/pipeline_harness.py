@@ -0,0 +1,288 @@
+"""
+Offline end-to-end benchmark of the Lambda pipeline.
+
+Runs whisper-transcription, speaker-identification and bedrock-summary in
+sequence against the in-process stand-ins in local_aws.py, using generated
+WAV recordings. For each recording and stage it reports wall time, peak RSS,
+bytes moved and API call counts as JSON, which can be saved as a baseline and
+compared against later runs to catch regressions.
+
+Usage:
+    python benchmarks/pipeline_harness.py --durations 1 10 --output baseline.json
+    python benchmarks/pipeline_harness.py --durations 1 10 --compare baseline.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import contextlib
+import importlib.util
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.join(BENCHMARK_DIR, '..', 'backend-cdk', 'lambda')
+sys.path.insert(0, LAMBDA_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+import lambda_runtime  # noqa: E402
+import local_aws  # noqa: E402
+
+UPLOADS_BUCKET = 'local-uploads'
+SUMMARIES_BUCKET = 'local-summaries'
+DEFAULT_DURATIONS_MINUTES = [1, 10, 60, 120]
+
+
+def load_handler(file_name):
+    """Import a hyphenated Lambda handler file as a module."""
+    module_name = file_name.replace('-', '_').rsplit('.', 1)[0]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(LAMBDA_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS counter; returns False where unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes():
+    """Peak resident set size since the last reset (or process start)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def snapshot(services):
+    return {name: service.stats() for name, service in services.items()}
+
+
+def diff_stats(before, after):
+    """Per-service API calls and bytes moved between two snapshots."""
+    result = {}
+    for name in after:
+        calls = {op: count - before[name]['calls'].get(op, 0)
+                 for op, count in after[name]['calls'].items()
+                 if count - before[name]['calls'].get(op, 0)}
+        throttled = {op: count - before[name]['throttled'].get(op, 0)
+                     for op, count in after[name]['throttled'].items()
+                     if count - before[name]['throttled'].get(op, 0)}
+        bytes_in = after[name]['bytes_in'] - before[name]['bytes_in']
+        bytes_out = after[name]['bytes_out'] - before[name]['bytes_out']
+        if calls or bytes_in or bytes_out:
+            result[name] = {'calls': calls, 'throttled': throttled,
+                            'bytes_sent': bytes_in, 'bytes_received': bytes_out}
+    return result
+
+
+def run_stage(name, handler, event, services, verbose):
+    """Run one handler and measure it."""
+    before = snapshot(services)
+    rss_reset = reset_peak_rss()
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            devnull = stack.enter_context(open(os.devnull, 'w'))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+            stack.enter_context(contextlib.redirect_stderr(devnull))
+        result = handler(event, None)
+    wall = time.perf_counter() - start
+    return result, {
+        'stage': name,
+        'wall_seconds': round(wall, 4),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'peak_rss_is_per_stage': rss_reset,
+        'services': diff_stats(before, snapshot(services))
+    }
+
+
+def endpoint_names(args):
+    """Names of the simulated Whisper endpoints (one unless --endpoint-latencies is given)."""
+    latencies = getattr(args, 'endpoint_latencies', None) or [0.0]
+    return [f"local-whisper-{i}" for i in range(len(latencies))] if len(latencies) > 1 else ['local-whisper']
+
+
+def build_services(args):
+    latencies = getattr(args, 'endpoint_latencies', None) or [0.0]
+    return {
+        's3': local_aws.LocalS3(latency_seconds=args.s3_latency),
+        'sagemaker-runtime': local_aws.LocalSageMakerRuntime(
+            latency_seconds=args.sagemaker_latency,
+            latency_per_audio_second=args.sagemaker_latency_per_audio_second,
+            throttle_rate=args.sagemaker_throttle_rate,
+            endpoint_latencies=dict(zip(endpoint_names(args), latencies)),
+            tail_latency_rate=getattr(args, 'sagemaker_tail_rate', 0.0),
+            tail_latency_seconds=getattr(args, 'sagemaker_tail_latency', 0.0),
+            seed=args.seed),
+        'bedrock-runtime': local_aws.LocalBedrockRuntime(
+            latency_seconds=args.bedrock_latency,
+            throttle_rate=args.bedrock_throttle_rate,
+            seed=args.seed)
+    }
+
+
+def register_services(services):
+    lambda_runtime.reset_clients()
+    lambda_runtime.register_client('s3', services['s3'])
+    lambda_runtime.register_client('sagemaker-runtime', services['sagemaker-runtime'], region_name='us-east-1')
+    lambda_runtime.register_client('bedrock-runtime', services['bedrock-runtime'], region_name='us-east-1')
+
+
+def run_pipeline(duration_seconds, args, handlers):
+    """Run the three stages on one generated recording."""
+    services = build_services(args)
+    register_services(services)
+
+    key = f"uploads/harness-{int(duration_seconds)}s.wav"
+    wav_bytes = local_aws.generate_wav(duration_seconds, sample_rate=args.sample_rate, channels=args.channels)
+    services['s3'].objects[(UPLOADS_BUCKET, key)] = wav_bytes
+    del wav_bytes
+
+    stages = []
+    whisper_result, metrics = run_stage('whisper-transcription', handlers['whisper'].lambda_handler, {
+        'detail': {'bucket': {'name': UPLOADS_BUCKET}, 'object': {'key': key}}
+    }, services, args.verbose)
+    stages.append(metrics)
+
+    status = whisper_result.get('TranscriptionJob', {}).get('TranscriptionJobStatus')
+    if status == 'COMPLETED':
+        speaker_result, metrics = run_stage('speaker-identification', handlers['speaker'].lambda_handler, {
+            'TranscriptionJob': {'Payload': whisper_result}
+        }, services, args.verbose)
+        stages.append(metrics)
+
+        summary_result, metrics = run_stage('bedrock-summary', handlers['summary'].lambda_handler, {
+            'SpeakerIdentification': {'Payload': speaker_result}
+        }, services, args.verbose)
+        stages.append(metrics)
+    else:
+        summary_result = None
+
+    return {
+        'duration_seconds': duration_seconds,
+        'audio_bytes': len(services['s3'].objects[(UPLOADS_BUCKET, key)]),
+        'status': status,
+        'failure_reason': whisper_result.get('TranscriptionJob', {}).get('FailureReason'),
+        'summary_key': summary_result.get('object_key') if isinstance(summary_result, dict) else None,
+        'total_wall_seconds': round(sum(stage['wall_seconds'] for stage in stages), 4),
+        'stages': stages
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """Return a list of regressions in wall time, peak RSS or API calls."""
+    regressions = []
+    baseline_runs = {run['duration_seconds']: run for run in baseline.get('runs', [])}
+    for run in report['runs']:
+        previous = baseline_runs.get(run['duration_seconds'])
+        if not previous:
+            continue
+        previous_stages = {stage['stage']: stage for stage in previous['stages']}
+        for stage in run['stages']:
+            old = previous_stages.get(stage['stage'])
+            if not old:
+                continue
+            label = f"{run['duration_seconds']}s/{stage['stage']}"
+            for metric in ('wall_seconds', 'peak_rss_bytes'):
+                if old[metric] and stage[metric] > old[metric] * (1 + tolerance):
+                    regressions.append(f"{label} {metric}: {old[metric]} -> {stage[metric]}")
+            for service, stats in stage['services'].items():
+                old_calls = old['services'].get(service, {}).get('calls', {})
+                for op, count in stats['calls'].items():
+                    if count > old_calls.get(op, 0):
+                        regressions.append(f"{label} {service}.{op} calls: {old_calls.get(op, 0)} -> {count}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline end-to-end benchmark of the audio summarizer pipeline')
+    parser.add_argument('--durations', type=float, nargs='+', default=DEFAULT_DURATIONS_MINUTES,
+                        help='Recording lengths in minutes (default: 1 10 60 120)')
+    parser.add_argument('--sample-rate', type=int, default=16000, help='Sample rate of the generated WAVs')
+    parser.add_argument('--channels', type=int, default=1, help='Channels of the generated WAVs')
+    parser.add_argument('--s3-latency', type=float, default=0.0, help='Seconds added to every S3 call')
+    parser.add_argument('--sagemaker-latency', type=float, default=0.0, help='Seconds added to every endpoint call')
+    parser.add_argument('--sagemaker-latency-per-audio-second', type=float, default=0.0,
+                        help='Endpoint seconds per second of audio in the request')
+    parser.add_argument('--endpoint-latencies', type=float, nargs='+',
+                        help='Simulate one Whisper endpoint per value, each with this many extra seconds per call')
+    parser.add_argument('--sagemaker-tail-rate', type=float, default=0.0,
+                        help='Share of endpoint calls that are slow outliers')
+    parser.add_argument('--sagemaker-tail-latency', type=float, default=0.0,
+                        help='Extra seconds taken by slow outlier calls')
+    parser.add_argument('--hedge', action='store_true', help='Enable hedged Whisper requests (HEDGE_ENABLED=true)')
+    parser.add_argument('--sagemaker-throttle-rate', type=float, default=0.0, help='Share of endpoint calls throttled')
+    parser.add_argument('--bedrock-latency', type=float, default=0.0, help='Seconds added to every Bedrock call')
+    parser.add_argument('--bedrock-throttle-rate', type=float, default=0.0, help='Share of Bedrock calls throttled')
+    parser.add_argument('--memory-budget', action='store_true',
+                        help='Run the transcription Lambda in memory budget mode (MEMORY_BUDGET_MODE=true)')
+    parser.add_argument('--chunk-concurrency', type=int, default=1, help='Chunks transcribed concurrently')
+    parser.add_argument('--profile-dir', help='Write cProfile/tracemalloc snapshots of every handler here')
+    parser.add_argument('--rate-limit-rps', type=float,
+                        help='Starting rate of the adaptive rate limiters (RATE_LIMITER_INITIAL_RPS)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for throttling decisions')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--compare', help='Baseline JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative regression (default 0.25)')
+    parser.add_argument('--verbose', action='store_true', help='Show handler output')
+    args = parser.parse_args()
+
+    os.environ.update({
+        'WHISPER_ENDPOINT': 'local-whisper',
+        'WHISPER_ENDPOINTS': ','.join(endpoint_names(args)),
+        'SUMMARIES_BUCKET': SUMMARIES_BUCKET,
+        'GUARDRAIL_ID': 'local-guardrail',
+        'CONTENT_INDEX_BACKEND': 'none',
+        'MEMORY_BUDGET_MODE': 'true' if args.memory_budget else 'false',
+        'CHUNK_CONCURRENCY': str(args.chunk_concurrency),
+        'HEDGE_ENABLED': 'true' if args.hedge else 'false'
+    })
+    if args.rate_limit_rps:
+        os.environ['RATE_LIMITER_INITIAL_RPS'] = str(args.rate_limit_rps)
+    if args.profile_dir:
+        os.environ.update({'PROFILING_ENABLED': 'true', 'PROFILE_DIR': args.profile_dir})
+        os.environ.pop('PROFILE_S3_URI', None)
+    handlers = {
+        'whisper': load_handler('whisper-transcription.py'),
+        'speaker': load_handler('speaker-identification.py'),
+        'summary': load_handler('bedrock-summary.py')
+    }
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': sys.version.split()[0],
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'verbose', 'profile_dir')},
+        'runs': [run_pipeline(minutes * 60, args, handlers) for minutes in args.durations]
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+        if regressions:
+            print('\nRegressions against baseline:', file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
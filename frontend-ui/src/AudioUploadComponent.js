@@ -1,9 +1,17 @@
 import React, { useState } from 'react';
-import { GET_UPLOAD_URL_ENDPOINT, CHECK_SUMMARY_ENDPOINT } from './config';
+import {
+  GET_UPLOAD_URL_ENDPOINT,
+  CHECK_SUMMARY_ENDPOINT,
+  MULTIPART_THRESHOLD_BYTES,
+  UPLOAD_CONCURRENCY,
+  STATUS_WEBSOCKET_URL
+} from './config';
 import { Upload } from 'lucide-react';
 import { Alert, AlertTitle, Box, Button, CircularProgress, Typography, LinearProgress } from '@mui/material';
 import axios from 'axios';
 import SummaryDisplayComponent from './SummaryDisplayComponent';
+import { uploadMultipart } from './multipartUpload';
+import { describeStatus, watchJobStatus } from './jobStatus';
 import './AudioUploadComponent.css';
 
 const AudioUploadComponent = () => {
@@ -12,12 +20,54 @@ const AudioUploadComponent = () => {
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState('');
   const [uploadProgress, setUploadProgress] = useState(0);
+  const [jobStatus, setJobStatus] = useState('');
 
   const handleFileChange = (event) => {
     setFile(event.target.files[0]);
     setError('');
     setSummary('');
     setUploadProgress(0);
+    setJobStatus('');
+  };
+
+  const showSummary = async (filename) => {
+    const summaryResponse = await axios.get(`${CHECK_SUMMARY_ENDPOINT}/fetch-summary/${filename}`, {
+      headers: {
+        'Content-Type': 'application/json',
+        'X-Requested-With': 'XMLHttpRequest'
+      }
+    });
+    setSummary(summaryResponse.data.content);
+    setIsLoading(false);
+    setUploadProgress(0);
+    setJobStatus('');
+  };
+
+  // Stage updates are pushed over the status WebSocket, and the summary is
+  // fetched the moment it has been written. Falls back to polling if the
+  // socket cannot be kept open.
+  const watchForSummary = (jobId) => {
+    watchJobStatus(jobId, {
+      url: STATUS_WEBSOCKET_URL,
+      onStatus: async (status) => {
+        setJobStatus(describeStatus(status));
+        if (status.stage === 'done') {
+          try {
+            await showSummary(status.summaryKey);
+          } catch (err) {
+            setError(err.response?.data?.error || 'An error occurred while fetching the summary. Please try again.');
+            setIsLoading(false);
+            setJobStatus('');
+          }
+        } else if (status.stage === 'failed') {
+          setError('Processing failed. Please try again.');
+          setIsLoading(false);
+          setUploadProgress(0);
+          setJobStatus('');
+        }
+      },
+      onUnavailable: () => pollForSummary(jobId)
+    });
   };
 
   const pollForSummary = async (uuid) => {
@@ -36,14 +86,9 @@ const AudioUploadComponent = () => {
           }
         });
         if (response.data.exists) {
-          const filename = response.data.key;
-          const summaryResponse = await axios.get(`${CHECK_SUMMARY_ENDPOINT}/fetch-summary/${filename}`, {
-            headers: {
-              'Content-Type': 'application/json',
-              'X-Requested-With': 'XMLHttpRequest'
-            }
-          });
-          setSummary(summaryResponse.data.content);
+          await showSummary(response.data.key);
+        } else if (response.data.status?.stage === 'failed') {
+          setError('Processing failed. Please try again.');
           setIsLoading(false);
           setUploadProgress(0);
         } else if (attempts < maxAttempts) {
@@ -70,6 +115,69 @@ const AudioUploadComponent = () => {
     checkSummary();
   };
 
+  // Single PUT to a presigned URL, for files below the multipart threshold
+  const uploadSingle = async () => {
+    // Request pre-signed URL using JSON
+    // Extract filename to match API Gateway validation model
+    const fileExtension = '.' + file.name.split('.').pop().toLowerCase();
+    console.log('Requesting upload URL with filename:', file.name);
+    
+    const urlResponse = await axios.post(
+      `${GET_UPLOAD_URL_ENDPOINT}/get-upload-url`,
+      {
+        filename: file.name  // Using filename as required by API validation model
+      },
+      {
+        headers: {
+          'Content-Type': 'application/json'
+        },
+        timeout: 10000, // 10 second timeout
+        validateStatus: function (status) {
+          return status >= 200 && status < 300; // Only accept success status codes
+        }
+      }
+    ).catch(err => {
+      if (err.code === 'ECONNABORTED') {
+        throw new Error('Request timed out. Please try again.');
+      }
+      if (err.response?.data?.message) {
+        throw new Error(err.response.data.message);
+      }
+      throw err;
+    });
+
+    const { uploadUrl, key } = urlResponse.data;
+    if (!uploadUrl || !key) {
+      throw new Error('Invalid response from server. Missing upload URL or key.');
+    }
+
+    // Upload directly to S3 using pre-signed URL
+    await axios.put(uploadUrl, file, {
+      headers: {
+        'Content-Type': file.type
+      },
+      timeout: 0, // Disable timeout for upload
+      onUploadProgress: (progressEvent) => {
+        const progress = Math.round(
+          (progressEvent.loaded * 100) / progressEvent.total
+        );
+        setUploadProgress(progress);
+        
+        // Log progress to console for debugging
+        if (progress % 20 === 0) { // Log every 20%
+          console.log(`Upload progress: ${progress}%`);
+        }
+      }
+    }).catch(err => {
+      if (err.response?.status === 403) {
+        throw new Error('Upload permission denied. Please try again or contact support.');
+      }
+      throw err;
+    });
+
+    return key;
+  };
+
   const handleUpload = async () => {
     if (!file) {
       setError('Please select a file first.');
@@ -87,69 +195,24 @@ const AudioUploadComponent = () => {
         throw new Error('Please select an audio or video file.');
       }
 
-      // Request pre-signed URL using JSON
-      // Extract filename to match API Gateway validation model
-      const fileExtension = '.' + file.name.split('.').pop().toLowerCase();
-      console.log('Requesting upload URL with filename:', file.name);
-      
-      const urlResponse = await axios.post(
-        `${GET_UPLOAD_URL_ENDPOINT}/get-upload-url`,
-        {
-          filename: file.name  // Using filename as required by API validation model
-        },
-        {
-          headers: {
-            'Content-Type': 'application/json'
-          },
-          timeout: 10000, // 10 second timeout
-          validateStatus: function (status) {
-            return status >= 200 && status < 300; // Only accept success status codes
-          }
-        }
-      ).catch(err => {
-        if (err.code === 'ECONNABORTED') {
-          throw new Error('Request timed out. Please try again.');
-        }
-        if (err.response?.data?.message) {
-          throw new Error(err.response.data.message);
-        }
-        throw err;
-      });
-
-      const { uploadUrl, key } = urlResponse.data;
-      if (!uploadUrl || !key) {
-        throw new Error('Invalid response from server. Missing upload URL or key.');
-      }
-
-      // Upload directly to S3 using pre-signed URL
-      await axios.put(uploadUrl, file, {
-        headers: {
-          'Content-Type': file.type
-        },
-        timeout: 0, // Disable timeout for upload
-        onUploadProgress: (progressEvent) => {
-          const progress = Math.round(
-            (progressEvent.loaded * 100) / progressEvent.total
-          );
-          setUploadProgress(progress);
-          
-          // Log progress to console for debugging
-          if (progress % 20 === 0) { // Log every 20%
-            console.log(`Upload progress: ${progress}%`);
-          }
-        }
-      }).catch(err => {
-        if (err.response?.status === 403) {
-          throw new Error('Upload permission denied. Please try again or contact support.');
-        }
-        throw err;
-      });
+      // Large recordings go up in parallel parts and resume after a dropped connection
+      const key = file.size >= MULTIPART_THRESHOLD_BYTES
+        ? (await uploadMultipart(file, {
+            apiEndpoint: GET_UPLOAD_URL_ENDPOINT,
+            concurrency: UPLOAD_CONCURRENCY,
+            onProgress: setUploadProgress
+          })).key
+        : await uploadSingle();
 
-      // Extract UUID from the key (format: uploads/uuid-filename)
-      const uuid = key.split('/')[1].split('-')[0];
+      // The job id is the upload UUID (format: uploads/uuid-filename)
+      const jobId = key.replace('uploads/', '').split('-').slice(0, 5).join('-');
 
-      // Start polling for summary
-      pollForSummary(uuid);
+      // Follow the job over the status WebSocket when it is deployed, otherwise poll for the summary
+      if (STATUS_WEBSOCKET_URL) {
+        watchForSummary(jobId);
+      } else {
+        pollForSummary(jobId);
+      }
 
     } catch (err) {
       let errorMessage;
@@ -218,7 +281,7 @@ const AudioUploadComponent = () => {
         fullWidth
         startIcon={isLoading ? <CircularProgress size={24} /> : <Upload />}
       >
-        {isLoading ? `Uploading... ${uploadProgress}%` : 'Upload and Process'}
+        {isLoading ? (jobStatus || `Uploading... ${uploadProgress}%`) : 'Upload and Process'}
       </Button>
 
       {isLoading && (
@@ -16,6 +16,13 @@ export const CLOUDFRONT_URL = 'https://xxxxxxxxxx.cloudfront.net';  // Replace w
 export const GET_UPLOAD_URL_ENDPOINT = API_GATEWAY_ENDPOINT;  // Direct to API Gateway
 export const CHECK_SUMMARY_ENDPOINT = isProduction ? CLOUDFRONT_URL : API_GATEWAY_ENDPOINT;  // Through CloudFront in production
 
+// Files of at least this size are uploaded as parallel multipart uploads that resume after failures
+export const MULTIPART_THRESHOLD_BYTES = Number(process.env.REACT_APP_MULTIPART_THRESHOLD_MB || 32) * 1024 * 1024;
+// Parts uploaded at the same time
+export const UPLOAD_CONCURRENCY = Number(process.env.REACT_APP_UPLOAD_CONCURRENCY || 4);
+// WebSocket URL for pushed job status (JobStatusWebSocketUrl stack output); polling is used without it
+export const STATUS_WEBSOCKET_URL = process.env.REACT_APP_STATUS_WEBSOCKET_URL || '';
+
 // Log the current environment for debugging
 console.log(`Running in ${isProduction ? 'production' : 'development'} mode`);
 console.log(`Using Upload URL endpoint: ${GET_UPLOAD_URL_ENDPOINT}`);
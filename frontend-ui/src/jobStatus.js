@@ -0,0 +1,103 @@
+// Stages after which the server sends nothing more for a job
+const FINAL_STAGES = ['done', 'failed'];
+
+// API Gateway closes idle WebSocket connections after 10 minutes
+const KEEP_ALIVE_MS = 5 * 60 * 1000;
+
+/**
+ * Short description of a job status for the upload button.
+ */
+export const describeStatus = (status) => {
+  switch (status.stage) {
+    case 'queued':
+      return 'Waiting to start...';
+    case 'transcribing':
+      return status.progress?.total
+        ? `Transcribing... ${status.progress.completed}/${status.progress.total} chunks`
+        : 'Transcribing...';
+    case 'speaker_identification':
+      return 'Identifying speakers...';
+    case 'summarizing':
+      return 'Summarizing...';
+    case 'done':
+      return 'Summary ready';
+    default:
+      return 'Processing failed';
+  }
+};
+
+/**
+ * Watch a job's status over the status WebSocket.
+ *
+ * The current status arrives right after subscribing, then every update as
+ * the pipeline moves on. A dropped connection is reopened up to
+ * `maxReconnects` times; after that `onUnavailable` is called so the caller
+ * can fall back to polling.
+ *
+ * @returns {function} Closes the connection
+ */
+export const watchJobStatus = (jobId, {
+  url,
+  onStatus,
+  onUnavailable = () => {},
+  maxReconnects = 3,
+  WebSocketImpl = typeof WebSocket !== 'undefined' ? WebSocket : null
+}) => {
+  let socket = null;
+  let keepAlive = null;
+  let stopped = false;
+  let reconnects = 0;
+  let lastStatusAt = Date.now();
+
+  const stop = () => {
+    stopped = true;
+    clearInterval(keepAlive);
+    socket?.close();
+  };
+
+  const open = () => {
+    socket = new WebSocketImpl(url);
+    socket.onopen = () => {
+      reconnects = 0;
+      socket.send(JSON.stringify({ action: 'subscribe', jobId }));
+      clearInterval(keepAlive);
+      // Without news since the last tick, subscribing again fetches the
+      // current status, which covers jobs that ended without a final push
+      keepAlive = setInterval(() => {
+        const idle = Date.now() - lastStatusAt >= KEEP_ALIVE_MS;
+        socket.send(JSON.stringify(idle ? { action: 'subscribe', jobId } : { action: 'ping' }));
+      }, KEEP_ALIVE_MS);
+    };
+    socket.onmessage = (event) => {
+      const status = JSON.parse(event.data);
+      if (status.jobId !== jobId) {
+        return;
+      }
+      lastStatusAt = Date.now();
+      if (FINAL_STAGES.includes(status.stage)) {
+        stop();
+      }
+      onStatus(status);
+    };
+    socket.onclose = () => {
+      clearInterval(keepAlive);
+      if (stopped) {
+        return;
+      }
+      if (reconnects < maxReconnects) {
+        reconnects += 1;
+        setTimeout(open, 1000 * reconnects);
+      } else {
+        stopped = true;
+        onUnavailable();
+      }
+    };
+  };
+
+  if (!WebSocketImpl) {
+    onUnavailable();
+    return () => {};
+  }
+  open();
+  return stop;
+};
@@ -0,0 +1,80 @@
+import { describeStatus, watchJobStatus } from './jobStatus';
+
+class FakeWebSocket {
+  static instances = [];
+
+  constructor(url) {
+    this.url = url;
+    this.sent = [];
+    FakeWebSocket.instances.push(this);
+  }
+
+  send(data) {
+    this.sent.push(JSON.parse(data));
+  }
+
+  close() {
+    this.closed = true;
+  }
+
+  push(status) {
+    this.onmessage({ data: JSON.stringify(status) });
+  }
+}
+
+describe('watchJobStatus', () => {
+  beforeEach(() => {
+    FakeWebSocket.instances = [];
+    jest.useFakeTimers();
+  });
+
+  afterEach(() => {
+    jest.useRealTimers();
+  });
+
+  it('subscribes and reports each stage until the summary is ready', () => {
+    const statuses = [];
+    watchJobStatus('job-1', { url: 'wss://status', onStatus: (status) => statuses.push(status), WebSocketImpl: FakeWebSocket });
+    const socket = FakeWebSocket.instances[0];
+    socket.onopen();
+
+    socket.push({ jobId: 'job-1', stage: 'transcribing', progress: { completed: 2, total: 8 } });
+    socket.push({ jobId: 'job-2', stage: 'done' });
+    socket.push({ jobId: 'job-1', stage: 'done', summaryKey: 'Bedrock-Sonnet-GenAI-summary-job-1.txt' });
+
+    expect(socket.sent[0]).toEqual({ action: 'subscribe', jobId: 'job-1' });
+    expect(statuses.map((status) => status.stage)).toEqual(['transcribing', 'done']);
+    expect(describeStatus(statuses[0])).toBe('Transcribing... 2/8 chunks');
+    expect(socket.closed).toBe(true);
+  });
+
+  it('subscribes again while no status arrives', () => {
+    const statuses = [];
+    watchJobStatus('job-1', { url: 'wss://status', onStatus: (status) => statuses.push(status), WebSocketImpl: FakeWebSocket });
+    const socket = FakeWebSocket.instances[0];
+    socket.onopen();
+    socket.push({ jobId: 'job-1', stage: 'transcribing' });
+
+    jest.advanceTimersByTime(5 * 60 * 1000);
+    expect(socket.sent[1]).toEqual({ action: 'ping' });
+    jest.advanceTimersByTime(5 * 60 * 1000);
+    expect(socket.sent[2]).toEqual({ action: 'subscribe', jobId: 'job-1' });
+
+    // An Express execution that timed out is reported as failed on subscribe
+    socket.push({ jobId: 'job-1', stage: 'failed', failure: { status: 'TIMED_OUT' } });
+    expect(statuses.map((status) => status.stage)).toEqual(['transcribing', 'failed']);
+    expect(socket.closed).toBe(true);
+  });
+
+  it('falls back to polling once reconnecting fails', () => {
+    const onUnavailable = jest.fn();
+    watchJobStatus('job-1', { url: 'wss://status', onStatus: jest.fn(), onUnavailable, maxReconnects: 1, WebSocketImpl: FakeWebSocket });
+
+    FakeWebSocket.instances[0].onclose();
+    jest.advanceTimersByTime(1000);
+    expect(FakeWebSocket.instances).toHaveLength(2);
+    FakeWebSocket.instances[1].onclose();
+
+    expect(onUnavailable).toHaveBeenCalledTimes(1);
+  });
+});
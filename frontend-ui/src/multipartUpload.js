@@ -0,0 +1,162 @@
+import axios from 'axios';
+
+// Part URLs requested from the API at a time
+const URL_BATCH_SIZE = 50;
+
+// Upload state kept between attempts so a failed upload resumes where it stopped
+const STORAGE_PREFIX = 'multipart-upload:';
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const storageKey = (file) => `${STORAGE_PREFIX}${file.name}:${file.size}:${file.lastModified}`;
+
+const readState = (storage, file) => {
+  try {
+    return JSON.parse(storage?.getItem(storageKey(file)) || 'null');
+  } catch (err) {
+    return null;
+  }
+};
+
+const jsonHeaders = { headers: { 'Content-Type': 'application/json' }, timeout: 30000 };
+
+/**
+ * Upload a file as an S3 multipart upload.
+ *
+ * Parts go straight to S3 through presigned URLs, `concurrency` at a time.
+ * A failed part is retried on its own with backoff; if the whole upload
+ * fails, calling this again with the same file resumes it from the parts S3
+ * already has. The API completes the upload once every part is in.
+ *
+ * @param {File} file
+ * @param {object} options
+ * @param {string} options.apiEndpoint - API Gateway base URL
+ * @param {number} [options.concurrency=4] - Parts uploaded in parallel
+ * @param {number} [options.maxRetries=4] - Attempts per part after the first
+ * @param {function} [options.onProgress] - Called with the percentage uploaded
+ * @param {Storage} [options.storage] - Where resume state is kept (localStorage)
+ * @returns {Promise<{key: string}>}
+ */
+export const uploadMultipart = async (file, {
+  apiEndpoint,
+  concurrency = 4,
+  maxRetries = 4,
+  onProgress = () => {},
+  storage = typeof window !== 'undefined' ? window.localStorage : null
+}) => {
+  const api = `${apiEndpoint}/multipart-upload`;
+
+  // Resume a previous attempt if S3 still has it
+  let upload = readState(storage, file);
+  let uploaded = [];
+  if (upload) {
+    try {
+      const response = await axios.post(`${api}/parts`, { key: upload.key, uploadId: upload.uploadId }, jsonHeaders);
+      uploaded = response.data.uploaded;
+    } catch (err) {
+      if (err.response?.status !== 404) {
+        throw err;
+      }
+      upload = null;
+    }
+  }
+  if (!upload) {
+    const response = await axios.post(api, {
+      filename: file.name,
+      size: file.size,
+      contentType: file.type
+    }, jsonHeaders);
+    upload = response.data;
+    storage?.setItem(storageKey(file), JSON.stringify(upload));
+  }
+  const { key, uploadId, partSize, partCount } = upload;
+
+  const partBytes = (partNumber) => Math.min(partSize, file.size - (partNumber - 1) * partSize);
+  const done = new Set(uploaded.map((part) => part.partNumber));
+  const loaded = {};
+  let completedBytes = uploaded.reduce((total, part) => total + part.size, 0);
+  const reportProgress = () => {
+    const inFlight = Object.values(loaded).reduce((total, bytes) => total + bytes, 0);
+    onProgress(Math.min(100, Math.round(((completedBytes + inFlight) * 100) / file.size)));
+  };
+  reportProgress();
+
+  // Presigned URLs are fetched in batches as the workers reach them
+  const remaining = [];
+  for (let partNumber = 1; partNumber <= partCount; partNumber += 1) {
+    if (!done.has(partNumber)) {
+      remaining.push(partNumber);
+    }
+  }
+  const urls = {};
+  const urlFor = (partNumber) => {
+    if (!urls[partNumber]) {
+      const start = remaining.indexOf(partNumber);
+      const partNumbers = remaining.slice(start, start + URL_BATCH_SIZE).filter((number) => !urls[number]);
+      const batch = axios.post(`${api}/parts`, { key, uploadId, partNumbers }, jsonHeaders)
+        .then((response) => Object.fromEntries(response.data.urls.map(({ partNumber: number, url }) => [number, url])));
+      partNumbers.forEach((number) => {
+        const url = batch.then((batchUrls) => batchUrls[number]);
+        urls[number] = url;
+        // Parts of a failed batch fetch their URLs again on the next attempt
+        url.catch(() => {
+          if (urls[number] === url) {
+            delete urls[number];
+          }
+        });
+      });
+    }
+    return urls[partNumber];
+  };
+
+  const uploadPart = async (partNumber) => {
+    const start = (partNumber - 1) * partSize;
+    const blob = file.slice(start, start + partBytes(partNumber));
+    for (let attempt = 0; ; attempt += 1) {
+      try {
+        const url = await urlFor(partNumber);
+        await axios.put(url, blob, {
+          timeout: 0,
+          onUploadProgress: (progressEvent) => {
+            loaded[partNumber] = progressEvent.loaded;
+            reportProgress();
+          }
+        });
+        delete loaded[partNumber];
+        completedBytes += partBytes(partNumber);
+        reportProgress();
+        return;
+      } catch (err) {
+        delete loaded[partNumber];
+        if (attempt >= maxRetries) {
+          throw err;
+        }
+        // An expired URL (403) is replaced; anything else is retried with backoff
+        if (err.response?.status === 403) {
+          delete urls[partNumber];
+        }
+        await sleep(Math.min(1000 * 2 ** attempt, 15000));
+      }
+    }
+  };
+
+  const queue = [...remaining];
+  const worker = async () => {
+    while (queue.length) {
+      try {
+        await uploadPart(queue.shift());
+      } catch (err) {
+        // Stop the other workers; the parts already in S3 are kept for a resume
+        queue.length = 0;
+        throw err;
+      }
+    }
+  };
+  await Promise.all(Array.from({ length: Math.min(concurrency, queue.length) }, worker));
+
+  await axios.post(`${api}/complete`, { key, uploadId, partCount }, jsonHeaders);
+  storage?.removeItem(storageKey(file));
+  return { key };
+};
+
+export default uploadMultipart;
@@ -0,0 +1,103 @@
+import axios from 'axios';
+import { uploadMultipart } from './multipartUpload';
+
+jest.mock('axios', () => ({
+  post: jest.fn(),
+  put: jest.fn(),
+  get: jest.fn()
+}));
+
+const API = 'https://api.example.com/prod';
+const PART_SIZE = 4;
+
+const memoryStorage = () => {
+  const items = {};
+  return {
+    getItem: (key) => (key in items ? items[key] : null),
+    setItem: (key, value) => { items[key] = value; },
+    removeItem: (key) => { delete items[key]; },
+    items
+  };
+};
+
+// API stand-in: parts the "server" has seen are listed back on resume
+const mockApi = (uploadedParts = []) => {
+  axios.post.mockImplementation((url, body) => {
+    if (url === `${API}/multipart-upload`) {
+      return Promise.resolve({ data: { key: 'uploads/test-uuid-meeting.wav', uploadId: 'upload-1', partSize: PART_SIZE, partCount: 3 } });
+    }
+    if (url.endsWith('/parts')) {
+      return Promise.resolve({
+        data: {
+          uploaded: uploadedParts.map((partNumber) => ({ partNumber, size: PART_SIZE })),
+          urls: (body.partNumbers || []).map((partNumber) => ({ partNumber, url: `https://s3.example.com/part-${partNumber}` }))
+        }
+      });
+    }
+    return Promise.resolve({ data: { key: body.key, parts: 3 } });
+  });
+};
+
+describe('uploadMultipart', () => {
+  const file = new File(['0123456789'], 'meeting.wav', { type: 'audio/wav', lastModified: 1 });
+
+  beforeEach(() => {
+    jest.clearAllMocks();
+  });
+
+  it('uploads all parts in parallel and completes the upload', async () => {
+    mockApi();
+    let inFlight = 0;
+    let maxInFlight = 0;
+    axios.put.mockImplementation(async () => {
+      inFlight += 1;
+      maxInFlight = Math.max(maxInFlight, inFlight);
+      await new Promise((resolve) => setTimeout(resolve, 5));
+      inFlight -= 1;
+      return {};
+    });
+    const storage = memoryStorage();
+    const progress = [];
+
+    const result = await uploadMultipart(file, { apiEndpoint: API, concurrency: 3, storage, onProgress: (p) => progress.push(p) });
+
+    expect(result.key).toBe('uploads/test-uuid-meeting.wav');
+    expect(axios.put).toHaveBeenCalledTimes(3);
+    expect(maxInFlight).toBe(3);
+    expect(axios.post).toHaveBeenCalledWith(`${API}/multipart-upload/complete`,
+      { key: 'uploads/test-uuid-meeting.wav', uploadId: 'upload-1', partCount: 3 }, expect.any(Object));
+    expect(progress[progress.length - 1]).toBe(100);
+    // Nothing is left to resume
+    expect(Object.keys(storage.items)).toHaveLength(0);
+  });
+
+  it('retries a failed part on its own', async () => {
+    mockApi();
+    axios.put
+      .mockRejectedValueOnce(new Error('Network Error'))
+      .mockResolvedValue({});
+
+    await uploadMultipart(file, { apiEndpoint: API, concurrency: 1, storage: memoryStorage() });
+
+    expect(axios.put).toHaveBeenCalledTimes(4);
+    expect(axios.put.mock.calls[0][0]).toBe(axios.put.mock.calls[1][0]);
+  });
+
+  it('resumes an interrupted upload from the parts S3 already has', async () => {
+    const storage = memoryStorage();
+    mockApi();
+    axios.put.mockResolvedValueOnce({}).mockRejectedValue(new Error('Network Error'));
+    await expect(uploadMultipart(file, { apiEndpoint: API, concurrency: 1, maxRetries: 0, storage }))
+      .rejects.toThrow('Network Error');
+
+    jest.clearAllMocks();
+    mockApi([1]);
+    axios.put.mockResolvedValue({});
+    await uploadMultipart(file, { apiEndpoint: API, concurrency: 2, storage });
+
+    // No new upload was started and only parts 2 and 3 were sent again
+    expect(axios.post).not.toHaveBeenCalledWith(`${API}/multipart-upload`, expect.anything(), expect.anything());
+    expect(axios.put.mock.calls.map((call) => call[0]).sort())
+      .toEqual(['https://s3.example.com/part-2', 'https://s3.example.com/part-3']);
+  });
+});
@@ -0,0 +1,52 @@
+import os
+import sys
+import importlib.util
+
+import pytest
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+LAMBDA_DIR = os.path.join(REPO_ROOT, 'backend-cdk', 'lambda')
+BENCHMARK_DIR = os.path.join(REPO_ROOT, 'benchmarks')
+
+# Shared Lambda modules (lambda_runtime etc.) are imported by name, just as
+# they are inside the deployed function package. The benchmarks directory
+# provides the local AWS stand-ins.
+for path in (BENCHMARK_DIR, LAMBDA_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def load_lambda_module(file_name):
+    """Import a Lambda handler file such as 'whisper-transcription.py'."""
+    module_name = file_name.replace('-', '_').rsplit('.', 1)[0]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(LAMBDA_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def lambda_module():
+    """Factory fixture returning a freshly imported Lambda handler module."""
+    return load_lambda_module
+
+
+@pytest.fixture(autouse=True)
+def _isolated_runtime():
+    """Make sure cached clients, routers, latency history and learned rates or CPU worker pools never leak between tests."""
+    import lambda_runtime
+    import endpoint_router
+    import hedging
+    import rate_limiter
+    import transcription_backends
+
+    def reset():
+        lambda_runtime.reset_clients()
+        endpoint_router.reset_routers()
+        hedging.reset_trackers()
+        rate_limiter.reset_limiters()
+        transcription_backends.reset_backends()
+
+    reset()
+    yield
+    reset()
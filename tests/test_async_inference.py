@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+import lambda_runtime
+import local_aws
+import transcription_backends
+
+EVENT = {'detail': {'bucket': {'name': 'uploads'}, 'object': {'key': 'uploads/standup.wav'}},
+         'TranscriptionBackend': 'sagemaker-async'}
+OUTPUT_KEY = 'Transcription-Output-for-uploads/standup.wav.txt'
+
+
+@pytest.fixture
+def services(monkeypatch):
+    for name, value in {'WHISPER_ENDPOINT': 'local-whisper', 'WHISPER_ASYNC_ENDPOINT': 'local-whisper-async',
+                        'SUMMARIES_BUCKET': 'summaries', 'CONTENT_INDEX_BACKEND': 'none',
+                        'RATE_LIMITER_INITIAL_RPS': '10000', 'CHUNK_REDACTION': 'regex'}.items():
+        monkeypatch.setenv(name, value)
+    s3 = local_aws.LocalS3()
+    sagemaker = local_aws.LocalSageMakerRuntime(async_s3=s3, defer_async=True)
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('sagemaker-runtime', sagemaker, region_name='us-east-1')
+    s3.objects[('uploads', 'uploads/standup.wav')] = local_aws.generate_wav(95)
+    return s3, sagemaker
+
+
+def test_lambda_returns_while_the_endpoint_works(services, lambda_module):
+    s3, sagemaker = services
+    whisper = lambda_module('whisper-transcription.py')
+
+    queued = whisper.lambda_handler(EVENT, None)
+    assert queued['TranscriptionJob']['TranscriptionJobStatus'] == 'IN_PROGRESS'
+    assert queued['AsyncInference']['Total'] == len(sagemaker.async_queue) == 4
+    assert sagemaker.calls['InvokeEndpoint'] == 0
+
+    # Polls before the endpoint has finished change nothing
+    assert whisper.collect_handler(queued, None) == queued
+    sagemaker.run_async_requests()
+    collected = whisper.collect_handler(queued, None)
+
+    assert collected['TranscriptionJob']['TranscriptionJobStatus'] == 'COMPLETED'
+    transcript = json.loads(s3.objects[('summaries', OUTPUT_KEY)])
+    assert transcript['results']['transcripts'][0]['transcript']
+    assert float(transcript['results']['speaker_labels']['segments'][-1]['end_time']) == pytest.approx(95)
+
+
+def test_chunks_only_follow_the_model_window(services, lambda_module, monkeypatch):
+    monkeypatch.setenv('WHISPER_MAX_PAYLOAD_BYTES', str(256 * 1024))
+    monkeypatch.setenv('WHISPER_MAX_CHUNK_SECONDS', '60')
+
+    queued = lambda_module('whisper-transcription.py').lambda_handler(EVENT, None)
+
+    # The real-time payload limit would need 12 chunks
+    assert queued['AsyncInference']['Total'] == 2
+
+
+def test_failed_requests_fail_the_job(services, lambda_module):
+    s3, sagemaker = services
+    whisper = lambda_module('whisper-transcription.py')
+    queued = whisper.lambda_handler(EVENT, None)
+    sagemaker.run_async_requests(fail=True)
+
+    failed = whisper.collect_handler(queued, None)
+
+    assert failed['TranscriptionJob']['TranscriptionJobStatus'] == 'FAILED'
+    assert 'ModelError' in failed['TranscriptionJob']['FailureReason']
+    assert ('summaries', OUTPUT_KEY) not in s3.objects
+
+
+def test_chunks_that_never_answer_fail_the_job(services, lambda_module, monkeypatch):
+    s3, sagemaker = services
+    whisper = lambda_module('whisper-transcription.py')
+    queued = whisper.lambda_handler(EVENT, None)
+    assert whisper.collect_handler(queued, None) == queued
+
+    # The endpoint dropped the requests: no output and no failure object ever appears
+    monkeypatch.setenv('ASYNC_INFERENCE_DEADLINE_SECONDS', '-1')
+    failed = whisper.collect_handler(queued, None)
+
+    assert failed['TranscriptionJob']['TranscriptionJobStatus'] == 'FAILED'
+    assert 'chunk 1 of 4' in failed['TranscriptionJob']['FailureReason']
+    assert 'no output or failure' in failed['TranscriptionJob']['FailureReason']
+    assert ('summaries', OUTPUT_KEY) not in s3.objects
+
+
+def test_blocking_transcribe_matches_the_real_time_endpoint(services, monkeypatch):
+    s3, sagemaker = services
+    sagemaker.defer_async = False
+    chunk = local_aws.generate_wav(4.5)
+
+    async_backend = transcription_backends.backend_from_environment('sagemaker-async')
+    assert async_backend.transcribe(chunk) == transcription_backends.backend_from_environment('sagemaker').transcribe(chunk)
+    assert async_backend.stats()['submitted'] == 1
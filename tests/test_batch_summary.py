@@ -0,0 +1,68 @@
+import pytest
+
+import lambda_runtime
+import local_aws
+
+
+@pytest.fixture
+def stubs(lambda_module, monkeypatch):
+    monkeypatch.setenv('SUMMARIES_BUCKET', 'summaries')
+    monkeypatch.setenv('GUARDRAIL_ID', 'local-guardrail')
+    monkeypatch.setenv('BATCH_ROLE_ARN', 'arn:aws:iam::123456789012:role/batch')
+    monkeypatch.setenv('BATCH_MIN_RECORDS', '3')
+    monkeypatch.setenv('RATE_LIMITER_INITIAL_RPS', '10000')
+    s3 = local_aws.LocalS3()
+    runtime = local_aws.LocalBedrockRuntime()
+    bedrock = local_aws.LocalBedrock(s3, runtime, failing_records={'r0000000002'})
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('bedrock-runtime', runtime, region_name='us-east-1')
+    lambda_runtime.register_client('bedrock', bedrock, region_name='us-east-1')
+    for name in ['a.wav', 'b.mp4', 'c.wav', 'd.wav']:
+        key = f'Transcription-Output-for-uploads/{name}-speaker-identification.txt'
+        s3.objects[('summaries', key)] = f'spk_0: notes for {name}'.encode('utf-8')
+    s3.objects[('summaries', 'Transcription-Output-for-uploads/a.wav.txt')] = b'{}'
+    return lambda_module('batch-summary.py'), s3, runtime, bedrock
+
+
+def test_backfill_runs_as_one_batch_job(stubs):
+    batch, s3, runtime, bedrock = stubs
+
+    submitted = batch.lambda_handler({'action': 'submit'}, None)
+    assert submitted['recordCount'] == 4
+    assert bedrock.calls['CreateModelInvocationJob'] == 1
+    # Transcripts are redacted before they go into the batch input
+    assert runtime.calls['ApplyGuardrail'] == 4
+
+    pending = batch.lambda_handler(submitted, None)
+    assert pending['complete'] is False and pending['status'] == 'InProgress'
+
+    while not pending['complete']:
+        pending = batch.lambda_handler(pending, None)
+
+    assert pending['status'] == 'PartiallyCompleted'
+    assert (pending['summaries'], pending['failed']) == (3, 1)
+    assert runtime.calls['InvokeModel'] == 3
+    # Summaries are redacted again before they are written
+    assert runtime.calls['ApplyGuardrail'] == 7
+    for name in ['a.wav', 'b.mp4', 'd.wav']:
+        assert s3.objects[('summaries', f'Bedrock-Sonnet-GenAI-summary-{name}.txt')] == \
+            runtime.summary_text.encode('utf-8')
+    assert ('summaries', 'Bedrock-Sonnet-GenAI-summary-c.wav.txt') not in s3.objects
+
+
+def test_small_runs_are_rejected(stubs, monkeypatch):
+    batch, _, _, bedrock = stubs
+    monkeypatch.setenv('BATCH_MIN_RECORDS', '100')
+
+    with pytest.raises(ValueError):
+        batch.lambda_handler({'action': 'submit'}, None)
+    assert bedrock.calls['CreateModelInvocationJob'] == 0
+
+
+def test_failed_jobs_raise(stubs):
+    batch, _, _, bedrock = stubs
+    submitted = batch.lambda_handler({'action': 'submit'}, None)
+    bedrock.jobs[submitted['jobArn']]['status'] = 'Failed'
+
+    with pytest.raises(RuntimeError):
+        batch.lambda_handler(submitted, None)
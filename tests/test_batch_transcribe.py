@@ -0,0 +1,115 @@
+import os
+import importlib.util
+
+import pytest
+
+import job_status
+import lambda_runtime
+import local_aws
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def load_runner():
+    spec = importlib.util.spec_from_file_location('batch_transcribe', os.path.join(REPO_ROOT, 'utils', 'batch_transcribe.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FlakyBedrockRuntime(local_aws.LocalBedrockRuntime):
+    """Bedrock stand-in whose model calls fail until `healthy` is set."""
+
+    healthy = False
+
+    def invoke_model(self, **kwargs):
+        if not self.healthy:
+            raise RuntimeError('model unavailable')
+        return super().invoke_model(**kwargs)
+
+
+@pytest.fixture
+def services(monkeypatch, tmp_path):
+    for name, value in {'WHISPER_ENDPOINT': 'local-whisper', 'SUMMARIES_BUCKET': 'summaries',
+                        'GUARDRAIL_ID': 'local-guardrail', 'CONTENT_INDEX_BACKEND': 'none',
+                        'RATE_LIMITER_INITIAL_RPS': '10000', 'MEMORY_BUDGET_MODE': 'true'}.items():
+        monkeypatch.setenv(name, value)
+    s3 = local_aws.LocalS3()
+    sagemaker = local_aws.LocalSageMakerRuntime()
+    bedrock = FlakyBedrockRuntime()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('sagemaker-runtime', sagemaker, region_name='us-east-1')
+    lambda_runtime.register_client('bedrock-runtime', bedrock, region_name='us-east-1')
+
+    s3.objects[('archive', 'uploads/archived.wav')] = local_aws.generate_wav(40)
+    local_file = tmp_path / 'interview.wav'
+    local_file.write_bytes(local_aws.generate_wav(75))
+    entries = ['s3://archive/uploads/archived.wav', str(local_file)]
+    options = {'state_dir': str(tmp_path / 'state'), 'uploads_bucket': 'uploads', 'backend': None}
+    return s3, sagemaker, bedrock, entries, options
+
+
+def test_batch_resumes_and_writes_the_pipeline_artifacts(services):
+    s3, sagemaker, bedrock, entries, options = services
+    runner = load_runner()
+
+    first = runner.run_batch(entries, options, processes=0)
+    assert (first['done'], first['failed']) == (0, 2)
+    transcribed = sagemaker.calls['InvokeEndpoint']
+    assert transcribed > 0
+
+    bedrock.healthy = True
+    second = runner.run_batch(entries, options, processes=0)
+    assert (second['done'], second['failed']) == (2, 0)
+    assert second['files_per_hour'] > 0
+    # Transcription and speaker identification were not repeated
+    assert sagemaker.calls['InvokeEndpoint'] == transcribed
+
+    uploaded_key = runner.load_state(options['state_dir'], entries[1])['stages']['upload']['key']
+    for key in ['uploads/archived.wav', uploaded_key]:
+        name = key.split('/')[-1]
+        for artifact in [f'Transcription-Output-for-{key}.txt',
+                         f'Transcription-Output-for-{key}-speaker-identification.txt',
+                         f'Bedrock-Sonnet-GenAI-summary-{name}.txt']:
+            assert ('summaries', artifact) in s3.objects, artifact
+    assert ('uploads', uploaded_key) in s3.objects
+
+    third = runner.run_batch(entries, options, processes=0)
+    assert (third['done'], third['skipped']) == (0, 2)
+
+
+def test_artifacts_match_the_step_functions_path(services, lambda_module):
+    s3, _, bedrock, entries, options = services
+    bedrock.healthy = True
+    runner = load_runner()
+    runner.run_batch(entries[:1], options, processes=0)
+    batch_artifacts = {key: body for (bucket, key), body in s3.objects.items() if bucket == 'summaries'}
+    for key in list(batch_artifacts):
+        del s3.objects[('summaries', key)]
+
+    # The state machine passes each task's output on to the next one
+    whisper = lambda_module('whisper-transcription.py').lambda_handler(
+        {'detail': {'bucket': {'name': 'archive'}, 'object': {'key': 'uploads/archived.wav'}}}, None)
+    speaker = lambda_module('speaker-identification.py').lambda_handler({'TranscriptionJob': {'Payload': whisper}}, None)
+    lambda_module('bedrock-summary.py').lambda_handler({'SpeakerIdentification': {'Payload': speaker}}, None)
+
+    assert {key: body for (bucket, key), body in s3.objects.items() if bucket == 'summaries'} == batch_artifacts
+
+
+def test_local_files_get_their_own_keys_outside_the_intake_prefix(services, tmp_path):
+    s3 = services[0]
+    runner = load_runner()
+    paths = []
+    for directory, seconds in [('monday', 5), ('tuesday', 7)]:
+        (tmp_path / directory).mkdir()
+        paths.append(tmp_path / directory / 'meeting.wav')
+        paths[-1].write_bytes(local_aws.generate_wav(seconds))
+
+    keys = [runner.upload_source(str(path), 'uploads')['key'] for path in paths]
+
+    assert keys[0] != keys[1]
+    for key, path in zip(keys, paths):
+        # Keys under uploads/ would start the Step Functions pipeline as well
+        assert key.startswith('batch-uploads/') and key.endswith('-meeting.wav')
+        assert job_status.job_id_for_key(key) == key.split('/')[-1][:36]
+        assert s3.objects[('uploads', key)] == path.read_bytes()
@@ -0,0 +1,87 @@
+import io
+import wave
+
+import pytest
+
+import chunk_planner
+import local_aws
+
+
+@pytest.mark.parametrize('payload_format', chunk_planner.PAYLOAD_FORMATS)
+@pytest.mark.parametrize('wav_bytes', [44, 45, 46, 1000, 960044])
+def test_encoded_size_matches_encoding(payload_format, wav_bytes):
+    chunk = bytes(range(256)) * (wav_bytes // 256) + bytes(wav_bytes % 256)
+    encoded = chunk_planner.encode_payload(chunk, payload_format)
+    assert chunk_planner.encoded_payload_bytes(wav_bytes, payload_format) == len(encoded)
+
+
+@pytest.mark.parametrize('payload_format', chunk_planner.PAYLOAD_FORMATS)
+@pytest.mark.parametrize('framerate, n_channels, sampwidth', [
+    (8000, 1, 1), (16000, 1, 2), (44100, 2, 2), (48000, 2, 3), (96000, 6, 4)
+])
+def test_chunks_fill_but_never_exceed_payload_limit(payload_format, framerate, n_channels, sampwidth):
+    limit = 1024 * 1024
+    plan = chunk_planner.plan_chunks(framerate * 600, framerate, n_channels, sampwidth,
+                                     max_payload_bytes=limit, payload_format=payload_format)
+
+    assert max(plan['payload_bytes']) <= limit
+    assert plan['chunk_count'] * plan['frames_per_chunk'] >= framerate * 600
+    if plan['chunk_seconds'] < chunk_planner.MODEL_WINDOW_SECONDS:
+        # One more frame per chunk would not have fit
+        bigger = chunk_planner.WAV_HEADER_BYTES + (plan['frames_per_chunk'] + 1) * n_channels * sampwidth
+        assert chunk_planner.encoded_payload_bytes(bigger, payload_format) > limit
+
+
+def test_chunks_are_capped_at_the_model_window():
+    plan = chunk_planner.plan_chunks(16000 * 95, 16000, 1, 2)
+
+    assert plan['frames_per_chunk'] == 16000 * 30
+    assert plan['chunk_count'] == 4
+    assert plan['chunk_wav_bytes'][-1] == chunk_planner.WAV_HEADER_BYTES + 16000 * 5 * 2
+
+
+def test_high_rate_audio_still_gets_whole_frames():
+    # The old 2 MB estimate floored to zero-second chunks for 192 kHz 8-channel audio
+    plan = chunk_planner.plan_chunks(192000 * 10, 192000, 8, 4)
+
+    assert plan['frames_per_chunk'] > 0
+    assert max(plan['payload_bytes']) <= chunk_planner.DEFAULT_MAX_PAYLOAD_BYTES
+
+
+def test_limit_too_small_for_one_frame():
+    with pytest.raises(ValueError):
+        chunk_planner.plan_chunks(100, 16000, 2, 2, max_payload_bytes=100)
+
+
+def test_environment_overrides(monkeypatch):
+    monkeypatch.setenv('WHISPER_MAX_PAYLOAD_BYTES', '200000')
+    monkeypatch.setenv('WHISPER_MAX_CHUNK_SECONDS', '10')
+    monkeypatch.setenv('WHISPER_PAYLOAD_FORMAT', 'raw-wav')
+
+    plan = chunk_planner.plan_from_environment(16000 * 60, 16000, 1, 2)
+
+    assert plan['payload_format'] == 'raw-wav'
+    assert plan['frames_per_chunk'] == (200000 - chunk_planner.WAV_HEADER_BYTES) // 2
+    assert chunk_planner.plan_summary(plan)['max_chunk_payload_bytes'] <= 200000
+
+
+@pytest.mark.parametrize('payload_format', chunk_planner.PAYLOAD_FORMATS)
+def test_whisper_chunks_follow_the_plan(lambda_module, monkeypatch, payload_format):
+    monkeypatch.setenv('WHISPER_MAX_PAYLOAD_BYTES', '300000')
+    monkeypatch.setenv('WHISPER_PAYLOAD_FORMAT', payload_format)
+    whisper = lambda_module('whisper-transcription.py')
+    audio = local_aws.generate_wav(95)
+
+    with wave.open(io.BytesIO(audio), 'rb') as wav_file:
+        plan = chunk_planner.plan_from_environment(
+            wav_file.getnframes(), wav_file.getframerate(), wav_file.getnchannels(), wav_file.getsampwidth())
+    chunks = list(whisper.iter_wav_chunks(io.BytesIO(audio)))
+
+    assert [len(chunk) for chunk, _, _ in chunks] == plan['chunk_wav_bytes']
+    assert [len(whisper.encode_whisper_payload(chunk, payload_format)) for chunk, _, _ in chunks] == plan['payload_bytes']
+    assert [len(chunk) for chunk in whisper.chunk_audio(audio)] == plan['chunk_wav_bytes']
+    assert chunks[-1][2] == pytest.approx(95)
+    endpoint = local_aws.LocalSageMakerRuntime()
+    duration, _ = endpoint.transcribe_payload(whisper.encode_whisper_payload(chunks[0][0], payload_format),
+                                              chunk_planner.content_type(payload_format))
+    assert duration == pytest.approx(plan['chunk_seconds'])
@@ -0,0 +1,118 @@
+import io
+
+import pytest
+
+import content_index
+import lambda_runtime
+import local_aws
+
+
+class FakeS3:
+    def __init__(self, objects=None):
+        self.objects = dict(objects or {})
+        self.copies = []
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self.copies.append((CopySource['Key'], Key))
+        self.objects[(Bucket, Key)] = self.objects.get((CopySource['Bucket'], CopySource['Key']), b'')
+
+
+class ExplodingSageMaker:
+    def invoke_endpoint(self, **kwargs):
+        raise AssertionError('SageMaker must not be called for duplicate content')
+
+
+def test_artifact_keys_match_pipeline_naming():
+    keys = content_index.artifact_keys('uploads/meeting-1234.wav')
+    assert keys['transcription_key'] == 'Transcription-Output-for-uploads/meeting-1234.wav.txt'
+    assert keys['speaker_key'] == 'Transcription-Output-for-uploads/meeting-1234.wav-speaker-identification.txt'
+    assert keys['summary_key'] == 'Bedrock-Sonnet-GenAI-summary-meeting-1234.wav.txt'
+    assert content_index.input_key_from_speaker_key(keys['speaker_key']) == 'uploads/meeting-1234.wav'
+
+
+def test_local_index_round_trip(tmp_path):
+    index = content_index.LocalFingerprintIndex(str(tmp_path))
+    assert index.lookup('abc') is None
+    index.record('abc', {'input_key': 'uploads/a.wav'})
+    assert index.lookup('abc') == {'input_key': 'uploads/a.wav'}
+
+
+def test_reuse_skips_copy_for_same_object():
+    s3 = FakeS3()
+    entry = dict(content_index.artifact_keys('uploads/a.wav'), input_key='uploads/a.wav', bucket='summaries')
+    content_index.reuse_artifacts(s3, entry, 'uploads/a.wav', 'summaries')
+    assert s3.copies == []
+
+
+@pytest.fixture
+def wav_bytes():
+    # 44-byte header followed by one second of silence
+    import wave
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(16000)
+        wav_file.writeframes(b'\x00\x00' * 16000)
+    return buffer.getvalue()
+
+
+def test_duplicate_upload_reuses_artifacts_without_inference(lambda_module, monkeypatch, tmp_path, wav_bytes):
+    monkeypatch.setenv('WHISPER_ENDPOINT', 'whisper')
+    monkeypatch.setenv('SUMMARIES_BUCKET', 'summaries')
+    monkeypatch.setenv('CONTENT_INDEX_BACKEND', 'local')
+    monkeypatch.setenv('CONTENT_INDEX_DIR', str(tmp_path))
+
+    s3 = FakeS3({('uploads', 'uploads/second.wav'): wav_bytes})
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('sagemaker-runtime', ExplodingSageMaker(), region_name='us-east-1')
+
+    fingerprint = content_index.fingerprint_bytes(wav_bytes)
+    first_keys = content_index.artifact_keys('uploads/first.wav')
+    content_index.LocalFingerprintIndex(str(tmp_path)).record(
+        fingerprint, dict(first_keys, input_key='uploads/first.wav', bucket='summaries'))
+
+    whisper = lambda_module('whisper-transcription.py')
+    result = whisper.lambda_handler({'detail': {
+        'bucket': {'name': 'uploads'},
+        'object': {'key': 'uploads/second.wav'}
+    }}, None)
+
+    assert result['TranscriptionJob']['TranscriptionJobStatus'] == 'DEDUPLICATED'
+    assert result['Deduplication']['Hit'] is True
+    assert result['Deduplication']['SourceKey'] == 'uploads/first.wav'
+    second_keys = content_index.artifact_keys('uploads/second.wav')
+    assert sorted(s3.copies) == sorted(zip(
+        [first_keys[name] for name in second_keys], second_keys.values()))
+
+
+def test_stale_index_entry_falls_back_to_transcription(lambda_module, monkeypatch, tmp_path, wav_bytes):
+    for name, value in {'WHISPER_ENDPOINT': 'whisper', 'SUMMARIES_BUCKET': 'summaries', 'CHUNK_REDACTION': 'none',
+                        'CONTENT_INDEX_BACKEND': 'local', 'CONTENT_INDEX_DIR': str(tmp_path)}.items():
+        monkeypatch.setenv(name, value)
+    s3, sagemaker = local_aws.LocalS3(), local_aws.LocalSageMakerRuntime()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('sagemaker-runtime', sagemaker, region_name='us-east-1')
+    s3.objects[('uploads', 'uploads/second.wav')] = wav_bytes
+
+    # The earlier run's artifacts have expired; only its index entry is left
+    fingerprint = content_index.fingerprint_bytes(wav_bytes)
+    index = content_index.LocalFingerprintIndex(str(tmp_path))
+    index.record(fingerprint, dict(content_index.artifact_keys('uploads/first.wav'),
+                                   input_key='uploads/first.wav', bucket='summaries'))
+
+    result = lambda_module('whisper-transcription.py').lambda_handler({'detail': {
+        'bucket': {'name': 'uploads'},
+        'object': {'key': 'uploads/second.wav'}
+    }}, None)
+
+    assert result['TranscriptionJob']['TranscriptionJobStatus'] == 'COMPLETED'
+    assert 'Deduplication' not in result
+    assert sagemaker.calls['InvokeEndpoint'] == 1
+    assert index.lookup(fingerprint) is None
@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from botocore.exceptions import ClientError
+
+import endpoint_router
+import local_aws
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def payload():
+    return local_aws.generate_wav(1).hex()
+
+
+def invoke(router, client, body):
+    return router.invoke_endpoint(client, ContentType='application/json',
+                                  Body=('{"audio_input": "%s"}' % body).encode())
+
+
+def test_parse_targets_with_variants():
+    assert endpoint_router.parse_targets('whisper-a, whisper-b/variant-2,') == [
+        ('whisper-a', None), ('whisper-b', 'variant-2')]
+
+
+def test_least_outstanding_prefers_the_faster_endpoint():
+    client = local_aws.LocalSageMakerRuntime(endpoint_latencies={'fast': 0.005, 'slow': 0.05})
+    router = endpoint_router.EndpointRouter([('fast', None), ('slow', None)])
+    body = payload()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: invoke(router, client, body), range(40)))
+
+    # The slow endpoint holds its requests ten times longer, so it is
+    # busy when most new requests arrive
+    assert client.endpoint_calls['fast'] > 2 * client.endpoint_calls['slow']
+    stats = router.stats()
+    assert stats['fast']['ewma_ms'] < stats['slow']['ewma_ms']
+    assert stats['fast']['outstanding'] == stats['slow']['outstanding'] == 0
+
+
+def test_throttling_endpoint_is_ejected_and_request_retried_elsewhere():
+    clock = FakeClock()
+    client = local_aws.LocalSageMakerRuntime(endpoint_throttle_rates={'busy': 1.0})
+    router = endpoint_router.EndpointRouter([('busy', None), ('spare', None)], ejection_seconds=10, clock=clock)
+    body = payload()
+
+    for _ in range(5):
+        invoke(router, client, body)
+
+    # Only the first request was tried on the busy endpoint
+    assert client.endpoint_calls == {'busy': 1, 'spare': 5}
+    assert router.stats()['busy']['ejections'] == 1
+
+    # After the ejection expires the endpoint gets traffic again
+    clock.now += 11
+    invoke(router, client, body)
+    assert client.endpoint_calls['busy'] == 2
+    # ...and a repeat failure ejects it for twice as long
+    busy = router.targets[0]
+    assert busy.ejected_until == pytest.approx(clock.now + 20)
+
+
+def test_non_retryable_errors_are_raised_without_ejection():
+    class RejectingClient:
+        def invoke_endpoint(self, **kwargs):
+            raise ClientError({'Error': {'Code': 'ValidationError', 'Message': 'bad payload'},
+                               'ResponseMetadata': {'HTTPStatusCode': 400}}, 'InvokeEndpoint')
+
+    router = endpoint_router.EndpointRouter([('a', None), ('b', None)])
+    with pytest.raises(ClientError):
+        router.invoke_endpoint(RejectingClient(), Body=b'{}')
+    assert sum(stats['requests'] for stats in router.stats().values()) == 1
+    assert all(stats['ejections'] == 0 for stats in router.stats().values())
+
+
+def test_all_endpoints_throttling_raises_after_trying_each_once():
+    client = local_aws.LocalSageMakerRuntime(throttle_rate=1.0)
+    router = endpoint_router.EndpointRouter([('a', None), ('b', 'v1')])
+    with pytest.raises(ClientError):
+        invoke(router, client, payload())
+    assert client.endpoint_calls == {'a': 1, 'b': 1}
+
+
+def test_router_from_environment_is_cached(monkeypatch):
+    monkeypatch.delenv('WHISPER_ENDPOINTS', raising=False)
+    monkeypatch.setenv('WHISPER_ENDPOINT', 'single')
+    router = endpoint_router.router_from_environment()
+    assert [target.name for target in router.targets] == ['single']
+    assert endpoint_router.router_from_environment() is router
+
+    monkeypatch.setenv('WHISPER_ENDPOINTS', 'a,b/v2')
+    assert [target.name for target in endpoint_router.router_from_environment().targets] == ['a', 'b/v2']
@@ -0,0 +1,138 @@
+import time
+import threading
+
+import pytest
+
+import hedging
+
+
+class SlowOnce:
+    """Callable whose first call is slow; every later call is fast."""
+
+    def __init__(self, slow_seconds=0.3, fast_seconds=0.005):
+        self.slow_seconds = slow_seconds
+        self.fast_seconds = fast_seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.slow_seconds if call == 1 else self.fast_seconds)
+        return call
+
+
+def warmed_tracker(latency_ms=5.0, samples=20):
+    tracker = hedging.LatencyTracker()
+    for _ in range(samples):
+        tracker.record(latency_ms)
+    return tracker
+
+
+def test_percentile_uses_nearest_rank():
+    assert hedging.percentile(list(range(1, 101)), 99) == 99
+    assert hedging.percentile([3.0], 50) == 3.0
+    assert hedging.percentile([], 99) is None
+
+
+def test_slow_request_is_hedged_and_the_first_result_wins():
+    hedger = hedging.Hedger(warmed_tracker(), hedge_percentile=95, max_hedge_ratio=1.0)
+    attempt = SlowOnce()
+    try:
+        start = time.perf_counter()
+        assert hedger.call(attempt) == 2
+        assert time.perf_counter() - start < 0.2
+    finally:
+        hedger.close()
+
+    stats = hedger.stats()
+    assert stats['hedges'] == stats['hedge_wins'] == 1
+    assert stats['hedge_rate'] == 1.0
+
+
+def test_no_hedging_before_enough_latency_history():
+    hedger = hedging.Hedger(warmed_tracker(samples=2), min_samples=5, max_hedge_ratio=1.0)
+    attempt = SlowOnce(slow_seconds=0.05)
+    try:
+        assert hedger.call(attempt) == 1
+    finally:
+        hedger.close()
+    assert attempt.calls == 1
+    assert hedger.stats()['hedges'] == 0
+
+
+def test_hedge_volume_is_capped():
+    # Enough fast history that the slow originals do not move the p95
+    tracker = warmed_tracker(latency_ms=1.0, samples=200)
+    hedger = hedging.Hedger(tracker, max_hedge_ratio=0.25)
+    try:
+        for _ in range(8):
+            # Every original is slower than the 1 ms hedge delay
+            hedger.call(lambda: time.sleep(0.02) or 'ok')
+    finally:
+        hedger.close()
+    stats = hedger.stats()
+    assert stats['requests'] == 8
+    assert stats['hedges'] == 2
+
+
+def test_stats_report_p99_saved_once_the_slow_original_finishes():
+    hedger = hedging.Hedger(warmed_tracker(), max_hedge_ratio=1.0)
+    attempt = SlowOnce(slow_seconds=0.1)
+    try:
+        hedger.call(attempt)
+        time.sleep(0.15)
+    finally:
+        hedger.close()
+    stats = hedger.stats()
+    assert stats['p99_unhedged_ms'] >= 100
+    assert stats['p99_saved_ms'] == pytest.approx(stats['p99_unhedged_ms'] - stats['p99_ms'], abs=0.01)
+
+
+def test_stats_count_originals_still_running_as_the_tail():
+    tracker = warmed_tracker()
+    hedger = hedging.Hedger(tracker, max_hedge_ratio=1.0)
+    attempt = SlowOnce(slow_seconds=0.5)
+    try:
+        hedger.call(attempt)
+        # Read before the original finishes, as the Whisper function does
+        stats = hedger.stats()
+    finally:
+        hedger.close()
+    assert stats['hedge_wins'] == 1
+    # The original counts with the time it had run when the hedge won
+    assert stats['p99_unhedged_ms'] >= stats['p99_ms'] >= 5
+    assert stats['p99_saved_ms'] is not None
+    assert tracker.count() == 21
+
+
+def test_errors_fall_back_to_the_other_request():
+    hedger = hedging.Hedger(warmed_tracker(), max_hedge_ratio=1.0)
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.05)
+            raise RuntimeError('original failed')
+        time.sleep(0.1)
+        return 'hedge'
+
+    try:
+        assert hedger.call(attempt) == 'hedge'
+    finally:
+        hedger.close()
+
+
+def test_hedger_from_environment(monkeypatch):
+    monkeypatch.delenv('HEDGE_ENABLED', raising=False)
+    assert hedging.hedger_from_environment('whisper') is None
+    monkeypatch.setenv('HEDGE_ENABLED', 'true')
+    monkeypatch.setenv('HEDGE_MAX_RATIO', '0.05')
+    hedger = hedging.hedger_from_environment('whisper', max_in_flight=2)
+    try:
+        assert hedger.max_hedge_ratio == 0.05
+        assert hedger.tracker is hedging.shared_tracker('whisper')
+    finally:
+        hedger.close()
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import lambda_runtime
+import local_aws
+import transcript_sessions
+from test_intake_queue import FakeStepFunctions
+
+SEGMENT_SECONDS = 60
+
+
+def s3_event(key):
+    return {'Records': [{'s3': {'bucket': {'name': 'uploads'}, 'object': {'key': key}}}]}
+
+
+@pytest.fixture
+def services(monkeypatch):
+    monkeypatch.setenv('WHISPER_ENDPOINT', 'local-whisper')
+    monkeypatch.setenv('SUMMARIES_BUCKET', 'summaries')
+    monkeypatch.setenv('CONTENT_INDEX_BACKEND', 'none')
+    monkeypatch.setenv('RATE_LIMITER_INITIAL_RPS', '10000')
+    monkeypatch.setenv('STATE_MACHINE_ARN', 'arn:aws:states:us-east-1:123456789012:stateMachine:test')
+    s3, sagemaker, sfn = local_aws.LocalS3(), local_aws.LocalSageMakerRuntime(), FakeStepFunctions()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('sagemaker-runtime', sagemaker, region_name='us-east-1')
+    lambda_runtime.register_client('stepfunctions', sfn)
+    return s3, sagemaker, sfn
+
+
+def test_only_the_tail_is_left_when_the_upload_ends(services, lambda_module):
+    s3, sagemaker, sfn = services
+    whisper = lambda_module('whisper-transcription.py')
+    segment_count = 3
+
+    for sequence in range(1, segment_count + 1):
+        key = transcript_sessions.segment_key('rec-1', sequence)
+        s3.objects[('uploads', key)] = local_aws.generate_wav(SEGMENT_SECONDS)
+        if sequence < segment_count:
+            whisper.segment_handler(s3_event(key), None)
+    chunks_per_segment = sagemaker.calls['InvokeEndpoint'] // (segment_count - 1)
+
+    s3.objects[('uploads', 'sessions/rec-1/complete.json')] = json.dumps(
+        {'segments': segment_count, 'name': 'meeting.wav'}).encode('utf-8')
+    result = whisper.segment_handler(s3_event('sessions/rec-1/complete.json'), None)
+
+    # The last segment never had its own event processed, so it is the only work left
+    assert sagemaker.calls['InvokeEndpoint'] == segment_count * chunks_per_segment
+    assert result['processed'][0]['completed'] is True
+    assert len(sfn.started) == 1
+    started = sfn.started[0]
+    assert started['IncrementalSession'] == {'SessionId': 'rec-1', 'Segments': segment_count}
+    assert started['TranscriptionJob']['Payload']['TranscriptionJob']['TranscriptionJobStatus'] == 'COMPLETED'
+
+    # A repeated completion event does not start a second execution
+    whisper.segment_handler(s3_event('sessions/rec-1/complete.json'), None)
+    assert len(sfn.started) == 1
+
+    # The merged transcript matches transcribing the whole recording at once
+    session_transcript = s3.objects[('summaries', 'Transcription-Output-for-uploads/meeting.wav.txt')]
+    s3.objects[('uploads', 'uploads/meeting.wav')] = local_aws.generate_wav(SEGMENT_SECONDS * segment_count)
+    whisper.lambda_handler({'detail': {'bucket': {'name': 'uploads'}, 'object': {'key': 'uploads/meeting.wav'}}}, None)
+    whole_transcript = s3.objects[('summaries', 'Transcription-Output-for-uploads/meeting.wav.txt')]
+    assert json.loads(session_transcript) == json.loads(whole_transcript)
+
+
+def test_missing_segments_fail_the_merge():
+    segments = {1: {'sequence': 1, 'texts': ['a'], 'durations': [30.0]}}
+
+    with pytest.raises(ValueError):
+        transcript_sessions.merge_segments(segments, 2)
+
+
+@pytest.mark.parametrize('key, parsed', [
+    ('sessions/rec-1/segment-000012.wav', ('segment', 'rec-1', 12)),
+    ('sessions/rec-1/complete.json', ('complete', 'rec-1', None)),
+    ('uploads/meeting.wav', None),
+    ('sessions/rec-1/notes.txt', None)
+])
+def test_session_keys(key, parsed):
+    assert transcript_sessions.parse_session_key(key) == parsed
@@ -0,0 +1,241 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+import job_index
+import job_status
+import lambda_runtime
+import local_aws
+
+
+class FakeStepFunctions:
+    def __init__(self, running=0):
+        self.running = running
+        self.names = set()
+        self.started = []
+        self.started_on = []
+
+    def list_executions(self, **kwargs):
+        return {'executions': [{}] * min(self.running, kwargs['maxResults'])}
+
+    def start_execution(self, stateMachineArn, name, input):
+        if name in self.names:
+            raise ClientError({'Error': {'Code': 'ExecutionAlreadyExists'}}, 'StartExecution')
+        self.names.add(name)
+        self.started.append(json.loads(input))
+        self.started_on.append((stateMachineArn, json.loads(input)))
+
+
+class FakeSQS:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, QueueUrl, MessageBody, DelaySeconds, MessageAttributes):
+        self.sent.append({'messageId': f'requeued-{len(self.sent)}', 'body': MessageBody,
+                          'delay': DelaySeconds,
+                          'messageAttributes': {name: {'stringValue': value['StringValue']}
+                                                for name, value in MessageAttributes.items()}})
+
+    @property
+    def deferred(self):
+        return [(json.loads(message['body'])['Records'][0]['s3']['object']['key'], message['delay'])
+                for message in self.sent]
+
+
+def s3_message(message_id, key, etag='abc'):
+    body = {'Records': [{'s3': {'bucket': {'name': 'uploads'},
+                                'object': {'key': key, 'eTag': etag, 'size': 1024}}}]}
+    return {'messageId': message_id, 'receiptHandle': f'rh-{message_id}', 'body': json.dumps(body)}
+
+
+def wav_message(s3, message_id, key):
+    body = {'Records': [{'s3': {'bucket': {'name': 'uploads'},
+                                'object': {'key': key, 'eTag': 'abc', 'size': len(s3.objects[('uploads', key)])}}}]}
+    return {'messageId': message_id, 'receiptHandle': f'rh-{message_id}', 'body': json.dumps(body)}
+
+
+@pytest.fixture
+def intake(lambda_module, monkeypatch):
+    monkeypatch.setenv('STATE_MACHINE_ARN', 'arn:aws:states:us-east-1:123456789012:stateMachine:test')
+    monkeypatch.setenv('INTAKE_QUEUE_URL', 'https://sqs.local/intake')
+    monkeypatch.setenv('MAX_IN_FLIGHT_EXECUTIONS', '2')
+    return lambda_module('intake-queue.py')
+
+
+def test_starts_only_up_to_in_flight_limit(intake):
+    sfn, sqs = FakeStepFunctions(running=1), FakeSQS()
+    lambda_runtime.register_client('stepfunctions', sfn)
+    lambda_runtime.register_client('sqs', sqs)
+
+    result = intake.lambda_handler({'Records': [
+        s3_message('m1', 'uploads/a.wav'),
+        s3_message('m2', 'uploads/b.wav'),
+        s3_message('m3', 'uploads/c.wav'),
+    ]}, None)
+
+    assert len(sfn.started) == 1
+    assert sfn.started[0]['detail']['object']['key'] == 'uploads/a.wav'
+    assert result['batchItemFailures'] == []
+    assert sqs.deferred == [('uploads/b.wav', 60), ('uploads/c.wav', 60)]
+
+
+def test_waiting_for_a_slot_never_reaches_the_dead_letter_queue(intake):
+    max_receive_count = 50
+    sfn, sqs = FakeStepFunctions(running=2), FakeSQS()
+    lambda_runtime.register_client('stepfunctions', sfn)
+    lambda_runtime.register_client('sqs', sqs)
+    message, receive_count = s3_message('m1', 'uploads/a.wav'), 1
+
+    for _ in range(2 * max_receive_count):
+        result = intake.lambda_handler({'Records': [message]}, None)
+        if result['batchItemFailures']:
+            receive_count += 1
+        else:
+            message, receive_count = sqs.sent[-1], 1
+        assert receive_count < max_receive_count
+
+    sfn.running = 0
+    assert intake.lambda_handler({'Records': [message]}, None) == {'batchItemFailures': []}
+    assert sfn.started[0]['detail']['object']['key'] == 'uploads/a.wav'
+    assert message['messageAttributes']['IntakeDeferrals']['stringValue'] == str(2 * max_receive_count)
+
+
+def test_duplicate_deliveries_are_acknowledged_without_new_execution(intake):
+    sfn = FakeStepFunctions()
+    lambda_runtime.register_client('stepfunctions', sfn)
+    lambda_runtime.register_client('sqs', FakeSQS())
+
+    result = intake.lambda_handler({'Records': [
+        s3_message('m1', 'uploads/a+file.wav'),
+        s3_message('m2', 'uploads/a+file.wav'),
+    ]}, None)
+
+    assert len(sfn.started) == 1
+    assert sfn.started[0]['detail']['object']['key'] == 'uploads/a file.wav'
+    assert result['batchItemFailures'] == []
+
+
+def test_execution_name_depends_on_key_and_etag(intake):
+    first = intake.execution_name('uploads/a.wav', 'etag-1')
+    assert first == intake.execution_name('uploads/a.wav', 'etag-1')
+    assert first != intake.execution_name('uploads/a.wav', 'etag-2')
+    assert len(intake.execution_name('uploads/' + 'x' * 200 + '.wav', 'e')) <= 80
+
+
+def test_short_recordings_take_the_express_lane(intake, monkeypatch):
+    express_arn = 'arn:aws:states:us-east-1:123456789012:stateMachine:express'
+    monkeypatch.setenv('EXPRESS_STATE_MACHINE_ARN', express_arn)
+    monkeypatch.setenv('EXPRESS_MAX_DURATION_SECONDS', '60')
+    monkeypatch.setenv('MAX_IN_FLIGHT_EXECUTIONS', '10')
+    monkeypatch.setenv('JOB_INDEX_BACKEND', 's3')
+    monkeypatch.setenv('SUMMARIES_BUCKET', 'summaries')
+    s3, sfn = local_aws.LocalS3(), FakeStepFunctions()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('stepfunctions', sfn)
+    lambda_runtime.register_client('sqs', FakeSQS())
+    for key, seconds in [('uploads/short.wav', 30), ('uploads/long.wav', 90)]:
+        s3.objects[('uploads', key)] = local_aws.generate_wav(seconds)
+    messages = [wav_message(s3, 'm1', 'uploads/short.wav'), wav_message(s3, 'm2', 'uploads/long.wav')]
+
+    intake.lambda_handler({'Records': messages}, None)
+    # Express executions are not deduplicated by name; the job index catches the redelivery
+    sfn.names.clear()
+    intake.lambda_handler({'Records': messages[:1]}, None)
+
+    assert [(arn, started['lane']) for arn, started in sfn.started_on] == [
+        (express_arn, 'express'), ('arn:aws:states:us-east-1:123456789012:stateMachine:test', 'standard')]
+    record = job_index.get_job_index().get('short.wav')
+    assert record['lane'] == 'express' and record['durationSeconds'] == 30.0
+
+
+def test_files_without_wav_header_are_routed_by_size(intake):
+    s3 = local_aws.LocalS3()
+    s3.objects[('uploads', 'uploads/a.mp3')] = b'ID3' + b'\x00' * 100
+    record = {'bucket': 'uploads', 'key': 'uploads/a.mp3', 'etag': 'e', 'size': 2 * 1024 * 1024}
+
+    assert intake.choose_lane(s3, record, 300, 1024 * 1024) == ('standard', None)
+    assert intake.choose_lane(s3, record, 300, 4 * 1024 * 1024) == ('express', None)
+
+
+def test_transcribe_path_stays_on_the_standard_workflow(intake, monkeypatch):
+    monkeypatch.setenv('EXPRESS_STATE_MACHINE_ARN', 'arn:aws:states:us-east-1:123456789012:stateMachine:express')
+    monkeypatch.setenv('USE_WHISPER', 'false')
+    s3, sfn = local_aws.LocalS3(), FakeStepFunctions()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('stepfunctions', sfn)
+    lambda_runtime.register_client('sqs', FakeSQS())
+    s3.objects[('uploads', 'uploads/short.wav')] = local_aws.generate_wav(5)
+
+    intake.lambda_handler({'Records': [wav_message(s3, 'm1', 'uploads/short.wav')]}, None)
+
+    assert [(arn, started['lane']) for arn, started in sfn.started_on] == [
+        ('arn:aws:states:us-east-1:123456789012:stateMachine:test', 'standard')]
+
+
+def test_express_executions_count_against_the_in_flight_limit(intake, monkeypatch):
+    monkeypatch.setenv('EXPRESS_STATE_MACHINE_ARN', 'arn:aws:states:us-east-1:123456789012:stateMachine:express')
+    monkeypatch.setenv('JOB_INDEX_BACKEND', 's3')
+    monkeypatch.setenv('SUMMARIES_BUCKET', 'summaries')
+    s3, sfn, sqs = local_aws.LocalS3(), FakeStepFunctions(), FakeSQS()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('stepfunctions', sfn)
+    lambda_runtime.register_client('sqs', sqs)
+    for name in ['a', 'b', 'c']:
+        s3.objects[('uploads', f'uploads/{name}.wav')] = local_aws.generate_wav(5)
+    batch = lambda *names: {'Records': [wav_message(s3, f'm-{name}', f'uploads/{name}.wav') for name in names]}
+
+    intake.lambda_handler(batch('a', 'b'), None)
+    # A later batch sees both Express executions still running
+    intake.lambda_handler(batch('c'), None)
+    assert len(sfn.started) == 2 and sqs.deferred == [('uploads/c.wav', 60)]
+
+    job_status.notify('a.wav', 'done')
+    intake.lambda_handler(batch('c'), None)
+    assert [started['detail']['object']['key'] for started in sfn.started] == [
+        'uploads/a.wav', 'uploads/b.wav', 'uploads/c.wav']
+    assert job_index.get_job_index().in_flight('express') == 2
+
+
+class UnreachableInFlightS3(local_aws.LocalS3):
+    """S3 whose in-flight records cannot be reached."""
+
+    def _check(self, Key):
+        if job_index.IN_FLIGHT_PREFIX in Key:
+            raise EndpointConnectionError(endpoint_url='https://s3.amazonaws.com')
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._check(Key)
+        return super().get_object(Bucket=Bucket, Key=Key, **kwargs)
+
+    def put_object(self, Bucket, Key, **kwargs):
+        self._check(Key)
+        return super().put_object(Bucket=Bucket, Key=Key, **kwargs)
+
+
+def test_in_flight_index_errors_do_not_fail_the_batch(intake, monkeypatch):
+    monkeypatch.setenv('EXPRESS_STATE_MACHINE_ARN', 'arn:aws:states:us-east-1:123456789012:stateMachine:express')
+    monkeypatch.setenv('JOB_INDEX_BACKEND', 's3')
+    monkeypatch.setenv('SUMMARIES_BUCKET', 'summaries')
+    s3, sfn, sqs = UnreachableInFlightS3(), FakeStepFunctions(), FakeSQS()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('stepfunctions', sfn)
+    lambda_runtime.register_client('sqs', sqs)
+    s3.objects[('uploads', 'uploads/a.wav')] = local_aws.generate_wav(5)
+
+    result = intake.lambda_handler({'Records': [wav_message(s3, 'm-a', 'uploads/a.wav')]}, None)
+
+    # The execution started, so its message is acknowledged rather than redelivered
+    assert result == {'batchItemFailures': []}
+    assert [started['detail']['object']['key'] for started in sfn.started] == ['uploads/a.wav']
+
+
+def test_in_flight_slots_lapse_after_the_express_timeout(tmp_path):
+    index = job_index.LocalJobIndex(str(tmp_path))
+    index.start_in_flight('express', 'job-1', 300)
+    index.start_in_flight('express', 'job-2', -1)
+
+    assert index.in_flight('express') == 1
+    index.update('job-1', 'queued', lane='express')
+    index.update('job-1', 'failed', failure={'error': 'States.TaskFailed'})
+    assert index.in_flight('express') == 0
@@ -0,0 +1,123 @@
+import json
+import threading
+
+import pytest
+
+import job_index
+import lambda_runtime
+import local_aws
+
+JOB_ID = '0f8fad5b-d9cb-469f-a165-70867728950e'
+INPUT_KEY = f'uploads/{JOB_ID}-meeting.wav'
+
+
+@pytest.fixture
+def services(monkeypatch):
+    for name, value in {'WHISPER_ENDPOINT': 'local-whisper', 'SUMMARIES_BUCKET': 'summaries',
+                        'GUARDRAIL_ID': 'local-guardrail', 'CONTENT_INDEX_BACKEND': 'none',
+                        'RATE_LIMITER_INITIAL_RPS': '10000', 'JOB_INDEX_BACKEND': 's3'}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv('STATUS_WEBSOCKET_ENDPOINT', raising=False)
+    s3 = local_aws.LocalS3()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('sagemaker-runtime', local_aws.LocalSageMakerRuntime(), region_name='us-east-1')
+    lambda_runtime.register_client('bedrock-runtime', local_aws.LocalBedrockRuntime(), region_name='us-east-1')
+    s3.objects[('uploads', INPUT_KEY)] = local_aws.generate_wav(90)
+    return s3
+
+
+def run_pipeline(lambda_module):
+    whisper = lambda_module('whisper-transcription.py').lambda_handler(
+        {'detail': {'bucket': {'name': 'uploads'}, 'object': {'key': INPUT_KEY}}}, None)
+    speaker = lambda_module('speaker-identification.py').lambda_handler({'TranscriptionJob': {'Payload': whisper}}, None)
+    lambda_module('bedrock-summary.py').lambda_handler({'SpeakerIdentification': {'Payload': speaker}}, None)
+
+
+def lookup(lambda_module, **parameters):
+    result = lambda_module('job-lookup.py').lambda_handler({'pathParameters': parameters}, None)
+    return result['statusCode'], json.loads(result['body'])
+
+
+def test_every_stage_records_timing_and_artifacts(services, lambda_module):
+    run_pipeline(lambda_module)
+
+    record = job_index.get_job_index().get(JOB_ID)
+    assert record['stage'] == 'done' and record['inputKey'] == INPUT_KEY and record['totalSeconds'] >= 0
+    assert list(record['stages']) == ['transcribing', 'speaker_identification', 'summarizing', 'done']
+    assert all(record['stages'][stage]['seconds'] >= 0
+               for stage in ['transcribing', 'speaker_identification', 'summarizing'])
+    assert set(record['artifacts']) == {'transcription_key', 'speaker_key', 'summary_key'}
+    assert ('summaries', record['artifacts']['summary_key']) in services.objects
+
+
+def test_lookup_answers_from_the_index(services, lambda_module):
+    assert lookup(lambda_module, uuid=JOB_ID)[1] == {'exists': False, 'key': None, 'status': None}
+    run_pipeline(lambda_module)
+    # Lookups must not fall back to listing the bucket
+    services.list_objects_v2 = None
+
+    status, check = lookup(lambda_module, uuid=JOB_ID)
+    assert status == 200 and check['exists'] and check['status']['stage'] == 'done'
+    for name in [check['key'], JOB_ID]:
+        status, summary = lookup(lambda_module, filename=name)
+        assert status == 200 and summary['key'] == check['key'] and summary['content']
+    assert lookup(lambda_module, filename='unknown-job')[0] == 404
+
+
+def test_failure_reason_is_kept(tmp_path):
+    index = job_index.LocalJobIndex(str(tmp_path))
+    index.update(JOB_ID, 'transcribing', progress={'completed': 1, 'total': 4})
+    # A late queued update never moves a started job back
+    assert index.update(JOB_ID, 'queued', lane='express')['stage'] == 'transcribing'
+    record = index.update(JOB_ID, 'failed', failure={'status': 'FAILED', 'error': 'States.Timeout'})
+
+    assert record == index.get(JOB_ID)
+    assert 'finishedAt' in record['stages']['transcribing'] and 'progress' not in record
+    assert record['failure']['error'] == 'States.Timeout'
+
+
+@pytest.fixture(params=['s3', 'local'])
+def shared_index(request, tmp_path):
+    if request.param == 'local':
+        return job_index.LocalJobIndex(str(tmp_path))
+    # Latency on every call makes the read-modify-write cycles interleave
+    return job_index.S3JobIndex(local_aws.LocalS3(latency_seconds=0.005), 'summaries')
+
+
+def test_concurrent_updates_are_never_lost(shared_index):
+    shared_index.update(JOB_ID, 'queued', lane='standard')
+    writers = [threading.Thread(target=shared_index.update, args=(JOB_ID, 'transcribing'),
+                                kwargs={'artifacts': {f'chunk_{i}': f'key-{i}'}}) for i in range(6)]
+    writers.append(threading.Thread(target=shared_index.update, args=(JOB_ID, 'queued'),
+                                    kwargs={'executionName': 'upload-1234'}))
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    record = shared_index.get(JOB_ID)
+    assert record['stage'] == 'transcribing'
+    assert set(record['artifacts']) == {f'chunk_{i}' for i in range(6)}
+    assert record['lane'] == 'standard' and record['executionName'] == 'upload-1234'
+    assert 'seconds' in record['stages']['queued']
+
+
+def test_update_gives_up_on_a_record_that_keeps_changing(tmp_path, monkeypatch):
+    index = job_index.LocalJobIndex(str(tmp_path))
+    monkeypatch.setattr(index, 'write', lambda job_id, record, version: False)
+    monkeypatch.setattr(job_index.time, 'sleep', lambda seconds: None)
+
+    with pytest.raises(job_index.ConcurrentUpdateError):
+        index.update(JOB_ID, 'transcribing')
+    with pytest.raises(TypeError):
+        job_index.JobIndex()
+
+
+def test_s3_index_needs_conditional_writes(monkeypatch):
+    monkeypatch.setenv('JOB_INDEX_BACKEND', 's3')
+    monkeypatch.setattr(job_index.botocore, '__version__', '1.35.99')
+
+    with pytest.raises(RuntimeError, match='botocore>=1.36.0'):
+        job_index.get_job_index('summaries')
+    job_index.require_conditional_writes('1.36.0')
+    job_index.require_conditional_writes('1.40.2rc1')
@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+import job_index
+import lambda_runtime
+import local_aws
+import job_status
+
+ENDPOINT = 'https://ws.example.com/prod'
+JOB_ID = '0f8fad5b-d9cb-469f-a165-70867728950e'
+INPUT_KEY = f'uploads/{JOB_ID}-meeting.wav'
+
+
+@pytest.fixture
+def services(monkeypatch):
+    for name, value in {'WHISPER_ENDPOINT': 'local-whisper', 'SUMMARIES_BUCKET': 'summaries',
+                        'GUARDRAIL_ID': 'local-guardrail', 'CONTENT_INDEX_BACKEND': 'none',
+                        'RATE_LIMITER_INITIAL_RPS': '10000', 'STATUS_WEBSOCKET_ENDPOINT': ENDPOINT,
+                        'STATUS_MIN_INTERVAL_SECONDS': '0', 'JOB_INDEX_BACKEND': 's3'}.items():
+        monkeypatch.setenv(name, value)
+    s3, connections = local_aws.LocalS3(), local_aws.LocalConnections()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('sagemaker-runtime', local_aws.LocalSageMakerRuntime(), region_name='us-east-1')
+    lambda_runtime.register_client('bedrock-runtime', local_aws.LocalBedrockRuntime(), region_name='us-east-1')
+    lambda_runtime.register_client('apigatewaymanagementapi', connections, endpoint_url=ENDPOINT)
+    s3.objects[('uploads', INPUT_KEY)] = local_aws.generate_wav(90)
+    return s3, connections
+
+
+def websocket_event(route, connection_id, body=None):
+    return {'requestContext': {'routeKey': route, 'connectionId': connection_id},
+            'body': json.dumps(body) if body else None}
+
+
+def execution_event(status, input_key=INPUT_KEY):
+    return {'detail-type': 'Step Functions Execution Status Change',
+            'detail': {'status': status, 'executionArn': 'arn:execution',
+                       'input': json.dumps({'detail': {'bucket': {'name': 'uploads'}, 'object': {'key': input_key}}})}}
+
+
+def test_stages_are_pushed_as_the_pipeline_runs(services, lambda_module):
+    s3, connections = services
+    status = lambda_module('job-status.py')
+    status.lambda_handler(websocket_event('$connect', 'conn-1'), None)
+    status.lambda_handler(websocket_event('subscribe', 'conn-1', {'action': 'subscribe', 'jobId': JOB_ID}), None)
+
+    whisper = lambda_module('whisper-transcription.py').lambda_handler(
+        {'detail': {'bucket': {'name': 'uploads'}, 'object': {'key': INPUT_KEY}}}, None)
+    speaker = lambda_module('speaker-identification.py').lambda_handler({'TranscriptionJob': {'Payload': whisper}}, None)
+    lambda_module('bedrock-summary.py').lambda_handler({'SpeakerIdentification': {'Payload': speaker}}, None)
+
+    messages = connections.messages['conn-1']
+    assert messages[0]['stage'] == 'queued'
+    progress = [message['progress'] for message in messages if message['stage'] == 'transcribing']
+    assert progress[0]['completed'] == 0 and progress[-1]['completed'] == progress[-1]['total'] > 1
+    stages = [message['stage'] for message in messages]
+    assert stages[-3:] == ['speaker_identification', 'summarizing', 'done']
+    # The summary location is pushed once the summary exists
+    assert ('summaries', messages[-1]['summaryKey']) in s3.objects
+
+    # A late subscriber gets the final status straight away
+    status.lambda_handler(websocket_event('subscribe', 'conn-2', {'action': 'subscribe', 'jobId': JOB_ID}), None)
+    assert connections.messages['conn-2'][0]['stage'] == 'done'
+
+
+def test_execution_events_report_start_and_failure(services, lambda_module):
+    s3, connections = services
+    status = lambda_module('job-status.py')
+    status.lambda_handler(websocket_event('subscribe', 'conn-1', {'action': 'subscribe', 'jobId': JOB_ID}), None)
+    job_status.notify(JOB_ID, 'transcribing', progress={'completed': 1, 'total': 4})
+
+    # A late RUNNING event does not move the job back to queued
+    assert status.lambda_handler(execution_event('RUNNING'), None)['published'] is None
+    status.lambda_handler(execution_event('FAILED'), None)
+
+    assert [message['stage'] for message in connections.messages['conn-1']] == ['queued', 'transcribing', 'failed']
+
+
+def test_closed_connections_are_dropped(services, lambda_module):
+    s3, connections = services
+    status = lambda_module('job-status.py')
+    for connection_id in ['conn-1', 'conn-2']:
+        status.lambda_handler(websocket_event('subscribe', connection_id, {'jobId': JOB_ID}), None)
+    connections.gone.add('conn-1')
+    status.lambda_handler(websocket_event('$disconnect', 'conn-2'), None)
+
+    job_status.notify(JOB_ID, 'summarizing')
+
+    channel = job_status.channel_from_environment()
+    assert channel.connections(JOB_ID) == []
+    assert not [key for bucket, key in s3.objects if key.startswith('status-connections/')]
+
+
+@pytest.mark.parametrize('key', [
+    INPUT_KEY,
+    f'Transcription-Output-for-{INPUT_KEY}.txt',
+    f'Transcription-Output-for-{INPUT_KEY}-speaker-identification.txt',
+    JOB_ID
+])
+def test_every_artifact_maps_to_the_upload_job(key):
+    assert job_status.job_id_for_key(key) == JOB_ID
+
+
+def test_artifacts_of_other_uploads_map_to_the_file_name():
+    assert job_status.job_id_for_key('Transcription-Output-for-uploads/meeting.wav-speaker-identification.txt') == 'meeting.wav'
+
+
+def test_express_failures_and_timeouts_reach_subscribers(services, lambda_module, monkeypatch):
+    s3, connections = services
+    status = lambda_module('job-status.py')
+    index = job_index.get_job_index()
+    index.update(JOB_ID, 'queued', inputKey=INPUT_KEY, lane='express')
+    index.start_in_flight('express', JOB_ID, 300)
+    status.lambda_handler(websocket_event('subscribe', 'conn-1', {'action': 'subscribe', 'jobId': JOB_ID}), None)
+
+    # What the Express workflow's catch sends for a failed step
+    status.lambda_handler({'detail-type': 'Pipeline Execution Failed', 'detail': {
+        'status': 'FAILED', 'error': 'ValueError', 'cause': 'TranscriptFileUri is missing from the event',
+        'input': {'detail': {'bucket': {'name': 'uploads'}, 'object': {'key': INPUT_KEY}}}}}, None)
+
+    failed = connections.messages['conn-1'][-1]
+    assert failed['stage'] == 'failed' and failed['failure']['error'] == 'ValueError'
+    assert index.in_flight('express') == 0
+
+    # A timed-out execution writes nothing; subscribers see it fail once the timeout has passed
+    other_job = '7c9e6679-7425-40de-944b-e07fc1f90ae7'
+    index.update(other_job, 'transcribing', lane='express')
+    monkeypatch.setenv('EXPRESS_TIMEOUT_SECONDS', '-120')
+    status.lambda_handler(websocket_event('subscribe', 'conn-2', {'action': 'subscribe', 'jobId': other_job}), None)
+    assert connections.messages['conn-2'][-1]['failure']['status'] == 'TIMED_OUT'
+    assert index.read(other_job)[0]['stage'] == 'transcribing'
@@ -0,0 +1,54 @@
+import os
+
+import lambda_runtime
+
+
+def test_get_client_is_cached_per_service_and_region(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    s3_first = lambda_runtime.get_client('s3')
+    s3_second = lambda_runtime.get_client('s3')
+    sagemaker = lambda_runtime.get_client('sagemaker-runtime', region_name='us-east-1')
+
+    assert s3_first is s3_second
+    assert sagemaker is not s3_first
+    assert lambda_runtime.get_client('sagemaker-runtime', region_name='us-east-1') is sagemaker
+
+
+def test_client_config_enables_keepalive_and_pool(monkeypatch):
+    monkeypatch.setenv('MAX_POOL_CONNECTIONS', '16')
+    config = lambda_runtime.client_config()
+    assert config.max_pool_connections == 16
+    assert config.tcp_keepalive is True
+
+
+def test_register_client_overrides_lookup():
+    stand_in = object()
+    lambda_runtime.register_client('s3', stand_in)
+    assert lambda_runtime.get_client('s3') is stand_in
+
+
+def test_find_ffmpeg_runs_lookup_once(monkeypatch):
+    calls = []
+
+    def fake_which(name):
+        calls.append(name)
+        return '/opt/bin/ffmpeg'
+
+    monkeypatch.setattr(lambda_runtime.shutil, 'which', fake_which)
+    monkeypatch.setenv('PATH', '/usr/bin')
+    lambda_runtime.reset_ffmpeg_cache()
+    try:
+        assert lambda_runtime.find_ffmpeg() == '/opt/bin/ffmpeg'
+        assert lambda_runtime.find_ffmpeg() == '/opt/bin/ffmpeg'
+        assert calls == ['ffmpeg']
+        assert os.environ['PATH'].split(':')[0] == '/opt/bin'
+        assert os.environ['PATH'].endswith(':/usr/bin')
+    finally:
+        lambda_runtime.reset_ffmpeg_cache()
+
+
+def test_lazy_import_defers_until_attribute_access():
+    module = lambda_runtime.lazy_import('json')
+    assert module._module is None
+    assert module.dumps({'a': 1}) == '{"a": 1}'
+    assert module._module is not None
@@ -0,0 +1,66 @@
+import json
+import tracemalloc
+
+import pytest
+
+import lambda_runtime
+import local_aws
+
+CHUNK_BYTES = 30 * 16000 * 2  # one 30 second chunk of 16 kHz mono 16-bit audio
+
+
+@pytest.fixture
+def whisper(lambda_module, monkeypatch):
+    monkeypatch.setenv('WHISPER_ENDPOINT', 'local-whisper')
+    monkeypatch.setenv('SUMMARIES_BUCKET', 'summaries')
+    monkeypatch.setenv('CONTENT_INDEX_BACKEND', 'none')
+    # The stand-in endpoint answers instantly; do not let the limiter pace it
+    monkeypatch.setenv('RATE_LIMITER_INITIAL_RPS', '10000')
+    return lambda_module('whisper-transcription.py')
+
+
+def run_transcription(whisper, minutes, trace=False):
+    s3 = local_aws.LocalS3()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('sagemaker-runtime', local_aws.LocalSageMakerRuntime(), region_name='us-east-1')
+    s3.objects[('uploads', 'uploads/long.wav')] = local_aws.generate_wav(minutes * 60)
+
+    event = {'detail': {'bucket': {'name': 'uploads'}, 'object': {'key': 'uploads/long.wav'}}}
+    if trace:
+        tracemalloc.start()
+    try:
+        result = whisper.lambda_handler(event, None)
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+    finally:
+        if trace:
+            tracemalloc.stop()
+
+    assert result['TranscriptionJob']['TranscriptionJobStatus'] == 'COMPLETED'
+    output = s3.objects[('summaries', 'Transcription-Output-for-uploads/long.wav.txt')]
+    return json.loads(output), peak
+
+
+@pytest.mark.parametrize('concurrency', [1, 2])
+def test_peak_memory_is_bounded_by_chunk_size_not_recording_length(whisper, monkeypatch, concurrency):
+    monkeypatch.setenv('MEMORY_BUDGET_MODE', 'true')
+    monkeypatch.setenv('CHUNK_CONCURRENCY', str(concurrency))
+
+    # A 40 minute recording is ~77 MB; the budget covers the WAV chunk, its
+    # hex request body and the endpoint's decoded copy for every request in
+    # flight, plus a fixed allowance for the transcript text
+    budget = 8 * CHUNK_BYTES * concurrency + 2 * 1024 * 1024
+    _, peak = run_transcription(whisper, 40, trace=True)
+
+    assert peak < budget
+
+
+def test_memory_budget_mode_writes_the_same_transcript(whisper, monkeypatch):
+    in_memory, _ = run_transcription(whisper, 1.5)
+    monkeypatch.setenv('MEMORY_BUDGET_MODE', 'true')
+    monkeypatch.setenv('CHUNK_CONCURRENCY', '2')
+    streamed, _ = run_transcription(whisper, 1.5)
+
+    assert streamed['results']['transcripts'] == in_memory['results']['transcripts']
+    assert streamed['results']['items'] == in_memory['results']['items']
+    assert len(streamed['results']['speaker_labels']['segments']) == 3
+    assert streamed['status'] == 'COMPLETED'
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import metrics
+
+
+def emitted_records(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{')]
+
+
+def test_stage_records_use_embedded_metric_format(capsys):
+    recorder = metrics.StageMetrics('whisper-transcription', InputKey='uploads/a.wav')
+    with recorder.stage('download') as stage:
+        stage['bytes'] = 1024
+    recorder.set_property('AudioDurationSeconds', 12.5)
+    recorder.flush()
+
+    download, total = emitted_records(capsys)
+    definition = download['_aws']['CloudWatchMetrics'][0]
+    assert definition['Dimensions'] == [['Function', 'Stage']]
+    assert {m['Name'] for m in definition['Metrics']} == {'StageDuration', 'StageBytes'}
+    assert download['Stage'] == 'download'
+    assert download['StageBytes'] == 1024
+    assert download['InputKey'] == 'uploads/a.wav'
+    assert {m['Name'] for m in total['_aws']['CloudWatchMetrics'][0]['Metrics']} == {
+        'InvocationDuration', 'AudioDurationSeconds'}
+
+
+def test_structured_properties_are_only_in_the_invocation_total(capsys):
+    recorder = metrics.StageMetrics('whisper-transcription', InputKey='uploads/a.wav')
+    recorder.set_property('ChunkPlan', {'chunk_count': 4})
+    recorder.record('inference', 5.0)
+    recorder.record('upload', 1.0)
+    recorder.flush()
+
+    *stages, total = emitted_records(capsys)
+    assert [record['InputKey'] for record in stages] == ['uploads/a.wav', 'uploads/a.wav']
+    assert not any('ChunkPlan' in record for record in stages)
+    assert total['ChunkPlan'] == {'chunk_count': 4}
+
+
+def test_repeated_stages_keep_every_value_in_batches_of_100(capsys):
+    recorder = metrics.StageMetrics('whisper-transcription')
+    for _ in range(150):
+        recorder.record('inference', 5.0, 10)
+    recorder.flush()
+
+    inference = [record for record in emitted_records(capsys) if record.get('Stage') == 'inference']
+    assert [len(record['StageDuration']) for record in inference] == [100, 50]
+    assert recorder.summary()['inference']['count'] == 150
+
+
+def test_debug_is_silent_by_default(capsys, monkeypatch):
+    monkeypatch.delenv('VERBOSE_LOGGING', raising=False)
+    metrics.debug('hidden')
+    monkeypatch.setenv('VERBOSE_LOGGING', 'true')
+    metrics.debug('shown')
+    assert capsys.readouterr().out == 'shown\n'
+
+
+def test_failed_invocations_still_flush(capsys, lambda_module):
+    with pytest.raises(ValueError):
+        lambda_module('speaker-identification.py').lambda_handler({'TranscriptionJob': {'Payload': {}}}, None)
+
+    total = emitted_records(capsys)[-1]
+    assert total['Function'] == 'speaker-identification'
+    assert 'TranscriptFileUri' in total['FailureReason']
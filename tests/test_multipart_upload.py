@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import lambda_runtime
+import local_aws
+
+MIB = 1024 * 1024
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('UPLOADS_BUCKET', 'uploads')
+    monkeypatch.setenv('UPLOAD_PART_SIZE_MB', '5')
+    s3 = local_aws.LocalS3()
+    lambda_runtime.register_client('s3', s3)
+    return s3
+
+
+def call(handler, action, body):
+    path = '/multipart-upload' if action == 'start' else f'/multipart-upload/{action}'
+    result = handler.lambda_handler({'path': path, 'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+    return result['statusCode'], json.loads(result['body'])
+
+
+def test_interrupted_upload_resumes_and_completes(s3, lambda_module):
+    handler = lambda_module('multipart-upload.py')
+    recording = bytes(range(256)) * (48 * 1024)  # 12 MiB -> three 5 MiB parts
+
+    status, upload = call(handler, 'start', {'filename': 'board meeting.wav', 'size': len(recording),
+                                             'contentType': 'audio/wav'})
+    assert status == 200
+    assert upload['key'].startswith('uploads/') and upload['key'].endswith('-board_meeting.wav')
+    assert (upload['partSize'], upload['partCount']) == (5 * MIB, 3)
+    reference = {'key': upload['key'], 'uploadId': upload['uploadId']}
+
+    def put_part(number):
+        start = (number - 1) * upload['partSize']
+        s3.upload_part(Bucket='uploads', Key=upload['key'], UploadId=upload['uploadId'], PartNumber=number,
+                       Body=recording[start:start + upload['partSize']])
+
+    _, listing = call(handler, 'parts', dict(reference, partNumbers=[1, 2, 3]))
+    assert [url['partNumber'] for url in listing['urls']] == [1, 2, 3]
+    assert all('uploadId=' in url['url'] for url in listing['urls'])
+    put_part(1)
+    put_part(3)
+
+    # After the connection dropped, the browser learns which parts are left
+    _, listing = call(handler, 'parts', reference)
+    assert [part['partNumber'] for part in listing['uploaded']] == [1, 3]
+    status, error = call(handler, 'complete', dict(reference, partCount=3))
+    assert status == 400 and '[2]' in error['error']
+
+    put_part(2)
+    status, completed = call(handler, 'complete', dict(reference, partCount=3))
+    assert (status, completed['parts']) == (200, 3)
+    assert s3.objects[('uploads', upload['key'])] == recording
+    assert not s3.uploads
+
+    # The upload is gone, so a stale resume starts over
+    status, _ = call(handler, 'parts', reference)
+    assert status == 404
+
+
+@pytest.mark.parametrize('file_size, part_size', [
+    (100 * MIB, 16 * MIB),
+    (16 * MIB * 10000, 16 * MIB),
+    (16 * MIB * 10000 + 1, 17 * MIB),
+    (1024 * 1024 * MIB, 105 * MIB)
+])
+def test_part_size_stays_within_the_part_limit(lambda_module, file_size, part_size):
+    handler = lambda_module('multipart-upload.py')
+
+    assert handler.part_size_for(file_size, 16 * MIB) == part_size
+    assert -(-file_size // part_size) <= handler.MAX_PARTS
+
+
+@pytest.mark.parametrize('body', [
+    {'key': 'summaries/report.txt', 'uploadId': 'upload-1', 'partCount': 1},
+    {'key': 'uploads/../report.txt', 'uploadId': 'upload-1', 'partCount': 1},
+    {'key': 'uploads/a.wav'}
+])
+def test_requests_outside_uploads_are_rejected(s3, lambda_module, body):
+    status, _ = call(lambda_module('multipart-upload.py'), 'complete', body)
+
+    assert status == 400
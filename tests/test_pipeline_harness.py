@@ -0,0 +1,53 @@
+import argparse
+
+import pytest
+
+import local_aws
+import pipeline_harness
+
+
+def harness_args(**overrides):
+    args = dict(sample_rate=16000, channels=1, s3_latency=0.0, sagemaker_latency=0.0,
+                sagemaker_latency_per_audio_second=0.0, sagemaker_throttle_rate=0.0,
+                bedrock_latency=0.0, bedrock_throttle_rate=0.0, seed=0, verbose=False)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    monkeypatch.setenv('WHISPER_ENDPOINT', 'local-whisper')
+    monkeypatch.setenv('SUMMARIES_BUCKET', pipeline_harness.SUMMARIES_BUCKET)
+    monkeypatch.setenv('GUARDRAIL_ID', 'local-guardrail')
+    monkeypatch.setenv('CONTENT_INDEX_BACKEND', 'none')
+    return {
+        'whisper': pipeline_harness.load_handler('whisper-transcription.py'),
+        'speaker': pipeline_harness.load_handler('speaker-identification.py'),
+        'summary': pipeline_harness.load_handler('bedrock-summary.py')
+    }
+
+
+def test_generated_wav_has_requested_duration():
+    wav_bytes = local_aws.generate_wav(2.5, sample_rate=8000, channels=2)
+    assert local_aws.wav_duration_seconds(wav_bytes) == pytest.approx(2.5)
+
+
+def test_pipeline_runs_offline_and_reports_stages(handlers):
+    run = pipeline_harness.run_pipeline(45, harness_args(), handlers)
+
+    assert run['status'] == 'COMPLETED'
+    assert [stage['stage'] for stage in run['stages']] == [
+        'whisper-transcription', 'speaker-identification', 'bedrock-summary']
+    whisper_stage = run['stages'][0]
+    assert whisper_stage['services']['sagemaker-runtime']['calls'] == {'InvokeEndpoint': 2}
+    assert whisper_stage['services']['s3']['bytes_received'] == run['audio_bytes']
+    assert run['summary_key'] == 'Bedrock-Sonnet-GenAI-summary-harness-45s.wav.txt'
+
+
+def test_compare_flags_extra_api_calls(handlers):
+    report = {'runs': [pipeline_harness.run_pipeline(45, harness_args(), handlers)]}
+    baseline = {'runs': [dict(report['runs'][0])]}
+    baseline['runs'][0]['stages'] = [dict(stage, services={}) for stage in report['runs'][0]['stages']]
+
+    regressions = pipeline_harness.compare_to_baseline(report, baseline, tolerance=100)
+    assert any('InvokeEndpoint' in regression for regression in regressions)
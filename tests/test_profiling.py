@@ -0,0 +1,75 @@
+import json
+import pstats
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+
+import lambda_runtime
+import local_aws
+import metrics
+import profiling
+
+
+@pytest.fixture(autouse=True)
+def _profiling_env(monkeypatch):
+    monkeypatch.setenv('PROFILING_ENABLED', 'true')
+    monkeypatch.delenv('PROFILE_S3_URI', raising=False)
+    monkeypatch.delenv('PROFILE_SAMPLE_EVERY', raising=False)
+    profiling.reset_sampling()
+    yield
+    profiling.reset_sampling()
+
+
+@profiling.profile_invocation('test-function')
+def handler(event, context):
+    recorder = metrics.StageMetrics('test-function', InputKey=event['key'])
+    recorder.set_property('AudioDurationSeconds', 90.0)
+    buffers = [bytearray(1024) for _ in range(100)]
+    return {'status': 'ok', 'buffers': len(buffers)}
+
+
+def test_profile_written_to_local_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path))
+
+    assert handler({'key': 'uploads/a.wav'}, SimpleNamespace(aws_request_id='req-1'))['status'] == 'ok'
+
+    [folder] = (tmp_path / 'test-function').iterdir()
+    assert folder.name.endswith('-req-1')
+    stats = pstats.Stats(str(folder / 'cprofile.prof'))
+    assert any(name == 'handler' for _, _, name in stats.stats)
+    assert tracemalloc.Snapshot.load(str(folder / 'tracemalloc.snapshot')).statistics('lineno')
+    assert (folder / 'tracemalloc.txt').read_text().startswith('Top 25 allocation sites')
+    metadata = json.loads((folder / 'metadata.json').read_text())
+    assert metadata['InputKey'] == 'uploads/a.wav'
+    assert metadata['AudioDurationSeconds'] == 90.0
+    assert metadata['PeakTracedBytes'] > 100 * 1024
+
+
+def test_profile_uploaded_to_s3_prefix_with_tags(monkeypatch):
+    s3 = local_aws.LocalS3()
+    lambda_runtime.register_client('s3', s3)
+    put_metadata = []
+    original_put = s3.put_object
+    monkeypatch.setattr(s3, 'put_object', lambda **kwargs: put_metadata.append(kwargs['Metadata']) or original_put(**kwargs))
+    monkeypatch.setenv('PROFILE_S3_URI', 's3://profiles-bucket/profiles')
+
+    handler({'key': 'uploads/a b.wav'}, None)
+
+    keys = sorted(key for bucket, key in s3.objects if bucket == 'profiles-bucket')
+    assert [key.rsplit('/', 1)[1] for key in keys] == [
+        'cprofile.prof', 'metadata.json', 'tracemalloc.snapshot', 'tracemalloc.txt']
+    assert all(key.startswith('profiles/test-function/') for key in keys)
+    assert put_metadata[0] == {'inputkey': 'uploads%2Fa%20b.wav', 'audiodurationseconds': '90.0'}
+
+
+def test_sampling_and_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path))
+    monkeypatch.setenv('PROFILE_SAMPLE_EVERY', '2')
+    for _ in range(3):
+        handler({'key': 'uploads/a.wav'}, None)
+    assert len(list((tmp_path / 'test-function').iterdir())) == 2
+
+    monkeypatch.setenv('PROFILING_ENABLED', 'false')
+    handler({'key': 'uploads/a.wav'}, None)
+    assert len(list((tmp_path / 'test-function').iterdir())) == 2
@@ -0,0 +1,98 @@
+import json
+import os
+import re
+
+import pytest
+
+import lambda_runtime
+import local_aws
+import prompt_compaction
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'compaction')
+NAMES = sorted(name[:-len('.json')] for name in os.listdir(FIXTURES) if name.endswith('.json'))
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, f'{name}.txt')) as f:
+        transcript = f.read()
+    with open(os.path.join(FIXTURES, f'{name}.json')) as f:
+        expected = json.load(f)
+    return transcript, expected
+
+
+def normalized(text):
+    return re.sub(r'\s+', ' ', text.lower())
+
+
+@pytest.mark.parametrize('name', NAMES)
+def test_key_content_survives_compaction(name):
+    transcript, expected = load_fixture(name)
+
+    compacted, aliases, report = prompt_compaction.compact_transcript(transcript, prompt_compaction.DEFAULT_STEPS)
+
+    for phrase in expected['key_discussions']:
+        assert normalized(phrase) in normalized(compacted), phrase
+    # Action items stay on a line attributed to their owner
+    for item in expected['action_items']:
+        label = aliases.get(item['owner'], item['owner'])
+        lines = [line for line in compacted.splitlines() if re.search(rf'\b{re.escape(label)}:', line)]
+        assert any(normalized(item['phrase']) in normalized(line) for line in lines), item
+    restored = prompt_compaction.expand_aliases(compacted, aliases)
+    for speaker in expected['speakers']:
+        assert speaker in restored
+    saving = 1 - report['tokens_after'] / report['tokens_before']
+    assert saving >= expected['min_token_savings']
+    assert report['turns_after'] <= report['turns_before']
+
+
+def test_disfluencies_are_collapsed():
+    text = "so, um, we we should uh ship it, let's let's do that on on Thursday"
+
+    assert prompt_compaction.collapse_disfluencies(text) == "so we should ship it, let's do that on Thursday"
+
+
+def test_aliases_skip_names_used_in_the_transcript():
+    turns = [prompt_compaction.Turn(second, f'spk_{second % 2}', 'the Amazon S0 bucket') for second in range(40)]
+
+    aliases = prompt_compaction.speaker_aliases(turns)
+
+    assert aliases == {'spk_0': 'S1', 'spk_1': 'S2'}
+    assert prompt_compaction.expand_aliases('S1 asked S2 about S0', aliases) == 'spk_0 asked spk_1 about S0'
+
+
+def test_steps_from_environment(monkeypatch):
+    monkeypatch.setenv('PROMPT_COMPACTION_STEPS', 'none')
+    assert prompt_compaction.steps_from_environment() == ()
+    monkeypatch.setenv('PROMPT_COMPACTION_STEPS', 'merge_turns, drop_timestamps')
+    assert prompt_compaction.steps_from_environment() == ('merge_turns', 'drop_timestamps')
+    monkeypatch.setenv('PROMPT_COMPACTION_STEPS', 'summarize')
+    with pytest.raises(ValueError):
+        prompt_compaction.steps_from_environment()
+
+    transcript, _ = load_fixture('standup')
+    assert prompt_compaction.compact_transcript(transcript, ())[0] == transcript
+
+
+def test_handler_sends_compacted_prompt(lambda_module, monkeypatch):
+    monkeypatch.setenv('GUARDRAIL_ID', 'local-guardrail')
+    monkeypatch.setenv('CONTENT_INDEX_BACKEND', 'none')
+    s3 = local_aws.LocalS3()
+    # The model answers with the speaker aliases from the compacted prompt
+    bedrock = local_aws.LocalBedrockRuntime(summary_text=(
+        "Summary: Quarterly review.\n\nSpeakers: S0, S1\n\n"
+        "Key Discussions:\n- Budget\n\nAction Items:\n- Send the forecast (Owner: S1)"))
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('bedrock-runtime', bedrock, region_name='us-east-1')
+    transcript, _ = load_fixture('board_meeting')
+    key = 'Transcription-Output-for-uploads/board.wav-speaker-identification.txt'
+    s3.objects[('summaries', key)] = transcript.encode('utf-8')
+
+    summary = lambda_module('bedrock-summary.py')
+    result = summary.lambda_handler({'SpeakerIdentification': {'Payload': {'bucket_name': 'summaries', 'object_key': key}}}, None)
+
+    compaction = result['compaction']
+    assert compaction['tokens_after'] < compaction['tokens_before']
+    assert result['model']['estimated_input_tokens'] == compaction['tokens_after']
+    written = s3.objects[('summaries', result['object_key'])].decode('utf-8')
+    for section in ['Summary:', 'Speakers: spk_0, spk_1', 'Key Discussions:', 'Action Items:', '(Owner: spk_1)']:
+        assert section in written
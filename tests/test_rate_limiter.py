@@ -0,0 +1,143 @@
+import pytest
+from botocore.exceptions import ClientError
+
+import lambda_runtime
+import local_aws
+import rate_limiter
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def error(code, status=400):
+    return ClientError({'Error': {'Code': code, 'Message': code},
+                        'ResponseMetadata': {'HTTPStatusCode': status}}, 'Call')
+
+
+def test_rate_increases_additively_and_decreases_multiplicatively():
+    fake = FakeTime()
+    limiter = rate_limiter.AIMDRateLimiter(initial_rate=4, additive_increase=1, decrease_factor=0.5,
+                                           decrease_cooldown=1, clock=fake.clock, sleep=fake.sleep)
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.rate == 8
+
+    limiter.on_throttle()
+    assert limiter.rate == 4
+    # Concurrent throttles within the cooldown only count once
+    limiter.on_throttle()
+    assert limiter.rate == 4
+    fake.now += 2
+    limiter.on_throttle()
+    assert limiter.rate == 2
+    assert limiter.stats() == {'rate': 2, 'throttles': 3, 'decreases': 2}
+
+
+def test_token_bucket_paces_requests_at_the_current_rate():
+    fake = FakeTime()
+    limiter = rate_limiter.AIMDRateLimiter(initial_rate=2, burst=1, clock=fake.clock, sleep=fake.sleep)
+    for _ in range(5):
+        limiter.acquire()
+    # The first request uses the burst; the other four wait 0.5 s each
+    assert fake.now == pytest.approx(2.0)
+
+
+def test_throttles_are_retried_with_jitter_until_success():
+    fake = FakeTime()
+    limiter = rate_limiter.AIMDRateLimiter(initial_rate=100, clock=fake.clock, sleep=fake.sleep)
+    responses = [error('ThrottlingException'), error('ServiceUnavailable', 503), 'ok']
+
+    def call():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    delays = []
+    result = rate_limiter.call_with_retries(limiter, call, sleep=delays.append,
+                                            jitter=lambda low, high: high)
+    assert result == 'ok'
+    assert delays == [0.4, 0.8]
+    assert limiter.throttles == 1
+
+
+def test_permanent_errors_and_exhausted_retries_are_raised():
+    limiter = rate_limiter.AIMDRateLimiter(initial_rate=100)
+    calls = []
+
+    def rejected():
+        calls.append(1)
+        raise error('ValidationException')
+
+    with pytest.raises(ClientError):
+        rate_limiter.call_with_retries(limiter, rejected, sleep=lambda _: None)
+    assert len(calls) == 1
+
+    def throttled():
+        calls.append(1)
+        raise error('ThrottlingException')
+
+    with pytest.raises(ClientError):
+        rate_limiter.call_with_retries(limiter, throttled, max_attempts=3, sleep=lambda _: None)
+    assert len(calls) == 4
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setenv('RATE_LIMITER_INITIAL_RPS', '10000')
+    monkeypatch.setenv('RATE_LIMITER_MAX_ATTEMPTS', '20')
+    monkeypatch.setattr(rate_limiter.time, 'sleep', lambda _: None)
+
+
+def test_transcription_survives_a_throttling_endpoint(lambda_module, monkeypatch, no_backoff):
+    monkeypatch.setenv('WHISPER_ENDPOINT', 'local-whisper')
+    monkeypatch.setenv('CONTENT_INDEX_BACKEND', 'none')
+    s3 = local_aws.LocalS3()
+    sagemaker = local_aws.LocalSageMakerRuntime(throttle_rate=0.4, seed=1)
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('sagemaker-runtime', sagemaker, region_name='us-east-1')
+    s3.objects[('uploads', 'a.wav')] = local_aws.generate_wav(300)
+
+    whisper = lambda_module('whisper-transcription.py')
+    result = whisper.lambda_handler({'detail': {'bucket': {'name': 'uploads'}, 'object': {'key': 'a.wav'}}}, None)
+
+    assert result['TranscriptionJob']['TranscriptionJobStatus'] == 'COMPLETED'
+    assert sagemaker.throttled['InvokeEndpoint'] > 0
+    assert rate_limiter.get_limiter('sagemaker:InvokeEndpoint').throttles == sagemaker.throttled['InvokeEndpoint']
+
+
+def test_summary_retries_throttled_bedrock_calls(lambda_module, monkeypatch, no_backoff):
+    monkeypatch.setenv('GUARDRAIL_ID', 'local-guardrail')
+    monkeypatch.setenv('CONTENT_INDEX_BACKEND', 'none')
+    s3 = local_aws.LocalS3()
+    bedrock = local_aws.LocalBedrockRuntime(throttle_rate=0.5, seed=3)
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('bedrock-runtime', bedrock, region_name='us-east-1')
+    key = 'Transcription-Output-for-uploads/a.wav-speaker-identification.txt'
+    s3.objects[('summaries', key)] = b'spk_0: hello there'
+
+    summary = lambda_module('bedrock-summary.py')
+    result = summary.lambda_handler({'SpeakerIdentification': {'Payload': {'bucket_name': 'summaries', 'object_key': key}}}, None)
+
+    assert result['object_key'] == 'Bedrock-Sonnet-GenAI-summary-a.wav.txt'
+    assert sum(bedrock.throttled.values()) > 0
+
+
+def test_guardrail_does_not_pass_on_unredacted_text_when_throttled(lambda_module, monkeypatch, no_backoff):
+    monkeypatch.setenv('RATE_LIMITER_MAX_ATTEMPTS', '3')
+    summary = lambda_module('bedrock-summary.py')
+    bedrock = local_aws.LocalBedrockRuntime(throttle_rate=1.0)
+
+    with pytest.raises(ClientError):
+        summary.apply_guardrail(bedrock, 'call me on 555-0100', 'local-guardrail')
+    assert bedrock.calls['ApplyGuardrail'] == 3
@@ -0,0 +1,159 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+import lambda_runtime
+import local_aws
+import redaction
+
+PII_TEXT = 'call me at 555-123-4567 or mail jane.doe@example.com'
+
+
+class PiiSageMakerRuntime(local_aws.LocalSageMakerRuntime):
+    """Whisper stand-in whose transcripts contain a phone number and an e-mail address."""
+
+    def transcribe_payload(self, body, content_type='application/json'):
+        duration, _ = super().transcribe_payload(body, content_type)
+        return duration, PII_TEXT
+
+
+class RecordingBedrockRuntime(local_aws.LocalBedrockRuntime):
+    """Records how many chunks had been transcribed when each guardrail call started."""
+
+    def __init__(self, sagemaker, **kwargs):
+        super().__init__(**kwargs)
+        self.sagemaker = sagemaker
+        self.transcribed_at_call = []
+
+    def apply_guardrail(self, **kwargs):
+        self.transcribed_at_call.append(self.sagemaker.calls['InvokeEndpoint'])
+        return super().apply_guardrail(**kwargs)
+
+
+class BrokenGuardrailRuntime(RecordingBedrockRuntime):
+    """Guardrail whose every call fails with a non-transient error."""
+
+    def apply_guardrail(self, **kwargs):
+        super().apply_guardrail(**kwargs)
+        raise ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'Guardrail not found'},
+                           'ResponseMetadata': {'HTTPStatusCode': 404}}, 'ApplyGuardrail')
+
+
+class NameGuardrailRuntime(local_aws.LocalBedrockRuntime):
+    """Guardrail that anonymizes one name, but only when it sees the whole of it."""
+
+    def apply_guardrail(self, **kwargs):
+        response = super().apply_guardrail(**kwargs)
+        text = kwargs['content'][0]['text']['text']
+        if 'Jane Doe' not in text:
+            return response
+        return dict(response, action='GUARDRAIL_INTERVENED',
+                    outputs=[{'text': text.replace('Jane Doe', '{NAME}')}])
+
+
+@pytest.fixture
+def services(monkeypatch):
+    for name, value in {'WHISPER_ENDPOINT': 'local-whisper', 'SUMMARIES_BUCKET': 'summaries',
+                        'GUARDRAIL_ID': 'local-guardrail', 'CONTENT_INDEX_BACKEND': 'none',
+                        'RATE_LIMITER_INITIAL_RPS': '10000', 'CHUNK_CONCURRENCY': '1'}.items():
+        monkeypatch.setenv(name, value)
+    s3 = local_aws.LocalS3()
+    sagemaker = PiiSageMakerRuntime(latency_seconds=0.02)
+    bedrock = RecordingBedrockRuntime(sagemaker)
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('sagemaker-runtime', sagemaker, region_name='us-east-1')
+    lambda_runtime.register_client('bedrock-runtime', bedrock, region_name='us-east-1')
+    s3.objects[('uploads', 'uploads/call.wav')] = local_aws.generate_wav(150)
+    return s3, sagemaker, bedrock
+
+
+def run_pipeline(lambda_module):
+    whisper = lambda_module('whisper-transcription.py').lambda_handler(
+        {'detail': {'bucket': {'name': 'uploads'}, 'object': {'key': 'uploads/call.wav'}}}, None)
+    speaker = lambda_module('speaker-identification.py').lambda_handler({'TranscriptionJob': {'Payload': whisper}}, None)
+    lambda_module('bedrock-summary.py').lambda_handler({'SpeakerIdentification': {'Payload': speaker}}, None)
+
+
+@pytest.mark.parametrize('text, redacted', [
+    ('call 555-123-4567 now', 'call {PHONE} now'),
+    ('call (555) 123-4567 now', 'call {PHONE} now'),
+    ('mail jane.doe@example.com', 'mail {EMAIL}'),
+    ('ssn 123-45-6789', 'ssn {US_SOCIAL_SECURITY_NUMBER}'),
+    ('card 4111 1111 1111 1111', 'card {CREDIT_DEBIT_CARD_NUMBER}'),
+    ('meet at 10:30 in room 204', 'meet at 10:30 in room 204')
+])
+def test_regex_redaction(text, redacted):
+    assert redaction.regex_redact(text) == redacted
+
+
+def test_identifiers_split_across_chunks_are_redacted():
+    texts = [redaction.regex_redact(text) for text in ['please call 555-123', '4567 tomorrow']]
+
+    assert redaction.redact_seams(texts) == ['please call {PHONE}', 'tomorrow']
+
+
+def test_chunks_are_redacted_while_inference_is_in_flight(services, lambda_module, monkeypatch):
+    s3, sagemaker, bedrock = services
+    monkeypatch.setenv('CHUNK_REDACTION', 'regex,guardrail')
+
+    run_pipeline(lambda_module)
+
+    transcript_key = ('summaries', 'Transcription-Output-for-uploads/call.wav.txt')
+    transcript = json.loads(s3.objects[transcript_key])['results']['transcripts'][0]['transcript']
+    assert '555-123-4567' not in transcript and 'jane.doe@example.com' not in transcript
+    assert '{PHONE}' in transcript and '{EMAIL}' in transcript
+    assert s3.metadata[transcript_key] == {redaction.METADATA_KEY: 'regex+guardrail'}
+
+    chunks = sagemaker.calls['InvokeEndpoint']
+    assert chunks > 1
+    # The first chunks were redacted before the last one was transcribed
+    assert min(bedrock.transcribed_at_call) < chunks
+    # One guardrail call per chunk and per seam plus the summary; the transcript pass was skipped
+    assert bedrock.calls['ApplyGuardrail'] == chunks + (chunks - 1) + 1
+
+
+def test_summary_runs_its_guardrail_pass_when_chunk_guardrail_fails(services, lambda_module, monkeypatch):
+    s3, sagemaker, _ = services
+    bedrock = BrokenGuardrailRuntime(sagemaker)
+    lambda_runtime.register_client('bedrock-runtime', bedrock, region_name='us-east-1')
+    monkeypatch.setenv('CHUNK_REDACTION', 'regex,guardrail')
+
+    run_pipeline(lambda_module)
+
+    speaker_key = ('summaries', 'Transcription-Output-for-uploads/call.wav-speaker-identification.txt')
+    assert s3.metadata[speaker_key] == {redaction.METADATA_KEY: 'regex'}
+    chunks = sagemaker.calls['InvokeEndpoint']
+    # Chunks and seams, then the transcript pass the summary no longer skips, then the summary
+    assert bedrock.calls['ApplyGuardrail'] == chunks + (chunks - 1) + 2
+
+
+def test_guardrail_sees_names_split_across_chunks():
+    redactor = redaction.ChunkRedactor(('regex', 'guardrail'), NameGuardrailRuntime(), 'local-guardrail')
+    try:
+        texts = redactor.results([redactor.submit(text) for text in ['we asked Jane', 'Doe to call back']])
+    finally:
+        redactor.close()
+
+    # Both chunks fit in the seam window, so the redacted window replaces the first and the second is emptied
+    assert texts == ['we asked {NAME} to call back', '']
+    assert redactor.describe() == 'regex+guardrail'
+
+
+def test_summary_keeps_its_guardrail_pass_without_upstream_guardrail(services, lambda_module):
+    s3, sagemaker, bedrock = services
+
+    run_pipeline(lambda_module)
+
+    speaker_key = ('summaries', 'Transcription-Output-for-uploads/call.wav-speaker-identification.txt')
+    assert s3.metadata[speaker_key] == {redaction.METADATA_KEY: 'regex'}
+    assert '555-123-4567' not in s3.objects[speaker_key].decode('utf-8')
+    # Transcript and summary
+    assert bedrock.calls['ApplyGuardrail'] == 2
+
+
+def test_unknown_redaction_step_is_rejected(monkeypatch):
+    monkeypatch.setenv('CHUNK_REDACTION', 'regex,comprehend')
+
+    with pytest.raises(ValueError):
+        redaction.steps_from_environment()
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import lambda_runtime
+import local_aws
+import summary_routing
+
+POLICY = {
+    'chars_per_token': 4,
+    'tiers': [
+        {'name': 'long', 'max_input_tokens': None, 'model_id': 'large-model', 'max_tokens': 4096},
+        {'name': 'short', 'max_input_tokens': 100, 'model_id': 'small-model', 'max_tokens': 512}
+    ]
+}
+
+
+@pytest.mark.parametrize('chars, tier', [(0, 'short'), (400, 'short'), (401, 'long'), (100000, 'long')])
+def test_tier_follows_estimated_tokens(chars, tier):
+    policy = dict(POLICY, tiers=summary_routing.validate_policy(POLICY))
+
+    route = summary_routing.choose_model('x' * chars, policy=policy)
+
+    assert route['tier'] == tier
+    assert route['estimated_input_tokens'] == -(-chars // 4)
+
+
+def test_overrides():
+    policy = dict(POLICY, tiers=summary_routing.validate_policy(POLICY))
+    text = 'short transcript'
+
+    assert summary_routing.choose_model(text, {'tier': 'long'}, policy)['model_id'] == 'large-model'
+    assert summary_routing.choose_model(text, {'max_tokens': 64}, policy)['max_tokens'] == 64
+    custom = summary_routing.choose_model(text, {'model_id': 'other-model', 'max_tokens': 300}, policy)
+    assert (custom['tier'], custom['model_id'], custom['max_tokens']) == ('override', 'other-model', 300)
+    with pytest.raises(ValueError):
+        summary_routing.choose_model(text, {'tier': 'huge'}, policy)
+
+
+@pytest.mark.parametrize('tiers', [
+    [],
+    [{'name': 'a', 'max_input_tokens': 10, 'model_id': 'm', 'max_tokens': 1}],
+    [{'name': 'a', 'max_input_tokens': None, 'model_id': 'm'}]
+])
+def test_malformed_policies_are_rejected(tiers):
+    with pytest.raises(ValueError):
+        summary_routing.validate_policy({'tiers': tiers})
+
+
+def test_shipped_policy_is_valid():
+    policy = summary_routing.load_policy()
+
+    assert policy['tiers'][-1]['max_input_tokens'] is None
+    assert policy['tiers'][-1]['max_tokens'] == 4096
+
+
+@pytest.mark.parametrize('transcript, model_id', [
+    (b'spk_0: please call me back', 'small-model'),
+    (b'spk_0: ' + b'long agenda item ' * 200, 'large-model')
+], ids=['short', 'long'])
+def test_handler_reports_model_and_tokens(lambda_module, monkeypatch, transcript, model_id):
+    monkeypatch.setenv('GUARDRAIL_ID', 'local-guardrail')
+    monkeypatch.setenv('CONTENT_INDEX_BACKEND', 'none')
+    monkeypatch.setenv('SUMMARY_ROUTING_POLICY', json.dumps(POLICY))
+    monkeypatch.setenv('PROMPT_COMPACTION_STEPS', 'none')
+    s3 = local_aws.LocalS3()
+    bedrock = local_aws.LocalBedrockRuntime()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('bedrock-runtime', bedrock, region_name='us-east-1')
+    key = 'Transcription-Output-for-uploads/a.wav-speaker-identification.txt'
+    s3.objects[('summaries', key)] = transcript
+
+    summary = lambda_module('bedrock-summary.py')
+    result = summary.lambda_handler({'SpeakerIdentification': {'Payload': {'bucket_name': 'summaries', 'object_key': key}}}, None)
+
+    assert result['model']['model_id'] == model_id
+    assert bedrock.models == {model_id: 1}
+    assert result['model']['input_tokens'] > 0 and result['model']['output_tokens'] > 0
+    assert result['model']['estimated_input_tokens'] == -(-len(transcript) // 4)
@@ -0,0 +1,113 @@
+import io
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+import lambda_runtime
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+class FakeTranscribe:
+    def __init__(self):
+        self.started = []
+
+    def start_transcription_job(self, **kwargs):
+        self.started.append(kwargs)
+
+    def get_transcription_job(self, TranscriptionJobName):
+        return {
+            'TranscriptionJob': {
+                'TranscriptionJobName': TranscriptionJobName,
+                'TranscriptionJobStatus': 'COMPLETED',
+                'Transcript': {'TranscriptFileUri': 'https://s3.amazonaws.com/summaries/out.txt'}
+            },
+            'ResponseMetadata': {}
+        }
+
+
+class FakeStepFunctions:
+    def __init__(self):
+        self.successes = []
+
+    def send_task_success(self, taskToken, output):
+        self.successes.append((taskToken, json.loads(output)))
+
+
+@pytest.fixture
+def services(monkeypatch):
+    monkeypatch.setenv('SUMMARIES_BUCKET', 'summaries')
+    fakes = {'s3': FakeS3(), 'transcribe': FakeTranscribe(), 'stepfunctions': FakeStepFunctions()}
+    for name, client in fakes.items():
+        lambda_runtime.register_client(name, client)
+    return fakes
+
+
+def test_start_registers_token_before_starting_job(lambda_module, services):
+    callback = lambda_module('transcribe-callback.py')
+    callback.start_handler({
+        'TaskToken': 'token-1',
+        'TranscriptionJob': {'TranscriptionJobName': 'Transcription-Job-a.wav', 'LanguageCode': 'en-US'}
+    }, None)
+
+    assert ('summaries', 'transcribe-callbacks/Transcription-Job-a.wav.json') in services['s3'].objects
+    assert services['transcribe'].started[0]['TranscriptionJobName'] == 'Transcription-Job-a.wav'
+
+
+def test_completion_event_resumes_execution(lambda_module, services):
+    callback = lambda_module('transcribe-callback.py')
+    services['s3'].put_object('summaries', 'transcribe-callbacks/Transcription-Job-a.wav.json',
+                              json.dumps({'TaskToken': 'token-1'}).encode('utf-8'))
+
+    result = callback.lambda_handler({'detail': {
+        'TranscriptionJobName': 'Transcription-Job-a.wav',
+        'TranscriptionJobStatus': 'COMPLETED'
+    }}, None)
+
+    assert result['resumed'] is True
+    token, output = services['stepfunctions'].successes[0]
+    assert token == 'token-1'
+    assert output['TranscriptionJob']['TranscriptionJobStatus'] == 'COMPLETED'
+    assert 'ResponseMetadata' not in output
+    assert services['s3'].objects == {}
+
+
+def test_event_without_registered_token_is_ignored(lambda_module, services):
+    callback = lambda_module('transcribe-callback.py')
+    result = callback.lambda_handler({'detail': {
+        'TranscriptionJobName': 'Transcription-Job-b.wav',
+        'TranscriptionJobStatus': 'COMPLETED'
+    }}, None)
+
+    assert result == {'resumed': False}
+    assert services['stepfunctions'].successes == []
+
+
+def test_token_is_dropped_when_the_job_does_not_start(lambda_module, services):
+    def reject(**kwargs):
+        raise ClientError({'Error': {'Code': 'ConflictException'}}, 'StartTranscriptionJob')
+    services['transcribe'].start_transcription_job = reject
+    callback = lambda_module('transcribe-callback.py')
+
+    with pytest.raises(ClientError):
+        callback.start_handler({
+            'TaskToken': 'token-1',
+            'TranscriptionJob': {'TranscriptionJobName': 'Transcription-Job-a.wav', 'LanguageCode': 'en-US'}
+        }, None)
+
+    assert services['s3'].objects == {}
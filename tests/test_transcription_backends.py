@@ -0,0 +1,126 @@
+import sys
+import json
+import types
+import importlib.machinery
+import importlib.util
+
+import numpy as np
+import pytest
+
+import lambda_runtime
+import local_aws
+import transcription_backends
+import wav_format
+
+EVENT = {'detail': {'bucket': {'name': 'uploads'}, 'object': {'key': 'uploads/standup.wav'}}}
+
+
+@pytest.fixture
+def environment(monkeypatch):
+    monkeypatch.setenv('WHISPER_ENDPOINT', 'local-whisper')
+    monkeypatch.setenv('SUMMARIES_BUCKET', 'summaries')
+    monkeypatch.setenv('CONTENT_INDEX_BACKEND', 'none')
+    monkeypatch.setenv('RATE_LIMITER_INITIAL_RPS', '10000')
+    monkeypatch.setenv('CPU_WORKERS', '2')
+    monkeypatch.setenv('CPU_ENGINE_LOADER', 'local_aws:load_placeholder_engine')
+    lambda_runtime.register_client('sagemaker-runtime', local_aws.LocalSageMakerRuntime(), region_name='us-east-1')
+    with local_aws.LocalWhisperServer() as server:
+        monkeypatch.setenv('TRANSCRIPTION_HTTP_URL', server.url)
+        yield server
+
+
+@pytest.mark.parametrize('payload_format', ['hex-json', 'raw-wav'])
+def test_backends_return_identical_results(environment, monkeypatch, payload_format):
+    monkeypatch.setenv('WHISPER_PAYLOAD_FORMAT', payload_format)
+    chunks = [local_aws.generate_wav(seconds) for seconds in (1, 4.5, 0)]
+
+    results = {}
+    for name in ['sagemaker', 'http', 'cpu']:
+        backend = transcription_backends.backend_from_environment(name)
+        results[name] = [backend.transcribe(chunk) for chunk in chunks]
+
+    assert results['sagemaker'] == results['http'] == results['cpu']
+    assert results['sagemaker'][1] == {'text': local_aws.placeholder_transcript(4.5)}
+    assert environment.requests == 3
+
+
+def test_backend_is_selected_per_job(environment, monkeypatch, lambda_module):
+    whisper = lambda_module('whisper-transcription.py')
+    outputs = {}
+    for name in ['sagemaker', 'http', 'cpu']:
+        s3 = local_aws.LocalS3()
+        lambda_runtime.register_client('s3', s3)
+        s3.objects[('uploads', 'uploads/standup.wav')] = local_aws.generate_wav(70)
+
+        result = whisper.lambda_handler(dict(EVENT, TranscriptionBackend=name), None)
+
+        assert result['TranscriptionJob']['TranscriptionJobStatus'] == 'COMPLETED'
+        outputs[name] = json.loads(s3.objects[('summaries', 'Transcription-Output-for-uploads/standup.wav.txt')])
+
+    assert outputs['sagemaker'] == outputs['http'] == outputs['cpu']
+    assert environment.requests == 3
+
+
+def test_unknown_backend_fails_the_job(environment, monkeypatch, lambda_module):
+    monkeypatch.setenv('TRANSCRIPTION_BACKEND', 'gpu')
+
+    with pytest.raises(ValueError):
+        transcription_backends.backend_name()
+    result = lambda_module('whisper-transcription.py').lambda_handler(EVENT, None)
+    assert result['TranscriptionJob']['TranscriptionJobStatus'] == 'FAILED'
+
+
+@pytest.mark.parametrize('response, text', [
+    ({'text': 'hello there'}, 'hello there'),
+    ({'text': ['hello', 'there']}, 'hello there'),
+    ('hello there', 'hello there')
+])
+def test_response_shapes_are_normalized(response, text):
+    assert transcription_backends.as_result(response) == {'text': text}
+
+
+class StubWhisperModel:
+    """Stands in for faster_whisper.WhisperModel and records the audio it is given."""
+
+    instances = []
+
+    def __init__(self, model, device, compute_type, cpu_threads, num_workers):
+        self.options = {'model': model, 'device': device, 'compute_type': compute_type}
+        self.audio = None
+        StubWhisperModel.instances.append(self)
+
+    def transcribe(self, audio, beam_size):
+        self.audio = audio
+        segments = [types.SimpleNamespace(text=' hello'), types.SimpleNamespace(text=' there. ')]
+        return iter(segments), types.SimpleNamespace(duration=len(audio) / 16000)
+
+
+@pytest.fixture
+def faster_whisper_stub(monkeypatch):
+    module = types.ModuleType('faster_whisper')
+    module.__spec__ = importlib.machinery.ModuleSpec('faster_whisper', None)
+    module.WhisperModel = StubWhisperModel
+    monkeypatch.setitem(sys.modules, 'faster_whisper', module)
+    StubWhisperModel.instances = []
+    return StubWhisperModel
+
+
+def test_faster_whisper_engine_decodes_wav_and_joins_segments(faster_whisper_stub):
+    engine = transcription_backends.load_faster_whisper('base', 'int8')
+    chunk = local_aws.generate_wav(1.5)
+
+    assert engine(chunk) == 'hello there.'
+    model = faster_whisper_stub.instances[0]
+    assert model.options == {'model': 'base', 'device': 'cpu', 'compute_type': 'int8'}
+    assert model.audio.dtype == np.float32 and model.audio.shape == (24000,)
+    assert 0 < np.abs(model.audio).max() <= 1.0
+
+    with pytest.raises(wav_format.WavFormatError):
+        engine(local_aws.generate_wav(1, sample_rate=44100, channels=2))
+
+
+def test_cpu_backend_explains_a_missing_faster_whisper(monkeypatch):
+    monkeypatch.setattr(importlib.util, 'find_spec', lambda name: None)
+
+    with pytest.raises(ImportError, match='requirements-cpu.txt'):
+        transcription_backends.CpuBackend(workers=1)
@@ -0,0 +1,151 @@
+import json
+import struct
+import tempfile
+
+import numpy as np
+import pytest
+
+import lambda_runtime
+import local_aws
+import wav_format
+
+PCM_GUID_TAIL = b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+
+
+def build_wav(data, channels, rate, bits, format_tag=wav_format.WAVE_FORMAT_PCM, extensible=False,
+              before=(), after=(), data_size=None):
+    """WAV bytes with the given fmt, extra chunks around data and an optional fake data size."""
+    block_align = channels * ((bits + 7) // 8)
+    fmt = struct.pack('<HHIIHH', wav_format.WAVE_FORMAT_EXTENSIBLE if extensible else format_tag,
+                      channels, rate, rate * block_align, block_align, bits)
+    if extensible:
+        fmt += struct.pack('<HHI', 22, bits, 0) + struct.pack('<H', format_tag) + PCM_GUID_TAIL
+
+    def chunk(chunk_id, body, size=None):
+        return chunk_id + struct.pack('<I', len(body) if size is None else size) + body + b'\x00' * (len(body) & 1)
+
+    body = b'WAVE' + b''.join(chunk(i, b) for i, b in before) + chunk(b'fmt ', fmt) \
+        + chunk(b'data', data, data_size) + b''.join(chunk(i, b) for i, b in after)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def sine(rate, seconds, channels=1, freq=440.0):
+    t = np.arange(int(rate * seconds)) / rate
+    signal = 0.5 * np.sin(2 * np.pi * freq * t)
+    return np.repeat(signal[:, None], channels, axis=1)
+
+
+def test_parser_walks_extensible_layout_with_list_and_junk():
+    data = np.zeros((10, 2), dtype='<f4').tobytes()
+    audio = build_wav(data, 2, 48000, 32, wav_format.WAVE_FORMAT_IEEE_FLOAT, extensible=True,
+                      before=[(b'JUNK', b'\x00' * 28), (b'LIST', b'INFOISFT\x03\x00\x00\x00ab\x00')],
+                      after=[(b'LIST', b'INFO')])
+
+    info = wav_format.parse_header(audio)
+
+    assert info.extensible and info.is_float
+    assert (info.channels, info.sample_rate, info.sampwidth, info.n_frames) == (2, 48000, 4, 10)
+    assert [chunk_id for chunk_id, _, _ in info.chunks] == ['JUNK', 'LIST', 'fmt ', 'data']
+    assert audio[info.data_offset:info.data_offset + info.data_size] == data
+    assert not info.stdlib_readable
+
+
+def test_float_samples_are_a_view_of_the_buffer():
+    samples = sine(16000, 0.1, channels=2).astype('<f4')
+    audio = build_wav(samples.tobytes(), 2, 16000, 32, wav_format.WAVE_FORMAT_IEEE_FLOAT)
+
+    view = wav_format.pcm_view(audio, wav_format.parse_header(audio))
+
+    assert view.shape == samples.shape
+    assert np.shares_memory(view, np.frombuffer(audio, dtype=np.uint8))
+    np.testing.assert_array_equal(view, samples)
+
+
+def test_24_bit_samples_are_sign_extended():
+    values = [0, 1, -1, 8388607, -8388608]
+    data = b''.join(struct.pack('<i', value)[:3] for value in values)
+    audio = build_wav(data, 1, 16000, 24, extensible=True)
+    info = wav_format.parse_header(audio)
+
+    view = wav_format.pcm_view(audio, info)
+
+    assert (view[:, 0] >> 8).tolist() == values
+    assert wav_format.to_float(view, info).max() == pytest.approx(1.0, abs=1e-6)
+
+
+@pytest.mark.parametrize('rate', [48000, 44100, 8000])
+def test_conversion_to_16k_mono_int16(rate):
+    samples = sine(rate, 2.5, channels=2, freq=100.0)
+    audio = build_wav((samples * 2147483647).astype('<i4').tobytes(), 2, rate, 32)
+    info = wav_format.parse_header(audio)
+
+    converted = wav_format.to_int16_mono(audio, info)
+
+    expected = sine(16000, 2.5, freq=100.0)[:, 0] * 32767
+    assert converted.dtype == np.int16
+    assert len(converted) == 16000 * 5 // 2
+    # Resampling shifts and smooths the signal slightly
+    assert np.abs(converted - expected).max() < 0.02 * 32767
+
+
+def test_streamed_data_size_is_clamped_to_the_file():
+    audio = build_wav(np.zeros(100, dtype='<i2').tobytes(), 1, 16000, 16, data_size=0xFFFFFFFF)
+
+    assert wav_format.parse_header(audio).n_frames == 100
+
+
+@pytest.mark.parametrize('audio', [b'RIFF\x10\x00\x00\x00AVI LIST', b'not audio', b'RIFF\x04\x00\x00\x00WAVE'])
+def test_non_wave_files_are_rejected(audio):
+    with pytest.raises(wav_format.WavFormatError):
+        wav_format.parse_header(audio)
+
+
+def test_file_sources_are_memory_mapped():
+    samples = sine(48000, 1.0, channels=2).astype('<f4')
+    with tempfile.TemporaryFile() as source, tempfile.TemporaryFile() as dest:
+        source.write(build_wav(samples.tobytes(), 2, 48000, 32, wav_format.WAVE_FORMAT_IEEE_FLOAT))
+        source.seek(0)
+
+        frames = wav_format.normalize_wav(source, dest, block_seconds=0.3)
+        dest.seek(0)
+        info = wav_format.parse_header(dest)
+
+    assert frames == info.n_frames == 16000
+    assert info.is_target_format
+
+
+@pytest.mark.parametrize('memory_budget', ['false', 'true'])
+def test_whisper_transcribes_float_extensible_wav_without_ffmpeg(lambda_module, monkeypatch, memory_budget):
+    monkeypatch.setenv('WHISPER_ENDPOINT', 'local-whisper')
+    monkeypatch.setenv('SUMMARIES_BUCKET', 'summaries')
+    monkeypatch.setenv('CONTENT_INDEX_BACKEND', 'none')
+    monkeypatch.setenv('RATE_LIMITER_INITIAL_RPS', '10000')
+    monkeypatch.setenv('MEMORY_BUDGET_MODE', memory_budget)
+    whisper = lambda_module('whisper-transcription.py')
+    monkeypatch.setattr(whisper, 'convert_mp4_to_wav', pytest.fail)
+
+    s3 = local_aws.LocalS3()
+    endpoint = local_aws.LocalSageMakerRuntime()
+    lambda_runtime.register_client('s3', s3)
+    lambda_runtime.register_client('sagemaker-runtime', endpoint, region_name='us-east-1')
+    samples = sine(48000, 65, channels=2).astype('<f4')
+    s3.objects[('uploads', 'uploads/daw.wav')] = build_wav(
+        samples.tobytes(), 2, 48000, 32, wav_format.WAVE_FORMAT_IEEE_FLOAT, extensible=True,
+        before=[(b'JUNK', b'\x00' * 28)])
+
+    event = {'detail': {'bucket': {'name': 'uploads'}, 'object': {'key': 'uploads/daw.wav'}}}
+    result = whisper.lambda_handler(event, None)
+
+    assert result['TranscriptionJob']['TranscriptionJobStatus'] == 'COMPLETED'
+    output = json.loads(s3.objects[('summaries', 'Transcription-Output-for-uploads/daw.wav.txt')])
+    assert len(output['results']['speaker_labels']['segments']) == 3
+    assert endpoint.audio_seconds == pytest.approx(65)
+    # 16 kHz mono 16-bit is a sixth of 48 kHz stereo float, hex encoded
+    assert endpoint.bytes_in < 2 * samples.nbytes / 5
+
+
+def test_detect_audio_format_requires_wave_form_type(lambda_module):
+    whisper = lambda_module('whisper-transcription.py')
+
+    assert whisper.detect_audio_format(local_aws.generate_wav(0.1)[:64]) == 'wav'
+    assert whisper.detect_audio_format(b'RIFF\x10\x00\x00\x00AVI LIST') == 'unknown'
@@ -0,0 +1,245 @@
+"""
+Offline batch runner for the transcription and summary pipeline.
+
+Runs the Whisper, speaker-identification and summary Lambda handlers from
+backend-cdk/lambda on a plain Linux host or in a container, in the same
+order as the Step Functions state machine, so the S3 artifacts are the
+same. There is no Lambda timeout, so it also handles recordings that are
+too long for the Lambda path, and archive backfills.
+
+Manifest lines are either s3://bucket/key or local file paths. Local files
+are uploaded to --uploads-bucket first, as batch-uploads/<uuid>-<file name>:
+the UUID keeps files with the same name apart and is the job id in the job
+index, and the prefix is outside uploads/, so the intake queue does not run
+the Step Functions pipeline on them a second time.
+
+Files are processed in a pool of worker processes (--processes), so WAV
+parsing and conversion of several files use several cores. Inside each
+worker the Whisper handler sends --chunk-concurrency chunk requests at a
+time from a thread pool. Each file's progress is written to --state-dir
+after every stage; a rerun skips finished files and resumes the others at
+the first unfinished stage.
+
+The handlers read their usual environment (WHISPER_ENDPOINT, GUARDRAIL_ID,
+...). AWS credentials come from the environment or the instance profile.
+
+Usage:
+    python utils/batch_transcribe.py manifest.txt --uploads-bucket my-uploads \\
+        --summaries-bucket my-summaries --processes 4 --chunk-concurrency 8
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import argparse
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend-cdk', 'lambda')
+sys.path.insert(0, LAMBDA_DIR)
+
+import lambda_runtime  # noqa: E402
+
+# Stages in state machine order
+STAGES = ('upload', 'transcription', 'speaker_identification', 'summary')
+
+# Local files are uploaded here; S3 notifications only cover uploads/
+UPLOAD_PREFIX = 'batch-uploads/'
+
+# Handler modules loaded once per worker process
+_handlers = {}
+
+
+def load_handler(file_name):
+    """Import a hyphenated Lambda handler file once per process."""
+    module = _handlers.get(file_name)
+    if module is None:
+        module_name = file_name.replace('-', '_').rsplit('.', 1)[0]
+        spec = importlib.util.spec_from_file_location(module_name, os.path.join(LAMBDA_DIR, file_name))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _handlers[file_name] = module
+    return module
+
+
+def read_manifest(path):
+    """Manifest entries, skipping blank lines and # comments."""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+
+def state_path(state_dir, entry):
+    return os.path.join(state_dir, hashlib.sha256(entry.encode('utf-8')).hexdigest()[:32] + '.json')
+
+
+def load_state(state_dir, entry):
+    """Saved progress of one manifest entry, or a fresh state."""
+    try:
+        with open(state_path(state_dir, entry)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'entry': entry, 'status': 'pending', 'stages': {}}
+
+
+def save_state(state_dir, state):
+    """Write the state atomically, so an interrupted run never leaves half a file."""
+    path = state_path(state_dir, state['entry'])
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temporary, path)
+
+
+def upload_source(entry, uploads_bucket):
+    """S3 location of a manifest entry, uploading local files first."""
+    if entry.startswith('s3://'):
+        bucket, _, key = entry[len('s3://'):].partition('/')
+        return {'bucket': bucket, 'key': key}
+    if not uploads_bucket:
+        raise ValueError(f"--uploads-bucket is required for local file {entry}")
+    # The key is kept in the resume state, so a rerun never uploads again
+    key = f"{UPLOAD_PREFIX}{uuid.uuid4()}-{os.path.basename(entry)}"
+    with open(entry, 'rb') as f:
+        lambda_runtime.get_client('s3').upload_fileobj(f, uploads_bucket, key)
+    return {'bucket': uploads_bucket, 'key': key, 'bytes': os.path.getsize(entry)}
+
+
+def run_stage(name, state, options):
+    """Run one stage of one file and return its result."""
+    stages = state['stages']
+    if name == 'upload':
+        return upload_source(state['entry'], options['uploads_bucket'])
+    if name == 'transcription':
+        event = {'detail': {'bucket': {'name': stages['upload']['bucket']},
+                            'object': {'key': stages['upload']['key']}}}
+        if options.get('backend'):
+            event['TranscriptionBackend'] = options['backend']
+        result = load_handler('whisper-transcription.py').lambda_handler(event, None)
+        job = result['TranscriptionJob']
+        if job['TranscriptionJobStatus'] not in ('COMPLETED', 'DEDUPLICATED'):
+            raise RuntimeError(f"Transcription failed: {job.get('FailureReason')}")
+        return result
+    if name == 'speaker_identification':
+        return load_handler('speaker-identification.py').lambda_handler(
+            {'TranscriptionJob': {'Payload': stages['transcription']}}, None)
+    if name == 'summary':
+        speaker = stages['speaker_identification']
+        return load_handler('bedrock-summary.py').lambda_handler({'SpeakerIdentification': {'Payload': {
+            'bucket_name': speaker['bucket_name'],
+            'object_key': speaker['object_key'],
+            'content_fingerprint': speaker.get('content_fingerprint')
+        }}}, None)
+    raise ValueError(f"Unknown stage: {name}")
+
+
+def process_entry(entry, options):
+    """
+    Run the remaining stages of one manifest entry, saving state after each.
+
+    Returns:
+        (entry, status, seconds, error) with status done, skipped or failed
+    """
+    start = time.perf_counter()
+    state = load_state(options['state_dir'], entry)
+    if state['status'] == 'done':
+        return entry, 'skipped', 0.0, None
+    try:
+        for name in STAGES:
+            if name in state['stages']:
+                continue
+            state['stages'][name] = run_stage(name, state, options)
+            save_state(options['state_dir'], state)
+            transcription = state['stages'].get('transcription', {}).get('TranscriptionJob', {})
+            if transcription.get('TranscriptionJobStatus') == 'DEDUPLICATED':
+                # Identical content was processed before and its artifacts were copied
+                break
+        state.update(status='done', error=None)
+        status, error = 'done', None
+    except Exception as e:
+        state.update(status='failed', error=str(e))
+        status, error = 'failed', str(e)
+    save_state(options['state_dir'], state)
+    return entry, status, time.perf_counter() - start, error
+
+
+def _init_worker(environment):
+    os.environ.update(environment)
+
+
+def handler_environment(args):
+    """Environment the handlers need, on top of the caller's."""
+    environment = {
+        'CHUNK_CONCURRENCY': str(args.chunk_concurrency),
+        # Long recordings are spooled to disk instead of held in memory
+        'MEMORY_BUDGET_MODE': 'true'
+    }
+    if args.summaries_bucket:
+        environment['SUMMARIES_BUCKET'] = args.summaries_bucket
+    return environment
+
+
+def run_batch(entries, options, processes=1, environment=None):
+    """
+    Process manifest entries and report throughput.
+
+    With processes=0 every file is processed in this process, one at a
+    time (useful for debugging and tests).
+
+    Returns:
+        Report with per-status counts, failures, wall seconds and files/hour
+    """
+    os.makedirs(options['state_dir'], exist_ok=True)
+    environment = environment or {}
+    counts = {'done': 0, 'skipped': 0, 'failed': 0}
+    failures = {}
+    start = time.perf_counter()
+
+    def record(entry, status, seconds, error):
+        counts[status] += 1
+        if error:
+            failures[entry] = error
+        print(f"{status:>7} {seconds:8.1f}s {entry}" + (f" ({error})" if error else ''), file=sys.stderr)
+
+    if processes <= 0:
+        _init_worker(environment)
+        for entry in entries:
+            record(*process_entry(entry, options))
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(environment,)) as executor:
+            futures = [executor.submit(process_entry, entry, options) for entry in entries]
+            for future in as_completed(futures):
+                record(*future.result())
+
+    wall_seconds = time.perf_counter() - start
+    return dict(counts, failures=failures, wall_seconds=round(wall_seconds, 3),
+                files_per_hour=round(counts['done'] * 3600.0 / wall_seconds, 1) if wall_seconds else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe and summarize a manifest of recordings outside Step Functions.")
+    parser.add_argument("manifest", help="File with one s3://bucket/key or local path per line")
+    parser.add_argument("--uploads-bucket", help="Bucket local files are uploaded to")
+    parser.add_argument("--summaries-bucket", help="Bucket for transcripts and summaries (SUMMARIES_BUCKET)")
+    parser.add_argument("--state-dir", default=".batch-state", help="Directory for per-file resume state")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Files processed in parallel (0 = in this process)")
+    parser.add_argument("--chunk-concurrency", type=int, default=4, help="Whisper requests in flight per file")
+    parser.add_argument("--backend", choices=['sagemaker', 'http', 'cpu'],
+                        help="Transcription backend (default: TRANSCRIPTION_BACKEND or sagemaker)")
+    parser.add_argument("--report", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    options = {'state_dir': args.state_dir, 'uploads_bucket': args.uploads_bucket, 'backend': args.backend}
+    report = run_batch(read_manifest(args.manifest), options, args.processes, handler_environment(args))
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if report['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())